@@ -22,7 +22,6 @@ from manila.api import extensions
 from manila.api.openstack import wsgi
 from manila.api import xmlutil
 from manila import db
-from manila.db.sqlalchemy import api as sqlalchemy_api
 from manila import exception
 from manila.i18n import _
 from manila.openstack.common import log as logging
@@ -100,7 +99,7 @@ class QuotaSetsController(object):
         if self.ext_mgr.is_loaded('os-user-quotas'):
             user_id = params.get('user_id', [None])[0]
         try:
-            sqlalchemy_api.authorize_project_context(context, id)
+            db.authorize_project_context(context, id)
             return self._format_quota_set(
                 id, self._get_quotas(context, id, user_id=user_id))
         except exception.NotAuthorized:
@@ -225,7 +224,7 @@ class QuotaSetsController(object):
             if user_id and not self.ext_mgr.is_loaded('os-user-quotas'):
                 raise webob.exc.HTTPNotFound()
             try:
-                sqlalchemy_api.authorize_project_context(context, id)
+                db.authorize_project_context(context, id)
                 if user_id:
                     QUOTAS.destroy_all_by_project_and_user(context,
                                                            id, user_id)
@@ -0,0 +1,90 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Request timing middleware and metrics endpoint.
+
+"""
+
+from oslo.config import cfg
+import webob.dec
+import webob.exc
+
+from manila import instrumentation
+from manila import wsgi
+
+CONF = cfg.CONF
+
+
+class Instrumentation(wsgi.Middleware):
+    """Times requests and reports where their time went.
+
+    The timings are returned in a Server-Timing header and logged.  The
+    time spent streaming a response body is only known once the body has
+    been sent, so it is only logged and emitted as 'stream'.
+    """
+
+    def __call__(self, environ, start_response):
+        # NOTE: plain WSGI, so that nothing is built per request when
+        # instrumentation is disabled.
+        if not CONF.instrumentation_enabled:
+            return self.application(environ, start_response)
+        return self._instrumented(environ, start_response)
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def _instrumented(self, req):
+        timings = instrumentation.begin('api')
+        description = '%s %s' % (req.method, req.path)
+        try:
+            response = req.get_response(self.application)
+        except Exception:
+            instrumentation.finish(timings, description=description)
+            raise
+        response.headers['Server-Timing'] = timings.server_timing(
+            timings.elapsed)
+        if isinstance(response.app_iter, list):
+            instrumentation.finish(timings, description=description)
+        else:
+            response.app_iter = self._stream(response.app_iter, timings,
+                                             description)
+        return response
+
+    def _stream(self, app_iter, timings, description):
+        try:
+            with instrumentation.timed('stream'):
+                for chunk in app_iter:
+                    yield chunk
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+            instrumentation.finish(timings, description=description)
+
+
+class Metrics(wsgi.Application):
+    """Serves the recorded metrics in the Prometheus text format.
+
+    Only admins may read them; the auth pipeline in front of this app
+    must set the request context.
+    """
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def __call__(self, req):
+        if not CONF.instrumentation_enabled:
+            raise webob.exc.HTTPNotFound()
+        context = req.environ.get('manila.context')
+        if context is None or not context.is_admin:
+            raise webob.exc.HTTPForbidden()
+        response = webob.Response(body=instrumentation.render_metrics())
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4'
+        return response
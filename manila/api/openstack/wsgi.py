@@ -24,6 +24,7 @@ from manila import exception
 from manila.i18n import _
 from manila.i18n import _LE
 from manila.i18n import _LI
+from manila import instrumentation
 from manila.openstack.common import log as logging
 from manila import utils
 from manila import wsgi
@@ -38,6 +39,9 @@ XMLNS_ATOM = 'http://www.w3.org/2005/Atom'
 
 LOG = logging.getLogger(__name__)
 
+# Size of the chunks streamed responses are written in.
+STREAM_CHUNK_SIZE = 65536
+
 # The vendor content types should serialize identically to the non-vendor
 # content types. So to avoid littering the code with both options, we
 # map the vendor to the other when looking up the type
@@ -229,6 +233,52 @@ class MetadataXMLDeserializer(XMLDeserializer):
         return metadata
 
 
+class LazyList(object):
+    """Sequence of items built on demand from a list of source items.
+
+    Views use it for collections so that each item view is only built
+    while the response is serialized, and then thrown away.
+    """
+
+    def __init__(self, func, items):
+        self.func = func
+        self.items = items
+
+    def __iter__(self):
+        for item in self.items:
+            yield self.func(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.func(item) for item in self.items[index]]
+        return self.func(self.items[index])
+
+    def __eq__(self, other):
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _is_streamable(data):
+    return (isinstance(data, dict) and
+            any(isinstance(v, LazyList) for v in data.values()))
+
+
+def _materialize(data):
+    """Return data with the top level lazy lists turned into lists."""
+    if not _is_streamable(data):
+        return data
+    return dict((k, list(v) if isinstance(v, LazyList) else v)
+                for k, v in data.items())
+
+
 class DictSerializer(ActionDispatcher):
     """Default request body serialization"""
 
@@ -245,6 +295,49 @@ class JSONDictSerializer(DictSerializer):
     def default(self, data):
         return jsonutils.dumps(data)
 
+    def serialize_iter(self, data):
+        """Yield the JSON document for data in chunks.
+
+        Lazy lists at the top level of data are encoded one item at a
+        time, so the memory used does not depend on their length.
+        """
+        buf = []
+        size = 0
+        for part in self._iterencode(data):
+            buf.append(part)
+            size += len(part)
+            if size >= STREAM_CHUNK_SIZE:
+                yield six.b('').join(buf)
+                buf = []
+                size = 0
+        if buf:
+            yield six.b('').join(buf)
+
+    def _iterencode(self, data):
+        def encode(obj):
+            chunk = jsonutils.dumps(obj)
+            if isinstance(chunk, six.text_type):
+                chunk = chunk.encode('utf-8')
+            return chunk
+
+        if not isinstance(data, dict):
+            yield encode(data)
+            return
+        separator = six.b('{')
+        for key, value in data.items():
+            yield separator + encode(key) + six.b(': ')
+            separator = six.b(', ')
+            if isinstance(value, LazyList):
+                item_separator = six.b('[')
+                for item in value:
+                    yield item_separator + encode(item)
+                    item_separator = six.b(', ')
+                yield six.b('[]') if item_separator == six.b('[') \
+                    else six.b(']')
+            else:
+                yield encode(value)
+        yield six.b('{}') if separator == six.b('{') else six.b('}')
+
 
 class XMLDictSerializer(DictSerializer):
 
@@ -513,7 +606,11 @@ class ResponseObject(object):
             response.headers[hdr] = value
         response.headers['Content-Type'] = content_type
         if self.obj is not None:
-            response.body = serializer.serialize(self.obj)
+            if (_is_streamable(self.obj) and
+                    hasattr(serializer, 'serialize_iter')):
+                response.app_iter = serializer.serialize_iter(self.obj)
+            else:
+                response.body = serializer.serialize(_materialize(self.obj))
 
         return response
 
@@ -820,6 +917,12 @@ class Resource(wsgi.Application):
             msg = _("Malformed request body")
             return Fault(webob.exc.HTTPBadRequest(explanation=msg))
 
+        timings = instrumentation.current()
+        if timings is not None:
+            owner = getattr(meth, '__self__', self)
+            timings.name = 'api.%s.%s' % (type(owner).__name__,
+                                          meth.__name__)
+
         # Now, deserialize the request body...
         try:
             if content_type:
@@ -879,8 +982,9 @@ class Resource(wsgi.Application):
                                                         request, action_args)
 
             if resp_obj and not response:
-                response = resp_obj.serialize(request, accept,
-                                              self.default_serializers)
+                with instrumentation.timed('serialize'):
+                    response = resp_obj.serialize(request, accept,
+                                                  self.default_serializers)
 
         try:
             msg_dict = dict(url=request.url, status=response.status_int)
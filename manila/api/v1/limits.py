@@ -19,13 +19,20 @@ Module dedicated functions/classes dealing with rate limiting requests.
 
 import collections
 import copy
+import fcntl
+import hashlib
 import httplib
 import math
+import mmap
+import os
 import re
+import struct
+import threading
 import time
 
 from oslo.serialization import jsonutils
 from oslo.utils import importutils
+import six
 import webob.dec
 import webob.exc
 
@@ -121,6 +128,7 @@ class Limit(object):
         self.verb = verb
         self.uri = uri
         self.regex = regex
+        self._compiled_regex = None
         self.value = int(value)
         self.unit = unit
         self.unit_string = self.display_unit().lower()
@@ -139,41 +147,70 @@ class Limit(object):
                 "made to %(uri)s every %(unit_string)s.")
         self.error_message = msg % self.__dict__
 
+    @property
+    def compiled_regex(self):
+        """The regex of the limit, compiled on first use."""
+        if self._compiled_regex is None:
+            self._compiled_regex = re.compile(self.regex)
+        return self._compiled_regex
+
+    def __deepcopy__(self, memo):
+        # NOTE: compiled regexes can not be deep-copied, and all the other
+        # attributes are immutable.
+        limit = self.__class__.__new__(self.__class__)
+        limit.__dict__.update(self.__dict__)
+        return limit
+
     def __call__(self, verb, url):
         """Represents a call to this limit from a relevant request.
 
         @param verb: string http verb (POST, GET, etc.)
         @param url: string URL
         """
-        if self.verb != verb or not re.match(self.regex, url):
+        if self.verb != verb or not self.compiled_regex.match(url):
             return
 
-        now = self._get_time()
-
-        if self.last_request is None:
-            self.last_request = now
+        state = (self.water_level, self.last_request, self.next_request,
+                 self.remaining)
+        state, delay = self.consume(state, self._get_time())
+        (self.water_level, self.last_request, self.next_request,
+         self.remaining) = state
+        return delay
+
+    def consume(self, state, now):
+        """Account for a request made at the given time.
+
+        @param state: Tuple of water level, last request time, next request
+                      time and remaining requests, or None if there were
+                      no requests yet.
+        @param now: Time of the request
+        @return: Tuple of the new state and the delay before the request
+                 would be accepted (or None if it is accepted)
+        """
+        if state is None:
+            state = (0, None, None, self.value)
+        water_level, last_request, next_request, remaining = state
 
-        leak_value = now - self.last_request
+        if last_request is None:
+            last_request = now
 
-        self.water_level -= leak_value
-        self.water_level = max(self.water_level, 0)
-        self.water_level += self.request_value
+        leak_value = now - last_request
 
-        difference = self.water_level - self.capacity
+        water_level -= leak_value
+        water_level = max(water_level, 0)
+        water_level += self.request_value
 
-        self.last_request = now
+        difference = water_level - self.capacity
 
         if difference > 0:
-            self.water_level -= self.request_value
-            self.next_request = now + difference
-            return difference
+            water_level -= self.request_value
+            return (water_level, now, now + difference, remaining), difference
 
         cap = self.capacity
-        water = self.water_level
         val = self.value
 
-        self.remaining = math.floor(((cap - water) / cap) * val)
-        self.next_request = now
+        remaining = math.floor(((cap - water_level) / cap) * val)
+        return (water_level, now, now, remaining), None
 
     def _get_time(self):
         """Retrieve the current time. Broken out for testability."""
@@ -210,7 +247,9 @@ DEFAULT_LIMITS = [
 class RateLimitingMiddleware(base_wsgi.Middleware):
     """Rate-limits requests passing through this middleware.
 
-    All limit information is stored in memory for this implementation.
+    By default, all limit information is stored in the memory of each API
+    worker.  Use the `SharedLimiter` limiter with a shared backend to
+    enforce limits across workers.
     """
 
     def __init__(self, application, limits=None, limiter=None, **kwargs):
@@ -273,23 +312,45 @@ class RateLimitingMiddleware(base_wsgi.Middleware):
 class Limiter(object):
     """Rate-limit checking class which handles limits in memory."""
 
-    def __init__(self, limits, **kwargs):
+    # Default number of users whose limit levels are kept in memory.
+    MAX_USERS = 10000
+
+    def __init__(self, limits, max_users=MAX_USERS, **kwargs):
         """Initialize the new `Limiter`.
 
         @param limits: List of `Limit` objects
+        @param max_users: Number of users whose limit levels are kept; the
+                          levels of the least recently seen users beyond
+                          that are dropped.
         """
         self.limits = copy.deepcopy(limits)
-        self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        self.max_users = int(max_users)
+        self.levels = collections.OrderedDict()
 
         # Pick up any per-user limit information
+        self.user_limits = {}
         for key, value in kwargs.items():
             if key.startswith('user:'):
                 username = key[5:]
-                self.levels[username] = self.parse_limits(value)
+                self.user_limits[username] = self.parse_limits(value)
+                self.levels[username] = copy.deepcopy(
+                    self.user_limits[username])
+
+    def _get_levels(self, username):
+        """Return the limit levels of a user, as most recently used."""
+        try:
+            levels = self.levels.pop(username)
+        except KeyError:
+            levels = copy.deepcopy(self.user_limits.get(username,
+                                                        self.limits))
+            while self.levels and len(self.levels) >= self.max_users:
+                self.levels.popitem(last=False)
+        self.levels[username] = levels
+        return levels
 
     def get_limits(self, username=None):
         """Return the limits for a given user."""
-        return [limit.display() for limit in self.levels[username]]
+        return [limit.display() for limit in self._get_levels(username)]
 
     def check_for_delay(self, verb, url, username=None):
         """Check the given verb/user/user triplet for limit.
@@ -298,7 +359,7 @@ class Limiter(object):
         """
         delays = []
 
-        for limit in self.levels[username]:
+        for limit in self._get_levels(username):
             delay = limit(verb, url)
             if delay:
                 delays.append((delay, limit.error_message))
@@ -370,6 +431,188 @@ class Limiter(object):
         return result
 
 
+class LimitBackend(object):
+    """Storage of the limit state used by `SharedLimiter`.
+
+    The state is an opaque tuple of four floats.  Implementations must
+    apply update() atomically with respect to every other user of the
+    same storage; for key-value stores like memcache this is a gets/cas
+    loop, for databases a row lock.
+    """
+
+    def get(self, key):
+        """Return the state stored under key, or None."""
+        raise NotImplementedError()
+
+    def update(self, key, func):
+        """Atomically replace the state stored under key.
+
+        @param func: Callable taking the current state (or None) and
+                     returning a tuple of the new state and a result
+        @return: The result returned by func
+        """
+        raise NotImplementedError()
+
+
+class MemoryLimitBackend(LimitBackend):
+    """Keeps the limit state of the most recently seen keys in memory."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = int(max_keys)
+        self._states = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._states.get(key)
+
+    def update(self, key, func):
+        with self._lock:
+            state, result = func(self._states.pop(key, None))
+            while len(self._states) >= self.max_keys:
+                self._states.popitem(last=False)
+            self._states[key] = state
+        return result
+
+
+class SharedMemoryLimitBackend(LimitBackend):
+    """Keeps the limit state in a memory mapped file.
+
+    API workers of a host mapping the same file share their limit state.
+    The file is an open addressing hash table of fixed size; when all the
+    slots a key can use are taken, the least recently updated one is
+    reused.
+    """
+
+    _SLOT = struct.Struct('=Q4d')
+    _PROBES = 8
+
+    def __init__(self, path, slots=65536):
+        self.slots = int(slots)
+        size = self.slots * self._SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def _hash(key):
+        # 0 marks free slots
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16) or 1
+
+    def _find(self, key_hash):
+        """Return the offset of the slot for key_hash and its state."""
+        victim = None
+        for probe in range(self._PROBES):
+            offset = ((key_hash + probe) % self.slots) * self._SLOT.size
+            slot = self._SLOT.unpack_from(self._map, offset)
+            if slot[0] == key_hash:
+                return offset, slot[1:]
+            if slot[0] == 0:
+                return offset, None
+            if victim is None or slot[2] < victim[1]:
+                victim = (offset, slot[2])
+        return victim[0], None
+
+    def get(self, key):
+        return self._find(self._hash(key))[1]
+
+    def update(self, key, func):
+        key_hash = self._hash(key)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            offset, state = self._find(key_hash)
+            state, result = func(state)
+            self._SLOT.pack_into(self._map, offset, key_hash, *state)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        return result
+
+
+class SharedLimiter(Limiter):
+    """Rate-limit checking class which keeps the limit state in a backend.
+
+    Limits are only evaluated against requests with the same verb, and the
+    state is kept in a `LimitBackend`, so that API workers using a shared
+    backend enforce limits together.  Arguments prefixed with ``backend_``
+    are passed to the backend.
+    """
+
+    def __init__(self, limits, backend=None, **kwargs):
+        backend_kwargs = {}
+        for key in list(kwargs):
+            if key.startswith('backend_'):
+                backend_kwargs[key[8:]] = kwargs.pop(key)
+        super(SharedLimiter, self).__init__(limits, **kwargs)
+        self.levels = None
+
+        if backend is None:
+            backend = MemoryLimitBackend
+        elif isinstance(backend, six.string_types):
+            backend = importutils.import_class(backend)
+        self.backend = backend(**backend_kwargs)
+
+        self._tables = {}
+        self._default_table = self._build_table(self.limits)
+        for username, user_limits in self.user_limits.items():
+            self._tables[username] = self._build_table(user_limits)
+
+    @staticmethod
+    def _build_table(limits):
+        """Return the limits with their backend keys, and those by verb."""
+        entries = []
+        by_verb = collections.defaultdict(list)
+        for limit in limits:
+            key = '%s %s %s/%s' % (limit.verb, limit.regex, limit.value,
+                                   limit.unit)
+            entries.append((limit, key))
+            by_verb[limit.verb].append((limit, key))
+        return entries, dict(by_verb)
+
+    def _get_table(self, username):
+        return self._tables.get(username, self._default_table)
+
+    def get_limits(self, username=None):
+        """Return the limits for a given user."""
+        result = []
+        for limit, key in self._get_table(username)[0]:
+            display = limit.display()
+            state = self.backend.get('%s:%s' % (username, key))
+            if state is not None:
+                display['remaining'] = int(state[3])
+                display['resetTime'] = int(state[2])
+            result.append(display)
+        return result
+
+    def check_for_delay(self, verb, url, username=None):
+        """Check the given verb/user/user triplet for limit.
+
+        @return: Tuple of delay (in seconds) and error message (or None, None)
+        """
+        delays = []
+        now = None
+
+        for limit, key in self._get_table(username)[1].get(verb, ()):
+            if not limit.compiled_regex.match(url):
+                continue
+            if now is None:
+                now = limit._get_time()
+            delay = self.backend.update(
+                '%s:%s' % (username, key),
+                lambda state: limit.consume(state, now))
+            if delay:
+                delays.append((delay, limit.error_message))
+
+        if delays:
+            delays.sort()
+            return delays[0]
+
+        return None, None
+
+
 class WsgiLimiter(object):
     """Rate-limit checking from a WSGI application.
 
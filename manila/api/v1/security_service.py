@@ -156,13 +156,10 @@ class SecurityServiceController(wsgi.Controller):
         limited_list = common.limited(security_services, req)
 
         if is_detail:
+            share_networks = db.share_network_ids_get_by_security_services(
+                context, [ss['id'] for ss in limited_list])
             security_services = self._view_builder.detail_list(
-                req, limited_list)
-            for ss in security_services['security_services']:
-                share_networks = db.share_network_get_all_by_security_service(
-                    context,
-                    ss['id'])
-                ss['share_networks'] = [sn['id'] for sn in share_networks]
+                req, limited_list, share_networks)
         else:
             security_services = self._view_builder.summary_list(
                 req, limited_list)
@@ -140,18 +140,18 @@ class ShareNetworkController(wsgi.Controller):
                                     'get_all_share_networks')
 
         if 'security_service_id' in search_opts:
-            networks = db_api.share_network_get_all_by_security_service(
-                context, search_opts['security_service_id'])
+            networks = db_api.share_network_view_get_all(
+                context,
+                security_service_id=search_opts['security_service_id'])
         elif ('project_id' in search_opts and
               search_opts['project_id'] != context.project_id):
-            networks = db_api.share_network_get_all_by_project(
-                context, search_opts['project_id'])
+            networks = db_api.share_network_view_get_all(
+                context, project_id=search_opts['project_id'])
         elif 'all_tenants' in search_opts:
-            networks = db_api.share_network_get_all(context)
+            networks = db_api.share_network_view_get_all(context)
         else:
-            networks = db_api.share_network_get_all_by_project(
-                context,
-                context.project_id)
+            networks = db_api.share_network_view_get_all(
+                context, project_id=context.project_id)
 
         date_parsing_error_msg = '''%s is not in yyyy-mm-dd format.'''
         if 'created_since' in search_opts:
@@ -13,10 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo.config import cfg
 import six
 import webob
 from webob import exc
 
+from manila.api import common
 from manila.api.openstack import wsgi
 from manila.api.views import share_servers as share_servers_views
 from manila.api import xmlutil
@@ -28,6 +30,7 @@ from manila.openstack.common import log as logging
 from manila import policy
 from manila import share
 
+CONF = cfg.CONF
 RESOURCE_NAME = 'share_server'
 RESOURCES_NAME = 'share_servers'
 LOG = logging.getLogger(__name__)
@@ -81,21 +84,22 @@ class ShareServerController(wsgi.Controller):
 
         search_opts = {}
         search_opts.update(req.GET)
+        search_opts.pop('limit', None)
+        search_opts.pop('marker', None)
 
-        share_servers = db_api.share_server_get_all(context)
+        params = common.get_pagination_params(req)
+        if 'limit' in params or 'marker' in params:
+            max_limit = CONF.osapi_max_limit
+            params['limit'] = min(max_limit, params.get('limit') or max_limit)
+        try:
+            share_servers = db_api.share_server_view_get_all(
+                context, filters=search_opts, **params)
+        except exception.ShareServerNotFound:
+            msg = _('marker [%s] not found') % params['marker']
+            raise exc.HTTPBadRequest(explanation=msg)
         for s in share_servers:
-            s.project_id = s.share_network['project_id']
-            if s.share_network['name']:
-                s.share_network_name = s.share_network['name']
-            else:
+            if not s.share_network_name:
                 s.share_network_name = s.share_network_id
-        if search_opts:
-            for k, v in six.iteritems(search_opts):
-                share_servers = [s for s in share_servers if
-                                 (hasattr(s, k) and
-                                  s[k] == v or k == 'share_network' and
-                                  v in [s.share_network['name'],
-                                        s.share_network['id']])]
         return self._view_builder.build_share_servers(share_servers)
 
     @wsgi.serializers(xml=ShareServerTemplate)
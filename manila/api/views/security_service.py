@@ -14,6 +14,7 @@
 #    under the License.
 
 from manila.api import common
+from manila.api.openstack import wsgi
 
 
 class ViewBuilder(common.ViewBuilder):
@@ -25,9 +26,22 @@ class ViewBuilder(common.ViewBuilder):
         """Show a list of security services without many details."""
         return self._list_view(self.summary, request, security_services)
 
-    def detail_list(self, request, security_services):
-        """Detailed view of a list of security services."""
-        return self._list_view(self.detail, request, security_services)
+    def detail_list(self, request, security_services, share_networks=None):
+        """Detailed view of a list of security services.
+
+        :param share_networks: optional dict mapping the id of each
+                               security service to the ids of its share
+                               networks, shown as 'share_networks'.
+        """
+        if share_networks is None:
+            return self._list_view(self.detail, request, security_services)
+
+        def detail(request, security_service):
+            view = self.detail(request, security_service)
+            view['security_service']['share_networks'] = (
+                share_networks.get(security_service['id'], []))
+            return view
+        return self._list_view(detail, request, security_services)
 
     def summary(self, request, security_service):
         """Generic, non-detailed view of an security service."""
@@ -62,7 +76,8 @@ class ViewBuilder(common.ViewBuilder):
 
     def _list_view(self, func, request, security_services):
         """Provide a view for a list of security services."""
-        security_services_list = [func(request, service)['security_service']
-                                  for service in security_services]
+        security_services_list = wsgi.LazyList(
+            lambda service: func(request, service)['security_service'],
+            security_services)
         security_services_dict = dict(security_services=security_services_list)
         return security_services_dict
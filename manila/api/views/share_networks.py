@@ -14,6 +14,7 @@
 #    under the License.
 
 from manila.api import common
+from manila.api.openstack import wsgi
 
 
 class ViewBuilder(common.ViewBuilder):
@@ -27,9 +28,10 @@ class ViewBuilder(common.ViewBuilder):
         return {'share_network': self._build_share_network_view(share_network)}
 
     def build_share_networks(self, share_networks, is_detail=True):
-        return {'share_networks':
-                [self._build_share_network_view(share_network, is_detail)
-                 for share_network in share_networks]}
+        return {'share_networks': wsgi.LazyList(
+            lambda share_network: self._build_share_network_view(
+                share_network, is_detail),
+            share_networks)}
 
     def _build_share_network_view(self, share_network, is_detail=True):
         sn = {
@@ -14,6 +14,7 @@
 #    under the License.
 
 from manila.api import common
+from manila.api.openstack import wsgi
 
 
 class ViewBuilder(common.ViewBuilder):
@@ -30,9 +31,8 @@ class ViewBuilder(common.ViewBuilder):
 
     def build_share_servers(self, share_servers):
         return {
-            'share_servers':
-                [self._build_share_server_view(share_server)
-                 for share_server in share_servers]
+            'share_servers': wsgi.LazyList(self._build_share_server_view,
+                                           share_servers)
         }
 
     def build_share_server_details(self, details):
@@ -14,6 +14,7 @@
 #    under the License.
 
 from manila.api import common
+from manila.api.openstack import wsgi
 
 
 class ViewBuilder(common.ViewBuilder):
@@ -59,8 +60,8 @@ class ViewBuilder(common.ViewBuilder):
 
     def _list_view(self, func, request, snapshots):
         """Provide a view for a list of share snapshots."""
-        snapshots_list = [func(request, snapshot)['snapshot']
-                          for snapshot in snapshots]
+        snapshots_list = wsgi.LazyList(
+            lambda snapshot: func(request, snapshot)['snapshot'], snapshots)
         snapshots_links = self._get_collection_links(request,
                                                      snapshots,
                                                      self._collection_name)
@@ -14,6 +14,7 @@
 #    under the License.
 
 from manila.api import common
+from manila.api.openstack import wsgi
 
 
 class ViewBuilder(common.ViewBuilder):
@@ -76,7 +77,8 @@ class ViewBuilder(common.ViewBuilder):
 
     def _list_view(self, func, request, shares):
         """Provide a view for a list of shares."""
-        shares_list = [func(request, share)['share'] for share in shares]
+        shares_list = wsgi.LazyList(
+            lambda share: func(request, share)['share'], shares)
         shares_links = self._get_collection_links(request,
                                                   shares,
                                                   self._collection_name)
@@ -13,11 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import io
+import itertools
 import os.path
 
 from lxml import etree
 import six
 
+from manila.api.openstack import wsgi
 from manila.i18n import _
 from manila import utils
 
@@ -31,6 +35,11 @@ XMLNS_VOLUME_V2 = ('http://docs.openstack.org/api/openstack-volume/2.0/'
                    'content')
 XMLNS_SHARE_V1 = ''
 
+# Render plans of the templates serialized so far, keyed by the tuple of
+# root template elements (master first, then slaves).
+_RENDER_PLANS = {}
+_RENDER_PLANS_MAX = 256
+
 
 def validate_schema(xml, schema_name):
     if isinstance(xml, str):
@@ -412,7 +421,7 @@ class TemplateElement(object):
             return [(self._render(parent, None, patches, nsmap), None)]
 
         # Make the data into a list if it isn't already
-        if not isinstance(data, list):
+        if not isinstance(data, (list, wsgi.LazyList)):
             data = [data]
         elif parent is None:
             raise ValueError(_('root element selecting a list'))
@@ -493,6 +502,148 @@ class TemplateElement(object):
                 (' '.join(contents), ''.join(children), self.tag))
 
 
+def _compile_selector(selector):
+    """Return an equivalent of the selector that is faster to call."""
+    if type(selector) is not Selector:
+        return selector
+
+    chain = selector.chain
+    if not chain:
+        return lambda obj, do_raise=False: obj
+    if len(chain) > 1 or callable(chain[0]):
+        return selector
+
+    key = chain[0]
+
+    def select(obj, do_raise=False):
+        try:
+            return obj[key]
+        except (KeyError, IndexError):
+            if do_raise:
+                raise KeyError(key)
+            return None
+    return select
+
+
+def _compile_apply(element):
+    """Return a callable doing what element.apply() does."""
+    if (six.get_unbound_function(type(element).apply) is not
+            six.get_unbound_function(TemplateElement.apply)):
+        return element.apply
+
+    text = element.text
+    attrib = [(key, _compile_selector(value))
+              for key, value in element.attrib.items()]
+
+    def apply(elem, obj):
+        if text is not None:
+            elem.text = six.text_type(text(obj))
+        for key, value in attrib:
+            try:
+                elem.set(key, six.text_type(value(obj, True)))
+            except KeyError:
+                # Attribute has no value, so don't include it
+                pass
+    return apply
+
+
+class RenderNode(object):
+    """Render plan of a template element.
+
+    Binds a template element together with the matching elements of the
+    slave templates, with selectors, attribute setters and children
+    resolved once, so that rendering an object does not have to walk and
+    merge the template trees again.
+    """
+
+    def __init__(self, siblings):
+        first = siblings[0]
+        self.element = first
+        self.patches = siblings[1:]
+        self.tag = first.tag
+        self.select = _compile_selector(first.selector)
+        self.subselect = (None if first.subselector is None
+                          else _compile_selector(first.subselector))
+        self.will_render = first.will_render
+        self.appliers = [_compile_apply(sibling) for sibling in siblings]
+
+        # Elements overriding the rendering itself are rendered by the
+        # elements; only their children go through the plan.
+        self.legacy = any(
+            six.get_unbound_function(getattr(type(first), name)) is not
+            six.get_unbound_function(getattr(TemplateElement, name))
+            for name in ('render', '_render'))
+
+        # Merge children the same way Template._serialize() does
+        self.children = []
+        seen = set()
+        for idx, sibling in enumerate(siblings):
+            for child in sibling:
+                if child.tag in seen:
+                    continue
+                seen.add(child.tag)
+                nieces = [child]
+                for sib in siblings[idx + 1:]:
+                    if child.tag in sib:
+                        nieces.append(sib[child.tag])
+                self.children.append(RenderNode(nieces))
+
+    def render(self, parent, obj, nsmap=None):
+        """Render an object.
+
+        Yields a (etree.Element, datum) tuple for each element rendered
+        from the object, once the element and all its children have
+        been rendered.
+        """
+
+        if self.legacy:
+            for elem, datum in self.element.render(parent, obj,
+                                                   self.patches, nsmap):
+                self.render_children(elem, datum)
+                yield elem, datum
+            return
+
+        data = None if obj is None else self.select(obj)
+        if not self.will_render(data):
+            return
+        elif data is None:
+            elem = self._make_element(parent, None, nsmap)
+            self.render_children(elem, None)
+            yield elem, None
+            return
+        elif not isinstance(data, (list, wsgi.LazyList)):
+            data = [data]
+        elif parent is None:
+            raise ValueError(_('root element selecting a list'))
+
+        for datum in data:
+            if self.subselect is not None:
+                datum = self.subselect(datum)
+            elem = self._make_element(parent, datum, nsmap)
+            if datum is not None:
+                for apply in self.appliers:
+                    apply(elem, datum)
+            self.render_children(elem, datum)
+            yield elem, datum
+
+    def render_children(self, elem, datum):
+        for child in self.children:
+            for _elem, _datum in child.render(elem, datum):
+                pass
+
+    def iter_children(self, elem, datum):
+        """Render the children, yielding each top-level child element."""
+        for child in self.children:
+            for child_elem, _datum in child.render(elem, datum):
+                yield child_elem
+
+    def _make_element(self, parent, datum, nsmap):
+        tagname = self.tag(datum) if callable(self.tag) else self.tag
+        if parent is None:
+            return etree.Element(tagname, nsmap=nsmap)
+        return etree.SubElement(parent, tagname, nsmap=nsmap)
+
+
 def SubTemplateElement(parent, tag, attrib=None, selector=None,
                        subselector=None, **extra):
     """Create a template element as a child of another.
@@ -609,12 +760,80 @@ class Template(object):
         if self.root is None:
             return None
 
-        # Get the siblings and nsmap of the root element
-        siblings = self._siblings()
-        nsmap = self._nsmap()
-
         # Form the element tree
-        return self._serialize(None, obj, siblings, nsmap)
+        elems = list(self.render_plan().render(None, obj, self._nsmap()))
+        if elems:
+            return elems[0][0]
+
+    def serialize_iter(self, obj):
+        """Serialize an object in chunks.
+
+        The children of the root element are rendered and written one at
+        a time with the lxml incremental writer, and dropped once written.
+        Produces the same document as serialize(); templates whose
+        incremental output could differ (namespaces declared on the root,
+        custom serialization options) are serialized with serialize().
+
+        :param obj: The object to serialize.
+        """
+
+        plan = None if self.root is None else self.render_plan()
+        if (plan is None or plan.legacy or callable(plan.tag) or
+                '{' in plan.tag or self._nsmap() or
+                self.serialize_options != dict(encoding='UTF-8',
+                                               xml_declaration=True)):
+            yield self.serialize(obj)
+            return
+
+        data = None if obj is None else plan.select(obj)
+        if (data is None or not plan.will_render(data) or
+                isinstance(data, (list, wsgi.LazyList))):
+            yield self.serialize(obj)
+            return
+        if plan.subselect is not None:
+            data = plan.subselect(data)
+
+        root = etree.Element(plan.tag)
+        for apply in plan.appliers:
+            apply(root, data)
+        children = plan.iter_children(root, data)
+        first = next(children, None)
+        if first is None:
+            yield etree.tostring(root, **self.serialize_options)
+            return
+
+        buf = io.BytesIO()
+        with etree.xmlfile(buf, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            with xf.element(root.tag,
+                            collections.OrderedDict(root.attrib.items())):
+                if root.text:
+                    xf.write(root.text)
+                for elem in itertools.chain([first], children):
+                    xf.write(elem)
+                    root.remove(elem)
+                    if buf.tell() >= wsgi.STREAM_CHUNK_SIZE:
+                        yield buf.getvalue()
+                        buf.seek(0)
+                        buf.truncate()
+        yield buf.getvalue()
+
+    def render_plan(self):
+        """Return the render plan of the template and its slaves.
+
+        Plans are built on first use and shared by all the templates
+        with the same root elements; templates must not be modified once
+        they have been serialized.
+        """
+
+        siblings = tuple(self._siblings())
+        plan = _RENDER_PLANS.get(siblings)
+        if plan is None:
+            plan = RenderNode(siblings)
+            if len(_RENDER_PLANS) >= _RENDER_PLANS_MAX:
+                _RENDER_PLANS.clear()
+            _RENDER_PLANS[siblings] = plan
+        return plan
 
     def _siblings(self):
         """Hook method for computing root siblings.
@@ -18,16 +18,19 @@ Handles all requests to Nova.
 
 import sys
 
-from novaclient import exceptions as nova_exception
-from novaclient import service_catalog
-from novaclient.v1_1 import client as nova_client
-from novaclient.v1_1.contrib import assisted_volume_snapshots
-from novaclient.v1_1 import servers as nova_servers
 from oslo.config import cfg
 
 from manila.db import base
 from manila import exception
 from manila.openstack.common import log as logging
+from manila import utils
+
+nova_exception = utils.LazyImport('novaclient.exceptions')
+service_catalog = utils.LazyImport('novaclient.service_catalog')
+nova_client = utils.LazyImport('novaclient.v1_1.client')
+assisted_volume_snapshots = utils.LazyImport(
+    'novaclient.v1_1.contrib.assisted_volume_snapshots')
+nova_servers = utils.LazyImport('novaclient.v1_1.servers')
 
 
 nova_opts = [
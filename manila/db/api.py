@@ -68,6 +68,17 @@ IMPL = db_api.DBAPI.from_config(cfg.CONF, backend_mapping=_BACKEND_MAPPING,
                                 lazy=True)
 
 
+###################
+def dispose_engine():
+    """Close the database connections pooled by this process."""
+    return IMPL.dispose_engine()
+
+
+def authorize_project_context(context, project_id):
+    """Ensure a request has permission to access the given project."""
+    return IMPL.authorize_project_context(context, project_id)
+
+
 ###################
 def service_destroy(context, service_id):
     """Destroy the service or raise if it does not exist."""
@@ -127,6 +138,17 @@ def service_update(context, service_id, values):
     return IMPL.service_update(context, service_id, values)
 
 
+def service_heartbeat(context, service_ids, availability_zone=None):
+    """Record a check-in of each of the given services at once.
+
+    Bumps report_count and updated_at without reading the services first,
+    and sets their availability zone if one is given.
+
+    :returns: the ids of the services which do not exist anymore.
+    """
+    return IMPL.service_heartbeat(context, service_ids, availability_zone)
+
+
 ####################
 
 
@@ -289,6 +311,20 @@ def share_update(context, share_id, values):
     return IMPL.share_update(context, share_id, values)
 
 
+def share_status_update(context, share_id, status, expected_status=None,
+                        values=None):
+    """Set the status of a share in a single statement.
+
+    :param expected_status: a status or a list of statuses the share must
+                            be in for the update to happen.
+    :param values: other fields to set along with the status.
+    :returns: whether the share was updated.
+    """
+    return IMPL.share_status_update(context, share_id, status,
+                                    expected_status=expected_status,
+                                    values=values)
+
+
 def share_get(context, share_id):
     """Get share by id."""
     return IMPL.share_get(context, share_id)
@@ -327,6 +363,19 @@ def share_get_all_by_share_server(context, share_server_id, filters=None,
     )
 
 
+def share_view_get_all(context, project_id=None, share_server_id=None,
+                       filters=None, sort_key=None, sort_dir=None):
+    """Returns shares as plain records for API views.
+
+    The records support the item and attribute access of the models, and
+    carry 'share_metadata' and 'volume_type' like a share model does.
+    """
+    return IMPL.share_view_get_all(
+        context, project_id=project_id, share_server_id=share_server_id,
+        filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+    )
+
+
 def share_delete(context, share_id):
     """Delete share."""
     return IMPL.share_delete(context, share_id)
@@ -367,6 +416,17 @@ def share_access_update(context, access_id, values):
     return IMPL.share_access_update(context, access_id, values)
 
 
+def share_access_state_update(context, access_id, state, expected_state=None):
+    """Set the state of an access rule in a single statement.
+
+    :param expected_state: a state or a list of states the access rule
+                           must be in for the update to happen.
+    :returns: whether the access rule was updated.
+    """
+    return IMPL.share_access_state_update(context, access_id, state,
+                                          expected_state=expected_state)
+
+
 ####################
 
 
@@ -416,6 +476,15 @@ def share_snapshot_get_all_for_share(context, share_id, filters=None,
     )
 
 
+def share_snapshot_view_get_all(context, project_id=None, filters=None,
+                                sort_key=None, sort_dir=None):
+    """Returns share snapshots as plain records for API views."""
+    return IMPL.share_snapshot_view_get_all(
+        context, project_id=project_id, filters=filters, sort_key=sort_key,
+        sort_dir=sort_dir,
+    )
+
+
 def share_snapshot_update(context, snapshot_id, values):
     """Set the given properties on an snapshot and update it.
 
@@ -424,6 +493,20 @@ def share_snapshot_update(context, snapshot_id, values):
     return IMPL.share_snapshot_update(context, snapshot_id, values)
 
 
+def share_snapshot_status_update(context, snapshot_id, status,
+                                 expected_status=None, values=None):
+    """Set the status of a snapshot in a single statement.
+
+    :param expected_status: a status or a list of statuses the snapshot
+                            must be in for the update to happen.
+    :param values: other fields to set along with the status.
+    :returns: whether the snapshot was updated.
+    """
+    return IMPL.share_snapshot_status_update(
+        context, snapshot_id, status, expected_status=expected_status,
+        values=values)
+
+
 def share_snapshot_data_get_for_project(context, project_id, session=None):
     """Get count and gigabytes used for snapshots for specified project."""
     return IMPL.share_snapshot_data_get_for_project(context,
@@ -517,6 +600,20 @@ def share_network_get_all_by_security_service(context, security_service_id):
         context, security_service_id)
 
 
+def share_network_ids_get_by_security_services(context, security_service_ids):
+    """Get share network ids of each of the given security services."""
+    return IMPL.share_network_ids_get_by_security_services(
+        context, security_service_ids)
+
+
+def share_network_view_get_all(context, project_id=None,
+                               security_service_id=None):
+    """Returns share networks as plain records for API views."""
+    return IMPL.share_network_view_get_all(
+        context, project_id=project_id,
+        security_service_id=security_service_id)
+
+
 def share_network_add_security_service(context, id, security_service_id):
     return IMPL.share_network_add_security_service(context,
                                                    id,
@@ -534,11 +631,21 @@ def network_allocation_create(context, values):
     return IMPL.network_allocation_create(context, values)
 
 
+def network_allocations_create(context, values_list):
+    """Create network allocation DB records in a single transaction."""
+    return IMPL.network_allocations_create(context, values_list)
+
+
 def network_allocation_delete(context, id):
     """Delete a network allocation DB record."""
     return IMPL.network_allocation_delete(context, id)
 
 
+def network_allocations_delete(context, ids):
+    """Delete network allocation DB records with a single statement."""
+    return IMPL.network_allocations_delete(context, ids)
+
+
 def network_allocation_update(context, id, values):
     """Update a network allocation DB record."""
     return IMPL.network_allocation_update(context, id, values)
@@ -604,6 +711,12 @@ def share_server_get_all(context):
     return IMPL.share_server_get_all(context)
 
 
+def share_server_view_get_all(context, filters=None, limit=None, marker=None):
+    """Returns share servers as plain records for API views."""
+    return IMPL.share_server_view_get_all(context, filters=filters,
+                                          limit=limit, marker=marker)
+
+
 def share_server_backend_details_set(context, share_server_id, server_details):
     """Create DB record with backend details."""
     return IMPL.share_server_backend_details_set(context, share_server_id,
@@ -680,3 +793,25 @@ def volume_type_extra_specs_update_or_create(context,
     return IMPL.volume_type_extra_specs_update_or_create(context,
                                                          volume_type_id,
                                                          extra_specs)
+
+
+###################
+
+
+def purge_deleted_rows(context, before, batch_size=1000, archive=False,
+                       dry_run=False, progress=None):
+    """Purge the rows soft-deleted before the given date.
+
+    Rows still referenced by rows which are not purged are kept.  Every
+    table is purged in transactions of batch_size rows at most.
+
+    :param archive: copy the purged rows to shadow_<table> tables first.
+    :param dry_run: only count the rows which would be purged.
+    :param progress: called with the table name and the number of rows
+                     purged from it so far after every batch.
+    :returns: an ordered dict of the rows purged, or which would be,
+              by table name.
+    """
+    return IMPL.purge_deleted_rows(context, before, batch_size=batch_size,
+                                   archive=archive, dry_run=dry_run,
+                                   progress=progress)
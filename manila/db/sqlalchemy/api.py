@@ -18,6 +18,7 @@
 
 """Implementation of SQLAlchemy backend."""
 
+import collections
 import sys
 import uuid
 import warnings
@@ -26,12 +27,15 @@ from oslo.config import cfg
 from oslo.db import exception as db_exception
 from oslo.db import options as db_options
 from oslo.db.sqlalchemy import session
+from oslo.db.sqlalchemy import utils as db_utils
 from oslo.utils import timeutils
 import six
+import sqlalchemy
 from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.sql import func
+from sqlalchemy.sql import select
 
 from manila.common import constants
 from manila.db.sqlalchemy import models
@@ -39,6 +43,7 @@ from manila import exception
 from manila.i18n import _
 from manila.i18n import _LE
 from manila.i18n import _LW
+from manila import instrumentation
 from manila.openstack.common import log as logging
 
 
@@ -60,6 +65,8 @@ def _create_facade_lazily():
     global _FACADE
     if _FACADE is None:
         _FACADE = session.EngineFacade.from_config(cfg.CONF)
+        if cfg.CONF.instrumentation_enabled:
+            instrumentation.instrument_engine(_FACADE.get_engine())
     return _FACADE
 
 
@@ -73,6 +80,11 @@ def get_session(**kwargs):
     return facade.get_session(**kwargs)
 
 
+def dispose_engine():
+    if _FACADE is not None:
+        _FACADE.get_engine().dispose()
+
+
 def get_backend():
     """The backend is this module itself."""
 
@@ -246,6 +258,94 @@ def exact_filter(query, model, filters, legal_keys):
     return query
 
 
+###################
+
+
+# NOTE: keeps "IN" lists under the bind parameter limit of sqlite.
+_IN_CHUNK_SIZE = 500
+
+
+class ReadRecord(object):
+    """Row of a read model, indexable like the ORM models.
+
+    API views only render what they get, so the list paths select the
+    columns with Core SQL into these instead of hydrating ORM objects
+    with session state and change tracking.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, values=()):
+        for key, value in six.moves.zip_longest(self.__slots__, values):
+            setattr(self, key, value)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __iter__(self):
+        return self.iteritems()
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                list(self.iteritems()) == list(other.iteritems()))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, self.get('id'))
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def iteritems(self):
+        for key in self.__slots__:
+            yield key, getattr(self, key)
+
+    def items(self):
+        return list(self.iteritems())
+
+    def update(self, values):
+        for key, value in six.iteritems(values):
+            setattr(self, key, value)
+
+    def to_dict(self):
+        return dict(self.iteritems())
+
+
+def _read_record_class(name, columns, extra=()):
+    return type(name, (ReadRecord,),
+                {'__slots__': tuple(c.name for c in columns) + extra})
+
+
+def _read_records(session, query, record_class, columns):
+    """Run the query as a Core select of columns, one record per row.
+
+    Rows repeated by joins used for filtering are returned once.
+    """
+    result = session.execute(query.with_entities(*columns).statement)
+    records = []
+    seen = set()
+    for row in result:
+        record = record_class(row)
+        if record.id not in seen:
+            seen.add(record.id)
+            records.append(record)
+    return records
+
+
+def _chunks(items, size=_IN_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 def _sync_shares(context, project_id, user_id, session):
     (shares, gigs) = share_data_get_for_project(context,
                                                 project_id,
@@ -424,6 +524,26 @@ def service_update(context, service_id, values):
         service_ref.save(session=session)
 
 
+@require_admin_context
+def service_heartbeat(context, service_ids, availability_zone=None):
+    service_ids = list(service_ids)
+    values = {'report_count': models.Service.report_count + 1,
+              'updated_at': timeutils.utcnow()}
+    if availability_zone is not None:
+        values['availability_zone'] = availability_zone
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Service, session=session,
+                            read_deleted="no").\
+            filter(models.Service.id.in_(service_ids))
+        if query.update(values, synchronize_session=False) == len(service_ids):
+            return []
+        found = set(row.id for row in
+                    query.with_entities(models.Service.id).all())
+    return [service_id for service_id in service_ids
+            if service_id not in found]
+
+
 ###################
 
 
@@ -1119,6 +1239,65 @@ def _metadata_refs(metadata_dict, meta_class):
     return metadata_refs
 
 
+def _key_values_set(context, model, parent_key, parent_id, values,
+                    delete=False, session=None):
+    """Sets the key/value rows of a parent in a handful of statements.
+
+    The rows of the parent are read in one query and compared with
+    values: the new keys are inserted at once, the changed values are
+    updated by one statement and, with delete, the keys missing from
+    values are soft-deleted by one statement.  Rows left over with a key
+    set twice are soft-deleted as well.
+
+    :param model: the model of the rows, with key and value columns.
+    :param parent_key: the column of the rows holding parent_id.
+    """
+    if session is None:
+        session = get_session()
+    table = model.__table__
+    with session.begin():
+        rows = model_query(context, model, session=session,
+                           read_deleted="no").\
+            filter(getattr(model, parent_key) == parent_id).\
+            with_entities(model.id, model.key, model.value).\
+            order_by(model.id).all()
+        existing = {}
+        stale_ids = []
+        for row in rows:
+            if row.key in existing:
+                stale_ids.append(existing[row.key].id)
+            existing[row.key] = row
+
+        inserts = []
+        updates = []
+        for key, value in six.iteritems(values):
+            row = existing.get(key)
+            if row is None:
+                inserts.append({parent_key: parent_id, 'key': key,
+                                'value': value})
+            elif row.value != value:
+                updates.append({'_id': row.id, '_value': value})
+        if delete:
+            stale_ids.extend(row.id for key, row in six.iteritems(existing)
+                             if key not in values)
+
+        if inserts:
+            session.execute(table.insert(), inserts)
+        if updates:
+            session.execute(
+                table.update().
+                where(table.c.id == sqlalchemy.bindparam('_id')).
+                values(value=sqlalchemy.bindparam('_value')),
+                updates)
+        if stale_ids:
+            model_query(context, model, session=session).\
+                filter(model.id.in_(stale_ids)).\
+                update({'deleted': model.id,
+                        'deleted_at': timeutils.utcnow(),
+                        'updated_at': literal_column('updated_at')},
+                       synchronize_session=False)
+
+
 @require_context
 def share_create(context, values):
     values['share_metadata'] = _metadata_refs(values.get('metadata'),
@@ -1160,6 +1339,34 @@ def share_update(context, share_id, values):
         return share_ref
 
 
+def _compare_and_set(context, model, id, column, value, expected,
+                     values=None):
+    """Sets a column of a row in one statement, if it has a given value.
+
+    Unlike the read-modify-write of the *_update functions, no other
+    update can slip in between the check and the write.
+
+    :param expected: None, or a value or a list of values the column must
+                     hold for the row to be updated.
+    :returns: whether the row was updated.
+    """
+    values = dict(values or {})
+    values[column] = value
+    query = model_query(context, model).filter_by(id=id)
+    if expected is not None:
+        if isinstance(expected, six.string_types):
+            expected = [expected]
+        query = query.filter(getattr(model, column).in_(expected))
+    return bool(query.update(values, synchronize_session=False))
+
+
+@require_context
+def share_status_update(context, share_id, status, expected_status=None,
+                        values=None):
+    return _compare_and_set(context, models.Share, share_id, 'status',
+                            status, expected_status, values=values)
+
+
 @require_context
 def share_get(context, share_id, session=None):
     result = _share_get_query(context, session).filter_by(id=share_id).first()
@@ -1174,21 +1381,36 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
                                 sort_key=None, sort_dir=None):
     """Returns sorted list of shares that satisfies filters.
 
-    :param context: context to query under
+    See :py:func:`_share_filter_query` for the arguments.
+
+    :returns: list -- models.Share
+    :raises: exception.InvalidInput
+    """
+    return _share_filter_query(
+        _share_get_query(context), project_id=project_id,
+        share_server_id=share_server_id, host=host, filters=filters,
+        sort_key=sort_key, sort_dir=sort_dir).all()
+
+
+def _share_filter_query(query, project_id=None, share_server_id=None,
+                        host=None, filters=None, sort_key=None,
+                        sort_dir=None):
+    """Applies share filters and sorting to a query of shares.
+
+    :param query: query of models.Share to filter
     :param project_id: project id that owns shares
     :param share_server_id: share server that hosts shares
     :param host: host name where shares [and share servers] are located
     :param filters: dict of filters to specify share selection
     :param sort_key: key of models.Share to be used for sorting
     :param sort_dir: desired direction of sorting, can be 'asc' and 'desc'
-    :returns: list -- models.Share
+    :returns: the filtered and sorted query
     :raises: exception.InvalidInput
     """
     if not sort_key:
         sort_key = 'created_at'
     if not sort_dir:
         sort_dir = 'desc'
-    query = _share_get_query(context)
     if project_id:
         query = query.filter_by(project_id=project_id)
     if share_server_id:
@@ -1229,8 +1451,6 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
                     "sort_key": sort_key, "sort_dir": sort_dir}
         raise exception.InvalidInput(reason=msg)
 
-    # Returns list of shares that satisfy filters.
-    query = query.all()
     return query
 
 
@@ -1273,6 +1493,58 @@ def share_get_all_by_share_server(context, share_server_id, filters=None,
     return query
 
 
+_SHARE_COLUMNS = tuple(models.Share.__table__.columns)
+ShareRecord = _read_record_class('ShareRecord', _SHARE_COLUMNS,
+                                 ('share_metadata', 'volume_type'))
+
+
+@require_context
+def share_view_get_all(context, project_id=None, share_server_id=None,
+                       filters=None, sort_key=None, sort_dir=None):
+    """Returns shares for API views as ShareRecord rows.
+
+    Listing shares of all projects requires an admin context, like
+    :py:func:`share_get_all`. The metadata and the volume type names are
+    loaded with one query each per batch of shares.
+    """
+    if not (project_id or share_server_id or is_admin_context(context)):
+        raise exception.AdminRequired()
+    session = get_session()
+    query = _share_filter_query(
+        model_query(context, models.Share, session=session),
+        project_id=project_id, share_server_id=share_server_id,
+        filters=filters, sort_key=sort_key, sort_dir=sort_dir)
+    shares = _read_records(session, query, ShareRecord, _SHARE_COLUMNS)
+
+    metadata = collections.defaultdict(list)
+    meta_table = models.ShareMetadata.__table__
+    for share_ids in _chunks(share.id for share in shares):
+        rows = session.execute(
+            select([meta_table.c.share_id, meta_table.c.key,
+                    meta_table.c.value]).
+            where(meta_table.c.share_id.in_(share_ids)).
+            where(meta_table.c.deleted == 0))
+        for share_id, key, value in rows:
+            metadata[share_id].append({'key': key, 'value': value})
+
+    volume_types = {}
+    type_table = models.VolumeTypes.__table__
+    type_ids = set(share.volume_type_id for share in shares
+                   if share.volume_type_id)
+    for ids in _chunks(type_ids):
+        rows = session.execute(
+            select([type_table.c.id, type_table.c.name]).
+            where(type_table.c.id.in_(ids)).
+            where(type_table.c.deleted == 0))
+        for type_id, name in rows:
+            volume_types[type_id] = {'name': name}
+
+    for share in shares:
+        share.share_metadata = metadata.get(share.id, [])
+        share.volume_type = volume_types.get(share.volume_type_id)
+    return shares
+
+
 @require_context
 def share_delete(context, share_id):
     session = get_session()
@@ -1363,6 +1635,12 @@ def share_access_update(context, access_id, values):
         return access
 
 
+@require_context
+def share_access_state_update(context, access_id, state, expected_state=None):
+    return _compare_and_set(context, models.ShareAccessMapping, access_id,
+                            'state', state, expected_state)
+
+
 ###################
 
 
@@ -1427,17 +1705,24 @@ def share_snapshot_get(context, snapshot_id, session=None):
 def _share_snapshot_get_all_with_filters(context, project_id=None,
                                          share_id=None, filters=None,
                                          sort_key=None, sort_dir=None):
+    query = model_query(context, models.ShareSnapshot).\
+        options(joinedload('share'))
+    return _share_snapshot_filter_query(
+        query, project_id=project_id, share_id=share_id, filters=filters,
+        sort_key=sort_key, sort_dir=sort_dir).all()
+
+
+def _share_snapshot_filter_query(query, project_id=None, share_id=None,
+                                 filters=None, sort_key=None, sort_dir=None):
     # Init data
     sort_key = sort_key or 'share_id'
     sort_dir = sort_dir or 'desc'
     filters = filters or {}
-    query = model_query(context, models.ShareSnapshot)
 
     if project_id:
         query = query.filter_by(project_id=project_id)
     if share_id:
         query = query.filter_by(share_id=share_id)
-    query = query.options(joinedload('share'))
 
     # Apply filters
     if 'usage' in filters:
@@ -1473,8 +1758,7 @@ def _share_snapshot_get_all_with_filters(context, project_id=None,
                     "sort_key": sort_key, "sort_dir": sort_dir}
         raise exception.InvalidInput(reason=msg)
 
-    # Returns list of shares that satisfy filters
-    return query.all()
+    return query
 
 
 @require_admin_context
@@ -1504,6 +1788,31 @@ def share_snapshot_get_all_for_share(context, share_id, filters=None,
     )
 
 
+_SNAPSHOT_COLUMNS = tuple(models.ShareSnapshot.__table__.columns)
+ShareSnapshotRecord = _read_record_class('ShareSnapshotRecord',
+                                         _SNAPSHOT_COLUMNS)
+
+
+@require_context
+def share_snapshot_view_get_all(context, project_id=None, filters=None,
+                                sort_key=None, sort_dir=None):
+    """Returns share snapshots for API views as ShareSnapshotRecord rows.
+
+    Listing snapshots of all projects requires an admin context.
+    """
+    if project_id:
+        authorize_project_context(context, project_id)
+    elif not is_admin_context(context):
+        raise exception.AdminRequired()
+    session = get_session()
+    query = _share_snapshot_filter_query(
+        model_query(context, models.ShareSnapshot, session=session),
+        project_id=project_id, filters=filters, sort_key=sort_key,
+        sort_dir=sort_dir)
+    return _read_records(session, query, ShareSnapshotRecord,
+                         _SNAPSHOT_COLUMNS)
+
+
 @require_context
 def share_snapshot_data_get_for_project(context, project_id, session=None):
     authorize_project_context(context, project_id)
@@ -1531,6 +1840,13 @@ def share_snapshot_update(context, snapshot_id, values):
         return snapshot_ref
 
 
+@require_context
+def share_snapshot_status_update(context, snapshot_id, status,
+                                 expected_status=None, values=None):
+    return _compare_and_set(context, models.ShareSnapshot, snapshot_id,
+                            'status', status, expected_status, values=values)
+
+
 #################################
 
 
@@ -1578,54 +1894,9 @@ def _share_metadata_get(context, share_id, session=None):
 @require_context
 @require_share_exists
 def _share_metadata_update(context, share_id, metadata, delete, session=None):
-    if not session:
-        session = get_session()
-
-    with session.begin():
-        # Set existing metadata to deleted if delete argument is True
-        if delete:
-            original_metadata = _share_metadata_get(context, share_id,
-                                                    session=session)
-            for meta_key, meta_value in six.iteritems(original_metadata):
-                if meta_key not in metadata:
-                    meta_ref = _share_metadata_get_item(context, share_id,
-                                                        meta_key,
-                                                        session=session)
-                    meta_ref.update({'deleted': True})
-                    meta_ref.save(session=session)
-
-        meta_ref = None
-
-        # Now update all existing items with new values, or create new meta
-        # objects
-        for meta_key, meta_value in metadata.items():
-
-            # update the value whether it exists or not
-            item = {"value": meta_value}
-
-            try:
-                meta_ref = _share_metadata_get_item(context, share_id,
-                                                    meta_key,
-                                                    session=session)
-            except exception.ShareMetadataNotFound:
-                meta_ref = models.ShareMetadata()
-                item.update({"key": meta_key, "share_id": share_id})
-
-            meta_ref.update(item)
-            meta_ref.save(session=session)
-
-        return metadata
-
-
-def _share_metadata_get_item(context, share_id, key, session=None):
-    result = _share_metadata_get_query(context, share_id, session=session).\
-        filter_by(key=key).\
-        first()
-
-    if not result:
-        raise exception.ShareMetadataNotFound(metadata_key=key,
-                                              share_id=share_id)
-    return result
+    _key_values_set(context, models.ShareMetadata, 'share_id', share_id,
+                    metadata, delete=delete, session=session)
+    return metadata
 
 
 @require_context
@@ -1769,6 +2040,50 @@ def share_network_get_all_by_security_service(context, security_service_id):
         options(joinedload('share_servers')).all()
 
 
+@require_context
+def share_network_ids_get_by_security_services(context, security_service_ids):
+    """Returns {security_service_id: [share_network_id, ...]}.
+
+    Looks up the share networks of a whole page of security services at
+    once instead of issuing one query per security service.
+    """
+    result = dict((ss_id, []) for ss_id in security_service_ids)
+    assoc = models.ShareNetworkSecurityServiceAssociation
+    session = get_session()
+    for chunk in _chunks(result):
+        query = model_query(context, models.ShareNetwork, session=session).\
+            join(assoc, models.ShareNetwork.id == assoc.share_network_id).\
+            filter(assoc.security_service_id.in_(chunk)).\
+            filter_by(deleted=False).\
+            with_entities(assoc.security_service_id, models.ShareNetwork.id)
+        for ss_id, share_network_id in query:
+            result[ss_id].append(share_network_id)
+    return result
+
+
+_NETWORK_COLUMNS = tuple(models.ShareNetwork.__table__.columns)
+ShareNetworkRecord = _read_record_class('ShareNetworkRecord',
+                                        _NETWORK_COLUMNS)
+
+
+@require_context
+def share_network_view_get_all(context, project_id=None,
+                               security_service_id=None):
+    """Returns share networks for API views as ShareNetworkRecord rows."""
+    session = get_session()
+    query = model_query(context, models.ShareNetwork, session=session)
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    if security_service_id:
+        query = query.join(
+            models.ShareNetworkSecurityServiceAssociation,
+            models.ShareNetwork.id ==
+            models.ShareNetworkSecurityServiceAssociation.share_network_id).\
+            filter_by(security_service_id=security_service_id, deleted=False)
+    return _read_records(session, query, ShareNetworkRecord,
+                         _NETWORK_COLUMNS)
+
+
 @require_context
 def share_network_add_security_service(context, id, security_service_id):
     session = get_session()
@@ -1906,20 +2221,65 @@ def share_server_get_all(context):
     return _server_get_query(context).all()
 
 
+_SERVER_COLUMNS = tuple(models.ShareServer.__table__.columns)
+_SERVER_VIEW_COLUMNS = _SERVER_COLUMNS + (
+    models.ShareNetwork.project_id.label('project_id'),
+    models.ShareNetwork.name.label('share_network_name'),
+)
+ShareServerRecord = _read_record_class(
+    'ShareServerRecord', _SERVER_COLUMNS,
+    ('project_id', 'share_network_name'))
+
+
+_SERVER_VIEW_FILTERS = dict(
+    [(c.name, c) for c in _SERVER_COLUMNS] +
+    [(c.name, c.element) for c in _SERVER_VIEW_COLUMNS[len(_SERVER_COLUMNS):]])
+
+
+@require_context
+def share_server_view_get_all(context, filters=None, limit=None, marker=None):
+    """Returns share servers for API views as ShareServerRecord rows.
+
+    Besides the columns of the share server, every record has the
+    project_id and the name of its share network.
+
+    :param filters: dict of record attributes to match exactly; the
+                    'share_network' key matches the name or the id of
+                    the share network. Unknown keys match nothing.
+    :param limit: maximum number of records to return.
+    :param marker: id of the share server the page starts after.
+    """
+    session = get_session()
+    query = model_query(context, models.ShareServer, session=session).\
+        outerjoin(models.ShareNetwork,
+                  models.ShareServer.share_network_id ==
+                  models.ShareNetwork.id)
+    for key, value in six.iteritems(filters or {}):
+        if key in _SERVER_VIEW_FILTERS:
+            query = query.filter(_SERVER_VIEW_FILTERS[key] == value)
+        elif key == 'share_network':
+            query = query.filter(or_(
+                models.ShareNetwork.name == value,
+                models.ShareServer.share_network_id == value))
+        else:
+            return []
+    marker_ref = None
+    if marker is not None:
+        marker_ref = model_query(context, models.ShareServer,
+                                 session=session).filter_by(id=marker).first()
+        if marker_ref is None:
+            raise exception.ShareServerNotFound(share_server_id=marker)
+    query = db_utils.paginate_query(query, models.ShareServer, limit,
+                                    ['created_at', 'id'], marker=marker_ref)
+    return _read_records(session, query, ShareServerRecord,
+                         _SERVER_VIEW_COLUMNS)
+
+
 @require_context
 def share_server_backend_details_set(context, share_server_id, server_details):
     share_server_get(context, share_server_id)
-
-    for meta_key, meta_value in server_details.items():
-        meta_ref = models.ShareServerBackendDetails()
-        meta_ref.update({
-            'key': meta_key,
-            'value': meta_value,
-            'share_server_id': share_server_id
-        })
-        session = get_session()
-        with session.begin():
-            meta_ref.save(session)
+    _key_values_set(context, models.ShareServerBackendDetails,
+                    'share_server_id', share_server_id, server_details)
     return server_details
 
 
@@ -1958,6 +2318,19 @@ def network_allocation_create(context, values):
     return alloc_ref
 
 
+@require_context
+def network_allocations_create(context, values_list):
+    alloc_refs = []
+    for values in values_list:
+        alloc_ref = models.NetworkAllocation()
+        alloc_ref.update(values)
+        alloc_refs.append(alloc_ref)
+    session = get_session()
+    with session.begin():
+        session.add_all(alloc_refs)
+    return alloc_refs
+
+
 @require_context
 def network_allocation_delete(context, id):
     session = get_session()
@@ -1966,6 +2339,19 @@ def network_allocation_delete(context, id):
         alloc_ref.delete(session=session)
 
 
+@require_context
+def network_allocations_delete(context, ids):
+    if not ids:
+        return
+    session = get_session()
+    with session.begin():
+        model_query(context, models.NetworkAllocation, session=session).\
+            filter(models.NetworkAllocation.id.in_(ids)).\
+            update({'deleted': models.NetworkAllocation.id,
+                    'deleted_at': timeutils.utcnow()},
+                   synchronize_session=False)
+
+
 @require_context
 def network_allocation_get(context, id, session=None):
     if session is None:
@@ -2201,18 +2587,101 @@ def _volume_type_extra_specs_get_item(context, volume_type_id, key,
 @require_context
 def volume_type_extra_specs_update_or_create(context, volume_type_id,
                                              specs):
-    session = get_session()
-    with session.begin():
-        spec_ref = None
-        for key, value in six.iteritems(specs):
-            try:
-                spec_ref = _volume_type_extra_specs_get_item(
-                    context, volume_type_id, key, session)
-            except exception.VolumeTypeExtraSpecsNotFound:
-                spec_ref = models.VolumeTypeExtraSpecs()
-            spec_ref.update({"key": key, "value": value,
-                             "volume_type_id": volume_type_id,
-                             "deleted": False})
-            spec_ref.save(session=session)
-
-        return specs
+    _key_values_set(context, models.VolumeTypeExtraSpecs, 'volume_type_id',
+                    volume_type_id, specs)
+    return specs
+
+
+####################
+
+
+def _purge_tables(existing):
+    """The soft-deleting tables, the referencing ones before the others."""
+    return [table for table in reversed(models.BASE.metadata.sorted_tables)
+            if table.name in existing and
+            'deleted' in table.c and 'deleted_at' in table.c]
+
+
+def _purgeable(table, selectable, before, existing):
+    """Matches the rows of table which can be purged.
+
+    A row can be purged once it has been soft-deleted before the date and
+    no row referencing it is left after the purge, which makes the count
+    of a dry run exact whatever the order tables are purged in.
+
+    :param selectable: the table itself or an alias of it.
+    :param existing: the names of the tables of the database, the models
+                     also describe tables no migration created.
+    """
+    clause = sqlalchemy.and_(
+        selectable.c.deleted != table.c.deleted.default.arg,
+        selectable.c.deleted_at < before)
+    for child in models.BASE.metadata.sorted_tables:
+        if child.name not in existing:
+            continue
+        for foreign_key in child.foreign_keys:
+            if foreign_key.column.table is not table:
+                continue
+            alias = child.alias()
+            kept = (alias.c[foreign_key.parent.name] ==
+                    selectable.c[foreign_key.column.name])
+            if 'deleted' in child.c and 'deleted_at' in child.c:
+                kept = sqlalchemy.and_(kept, sqlalchemy.not_(
+                    _purgeable(child, alias, before, existing)))
+            clause = sqlalchemy.and_(clause,
+                                     ~sqlalchemy.exists().where(kept))
+    return clause
+
+
+def _shadow_table(engine, table):
+    """Returns the shadow table archiving table, creating it if needed."""
+    name = 'shadow_' + table.name
+    metadata = sqlalchemy.MetaData(bind=engine)
+    if engine.has_table(name):
+        shadow = sqlalchemy.Table(name, metadata, autoload=True)
+        missing = set(table.c.keys()) - set(shadow.c.keys())
+        if missing:
+            raise exception.ShadowTableMismatch(
+                table=name, columns=', '.join(sorted(missing)))
+        return shadow
+    # No constraints: the rows outlive the rows they referenced.
+    shadow = sqlalchemy.Table(
+        name, metadata,
+        *[sqlalchemy.Column(column.name, column.type)
+          for column in table.columns],
+        mysql_engine='InnoDB')
+    shadow.create()
+    return shadow
+
+
+@require_admin_context
+def purge_deleted_rows(context, before, batch_size=1000, archive=False,
+                       dry_run=False, progress=None):
+    engine = get_engine()
+    existing = set(sqlalchemy.inspect(engine).get_table_names())
+    counts = collections.OrderedDict()
+    for table in _purge_tables(existing):
+        purgeable = _purgeable(table, table, before, existing)
+        if dry_run:
+            counts[table.name] = engine.execute(
+                select([func.count()]).select_from(table).where(
+                    purgeable)).scalar()
+            continue
+        key = list(table.primary_key.columns)[0]
+        shadow = _shadow_table(engine, table) if archive else None
+        counts[table.name] = 0
+        while True:
+            with engine.begin() as conn:
+                ids = [row[0] for row in conn.execute(
+                    select([key]).where(purgeable).limit(batch_size))]
+                if not ids:
+                    break
+                if shadow is not None:
+                    conn.execute(shadow.insert().from_select(
+                        table.c.keys(),
+                        select([table]).where(key.in_(ids))))
+                conn.execute(table.delete().where(key.in_(ids)))
+            counts[table.name] += len(ids)
+            if progress is not None:
+                progress(table.name, counts[table.name])
+    return counts
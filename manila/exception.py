@@ -477,3 +477,7 @@ class GaneshaCommandFailure(ProcessExecutionError):
 
 class InvalidSqliteDB(Invalid):
     message = _("Invalid Sqlite database.")
+
+
+class ShadowTableMismatch(ManilaException):
+    message = _("Shadow table %(table)s lacks the columns %(columns)s.")
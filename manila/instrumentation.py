@@ -0,0 +1,383 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Opt-in timing of API requests, manager and driver calls.
+
+While a request or an RPC call of the share manager runs, a Timings
+object is bound to its (green)thread.  DB queries, policy checks, RPC
+casts, serialization and driver calls add the time they take to it by
+category, so a slow request can be attributed to where its time went.
+
+Every finished request or call is emitted as timing metrics named after
+it, e.g. 'api.ShareController.index' and 'api.ShareController.index.db'.
+The metrics are kept in this process to be rendered in the Prometheus
+text format and are sent to statsd when instrumentation_statsd_host is
+set.
+
+Nothing is bound when instrumentation_enabled is False, and the hooks
+then cost a thread local lookup.
+"""
+
+import collections
+import contextlib
+import functools
+import inspect
+import socket
+import threading
+import time
+
+from oslo.config import cfg
+
+from manila.i18n import _LW
+from manila.openstack.common import log as logging
+
+instrumentation_opts = [
+    cfg.BoolOpt('instrumentation_enabled',
+                default=False,
+                help='Time API requests, DB queries, RPC casts, share '
+                     'manager and share driver calls, and report the '
+                     'timings in response headers, logs and metrics. '
+                     'The metrics are served at /metrics of the share API '
+                     'to admins only.'),
+    cfg.FloatOpt('instrumentation_slow_threshold',
+                 default=1.0,
+                 help='Requests and share manager calls taking longer than '
+                      'this many seconds are logged as warnings.'),
+    cfg.StrOpt('instrumentation_statsd_host',
+               help='Host of a statsd daemon to send timing metrics to '
+                    'over UDP. Metrics are only kept in process if unset.'),
+    cfg.IntOpt('instrumentation_statsd_port',
+               default=8125,
+               help='Port of the statsd daemon.'),
+    cfg.StrOpt('instrumentation_prefix',
+               default='manila',
+               help='Prefix of the names of the metrics.'),
+    cfg.BoolOpt('instrumentation_lock_timing',
+                default=False,
+                help='Record histograms of the time spent waiting for and '
+                     'holding every named lock.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(instrumentation_opts)
+LOG = logging.getLogger(__name__)
+
+_LOCAL = threading.local()
+
+
+class Timings(object):
+    """Time spent by category within one request or manager call."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.totals = collections.defaultdict(float)
+        self.counts = collections.defaultdict(int)
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    def add(self, category, elapsed):
+        self.totals[category] += elapsed
+        self.counts[category] += 1
+
+    def summary(self):
+        """Returns 'db=1.2ms/3 policy=0.1ms/2' style text for logs."""
+        return ' '.join('%s=%.1fms/%d' % (category,
+                                          self.totals[category] * 1000,
+                                          self.counts[category])
+                        for category in sorted(self.totals))
+
+    def server_timing(self, total):
+        """Returns the value of a Server-Timing response header."""
+        metrics = ['total;dur=%.1f' % (total * 1000)]
+        metrics.extend('%s;dur=%.1f;desc="%d"' % (category,
+                                                  self.totals[category] * 1000,
+                                                  self.counts[category])
+                       for category in sorted(self.totals))
+        return ', '.join(metrics)
+
+
+def current():
+    """Returns the Timings bound to this thread, if any."""
+    return getattr(_LOCAL, 'timings', None)
+
+
+def begin(name):
+    """Binds new Timings named name to this thread and returns them."""
+    timings = Timings(name)
+    _LOCAL.timings = timings
+    return timings
+
+
+def finish(timings, elapsed=None, description=None):
+    """Unbinds the timings from this thread and reports them.
+
+    :param elapsed: total duration, taken from the timings if None.
+    :param description: what to call the request or call in logs.
+    """
+    if current() is timings:
+        _LOCAL.timings = None
+    if elapsed is None:
+        elapsed = timings.elapsed
+    emit(timings.name, elapsed)
+    for category, total in timings.totals.items():
+        emit('%s.%s' % (timings.name, category), total)
+
+    data = {'description': description or timings.name,
+            'elapsed': elapsed * 1000,
+            'summary': timings.summary()}
+    if elapsed >= CONF.instrumentation_slow_threshold:
+        LOG.warn(_LW('Slow %(description)s took %(elapsed).1fms: '
+                     '%(summary)s'), data)
+    else:
+        LOG.debug('%(description)s took %(elapsed).1fms: %(summary)s', data)
+
+
+@contextlib.contextmanager
+def timed(category):
+    """Adds the time spent in the block to the current timings."""
+    timings = current()
+    if timings is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings.add(category, time.time() - start)
+
+
+def _call_timed(kind, name, func, *args, **kwargs):
+    timings = current()
+    if timings is None:
+        timings = begin(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            finish(timings)
+    start = time.time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        elapsed = time.time() - start
+        timings.add(kind, elapsed)
+        emit(name, elapsed)
+
+
+def timed_method(kind):
+    """Decorator timing every call of a method as '<kind>.<method name>'.
+
+    A call made outside of a request gets timings of its own, so that the
+    DB queries and driver calls it makes are attributed to it.
+    """
+    def decorator(func):
+        name = '%s.%s' % (kind, func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CONF.instrumentation_enabled:
+                return func(*args, **kwargs)
+            return _call_timed(kind, name, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_methods(obj, kind, interface):
+    """Times the calls of the public methods of interface made on obj.
+
+    Used on driver instances, whose classes override the methods of the
+    interface, so decorating the interface itself would not do.
+    """
+    for name, member in inspect.getmembers(interface, callable):
+        if name.startswith('_') or inspect.isclass(member):
+            continue
+        method = getattr(obj, name)
+        setattr(obj, name, functools.partial(
+            _call_timed, kind, '%s.%s' % (kind, name), method))
+
+
+def instrument_engine(engine):
+    """Counts and times the statements executed through the engine."""
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        conn.info.setdefault('instrumentation_start', []).append(time.time())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context,
+                             executemany):
+        elapsed = time.time() - conn.info['instrumentation_start'].pop()
+        timings = current()
+        if timings is not None:
+            timings.add('db', elapsed)
+        emit('db.query', elapsed)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+class _TimedRPCClient(object):
+    """Times the casts and calls made through an RPC client."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def prepare(self, *args, **kwargs):
+        return _TimedRPCClient(self._client.prepare(*args, **kwargs))
+
+    def cast(self, *args, **kwargs):
+        with timed('rpc'):
+            return self._client.cast(*args, **kwargs)
+
+    def call(self, *args, **kwargs):
+        with timed('rpc'):
+            return self._client.call(*args, **kwargs)
+
+
+def instrument_rpc_client(client):
+    """Returns the client, timing its casts if instrumentation is on."""
+    if not CONF.instrumentation_enabled:
+        return client
+    return _TimedRPCClient(client)
+
+
+class StatsdClient(object):
+    """Sends metrics to statsd, dropping them if it cannot."""
+
+    def __init__(self, host, port, prefix):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = None
+
+    def timing(self, name, elapsed):
+        self._send('%s.%s:%.3f|ms' % (self.prefix, name, elapsed * 1000))
+
+    def gauge(self, name, value):
+        self._send('%s.%s:%s|g' % (self.prefix, name, value))
+
+    def _send(self, data):
+        try:
+            if self._socket is None:
+                self._socket = socket.socket(socket.AF_INET,
+                                             socket.SOCK_DGRAM)
+            self._socket.sendto(data, self.address)
+        except (socket.error, socket.gaierror):
+            pass
+
+
+_LOCK = threading.Lock()
+_METRICS = {}
+_GAUGES = {}
+_HISTOGRAMS = {}
+_STATSD = None
+HISTOGRAM_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+def _statsd():
+    global _STATSD
+    host = CONF.instrumentation_statsd_host
+    if not host:
+        return None
+    if _STATSD is None or _STATSD.address[0] != host:
+        _STATSD = StatsdClient(host, CONF.instrumentation_statsd_port,
+                               CONF.instrumentation_prefix)
+    return _STATSD
+
+
+def emit(name, elapsed):
+    """Records one timing of the metric name."""
+    with _LOCK:
+        metric = _METRICS.setdefault(name, [0, 0.0])
+        metric[0] += 1
+        metric[1] += elapsed
+    statsd = _statsd()
+    if statsd is not None:
+        statsd.timing(name, elapsed)
+
+
+def gauge(name, value):
+    """Records the current value of the metric name."""
+    with _LOCK:
+        _GAUGES[name] = value
+    statsd = _statsd()
+    if statsd is not None:
+        statsd.gauge(name, value)
+
+
+def observe(name, elapsed):
+    """Records one duration of the metric name in a histogram."""
+    with _LOCK:
+        histogram = _HISTOGRAMS.get(name)
+        if histogram is None:
+            # The bucket counts, then the total count and sum.
+            histogram = [0] * (len(HISTOGRAM_BUCKETS) + 1) + [0.0]
+            _HISTOGRAMS[name] = histogram
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if elapsed <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += elapsed
+    statsd = _statsd()
+    if statsd is not None:
+        statsd.timing(name, elapsed)
+
+
+def reset():
+    """Forgets the metrics recorded so far and the statsd client."""
+    global _STATSD
+    with _LOCK:
+        _METRICS.clear()
+        _GAUGES.clear()
+        _HISTOGRAMS.clear()
+    _STATSD = None
+
+
+def render_metrics():
+    """Returns the recorded metrics in the Prometheus text format."""
+    family = '%s_timing_seconds' % CONF.instrumentation_prefix
+    lines = ['# TYPE %s summary' % family]
+    with _LOCK:
+        metrics = sorted((name, list(metric))
+                         for name, metric in _METRICS.items())
+        gauges = sorted(_GAUGES.items())
+        histograms = sorted((name, list(histogram))
+                            for name, histogram in _HISTOGRAMS.items())
+    for name, (count, total) in metrics:
+        lines.append('%s_count{name="%s"} %d' % (family, name, count))
+        lines.append('%s_sum{name="%s"} %.6f' % (family, name, total))
+    if gauges:
+        family = '%s_gauge' % CONF.instrumentation_prefix
+        lines.append('# TYPE %s gauge' % family)
+        for name, value in gauges:
+            lines.append('%s{name="%s"} %s' % (family, name, value))
+    if histograms:
+        family = '%s_histogram_seconds' % CONF.instrumentation_prefix
+        lines.append('# TYPE %s histogram' % family)
+        for name, histogram in histograms:
+            for bound, count in zip(HISTOGRAM_BUCKETS, histogram):
+                lines.append('%s_bucket{name="%s",le="%s"} %d'
+                             % (family, name, bound, count))
+            lines.append('%s_bucket{name="%s",le="+Inf"} %d'
+                         % (family, name, histogram[-2]))
+            lines.append('%s_count{name="%s"} %d'
+                         % (family, name, histogram[-2]))
+            lines.append('%s_sum{name="%s"} %.6f'
+                         % (family, name, histogram[-1]))
+    return '\n'.join(lines) + '\n'
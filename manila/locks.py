@@ -0,0 +1,237 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Named locks, within this process or across the processes of a host.
+
+The semaphores of the named locks are kept in a table split in stripes,
+each with a mutex of its own, and a name is dropped from its stripe as
+soon as nobody holds or waits for its lock.  A name always has a
+semaphore of its own: hashing names onto shared semaphores could
+deadlock the code which takes one lock while holding another.
+
+External locks also take an fcntl lock on a file under lock_path.  The
+descriptors of the lock files are kept open in a bounded pool, instead
+of opening the file on every acquisition, and a busy lock file is polled
+with an exponential backoff.  The files themselves are never removed:
+another process could be waiting for a lock on the removed file while a
+third one locks a new file of the same name.
+
+With instrumentation_lock_timing, the time spent waiting for and holding
+every lock is recorded in histograms named after the lock, with the
+UUIDs in the name replaced by '<id>'.
+"""
+
+import collections
+import contextlib
+import errno
+import fcntl
+import functools
+import os
+import re
+import threading
+import time
+
+from eventlet import semaphore
+from oslo.config import cfg
+
+from manila.i18n import _
+from manila.i18n import _LE
+from manila import instrumentation
+from manila.openstack.common import fileutils
+from manila.openstack.common import log as logging
+
+lock_opts = [
+    cfg.IntOpt('lock_file_pool_size',
+               default=64,
+               help='Number of lock files whose descriptors are kept open '
+                    'for reuse by the external locks.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(lock_opts)
+CONF.import_opt('lock_path', 'manila.openstack.common.lockutils')
+CONF.import_opt('disable_process_locking',
+                'manila.openstack.common.lockutils')
+CONF.import_opt('instrumentation_enabled', 'manila.instrumentation')
+CONF.import_opt('instrumentation_lock_timing', 'manila.instrumentation')
+LOG = logging.getLogger(__name__)
+
+STRIPES = 16
+_UUID = re.compile('[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                   '[0-9a-f]{12}', re.IGNORECASE)
+
+
+class _NamedLock(object):
+
+    def __init__(self):
+        self.semaphore = semaphore.Semaphore()
+        self.users = 0
+
+
+class _LockFile(object):
+    """A lock file, opened once and locked as many times as needed.
+
+    fcntl locks belong to the process, so the file is only locked by the
+    holder of the semaphore of its name.  Closing any descriptor of the
+    file drops the lock, so the pool only closes the files not in use.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.in_use = False
+
+    def acquire(self):
+        if self.file is None:
+            basedir = os.path.dirname(self.path)
+            if not os.path.exists(basedir):
+                fileutils.ensure_tree(basedir)
+            self.file = open(self.path, 'a')
+        delay = 0.001
+        while True:
+            try:
+                fcntl.lockf(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except IOError as e:
+                if e.errno not in (errno.EACCES, errno.EAGAIN):
+                    raise threading.ThreadError(
+                        _("Unable to acquire lock on `%(filename)s` due to "
+                          "%(exception)s") % {'filename': self.path,
+                                              'exception': e})
+                time.sleep(delay)
+                delay = min(delay * 2, 0.01)
+
+    def release(self):
+        try:
+            fcntl.lockf(self.file, fcntl.LOCK_UN)
+        except IOError:
+            LOG.exception(_LE("Could not release the acquired lock `%s`"),
+                          self.path)
+            self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class LockManager(object):
+    """Hands out the named locks of this process."""
+
+    def __init__(self, stripes=STRIPES):
+        self._stripes = [(threading.Lock(), {}) for i in range(stripes)]
+        self._files = collections.OrderedDict()
+        self._files_mutex = threading.Lock()
+
+    @contextlib.contextmanager
+    def lock(self, name, lock_file_prefix=None, external=False,
+             lock_path=None):
+        """Holds the lock of name for the duration of the block.
+
+        :param external: whether to also lock out the other processes of
+                         the host, with a file lock.
+        """
+        timed = (CONF.instrumentation_enabled and
+                 CONF.instrumentation_lock_timing)
+        start = time.time()
+        mutex, locks = self._stripes[hash(name) % len(self._stripes)]
+        with mutex:
+            named = locks.get(name)
+            if named is None:
+                named = locks[name] = _NamedLock()
+            named.users += 1
+        try:
+            with named.semaphore:
+                lock_file = None
+                if external and not CONF.disable_process_locking:
+                    lock_file = self._get_file(
+                        _get_lock_path(name, lock_file_prefix, lock_path))
+                try:
+                    if lock_file is not None:
+                        lock_file.acquire()
+                    acquired = time.time()
+                    try:
+                        yield
+                    finally:
+                        if lock_file is not None:
+                            lock_file.release()
+                        if timed:
+                            family = _UUID.sub('<id>', name)
+                            instrumentation.observe('lock.%s.wait' % family,
+                                                    acquired - start)
+                            instrumentation.observe('lock.%s.hold' % family,
+                                                    time.time() - acquired)
+                finally:
+                    if lock_file is not None:
+                        self._put_file(lock_file)
+        finally:
+            with mutex:
+                named.users -= 1
+                if not named.users:
+                    del locks[name]
+
+    def _get_file(self, path):
+        with self._files_mutex:
+            lock_file = self._files.pop(path, None)
+            if lock_file is None:
+                lock_file = _LockFile(path)
+            lock_file.in_use = True
+            self._files[path] = lock_file
+            return lock_file
+
+    def _put_file(self, lock_file):
+        with self._files_mutex:
+            lock_file.in_use = False
+            excess = len(self._files) - CONF.lock_file_pool_size
+            if excess <= 0:
+                return
+            for path in list(self._files):
+                if not self._files[path].in_use:
+                    self._files.pop(path).close()
+                    excess -= 1
+                    if not excess:
+                        break
+
+
+def _get_lock_path(name, lock_file_prefix, lock_path):
+    # The same file names as lockutils, so that both lock each other out.
+    name = name.replace(os.sep, '_')
+    if lock_file_prefix:
+        sep = '' if lock_file_prefix.endswith('-') else '-'
+        name = '%s%s%s' % (lock_file_prefix, sep, name)
+    lock_path = lock_path or CONF.lock_path
+    if not lock_path:
+        raise cfg.RequiredOptError('lock_path')
+    return os.path.join(lock_path, name)
+
+
+_MANAGER = LockManager()
+
+
+def lock(name, lock_file_prefix=None, external=False, lock_path=None):
+    """Context manager holding the lock of name, see LockManager.lock."""
+    return _MANAGER.lock(name, lock_file_prefix, external, lock_path)
+
+
+def synchronized(name, lock_file_prefix=None, external=False,
+                 lock_path=None):
+    """Decorator running every call of a function under the lock of name."""
+    def wrap(f):
+        @functools.wraps(f)
+        def inner(*args, **kwargs):
+            with lock(name, lock_file_prefix, external, lock_path):
+                return f(*args, **kwargs)
+        return inner
+    return wrap
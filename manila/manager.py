@@ -51,6 +51,9 @@ This module provides Manager, a base class for managers.
 
 """
 
+import copy
+import time
+
 from oslo.config import cfg
 import six
 
@@ -61,6 +64,7 @@ from manila.scheduler import rpcapi as scheduler_rpcapi
 from manila import version
 
 CONF = cfg.CONF
+CONF.import_opt('publish_capability_deltas', 'manila.service')
 
 
 LOG = logging.getLogger(__name__)
@@ -195,15 +199,63 @@ class SchedulerDependentManager(Manager):
         self.last_capabilities = None
         self.service_name = service_name
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
+        # Versions start from the time the manager started, so that those
+        # of a restarted manager do not repeat the ones of its last run.
+        self.capabilities_version = int(time.time() * 1000)
+        self._published_capabilities = None
         super(SchedulerDependentManager, self).__init__(host, db_driver)
 
     def update_service_capabilities(self, capabilities):
         """Remember these capabilities to send on next periodic update."""
         self.last_capabilities = capabilities
 
+    def capabilities_update(self, full=False):
+        """Returns the next capability update to publish, if any.
+
+        The update holds the capabilities which changed and the names of
+        those which were removed since the previous update, and the
+        version the scheduler must have for it to apply.  The version is
+        bumped with every change.  Full updates hold all the capabilities
+        and no base version, and are made when full is True and for the
+        first update.
+        """
+        if not self.last_capabilities:
+            return None
+        capabilities = copy.deepcopy(self.last_capabilities)
+        published = self._published_capabilities
+        update = {'service_name': self.service_name, 'host': self.host}
+        if full or published is None:
+            self.capabilities_version += 1
+            update['capabilities'] = capabilities
+        else:
+            changed = dict((key, value)
+                           for key, value in six.iteritems(capabilities)
+                           if key not in published or published[key] != value)
+            removed = [key for key in published if key not in capabilities]
+            update['base_version'] = self.capabilities_version
+            if changed or removed:
+                self.capabilities_version += 1
+            update['capabilities'] = changed
+            update['removed'] = removed
+        update['version'] = self.capabilities_version
+        self._published_capabilities = capabilities
+        return update
+
     @periodic_task
-    def _publish_service_capabilities(self, context):
-        """Pass data back to the scheduler at a periodic interval."""
+    def _publish_service_capabilities(self, context, full=False):
+        """Pass data back to the scheduler at a periodic interval.
+
+        With publish_capability_deltas, the service publishes the updates
+        on its own schedule, and only a full update requested by a
+        scheduler is sent from here.
+        """
+        if CONF.publish_capability_deltas:
+            update = self.capabilities_update(full=True) if full else None
+            if update:
+                LOG.debug('Notifying Schedulers of all capabilities ...')
+                self.scheduler_rpcapi.update_service_capabilities_batch(
+                    context, [update])
+            return
         if self.last_capabilities:
             LOG.debug('Notifying Schedulers of capabilities ...')
             self.scheduler_rpcapi.update_service_capabilities(
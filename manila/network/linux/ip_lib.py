@@ -14,11 +14,28 @@
 #    under the License.
 
 import netaddr
+from oslo.config import cfg
 import six
 
+from manila import exception
 from manila.i18n import _
+from manila.network.linux import netlink
 from manila import utils
 
+OPTS = [
+    cfg.StrOpt('ip_lib_backend',
+               default='subprocess',
+               choices=['subprocess', 'netlink'],
+               help=_("How to look up the network devices, addresses and "
+                      "routes of the host: 'subprocess' runs the ip "
+                      "command, 'netlink' asks the kernel over a netlink "
+                      "socket without forking. Lookups in other network "
+                      "namespaces and all changes run the ip command "
+                      "either way.")),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(OPTS)
 
 LOOPBACK_DEVNAME = 'lo'
 
@@ -27,6 +44,9 @@ class SubProcessBase(object):
     def __init__(self, namespace=None):
         self.namespace = namespace
 
+    def _use_netlink(self):
+        return CONF.ip_lib_backend == 'netlink' and not self.namespace
+
     def _run(self, options, command, args):
         if self.namespace:
             return self._as_root(options, command, args)
@@ -58,6 +78,12 @@ class IPWrapper(SubProcessBase):
         return IPDevice(name, self.namespace)
 
     def get_devices(self, exclude_loopback=False):
+        if self._use_netlink():
+            return [IPDevice(link['name'], self.namespace)
+                    for link in netlink.get_links()
+                    if not (exclude_loopback and
+                            link['name'] == LOOPBACK_DEVNAME)]
+
         retval = []
         output = self._execute('o', 'link', ('list',), self.namespace)
         for line in output.split('\n'):
@@ -157,6 +183,17 @@ class IpDeviceCommandBase(IpCommandBase):
     def name(self):
         return self._parent.name
 
+    def _use_netlink(self):
+        return (CONF.ip_lib_backend == 'netlink' and
+                not self._parent.namespace)
+
+    def _get_link(self, name=None):
+        link = netlink.get_link(name or self.name)
+        if link is None:
+            raise exception.NetworkException(
+                _('Device "%s" does not exist.') % (name or self.name))
+        return link
+
 
 class IpLinkCommand(IpDeviceCommandBase):
     COMMAND = 'link'
@@ -213,6 +250,8 @@ class IpLinkCommand(IpDeviceCommandBase):
 
     @property
     def attributes(self):
+        if self._use_netlink():
+            return self._get_link()['attributes']
         return self._parse_line(self._run('show', self.name, options='o'))
 
     def _parse_line(self, value):
@@ -256,6 +295,9 @@ class IpAddrCommand(IpDeviceCommandBase):
         if filters is None:
             filters = []
 
+        if self._use_netlink() and set(filters) <= set(['permanent']):
+            return self._list_netlink(scope, to, 'permanent' in filters)
+
         retval = []
 
         if scope:
@@ -291,6 +333,20 @@ class IpAddrCommand(IpDeviceCommandBase):
                                dynamic=('dynamic' == parts[-1])))
         return retval
 
+    def _list_netlink(self, scope, to, permanent):
+        retval = []
+        for address in netlink.get_addresses(self._get_link()['index']):
+            if scope and address['scope'] != scope:
+                continue
+            if permanent and address['dynamic']:
+                continue
+            if to and (netaddr.IPNetwork(address['cidr']).ip not in
+                       netaddr.IPNetwork(to)):
+                continue
+            del address['index']
+            retval.append(address)
+        return retval
+
 
 class IpRouteCommand(IpDeviceCommandBase):
     COMMAND = 'route'
@@ -341,7 +397,28 @@ class IpRouteCommand(IpDeviceCommandBase):
         Ensures that the route entry for the interface is before all
         others on the same subnet.
         """
-        device_list = []
+        for subnet, device_list in self.get_subnet_devices(interface_name):
+            for (device, src) in device_list:
+                self._as_root('del', subnet, 'dev', device)
+                if (src != ''):
+                    self._as_root('append', subnet, 'proto', 'kernel',
+                                  'src', src, 'dev', device)
+                else:
+                    self._as_root('append', subnet, 'proto', 'kernel',
+                                  'dev', device)
+
+    def get_subnet_devices(self, interface_name):
+        """Finds the devices routed to ahead of the interface.
+
+        :returns: a list of (subnet, [(device, src), ...]) tuples, one for
+                  each subnet the interface has a kernel route for.
+        """
+        if self._use_netlink():
+            return self._get_subnet_devices_netlink(interface_name)
+        return self._get_subnet_devices(interface_name)
+
+    def _get_subnet_devices(self, interface_name):
+        subnet_devices = []
         device_route_list_lines = self._run('list', 'proto', 'kernel',
                                             'dev', interface_name).split('\n')
         for device_route_line in device_route_list_lines:
@@ -349,6 +426,7 @@ class IpRouteCommand(IpDeviceCommandBase):
                 subnet = device_route_line.split()[0]
             except Exception:
                 continue
+            device_list = []
             subnet_route_list_lines = self._run('list', 'proto', 'kernel',
                                                 'match', subnet).split('\n')
             for subnet_route_line in subnet_route_list_lines:
@@ -366,15 +444,34 @@ class IpRouteCommand(IpDeviceCommandBase):
                     device_list.append((device, src))
                 else:
                     break
-
-            for (device, src) in device_list:
-                self._as_root('del', subnet, 'dev', device)
-                if (src != ''):
-                    self._as_root('append', subnet, 'proto', 'kernel',
-                                  'src', src, 'dev', device)
-                else:
-                    self._as_root('append', subnet, 'proto', 'kernel',
-                                  'dev', device)
+            subnet_devices.append((subnet, device_list))
+        return subnet_devices
+
+    def _get_subnet_devices_netlink(self, interface_name):
+        index = self._get_link(interface_name)['index']
+        names = dict((link['index'], link['name'])
+                     for link in netlink.get_links())
+        routes = [route for route in netlink.get_routes()
+                  if route['protocol'] == netlink.RTPROT_KERNEL and
+                  route['dst'] != 'default']
+
+        subnet_devices = []
+        for route in routes:
+            if route['oif'] != index:
+                continue
+            subnet = netaddr.IPNetwork(route['dst'])
+            device_list = []
+            # Like 'ip route list match', which lists the routes covering
+            # the subnet.
+            for subnet_route in routes:
+                if subnet not in netaddr.IPNetwork(subnet_route['dst']):
+                    continue
+                if subnet_route['oif'] == index:
+                    break
+                device_list.append((names[subnet_route['oif']],
+                                    subnet_route['src'] or ''))
+            subnet_devices.append((route['dst'], device_list))
+        return subnet_devices
 
 
 class IpNetnsCommand(IpCommandBase):
@@ -0,0 +1,306 @@
+# Copyright 2014 Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Reads the network devices of the host over rtnetlink.
+
+Asking the kernel directly spares the fork of an 'ip' command, and of
+sudo, for every lookup.  Only the namespace of this process is read, and
+nothing is changed here: changing devices takes root privileges, which
+are only available through rootwrap.
+"""
+
+import errno
+import os
+import socket
+import struct
+
+import netaddr
+
+NETLINK_ROUTE = 0
+
+NLMSG_HEADER = struct.Struct('=LHHLL')
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_GETROUTE = 26
+
+IFINFOMSG = struct.Struct('=BxHiII')
+IFLA_ADDRESS = 1
+IFLA_BROADCAST = 2
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_QDISC = 6
+IFLA_TXQLEN = 13
+IFLA_OPERSTATE = 16
+IFLA_LINKMODE = 17
+IFLA_IFALIAS = 20
+IFLA_GROUP = 27
+
+IFADDRMSG = struct.Struct('=BBBBI')
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_BROADCAST = 4
+IFA_FLAGS = 8
+IFA_F_PERMANENT = 0x80
+
+RTMSG = struct.Struct('=BBBBBBBBI')
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_PREFSRC = 7
+RTA_TABLE = 15
+RT_TABLE_MAIN = 254
+RTPROT_KERNEL = 2
+
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+
+# The names 'ip' gives to the operational states, link modes and address
+# scopes.
+OPERSTATES = ('UNKNOWN', 'NOTPRESENT', 'DOWN', 'LOWERLAYERDOWN', 'TESTING',
+              'DORMANT', 'UP')
+LINKMODES = ('DEFAULT', 'DORMANT')
+SCOPES = {0: 'global', 200: 'site', 253: 'link', 254: 'host', 255: 'nowhere'}
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _attributes(data, offset):
+    attributes = {}
+    while offset + 4 <= len(data):
+        length, kind = struct.unpack_from('=HH', data, offset)
+        if length < 4:
+            break
+        # Clear the nested and byte order flags.
+        attributes[kind & 0x3fff] = data[offset + 4:offset + length]
+        offset += _align(length)
+    return attributes
+
+
+def _attribute(kind, value):
+    length = 4 + len(value)
+    return (struct.pack('=HH', length, kind) + value +
+            '\0' * (_align(length) - length))
+
+
+def _string(value):
+    return value.split('\0', 1)[0]
+
+
+def _uint32(value):
+    return struct.unpack('=I', value[:4])[0]
+
+
+def _mac(value):
+    return ':'.join('%02x' % ord(byte) for byte in value)
+
+
+def _ip(family, value):
+    return socket.inet_ntop(family, value)
+
+
+def _request(msg_type, payload, dump=True):
+    """Sends one rtnetlink request and returns the messages of the reply.
+
+    :returns: a list of (message type, message body) tuples.
+    :raises: OSError with the errno the kernel answered with.
+    """
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.bind((0, 0))
+        flags = NLM_F_REQUEST | (NLM_F_DUMP if dump else 0)
+        sock.sendall(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload),
+                                       msg_type, flags, 1, 0) + payload)
+        messages = []
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + NLMSG_HEADER.size <= len(data):
+                length, kind = NLMSG_HEADER.unpack_from(data, offset)[:2]
+                body = data[offset + NLMSG_HEADER.size:offset + length]
+                offset += _align(length)
+                if kind == NLMSG_DONE:
+                    return messages
+                if kind == NLMSG_ERROR:
+                    error = -struct.unpack_from('=i', body)[0]
+                    if error:
+                        raise OSError(error, os.strerror(error))
+                    return messages
+                messages.append((kind, body))
+                if not dump:
+                    return messages
+    finally:
+        sock.close()
+
+
+def _parse_link(body):
+    family, link_type, index, flags, _change = IFINFOMSG.unpack_from(body)
+    attrs = _attributes(body, IFINFOMSG.size)
+    attributes = {}
+    if IFLA_ADDRESS in attrs:
+        if link_type == ARPHRD_ETHER:
+            attributes['link/ether'] = _mac(attrs[IFLA_ADDRESS])
+        elif link_type == ARPHRD_LOOPBACK:
+            attributes['link/loopback'] = _mac(attrs[IFLA_ADDRESS])
+    if IFLA_BROADCAST in attrs:
+        attributes['brd'] = _mac(attrs[IFLA_BROADCAST])
+    if IFLA_MTU in attrs:
+        attributes['mtu'] = _uint32(attrs[IFLA_MTU])
+    if IFLA_QDISC in attrs:
+        attributes['qdisc'] = _string(attrs[IFLA_QDISC])
+    if IFLA_TXQLEN in attrs:
+        attributes['qlen'] = _uint32(attrs[IFLA_TXQLEN])
+    if IFLA_OPERSTATE in attrs:
+        state = ord(attrs[IFLA_OPERSTATE][0])
+        if state < len(OPERSTATES):
+            attributes['state'] = OPERSTATES[state]
+    if IFLA_LINKMODE in attrs:
+        mode = ord(attrs[IFLA_LINKMODE][0])
+        if mode < len(LINKMODES):
+            attributes['mode'] = LINKMODES[mode]
+    if IFLA_GROUP in attrs:
+        group = _uint32(attrs[IFLA_GROUP])
+        attributes['group'] = 'default' if group == 0 else str(group)
+    if IFLA_IFALIAS in attrs:
+        attributes['alias'] = _string(attrs[IFLA_IFALIAS])
+    return {'index': index,
+            'name': _string(attrs.get(IFLA_IFNAME, '')),
+            'flags': flags,
+            'attributes': attributes}
+
+
+def get_links():
+    """Lists the network devices.
+
+    :returns: a list of dicts with the index, name and flags of each
+              device, and its attributes keyed like in 'ip -o link show'.
+    """
+    return [_parse_link(body) for kind, body in
+            _request(RTM_GETLINK, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+            if kind == RTM_NEWLINK]
+
+
+def get_link(name):
+    """Looks a network device up by name, like get_links() describes it.
+
+    :returns: None if there is no such device.
+    """
+    payload = (IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0) +
+               _attribute(IFLA_IFNAME, str(name) + '\0'))
+    try:
+        messages = _request(RTM_GETLINK, payload, dump=False)
+    except OSError as e:
+        if e.errno == errno.ENODEV:
+            return None
+        raise
+    for kind, body in messages:
+        if kind == RTM_NEWLINK:
+            return _parse_link(body)
+    return None
+
+
+def _parse_address(body):
+    family, prefixlen, flags, scope, index = IFADDRMSG.unpack_from(body)
+    attrs = _attributes(body, IFADDRMSG.size)
+    if IFA_FLAGS in attrs:
+        flags = _uint32(attrs[IFA_FLAGS])
+    # 'ip' shows the local address, which only differs from the
+    # address on point to point links.
+    address = _ip(family, attrs.get(IFA_LOCAL) or attrs[IFA_ADDRESS])
+    cidr = '%s/%d' % (address, prefixlen)
+    if family == socket.AF_INET6:
+        version = 6
+        broadcast = '::'
+    else:
+        version = 4
+        if IFA_BROADCAST in attrs:
+            broadcast = _ip(family, attrs[IFA_BROADCAST])
+        else:
+            broadcast = str(netaddr.IPNetwork(cidr).broadcast)
+    return {'index': index,
+            'cidr': cidr,
+            'broadcast': broadcast,
+            'scope': SCOPES.get(scope, str(scope)),
+            'ip_version': version,
+            'dynamic': not flags & IFA_F_PERMANENT}
+
+
+def get_addresses(index=None):
+    """Lists the IPv4 and IPv6 addresses of all or of one network device.
+
+    :param index: the index of the device to list the addresses of.
+    :returns: a list of dicts keyed like the ones IpAddrCommand.list
+              returns, plus the index of the device of each address.
+    """
+    addresses = []
+    for kind, body in _request(RTM_GETADDR,
+                               IFADDRMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)):
+        if kind != RTM_NEWADDR:
+            continue
+        if index is not None and IFADDRMSG.unpack_from(body)[4] != index:
+            continue
+        addresses.append(_parse_address(body))
+    return addresses
+
+
+def _parse_route(body):
+    (family, dst_len, _src_len, _tos, table, protocol, _scope, _type,
+     _flags) = RTMSG.unpack_from(body)
+    attrs = _attributes(body, RTMSG.size)
+    if RTA_TABLE in attrs:
+        table = _uint32(attrs[RTA_TABLE])
+    if RTA_DST in attrs:
+        dst = '%s/%d' % (_ip(family, attrs[RTA_DST]), dst_len)
+    else:
+        dst = 'default'
+    return {'dst': dst,
+            'table': table,
+            'protocol': protocol,
+            'oif': _uint32(attrs[RTA_OIF]) if RTA_OIF in attrs else None,
+            'gateway': (_ip(family, attrs[RTA_GATEWAY])
+                        if RTA_GATEWAY in attrs else None),
+            'metric': (_uint32(attrs[RTA_PRIORITY])
+                       if RTA_PRIORITY in attrs else None),
+            'src': (_ip(family, attrs[RTA_PREFSRC])
+                    if RTA_PREFSRC in attrs else None)}
+
+
+def get_routes():
+    """Lists the IPv4 routes of the main table, as 'ip route list' does.
+
+    :returns: a list of dicts with the destination ('default' or a CIDR),
+              protocol, output device index, gateway, metric and preferred
+              source of each route, in the order of the kernel.
+    """
+    routes = []
+    for kind, body in _request(RTM_GETROUTE,
+                               RTMSG.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0,
+                                          0, 0)):
+        if kind != RTM_NEWROUTE:
+            continue
+        route = _parse_route(body)
+        if route['table'] == RT_TABLE_MAIN:
+            routes.append(route)
+    return routes
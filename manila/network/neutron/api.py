@@ -14,8 +14,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from neutronclient.common import exceptions as neutron_client_exc
-from neutronclient.v2_0 import client as clientv20
+import time
+
 from oslo.config import cfg
 
 from manila import context
@@ -24,6 +24,10 @@ from manila import exception
 from manila.i18n import _LE
 from manila.network.neutron import constants as neutron_constants
 from manila.openstack.common import log as logging
+from manila import utils
+
+neutron_client_exc = utils.LazyImport('neutronclient.common.exceptions')
+clientv20 = utils.LazyImport('neutronclient.v2_0.client')
 
 neutron_opts = [
     cfg.StrOpt(
@@ -71,6 +75,12 @@ neutron_opts = [
         deprecated_group='DEFAULT',
         help='Location of CA certificates file to use for '
              'neutron client requests.'),
+    cfg.IntOpt(
+        'neutron_extension_sync_interval',
+        default=600,
+        deprecated_group='DEFAULT',
+        help='Number of seconds the list of neutron extensions is cached '
+             'for before it is fetched again.'),
 ]
 
 CONF = cfg.CONF
@@ -136,31 +146,41 @@ class API(base.Base):
         nets = self.client.list_networks(**search_opts).get('networks', [])
         return nets
 
+    def _port_body(self, tenant_id, network_id, host_id=None, subnet_id=None,
+                   fixed_ip=None, device_owner=None, device_id=None,
+                   mac_address=None, security_group_ids=None,
+                   dhcp_opts=None):
+        port = {'network_id': network_id,
+                'admin_state_up': True,
+                'tenant_id': tenant_id}
+        if security_group_ids:
+            port['security_groups'] = security_group_ids
+        if mac_address:
+            port['mac_address'] = mac_address
+        if self._has_port_binding_extension() and host_id:
+            port['binding:host_id'] = host_id
+        if dhcp_opts is not None:
+            port['extra_dhcp_opts'] = dhcp_opts
+        if subnet_id:
+            fixed_ip_dict = {'subnet_id': subnet_id}
+            if fixed_ip:
+                fixed_ip_dict.update({'ip_address': fixed_ip})
+            port['fixed_ips'] = [fixed_ip_dict]
+        if device_owner:
+            port['device_owner'] = device_owner
+        if device_id:
+            port['device_id'] = device_id
+        return port
+
     def create_port(self, tenant_id, network_id, host_id=None, subnet_id=None,
                     fixed_ip=None, device_owner=None, device_id=None,
                     mac_address=None, security_group_ids=None, dhcp_opts=None):
         try:
-            port_req_body = {'port': {}}
-            port_req_body['port']['network_id'] = network_id
-            port_req_body['port']['admin_state_up'] = True
-            port_req_body['port']['tenant_id'] = tenant_id
-            if security_group_ids:
-                port_req_body['port']['security_groups'] = security_group_ids
-            if mac_address:
-                port_req_body['port']['mac_address'] = mac_address
-            if self._has_port_binding_extension() and host_id:
-                port_req_body['port']['binding:host_id'] = host_id
-            if dhcp_opts is not None:
-                port_req_body['port']['extra_dhcp_opts'] = dhcp_opts
-            if subnet_id:
-                fixed_ip_dict = {'subnet_id': subnet_id}
-                if fixed_ip:
-                    fixed_ip_dict.update({'ip_address': fixed_ip})
-                port_req_body['port']['fixed_ips'] = [fixed_ip_dict]
-            if device_owner:
-                port_req_body['port']['device_owner'] = device_owner
-            if device_id:
-                port_req_body['port']['device_id'] = device_id
+            port_req_body = {'port': self._port_body(
+                tenant_id, network_id, host_id=host_id, subnet_id=subnet_id,
+                fixed_ip=fixed_ip, device_owner=device_owner,
+                device_id=device_id, mac_address=mac_address,
+                security_group_ids=security_group_ids, dhcp_opts=dhcp_opts)}
             port = self.client.create_port(port_req_body).get('port', {})
             return port
         except neutron_client_exc.NeutronClientException as e:
@@ -171,6 +191,24 @@ class API(base.Base):
             raise exception.NetworkException(code=e.status_code,
                                              message=e.message)
 
+    def create_ports(self, tenant_id, network_id, count, **kwargs):
+        """Creates count alike ports in a single bulk request.
+
+        Takes the arguments of create_port.  Neutron creates either all
+        of the ports or none of them.
+        """
+        try:
+            port = self._port_body(tenant_id, network_id, **kwargs)
+            port_req_body = {'ports': [dict(port) for __ in range(count)]}
+            return self.client.create_port(port_req_body).get('ports', [])
+        except neutron_client_exc.NeutronClientException as e:
+            LOG.exception(_LE('Neutron error creating ports on network %s'),
+                          network_id)
+            if e.status_code == 409:
+                raise exception.PortLimitExceeded()
+            raise exception.NetworkException(code=e.status_code,
+                                             message=e.message)
+
     def delete_port(self, port_id):
         try:
             self.client.delete_port(port_id)
@@ -222,10 +260,20 @@ class API(base.Base):
         extensions_list = self.client.list_extensions().get('extensions')
         return dict((ext['name'], ext) for ext in extensions_list)
 
-    def _has_port_binding_extension(self):
-        if not self.extensions:
+    def _refresh_extensions_cache(self):
+        if (self.last_neutron_extension_sync is None or
+                time.time() - self.last_neutron_extension_sync >=
+                self.configuration.neutron_extension_sync_interval):
             self.extensions = self.list_extensions()
-        return neutron_constants.PORTBINDING_EXT in self.extensions
+            self.last_neutron_extension_sync = time.time()
+
+    def has_extension(self, name):
+        """Tells whether neutron has the extension, caching the list."""
+        self._refresh_extensions_cache()
+        return name in self.extensions
+
+    def _has_port_binding_extension(self):
+        return self.has_extension(neutron_constants.PORTBINDING_EXT)
 
     def router_create(self, tenant_id, name):
         router_req_body = {'router': {}}
@@ -29,6 +29,10 @@ class NeutronNetworkPlugin(network.NetworkBaseAPI):
         db_driver = kwargs.pop('db_driver', None)
         super(NeutronNetworkPlugin, self).__init__(db_driver=db_driver)
         self.neutron_api = neutron_api.API(*args, **kwargs)
+        # Provider attributes of networks and the CIDRs of subnets cannot
+        # change, so they are looked up once per process.
+        self._network_data = {}
+        self._subnet_data = {}
 
     def allocate_network(self, context, share_server, share_network, **kwargs):
         """Allocate network resources using given network information.
@@ -54,12 +58,10 @@ class NeutronNetworkPlugin(network.NetworkBaseAPI):
         allocation_count = kwargs.get('count', 1)
         device_owner = kwargs.get('device_owner', 'share')
 
-        ports = []
-        for __ in range(0, allocation_count):
-            ports.append(self._create_port(context, share_server,
-                                           share_network, device_owner))
-
-        return ports
+        if allocation_count < 1:
+            return []
+        return self._create_ports(context, share_server, share_network,
+                                  device_owner, allocation_count)
 
     def deallocate_network(self, context, share_server_id):
         """Deallocate neutron network resources for the given share server.
@@ -74,23 +76,32 @@ class NeutronNetworkPlugin(network.NetworkBaseAPI):
         ports = self.db.network_allocations_get_for_share_server(
             context, share_server_id)
 
-        for port in ports:
-            self._delete_port(context, port)
-
-    def _create_port(self, context, share_server, share_network, device_owner):
-        port = self.neutron_api.create_port(
+        # NOTE: neutron has no bulk port deletion, so only the DB records
+        # of the deleted ports are removed at once.
+        deleted = []
+        try:
+            for port in ports:
+                self._delete_port(context, port)
+                deleted.append(port['id'])
+        finally:
+            self.db.network_allocations_delete(context, deleted)
+
+    def _create_ports(self, context, share_server, share_network,
+                      device_owner, count):
+        ports = self.neutron_api.create_ports(
             share_network['project_id'],
-            network_id=share_network['neutron_net_id'],
+            share_network['neutron_net_id'],
+            count,
             subnet_id=share_network['neutron_subnet_id'],
             device_owner='manila:' + device_owner)
-        port_dict = {
+        port_dicts = [{
             'id': port['id'],
             'share_server_id': share_server['id'],
             'ip_address': port['fixed_ips'][0]['ip_address'],
             'mac_address': port['mac_address'],
             'status': constants.STATUS_ACTIVE,
-        }
-        return self.db.network_allocation_create(context, port_dict)
+        } for port in ports]
+        return self.db.network_allocations_create(context, port_dicts)
 
     def _delete_port(self, context, port):
         try:
@@ -99,35 +110,37 @@ class NeutronNetworkPlugin(network.NetworkBaseAPI):
             self.db.network_allocation_update(
                 context, port['id'], {'status': constants.STATUS_ERROR})
             raise
-        else:
-            self.db.network_allocation_delete(context, port['id'])
 
     def _has_provider_network_extension(self):
-        extentions = self.neutron_api.list_extensions()
-        return neutron_constants.PROVIDER_NW_EXT in extentions
+        return self.neutron_api.has_extension(
+            neutron_constants.PROVIDER_NW_EXT)
 
-    def _save_neutron_network_data(self, context, share_network):
-        net_info = self.neutron_api.get_network(
-            share_network['neutron_net_id'])
+    def _update_share_network(self, context, share_network, values):
+        if any(share_network.get(key) != value
+               for key, value in values.items()):
+            self.db.share_network_update(context, share_network['id'],
+                                         values)
 
-        provider_nw_dict = {
-            'network_type': net_info['provider:network_type'],
-            'segmentation_id': net_info['provider:segmentation_id']
-        }
+    def _save_neutron_network_data(self, context, share_network):
+        net_id = share_network['neutron_net_id']
+        if net_id not in self._network_data:
+            net_info = self.neutron_api.get_network(net_id)
+            self._network_data[net_id] = {
+                'network_type': net_info['provider:network_type'],
+                'segmentation_id': net_info['provider:segmentation_id']
+            }
 
-        self.db.share_network_update(context,
-                                     share_network['id'],
-                                     provider_nw_dict)
+        self._update_share_network(context, share_network,
+                                   self._network_data[net_id])
 
     def _save_neutron_subnet_data(self, context, share_network):
-        subnet_info = self.neutron_api.get_subnet(
-            share_network['neutron_subnet_id'])
-
-        subnet_values = {
-            'cidr': subnet_info['cidr'],
-            'ip_version': subnet_info['ip_version']
-        }
-
-        self.db.share_network_update(context,
-                                     share_network['id'],
-                                     subnet_values)
+        subnet_id = share_network['neutron_subnet_id']
+        if subnet_id not in self._subnet_data:
+            subnet_info = self.neutron_api.get_subnet(subnet_id)
+            self._subnet_data[subnet_id] = {
+                'cidr': subnet_info['cidr'],
+                'ip_version': subnet_info['ip_version']
+            }
+
+        self._update_share_network(context, share_network,
+                                   self._subnet_data[subnet_id])
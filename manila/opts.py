@@ -29,14 +29,18 @@ import manila.compute.nova
 import manila.db.api
 import manila.db.base
 import manila.exception
+import manila.instrumentation
+import manila.locks
 import manila.network
 import manila.network.linux.interface
+import manila.network.linux.ip_lib
 import manila.network.neutron.api
 import manila.openstack.common.eventlet_backdoor
 import manila.openstack.common.lockutils
 import manila.openstack.common.log
 import manila.openstack.common.policy
 import manila.openstack.common.sslutils
+import manila.policy
 import manila.quota
 import manila.scheduler.driver
 import manila.scheduler.host_manager
@@ -54,6 +58,7 @@ import manila.share.drivers.glusterfs
 import manila.share.drivers.glusterfs_native
 import manila.share.drivers.netapp.cluster_mode
 import manila.share.drivers.service_instance
+import manila.share.executor
 import manila.share.manager
 import manila.volume
 import manila.volume.cinder
@@ -73,7 +78,10 @@ _global_opt_lists = [
     manila.db.api.db_opts,
     [manila.db.base.db_driver_opt],
     manila.exception.exc_log_opts,
+    manila.instrumentation.instrumentation_opts,
+    manila.locks.lock_opts,
     manila.network.linux.interface.OPTS,
+    manila.network.linux.ip_lib.OPTS,
     manila.network.network_opts,
     manila.network.neutron.api.neutron_opts,
     manila.openstack.common.eventlet_backdoor.eventlet_backdoor_opts,
@@ -83,6 +91,7 @@ _global_opt_lists = [
     manila.openstack.common.log.log_opts,
     manila.openstack.common.log.logging_cli_opts,
     manila.openstack.common.policy.policy_opts,
+    manila.policy.policy_opts,
     manila.quota.quota_opts,
     manila.scheduler.driver.scheduler_driver_opts,
     manila.scheduler.host_manager.host_manager_opts,
@@ -106,6 +115,7 @@ _global_opt_lists = [
     manila.share.drivers.netapp.cluster_mode.NETAPP_NAS_OPTS,
     manila.share.drivers.service_instance.server_opts,
     manila.share.drivers.zfssa.zfssashare.ZFSSA_OPTS,
+    manila.share.executor.share_executor_opts,
     manila.share.manager.share_manager_opts,
     manila.volume._volume_opts,
     manila.volume.cinder.cinder_opts,
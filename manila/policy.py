@@ -15,13 +15,250 @@
 
 """Policy Engine For Manila"""
 
+import ast
 import functools
+import re
+import time
+
+from oslo.config import cfg
+import six
 
 from manila import exception
+from manila import instrumentation
 from manila.openstack.common import policy
 
+policy_opts = [
+    cfg.IntOpt('policy_reload_interval',
+               default=5,
+               help='Number of seconds between checks of the policy file '
+                    'and policy directories for changes. Set to 0 to check '
+                    'on every policy enforcement.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(policy_opts)
+
 _ENFORCER = None
 
+# Upper bound of decisions memoized per request context.
+_MEMO_SIZE = 256
+
+_TARGET_KEY_RX = re.compile(r'%\(([^)]+)\)s')
+_MISSING = object()
+
+
+class CompiledRule(object):
+    """A rule compiled into a Python closure.
+
+    :param func: callable(target, creds) returning the decision.
+    :param target_keys: target keys the decision depends on, or None if
+                        it may depend on the whole target.
+    :param creds_keys: credential keys the decision depends on, or None
+                       if it may depend on all the credentials.
+    """
+
+    def __init__(self, func, target_keys=frozenset(), creds_keys=frozenset()):
+        self.func = func
+        self.target_keys = target_keys
+        self.creds_keys = creds_keys
+
+    def __call__(self, target, creds):
+        return self.func(target, creds)
+
+
+def _union_keys(rules, attr):
+    keys = set()
+    for rule in rules:
+        rule_keys = getattr(rule, attr)
+        if rule_keys is None:
+            return None
+        keys.update(rule_keys)
+    return frozenset(keys)
+
+
+class Enforcer(policy.Enforcer):
+    """Policy enforcer evaluating rules compiled to closures.
+
+    Rules are compiled on first use and recompiled only after the rule set
+    changes.  Rules loaded from the policy file and directories are checked
+    for changes every policy_reload_interval seconds instead of on every
+    check.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.generation = 0
+        self._compiled = {}
+        self._next_load = 0
+        self._loading = False
+        super(Enforcer, self).__init__(*args, **kwargs)
+        self._watch_files = self.use_conf
+
+    def set_rules(self, rules, overwrite=True, use_conf=False):
+        super(Enforcer, self).set_rules(rules, overwrite=overwrite,
+                                        use_conf=use_conf)
+        # Rules set by the caller must not be replaced by the file ones.
+        self._watch_files = use_conf or self._loading
+        self.generation += 1
+        self._compiled = {}
+
+    def load_rules(self, force_reload=False):
+        now = time.time()
+        if not force_reload and now < self._next_load:
+            return
+        self._next_load = now + CONF.policy_reload_interval
+        self.use_conf = self.use_conf or self._watch_files
+        self._loading = True
+        try:
+            super(Enforcer, self).load_rules(force_reload)
+        finally:
+            self._loading = False
+
+    def compile(self, rule):
+        """Return the CompiledRule for the rule name, None if undefined."""
+        compiled = self._compiled.get(rule)
+        if compiled is None:
+            try:
+                check = self.rules[rule]
+            except KeyError:
+                return None
+            # Guard against rules referencing themselves while compiling.
+            self._compiled[rule] = CompiledRule(
+                lambda target, creds: check(target, creds, self), None, None)
+            compiled = self._compile_check(check)
+            self._compiled[rule] = compiled
+        return compiled
+
+    def _compile_check(self, check):
+        if isinstance(check, policy.TrueCheck):
+            return CompiledRule(lambda target, creds: True)
+        if isinstance(check, policy.FalseCheck):
+            return CompiledRule(lambda target, creds: False)
+        if isinstance(check, policy.NotCheck):
+            inner = self._compile_check(check.rule)
+            return CompiledRule(lambda target, creds: not inner(target, creds),
+                                inner.target_keys, inner.creds_keys)
+        if isinstance(check, (policy.AndCheck, policy.OrCheck)):
+            rules = [self._compile_check(r) for r in check.rules]
+            funcs = tuple(r.func for r in rules)
+            if isinstance(check, policy.AndCheck):
+                def func(target, creds):
+                    for f in funcs:
+                        if not f(target, creds):
+                            return False
+                    return True
+            else:
+                def func(target, creds):
+                    for f in funcs:
+                        if f(target, creds):
+                            return True
+                    return False
+            return CompiledRule(func, _union_keys(rules, 'target_keys'),
+                                _union_keys(rules, 'creds_keys'))
+        # Subclasses of the checks below may override __call__, so only the
+        # exact types are compiled.
+        if type(check) is policy.RuleCheck:
+            compiled = self.compile(check.match)
+            if compiled is None:
+                return CompiledRule(lambda target, creds: False)
+            return compiled
+        if type(check) is policy.RoleCheck:
+            role = check.match.lower()
+            return CompiledRule(
+                lambda target, creds: role in [x.lower()
+                                               for x in creds['roles']],
+                creds_keys=frozenset(['roles']))
+        if type(check) is policy.GenericCheck:
+            return self._compile_generic_check(check)
+        return CompiledRule(lambda target, creds: check(target, creds, self),
+                            None, None)
+
+    def _compile_generic_check(self, check):
+        template = check.match
+        if '%' in template:
+            target_keys = frozenset(_TARGET_KEY_RX.findall(template))
+            if not target_keys:
+                target_keys = None
+        else:
+            target_keys = frozenset()
+        try:
+            leftval = six.text_type(ast.literal_eval(check.kind))
+            kind_parts = None
+            creds_keys = frozenset()
+        except ValueError:
+            leftval = None
+            kind_parts = check.kind.split('.')
+            creds_keys = frozenset([kind_parts[0]])
+        except Exception:
+            # Let the check itself fail the same way on every call.
+            return CompiledRule(
+                lambda target, creds: check(target, creds, self), None, None)
+
+        def func(target, creds):
+            try:
+                match = template % target if target_keys != frozenset() \
+                    else template
+            except KeyError:
+                return False
+            if kind_parts is None:
+                return match == leftval
+            value = creds
+            try:
+                for kind_part in kind_parts:
+                    value = value[kind_part]
+            except KeyError:
+                return False
+            return match == six.text_type(value)
+        return CompiledRule(func, target_keys, creds_keys)
+
+    def enforce(self, rule, target, creds, do_raise=False,
+                exc=None, *args, **kwargs):
+        if isinstance(rule, policy.BaseCheck):
+            return super(Enforcer, self).enforce(rule, target, creds,
+                                                 do_raise, exc,
+                                                 *args, **kwargs)
+        self.load_rules()
+        result = self.decide(rule, target, creds)
+        if do_raise and not result:
+            if exc:
+                raise exc(*args, **kwargs)
+            raise policy.PolicyNotAuthorized(rule)
+        return result
+
+    def decide(self, rule, target, creds):
+        """Evaluate the rule name without reloading rules or raising."""
+        if not self.rules:
+            # No rules to reference means we're going to fail closed
+            return False
+        compiled = self.compile(rule)
+        if compiled is None:
+            return False
+        return compiled(target, creds)
+
+    def decision_key(self, rule, target, context):
+        """Return the memo key of a decision for a request context.
+
+        The key only covers the target and credentials items the rule
+        depends on.  None is returned when the decision cannot be memoized.
+        """
+        compiled = self.compile(rule)
+        if (compiled is None or compiled.target_keys is None or
+                compiled.creds_keys is None):
+            return None
+        try:
+            target_values = tuple(target.get(k, _MISSING)
+                                  for k in sorted(compiled.target_keys))
+            creds_values = []
+            for k in sorted(compiled.creds_keys):
+                value = getattr(context, k, _MISSING)
+                if isinstance(value, list):
+                    value = tuple(value)
+                creds_values.append(value)
+            key = (self.generation, rule, target_values, tuple(creds_values))
+            hash(key)
+        except (AttributeError, TypeError):
+            return None
+        return key
+
 
 def reset():
     global _ENFORCER
@@ -33,7 +270,7 @@ def reset():
 def init(policy_path=None):
     global _ENFORCER
     if not _ENFORCER:
-        _ENFORCER = policy.Enforcer()
+        _ENFORCER = Enforcer()
         if policy_path:
             _ENFORCER.policy_path = policy_path
     _ENFORCER.load_rules()
@@ -55,17 +292,28 @@ def enforce(context, action, target, do_raise=True):
 
        :raises manila.exception.PolicyNotAuthorized: if verification fails.
 
+    Decisions are memoized on the request context, so repeated checks of
+    the same action within a request are only evaluated once.
     """
     init()
-    if not isinstance(context, dict):
-        context = context.to_dict()
-
-    # Add the exception arguments if asked to do a raise
-    extra = {}
-    if do_raise:
-        extra.update(exc=exception.PolicyNotAuthorized, action=action,
-                     do_raise=do_raise)
-    return _ENFORCER.enforce(action, target, context, **extra)
+    with instrumentation.timed('policy'):
+        if isinstance(context, dict):
+            result = _ENFORCER.decide(action, target, context)
+        else:
+            key = _ENFORCER.decision_key(action, target, context)
+            memo = context.__dict__.setdefault('_policy_memo', {})
+            if key is not None and key in memo:
+                result = memo[key]
+            else:
+                result = _ENFORCER.decide(action, target, context.to_dict())
+                if key is not None:
+                    if len(memo) >= _MEMO_SIZE:
+                        memo.clear()
+                    memo[key] = result
+
+    if do_raise and not result:
+        raise exception.PolicyNotAuthorized(action=action)
+    return result
 
 
 def check_is_admin(roles):
@@ -32,6 +32,7 @@ from oslo.serialization import jsonutils
 
 import manila.context
 import manila.exception
+from manila import instrumentation
 
 CONF = cfg.CONF
 TRANSPORT = None
@@ -129,10 +130,11 @@ def get_transport_url(url_str=None):
 def get_client(target, version_cap=None, serializer=None):
     assert TRANSPORT is not None
     serializer = RequestContextSerializer(serializer)
-    return messaging.RPCClient(TRANSPORT,
-                               target,
-                               version_cap=version_cap,
-                               serializer=serializer)
+    client = messaging.RPCClient(TRANSPORT,
+                                 target,
+                                 version_cap=version_cap,
+                                 serializer=serializer)
+    return instrumentation.instrument_rpc_client(client)
 
 
 def get_server(target, endpoints, serializer=None):
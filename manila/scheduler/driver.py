@@ -73,6 +73,14 @@ class Scheduler(object):
                                                       host,
                                                       capabilities)
 
+    def apply_service_capabilities_update(self, service_name, host, version,
+                                          capabilities, base_version=None,
+                                          removed=None):
+        """Process a versioned capability update from a service node."""
+        return self.host_manager.apply_service_capabilities_update(
+            service_name, host, version, capabilities,
+            base_version=base_version, removed=removed)
+
     def hosts_up(self, context, topic):
         """Return the list of hosts that have a running service for topic."""
 
@@ -44,11 +44,19 @@ host_manager_opts = [
                 default=[
                     'CapacityWeigher'
                 ],
-                help='Which weigher class names to use for weighing hosts.')
+                help='Which weigher class names to use for weighing hosts.'),
+    cfg.BoolOpt('scheduler_liveness_from_capabilities',
+                default=False,
+                help='Consider a share service up while its capabilities '
+                     'have been received within service_down_time, instead '
+                     'of checking the heartbeat it writes to the database. '
+                     'The periodic_interval of the share services must '
+                     'then be well below service_down_time.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(host_manager_opts)
+CONF.import_opt('service_down_time', 'manila.common.config')
 
 LOG = logging.getLogger(__name__)
 
@@ -154,6 +162,7 @@ class HostManager(object):
 
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
+        self.capability_versions = {}  # { <host>: <version> }
         self.host_state_map = {}
         self.filter_handler = filters.HostFilterHandler('manila.scheduler.'
                                                         'filters')
@@ -250,6 +259,62 @@ class HostManager(object):
         capab_copy = dict(capabilities)
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[host] = capab_copy
+        self.capability_versions.pop(host, None)
+
+    def apply_service_capabilities_update(self, service_name, host, version,
+                                          capabilities, base_version=None,
+                                          removed=None):
+        """Apply a versioned capability update of a service.
+
+        Updates without a base version hold all the capabilities of the
+        service.  The others only hold the capabilities which changed
+        since base_version, and are applied in place to the capabilities
+        the host state of the service shares.
+
+        :returns: False if the update is a delta against a version this
+                  scheduler does not have, so a full update is needed.
+        """
+        if base_version is None:
+            self.update_service_capabilities(service_name, host,
+                                             capabilities)
+            if host in self.service_states:
+                self.capability_versions[host] = version
+            return True
+
+        if service_name not in ('share'):
+            return True
+        if (host not in self.service_states or
+                self.capability_versions.get(host) != base_version):
+            LOG.debug("Ignoring capability delta from %(host)s against "
+                      "version %(base)s.", {'host': host,
+                                            'base': base_version})
+            return False
+
+        capab = self.service_states[host]
+        capab.update(capabilities)
+        for key in removed or []:
+            capab.pop(key, None)
+        capab["timestamp"] = timeutils.utcnow()
+        self.capability_versions[host] = version
+        host_state = self.host_state_map.get(host)
+        if host_state and capabilities:
+            host_state.update_from_share_capability(capab)
+        return True
+
+    def _service_is_up(self, service):
+        """Check whether a share service is up.
+
+        With scheduler_liveness_from_capabilities, the time the service last
+        reported its capabilities stands for its heartbeat.
+        """
+        if not CONF.scheduler_liveness_from_capabilities:
+            return utils.service_is_up(service)
+        capabilities = self.service_states.get(service['host'])
+        if not capabilities:
+            return False
+        elapsed = timeutils.total_seconds(
+            timeutils.utcnow() - capabilities['timestamp'])
+        return elapsed <= CONF.service_down_time
 
     def get_all_host_states_share(self, context):
         """Get all hosts and their states.
@@ -266,7 +331,7 @@ class HostManager(object):
         topic = CONF.share_topic
         share_services = db.service_get_all_by_topic(context, topic)
         for service in share_services:
-            if not utils.service_is_up(service) or service['disabled']:
+            if not self._service_is_up(service) or service['disabled']:
                 LOG.warn(_LW("service is down or disabled."))
                 continue
             host = service['host']
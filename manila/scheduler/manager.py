@@ -20,6 +20,7 @@ Scheduler Service
 """
 
 from oslo.config import cfg
+from oslo import messaging
 from oslo.utils import excutils
 from oslo.utils import importutils
 
@@ -46,6 +47,10 @@ CONF.register_opt(scheduler_driver_opt)
 class SchedulerManager(manager.Manager):
     """Chooses a host to create shares."""
 
+    RPC_API_VERSION = '1.1'
+
+    target = messaging.Target(version=RPC_API_VERSION)
+
     def __init__(self, scheduler_driver=None, service_name=None,
                  *args, **kwargs):
         if not scheduler_driver:
@@ -74,6 +79,19 @@ class SchedulerManager(manager.Manager):
                                                 host,
                                                 capabilities)
 
+    def update_service_capabilities_batch(self, context, updates):
+        """Process the capability updates of the services of a process.
+
+        A full update is requested from the services whose updates are
+        deltas against capabilities this scheduler does not have.
+        """
+        for update in updates:
+            if not self.driver.apply_service_capabilities_update(**update):
+                LOG.debug('Requesting all capabilities of %s.',
+                          update['host'])
+                share_rpcapi.ShareAPI().publish_service_capabilities(
+                    context, host=update['host'])
+
     def create_share(self, context, topic, share_id, snapshot_id=None,
                      request_spec=None, filter_properties=None):
         try:
@@ -49,6 +49,18 @@ service_opts = [
     cfg.IntOpt('report_interval',
                default=10,
                help='Seconds between nodes reporting state to datastore.'),
+    cfg.BoolOpt('batch_report_state',
+                default=False,
+                help='Report the state of all services running in one '
+                     'process, like the backends of manila-all, with a '
+                     'single database update per report_interval.'),
+    cfg.BoolOpt('publish_capability_deltas',
+                default=False,
+                help='Publish only the capabilities that changed since the '
+                     'last update, with those of all services running in '
+                     'one process sent to the schedulers in a single '
+                     'message per periodic_interval. Needs schedulers '
+                     'supporting version 1.1 of the scheduler RPC API.'),
     cfg.IntOpt('periodic_interval',
                default=60,
                help='Seconds between running periodic tasks.'),
@@ -62,7 +74,21 @@ service_opts = [
                help='IP address for OpenStack Share API to listen on.'),
     cfg.IntOpt('osapi_share_listen_port',
                default=8786,
-               help='Port for OpenStack Share API to listen on.'), ]
+               help='Port for OpenStack Share API to listen on.'),
+    cfg.IntOpt('osapi_share_workers',
+               default=1,
+               help='Number of worker processes for OpenStack Share API. '
+                    'Each worker has its own database connection pool.'),
+    cfg.BoolOpt('osapi_share_reuse_port',
+                default=False,
+                help='Let every OpenStack Share API worker bind its own '
+                     'socket with SO_REUSEPORT, so the kernel balances new '
+                     'connections between them, instead of sharing a '
+                     'single socket bound by the parent process.'),
+    cfg.IntOpt('graceful_shutdown_timeout',
+               default=60,
+               help='Seconds a worker process waits for requests in flight '
+                    'to finish when it is reloaded with SIGHUP.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(service_opts)
@@ -158,14 +184,17 @@ class ProcessLauncher(object):
 
         signal.signal(signal.SIGTERM, self._handle_signal)
         signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGHUP, self._handle_signal)
 
     def _handle_signal(self, signo, frame):
         self.sigcaught = signo
         self.running = False
 
-        # Allow the process to be killed again and die from natural causes
-        signal.signal(signal.SIGTERM, signal.SIG_DFL)
-        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if signo != signal.SIGHUP:
+            # Allow the process to be killed again and die from natural
+            # causes
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
 
     def _pipe_watcher(self):
         # This will block until the write end is closed when the parent
@@ -189,6 +218,12 @@ class ProcessLauncher(object):
         # It allows the non-wsgi services to be terminated properly
         signal.signal(signal.SIGINT, _sigterm)
 
+        def _sighup(*args):
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            raise SignalExit(signal.SIGHUP, exccode=0)
+
+        signal.signal(signal.SIGHUP, _sighup)
+
         # Reopen the eventlet hub to make sure we don't share an epoll
         # fd with parent and/or siblings, which would be bad
         eventlet.hubs.use_hub()
@@ -218,19 +253,26 @@ class ProcessLauncher(object):
 
         wrap.forktimes.append(time.time())
 
+        # NOTE: connections pooled by the parent must not be shared with
+        # the children, every worker opens its own pool after the fork.
+        db.dispose_engine()
+
         pid = os.fork()
         if pid == 0:
             # NOTE(johannes): All exceptions are caught to ensure this
             # doesn't fallback into the loop spawning children. It would
             # be bad for a child to spawn more children.
             status = 0
+            graceful = False
             try:
                 self._child_process(wrap.server)
             except SignalExit as exc:
                 signame = {signal.SIGTERM: 'SIGTERM',
-                           signal.SIGINT: 'SIGINT'}[exc.signo]
+                           signal.SIGINT: 'SIGINT',
+                           signal.SIGHUP: 'SIGHUP'}[exc.signo]
                 LOG.info(_LI('Caught %s, exiting'), signame)
                 status = exc.code
+                graceful = exc.signo == signal.SIGHUP
             except SystemExit as exc:
                 status = exc.code
             except BaseException:
@@ -239,6 +281,8 @@ class ProcessLauncher(object):
             finally:
                 wrap.server.stop()
 
+            if graceful:
+                self._drain(wrap.server)
             os._exit(status)
 
         LOG.info(_LI('Started child %d'), pid)
@@ -248,8 +292,17 @@ class ProcessLauncher(object):
 
         return pid
 
+    @staticmethod
+    def _drain(server):
+        """Let requests in flight finish before a reloaded worker exits."""
+        with eventlet.Timeout(CONF.graceful_shutdown_timeout, False):
+            server.wait()
+
     def launch_server(self, server, workers=1):
         wrap = ServerWrapper(server, workers)
+        if hasattr(server, 'listen'):
+            # Bind before forking, so all of the workers share one socket.
+            server.listen()
         self.totalwrap = self.totalwrap + 1
         LOG.info(_LI('Starting %d workers'), wrap.workers)
         while (self.running and len(wrap.children) < wrap.workers
@@ -291,8 +344,7 @@ class ProcessLauncher(object):
                 self.running = False
         return wrap
 
-    def wait(self):
-        """Loop waiting on children to die and respawning as necessary."""
+    def _respawn_children(self):
         while self.running:
             wrap = self._wait_child()
             if not wrap:
@@ -307,6 +359,39 @@ class ProcessLauncher(object):
                    and not wrap.failed):
                 self._start_child(wrap)
 
+    def reload(self):
+        """Reload configuration and replace every child with a new one.
+
+        The replacements are forked before the old children are told to
+        exit, and the old children finish the requests they are serving,
+        so the listening socket is never left without a worker.
+        """
+        LOG.info(_LI('Caught SIGHUP, reloading children'))
+        CONF.reload_config_files()
+        old_children = list(self.children)
+        wraps = set(self.children.values())
+        for wrap in wraps:
+            if hasattr(wrap.server, 'reset'):
+                wrap.server.reset()
+            for _i in range(wrap.workers):
+                self._start_child(wrap)
+        for pid in old_children:
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except OSError as exc:
+                if exc.errno != errno.ESRCH:
+                    raise
+
+    def wait(self):
+        """Loop waiting on children to die and respawning as necessary."""
+        while True:
+            self._respawn_children()
+            if self.sigcaught != signal.SIGHUP:
+                break
+            self.sigcaught = None
+            self.running = True
+            self.reload()
+
         if self.sigcaught:
             signame = {signal.SIGTERM: 'SIGTERM',
                        signal.SIGINT: 'SIGINT'}[self.sigcaught]
@@ -377,7 +462,12 @@ class Service(object):
         self.rpcserver.start()
 
         self.manager.init_host()
-        if self.report_interval:
+        if (CONF.publish_capability_deltas and self.periodic_interval and
+                hasattr(self.manager, 'capabilities_update')):
+            _CAPABILITY_PUBLISHER.add(self)
+        if self.report_interval and CONF.batch_report_state:
+            _STATE_REPORTER.add(self)
+        elif self.report_interval:
             pulse = loopingcall.FixedIntervalLoopingCall(self.report_state)
             pulse.start(interval=self.report_interval,
                         initial_delay=self.report_interval)
@@ -462,6 +552,8 @@ class Service(object):
             self.rpcserver.stop()
         except Exception:
             pass
+        _STATE_REPORTER.remove(self)
+        _CAPABILITY_PUBLISHER.remove(self)
         for x in self.timers:
             try:
                 x.stop()
@@ -483,35 +575,122 @@ class Service(object):
 
     def report_state(self):
         """Update the state of this service in the datastore."""
-        ctxt = context.get_admin_context()
-        zone = CONF.storage_availability_zone
-        state_catalog = {}
-        try:
-            try:
-                service_ref = db.service_get(ctxt, self.service_id)
-            except exception.NotFound:
-                LOG.debug('The service database object disappeared, '
-                          'Recreating it.')
-                self._create_service_ref(ctxt)
-                service_ref = db.service_get(ctxt, self.service_id)
+        _report_state(self)
 
-            state_catalog['report_count'] = service_ref['report_count'] + 1
-            if zone != service_ref['availability_zone']:
-                state_catalog['availability_zone'] = zone
 
-            db.service_update(ctxt,
-                              self.service_id, state_catalog)
+def _report_state(*services):
+    """Update the state of the services in the datastore at once.
+
+    The report count is bumped in place, so a report is a single UPDATE
+    statement whatever the number of services.
+    """
+    ctxt = context.get_admin_context()
+    try:
+        missing = db.service_heartbeat(
+            ctxt, [serv.service_id for serv in services],
+            CONF.storage_availability_zone)
+        for serv in services:
+            if serv.service_id in missing:
+                LOG.debug('The service database object disappeared, '
+                          'Recreating it.')
+                serv._create_service_ref(ctxt)
 
             # TODO(termie): make this pattern be more elegant.
-            if getattr(self, 'model_disconnected', False):
-                self.model_disconnected = False
+            if getattr(serv, 'model_disconnected', False):
+                serv.model_disconnected = False
                 LOG.error(_LE('Recovered model server connection!'))
 
-        # TODO(vish): this should probably only catch connection errors
-        except Exception:  # pylint: disable=W0702
-            if not getattr(self, 'model_disconnected', False):
-                self.model_disconnected = True
-                LOG.exception(_LE('model server went away'))
+    # TODO(vish): this should probably only catch connection errors
+    except Exception:  # pylint: disable=W0702
+        disconnected = [serv for serv in services
+                        if not getattr(serv, 'model_disconnected', False)]
+        for serv in disconnected:
+            serv.model_disconnected = True
+        if disconnected:
+            LOG.exception(_LE('model server went away'))
+
+
+class StateReporter(object):
+    """Reports the state of the services of this process together.
+
+    Reports run every report_interval of the first service added.
+    """
+
+    def __init__(self):
+        self.services = []
+        self.timer = None
+
+    def add(self, service):
+        self.services.append(service)
+        if self.timer is None:
+            self.timer = loopingcall.FixedIntervalLoopingCall(
+                self.report_state)
+            self.timer.start(interval=service.report_interval,
+                             initial_delay=service.report_interval)
+
+    def remove(self, service):
+        if service not in self.services:
+            return
+        self.services.remove(service)
+        if not self.services:
+            self.timer.stop()
+            self.timer = None
+
+    def report_state(self):
+        if self.services:
+            _report_state(*self.services)
+
+
+_STATE_REPORTER = StateReporter()
+
+
+class CapabilityPublisher(object):
+    """Publishes the capabilities of the services of this process together.
+
+    The capability updates of all the services added are cast to the
+    schedulers in one message every periodic_interval of the first service
+    added.
+    """
+
+    def __init__(self):
+        self.services = []
+        self.timer = None
+
+    def add(self, service):
+        self.services.append(service)
+        if self.timer is None:
+            self.timer = loopingcall.FixedIntervalLoopingCall(self.publish)
+            self.timer.start(interval=service.periodic_interval,
+                             initial_delay=service.periodic_interval)
+
+    def remove(self, service):
+        if service not in self.services:
+            return
+        self.services.remove(service)
+        if not self.services:
+            self.timer.stop()
+            self.timer = None
+
+    def publish(self):
+        updates = []
+        for serv in self.services:
+            update = serv.manager.capabilities_update()
+            if update:
+                updates.append(update)
+        if not updates:
+            return
+        LOG.debug('Notifying schedulers of the capabilities of %d '
+                  'services ...', len(updates))
+        try:
+            self.services[0].manager.scheduler_rpcapi.\
+                update_service_capabilities_batch(
+                    context.get_admin_context(), updates)
+        except Exception:
+            # The schedulers ask for full updates when they miss deltas.
+            LOG.exception(_LE('Failed to publish service capabilities.'))
+
+
+_CAPABILITY_PUBLISHER = CapabilityPublisher()
 
 
 class WSGIService(object):
@@ -533,10 +712,13 @@ class WSGIService(object):
         self.app = self.loader.load_app(name)
         self.host = getattr(CONF, '%s_listen' % name, "0.0.0.0")
         self.port = getattr(CONF, '%s_listen_port' % name, 0)
+        self.workers = getattr(CONF, '%s_workers' % name, None) or 1
+        self.reuse_port = getattr(CONF, '%s_reuse_port' % name, False)
         self.server = wsgi.Server(name,
                                   self.app,
                                   host=self.host,
-                                  port=self.port)
+                                  port=self.port,
+                                  reuse_port=self.reuse_port)
 
     def _get_manager(self):
         """Initialize a Manager object appropriate for this service.
@@ -573,6 +755,29 @@ class WSGIService(object):
         self.server.start()
         self.port = self.server.port
 
+    def listen(self):
+        """Bind the listening socket ahead of forking the workers.
+
+        Nothing is bound when every worker binds its own socket with
+        SO_REUSEPORT.
+
+        :returns: None
+
+        """
+        if self.reuse_port:
+            return
+        self.server.listen()
+        self.port = self.server.port
+
+    def reset(self):
+        """Reload the WSGI application for the workers started next.
+
+        :returns: None
+
+        """
+        self.app = self.loader.load_app(self.name)
+        self.server.app = self.app
+
     def stop(self):
         """Stop serving this API.
 
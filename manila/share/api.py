@@ -380,14 +380,14 @@ class API(base.Base):
         if 'share_server_id' in search_opts:
             # NOTE(vponomaryov): this is project_id independent
             policy.check_policy(context, 'share', 'list_by_share_server_id')
-            shares = self.db.share_get_all_by_share_server(
-                context, search_opts.pop('share_server_id'), filters=filters,
-                sort_key=sort_key, sort_dir=sort_dir)
+            shares = self.db.share_view_get_all(
+                context, share_server_id=search_opts.pop('share_server_id'),
+                filters=filters, sort_key=sort_key, sort_dir=sort_dir)
         elif (context.is_admin and 'all_tenants' in search_opts):
-            shares = self.db.share_get_all(
+            shares = self.db.share_view_get_all(
                 context, filters=filters, sort_key=sort_key, sort_dir=sort_dir)
         else:
-            shares = self.db.share_get_all_by_project(
+            shares = self.db.share_view_get_all(
                 context, project_id=context.project_id, filters=filters,
                 sort_key=sort_key, sort_dir=sort_dir)
 
@@ -427,12 +427,12 @@ class API(base.Base):
                 raise exception.InvalidInput(reason=msg)
 
         if (context.is_admin and all_tenants):
-            snapshots = self.db.share_snapshot_get_all(
+            snapshots = self.db.share_snapshot_view_get_all(
                 context, filters=search_opts,
                 sort_key=sort_key, sort_dir=sort_dir)
         else:
-            snapshots = self.db.share_snapshot_get_all_by_project(
-                context, context.project_id, filters=search_opts,
+            snapshots = self.db.share_snapshot_view_get_all(
+                context, project_id=context.project_id, filters=search_opts,
                 sort_key=sort_key, sort_dir=sort_dir)
 
         # Remove key 'usage' if provided
@@ -105,6 +105,14 @@ ganesha_opts = [
     cfg.StrOpt('ganesha_export_template_dir',
                default='/etc/manila/ganesha-export-templ.d',
                help='Path to Ganesha export template. (Ganesha module only.)'),
+    cfg.BoolOpt('ganesha_local',
+                default=False,
+                help='Whether Ganesha runs on the Manila host. If so, the '
+                     'export files and the export id database are written '
+                     'directly by the share service, which then needs '
+                     'write access to ganesha_export_dir and to the '
+                     'directory of ganesha_db_path, instead of through '
+                     'root commands. (Ganesha module only.)'),
 ]
 
 CONF = cfg.CONF
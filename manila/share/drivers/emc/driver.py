@@ -54,6 +54,19 @@ EMC_NAS_OPTS = [
     cfg.StrOpt('emc_nas_pool_name',
                default=None,
                help='EMC pool name.'),
+    cfg.FloatOpt('emc_nas_xml_api_log_sample_rate',
+                 default=1.0,
+                 help='Fraction of XML API requests whose request and '
+                      'response bodies are logged when debug logging is '
+                      'enabled.'),
+    cfg.IntOpt('emc_nas_xml_api_log_max_body',
+               default=2048,
+               help='Maximum number of characters of an XML API request '
+                    'or response body written to the log.'),
+    cfg.IntOpt('emc_nas_query_cache_ttl',
+               default=60,
+               help='Seconds to cache mover, VDM, CIFS server and storage '
+                    'pool query results. Set to 0 to disable caching.'),
 ]
 
 CONF = cfg.CONF
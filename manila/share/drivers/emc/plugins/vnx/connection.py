@@ -528,19 +528,23 @@ class VNXStorageConnection(driver.StorageConnection):
             allocated_interfaces = []
             device_port = self._get_device_port(moverRef)
 
+            # The interfaces are independent of each other, so create them
+            # concurrently rather than waiting for each task in turn.
+            tracker = helper.TaskTracker()
             for net_info in network_info['network_allocations']:
                 ip = net_info['ip_address']
                 if_name = 'if-' + net_info['id'][-12:]
                 if_info = {'ip': ip, 'if_name': if_name}
                 interface_info.append(if_info)
-                status, interface = self._XMLAPI_helper.create_mover_interface(
-                    if_name,
-                    device_port['name'],
-                    ip,
-                    moverRef['id'],
-                    netmask,
-                    vlan_id)
-
+                tracker.submit(self._XMLAPI_helper.create_mover_interface,
+                               if_name,
+                               device_port['name'],
+                               ip,
+                               moverRef['id'],
+                               netmask,
+                               vlan_id)
+
+            for status, interface in tracker.wait():
                 if constants.STATUS_OK != status:
                     message = (_('Interface creation failed. Reason: %s.')
                                % interface)
@@ -705,15 +709,13 @@ class VNXStorageConnection(driver.StorageConnection):
                                                            vdm_id)
 
         # Delete interface from Data Mover
-        if cifs_if:
-            self._XMLAPI_helper.delete_mover_interface(
-                cifs_if,
-                vdmRef['host_mover_id'])
-
-        if nfs_if:
-            self._XMLAPI_helper.delete_mover_interface(
-                nfs_if,
-                vdmRef['host_mover_id'])
+        tracker = helper.TaskTracker()
+        for interface in (cifs_if, nfs_if):
+            if interface:
+                tracker.submit(self._XMLAPI_helper.delete_mover_interface,
+                               interface,
+                               vdmRef['host_mover_id'])
+        tracker.wait()
 
         # Delete Virtual Data Mover
         self._XMLAPI_helper.delete_vdm(vdmRef['id'])
@@ -13,10 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import cookielib
+import copy
 import random
 import re
+import sys
 
+from eventlet import greenpool
 from eventlet import greenthread
+from oslo.config import cfg
+from oslo.utils import timeutils
 import six
 from six.moves.urllib import error as url_error  # pylint: disable=E0611
 from six.moves.urllib import request as url_request  # pylint: disable=E0611
@@ -32,9 +37,11 @@ from manila.share.drivers.emc.plugins.vnx import constants
 from manila.share.drivers.emc.plugins.vnx import utils as vnx_utils
 from manila.share.drivers.emc.plugins.vnx import xml_api_parser as parser
 from manila.share.drivers.emc.plugins.vnx import xml_api_schema as schema
+from manila.share.drivers.emc.plugins.vnx import xml_api_template as template
 from manila import utils
 
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -45,6 +52,8 @@ class XMLAPIConnector(object):
         self.user_name = configuration.emc_nas_login
         self.pass_word = configuration.emc_nas_password
         self.debug = debug
+        self.log_sample_rate = configuration.emc_nas_xml_api_log_sample_rate
+        self.log_max_body = configuration.emc_nas_xml_api_log_max_body
         self.auth_url = 'https://' + self.storage_ip + '/Login'
         self._url = ('https://' + self.storage_ip
                      + '/servlets/CelerraManagementServices')
@@ -62,12 +71,29 @@ class XMLAPIConnector(object):
                                   constants.CONTENT_TYPE_URLENCODE)
         resp = self.url_opener.open(req)
         resp_body = resp.read()
-        self._http_log_resp(resp, resp_body)
+        if self._should_log():
+            self._http_log_resp(resp, resp_body)
 
-    def _http_log_req(self, req):
-        if not self.debug:
-            return
+    def _should_log(self):
+        """Decide whether to dump the next request/response pair.
+
+        Nothing is formatted unless debug logging is on, and only a
+        sample of the requests is dumped to keep periodic tasks cheap.
+        """
+        if not self.debug or not CONF.debug:
+            return False
+        if self.log_sample_rate >= 1:
+            return True
+        return random.random() < self.log_sample_rate
+
+    def _truncate_body(self, body):
+        if not body or len(body) <= self.log_max_body:
+            return body
+        return ('%(body)s... (%(left)d more characters)' %
+                {'body': body[:self.log_max_body],
+                 'left': len(body) - self.log_max_body})
 
+    def _http_log_req(self, req):
         string_parts = ['curl -i']
         string_parts.append(' -X %s' % req.get_method())
 
@@ -76,14 +102,11 @@ class XMLAPIConnector(object):
             string_parts.append(header)
 
         if req.data:
-            string_parts.append(" -d '%s'" % (req.data))
+            string_parts.append(" -d '%s'" % self._truncate_body(req.data))
         string_parts.append(' ' + req.get_full_url())
         LOG.debug("\nREQ: %s\n", "".join(string_parts))
 
     def _http_log_resp(self, resp, body, failed_req=None):
-        if not self.debug and failed_req is None:
-            return
-
         headers = six.text_type(resp.headers).replace('\n', '\\n')
         if failed_req:
             LOG.error(
@@ -95,10 +118,10 @@ class XMLAPIConnector(object):
                     'method': failed_req.get_method(),
                     'url': failed_req.get_full_url(),
                     'req_hdrs': failed_req.headers,
-                    'req_b': failed_req.data,
+                    'req_b': self._truncate_body(failed_req.data),
                     'code': resp.getcode(),
                     'resp_hdrs': headers,
-                    'resp_b': body,
+                    'resp_b': self._truncate_body(body),
                 }
             )
         else:
@@ -108,7 +131,7 @@ class XMLAPIConnector(object):
                 {
                     'code': resp.getcode(),
                     'resp_hdrs': headers,
-                    'resp_b': body,
+                    'resp_b': self._truncate_body(body),
                 }
             )
 
@@ -117,11 +140,14 @@ class XMLAPIConnector(object):
         req = url_request.Request(self._url, req_body, header)
         if method not in (None, 'GET', 'POST'):
             req.get_method = lambda: method
-        self._http_log_req(req)
+        log_it = self._should_log()
+        if log_it:
+            self._http_log_req(req)
         try:
             resp = self.url_opener.open(req)
             resp_body = resp.read()
-            self._http_log_resp(resp, resp_body)
+            if log_it:
+                self._http_log_resp(resp, resp_body)
         except url_error.HTTPError as http_err:
             err = {'errorCode': -1,
                    'httpStatusCode': http_err.code,
@@ -149,14 +175,85 @@ class XMLAPIConnector(object):
         return resp_body
 
 
+class QueryCache(object):
+    """Cache of XML API query results.
+
+    Entries are grouped by object kind (mover, VDM, pool, ...) so that a
+    task changing objects of one kind drops everything cached for it.
+    A ttl of zero or less disables caching.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+
+    def get(self, kind, key=None):
+        if self.ttl <= 0:
+            return None
+        entry = self._entries.get(kind, {}).get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if timeutils.is_older_than(stored_at, self.ttl):
+            del self._entries[kind][key]
+            return None
+        return copy.deepcopy(value)
+
+    def set(self, kind, value, key=None):
+        if self.ttl <= 0:
+            return
+        self._entries.setdefault(kind, {})[key] = (copy.deepcopy(value),
+                                                   timeutils.utcnow())
+
+    def invalidate(self, *kinds):
+        for kind in kinds:
+            self._entries.pop(kind, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class TaskTracker(object):
+    """Run independent XML API tasks concurrently and collect results.
+
+    Each submitted call blocks on its own green thread, so outstanding
+    tasks overlap on the array instead of running back to back. Results
+    are returned in submission order.
+    """
+
+    def __init__(self, size=8):
+        self._pool = greenpool.GreenPool(size)
+        self._threads = []
+
+    def submit(self, func, *args, **kwargs):
+        self._threads.append(self._pool.spawn(func, *args, **kwargs))
+
+    def wait(self):
+        results = []
+        error = None
+        for thread in self._threads:
+            try:
+                results.append(thread.wait())
+            except Exception:
+                if error is None:
+                    error = sys.exc_info()
+        self._threads = []
+        if error is not None:
+            six.reraise(*error)
+        return results
+
+
 @vnx_utils.decorate_all_methods(vnx_utils.log_enter_exit,
                                 debug_only=True)
 class XMLAPIHelper(object):
     def __init__(self, configuration):
         super(XMLAPIHelper, self).__init__()
         self._conn = XMLAPIConnector(configuration)
-        self._xml_header = (
-            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>')
+        self._xml_header = constants.XML_HEADER
+        self._cache = QueryCache(configuration.emc_nas_query_cache_ttl)
+
+    def invalidate_cache(self):
+        self._cache.clear()
 
     def setup_connector(self):
         self._conn.do_setup()
@@ -246,34 +343,18 @@ class XMLAPIHelper(object):
 
     def create_file_system(self, fs_name, fs_size, pool_id, mover_id,
                            is_vdm=True):
-        if is_vdm:
-            mover_ref = schema.VdmRef(vdm=six.text_type(mover_id))
-        else:
-            mover_ref = schema.MoverRef(mover=six.text_type(mover_id))
-
-        new_fs = schema.NewFileSystem(
-            name=six.text_type(fs_name),
-            mover=mover_ref,
-            destination=schema.StoragePool(
-                pool=six.text_type(pool_id),
-                size=six.text_type(fs_size),
-                may_contain_slices="true"
-            )
-        )
-
-        request = schema.build_task_package(new_fs)
+        request = template.new_file_system(fs_name, fs_size, pool_id,
+                                           mover_id, is_vdm=is_vdm)
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('pool')
         return status, msg
 
     def delete_file_system(self, fs_id):
-        request = schema.build_task_package(
-            schema.DeleteFileSystem(
-                filesystem=six.text_type(fs_id)
-            )
-        )
+        request = template.delete_file_system(fs_id)
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('pool')
         return status, msg
 
     def get_file_system_by_name(self, fs_name, need_capacity=True):
@@ -290,16 +371,8 @@ class XMLAPIHelper(object):
             'cwormState': '',
         }
 
-        request = schema.build_query_package(
-            schema.FileSystemQueryParams(
-                aspect_selection=schema.AspectSelectionFileSystem(
-                    file_systems='true',
-                    file_system_capacity_info='true' if
-                    need_capacity else 'false'),
-                sub_element=schema.FileSystemAlias(
-                    name=six.text_type(fs_name))
-            )
-        )
+        request = template.query_file_system_by_name(
+            fs_name, need_capacity=need_capacity)
 
         status, msg, result = self.send_request(request)
 
@@ -373,27 +446,14 @@ class XMLAPIHelper(object):
         return status, data
 
     def create_mount_point(self, fs_id, mount_path, mover_id):
-        request = schema.build_task_package(
-            schema.NewMount(
-                sub_element=schema.MoverOrVdmRef(
-                    mover=six.text_type(mover_id)),
-                file_system=six.text_type(fs_id),
-                path=six.text_type(mount_path)
-            )
-        )
+        request = template.new_mount(fs_id, mount_path, mover_id)
 
         status, msg, result = self.send_request(request)
 
         return status, msg
 
     def delete_mount_point(self, mover_id, mount_path, is_vdm):
-        request = schema.build_task_package(
-            schema.DeleteMount(
-                mover=six.text_type(mover_id),
-                path=six.text_type(mount_path),
-                is_vdm=six.text_type(is_vdm)
-            )
-        )
+        request = template.delete_mount(mover_id, mount_path, is_vdm)
 
         status, msg, result = self.send_request(request)
 
@@ -402,12 +462,7 @@ class XMLAPIHelper(object):
     def get_mount_point(self, mover_id):
 
         mount_points = []
-        request = schema.build_query_package(
-            schema.MountQueryParams(
-                mover_or_vdm=schema.MoverOrVdmRef(
-                    mover=six.text_type(mover_id))
-            )
-        )
+        request = template.query_mount_points(mover_id)
 
         status, msg, result = self.send_request(request)
 
@@ -526,7 +581,15 @@ class XMLAPIHelper(object):
         return dist
 
     def send_request(self, req):
-        req_xml = self._xml_header + req.toxml()
+        """Send a request to the XML API.
+
+        :param req: either a xml_api_schema element tree or a request
+            already rendered by xml_api_template.
+        """
+        if isinstance(req, six.string_types):
+            req_xml = req
+        else:
+            req_xml = self._xml_header + req.toxml()
         rsp_xml = self._conn.request(req_xml)
 
         result = parser.parse_xml_api(
@@ -566,44 +629,20 @@ class XMLAPIHelper(object):
 
     def create_check_point(self, src_fs, ckpt_name, pool_id, ckpt_size=None):
 
-        if ckpt_size:
-            new_ckpt = schema.NewCheckpoint(
-                sub_element=schema.SpaceAllocationMethod(
-                    schema.StoragePool(
-                        pool=six.text_type(pool_id),
-                        size=six.text_type(ckpt_size)
-                    )
-                ),
-                checkpoint_of=six.text_type(src_fs),
-                name=six.text_type(ckpt_name)
-            )
-
-        else:
-            new_ckpt = schema.NewCheckpoint(
-                sub_element=schema.SpaceAllocationMethod(
-                    schema.StoragePool(
-                        pool=six.text_type(pool_id)
-                    )
-                ),
-                checkpoint_of=six.text_type(src_fs),
-                name=six.text_type(ckpt_name)
-            )
-
-        request = schema.build_task_package(new_ckpt)
+        request = template.new_checkpoint(src_fs, ckpt_name, pool_id,
+                                          size=ckpt_size)
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('pool')
 
         return status, msg
 
     def delete_check_point(self, ckpt_id):
 
-        request = schema.build_task_package(
-            schema.DeleteCheckpoint(
-                checkpoint=six.text_type(ckpt_id)
-            )
-        )
+        request = template.delete_checkpoint(ckpt_id)
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('pool')
 
         return status, msg
 
@@ -621,13 +660,7 @@ class XMLAPIHelper(object):
             'readOnly': None,
         }
 
-        request = schema.build_query_package(
-            schema.CheckpointQueryParams(
-                sub_element=schema.FileSystemAlias(
-                    name=six.text_type(ckpt_name)
-                )
-            )
-        )
+        request = template.query_checkpoint_by_name(ckpt_name)
 
         status, msg, result = self.send_request(request)
 
@@ -657,11 +690,13 @@ class XMLAPIHelper(object):
         return status, check_point
 
     def list_storage_pool(self):
+        pools = self._cache.get('pool')
+        if pools is not None:
+            return constants.STATUS_OK, pools
+
         pools = []
 
-        request = schema.build_query_package(
-            schema.StoragePoolQueryParams()
-        )
+        request = template.query_storage_pools()
 
         status, msg, result = self.send_request(request)
 
@@ -705,6 +740,8 @@ class XMLAPIHelper(object):
 
         if not pools:
             status = constants.STATUS_ERROR
+        elif constants.STATUS_OK == status:
+            self._cache.set('pool', pools)
 
         return status, pools
 
@@ -715,23 +752,27 @@ class XMLAPIHelper(object):
             'id': '',
         }
 
-        request = schema.build_query_package(
-            schema.MoverQueryParams(
-                aspect_selection=schema.AspectSelectionMover()
-            )
-        )
-
-        status, msg, result = self.send_request(request)
-        if constants.STATUS_ERROR == status:
-            return status, msg
-
-        for item in result:
-            if (item[0] == 'Mover' and item[1]['name'] == name
-                    and 'mover' in item[1].keys()):
-                mover['id'] = item[1]['mover']
-                mover['name'] = name
-                break
-        if mover['id'] == '':
+        status = constants.STATUS_OK
+        mover_refs = self._cache.get('mover_ref')
+        if mover_refs is None:
+            request = template.query_movers()
+
+            status, msg, result = self.send_request(request)
+            if constants.STATUS_ERROR == status:
+                return status, msg
+
+            # All movers come back in one response, so remember them all
+            # rather than only the one asked for.
+            mover_refs = {}
+            for item in result:
+                if item[0] == 'Mover' and 'mover' in item[1].keys():
+                    mover_refs[item[1]['name']] = item[1]['mover']
+            self._cache.set('mover_ref', mover_refs)
+
+        if name in mover_refs:
+            mover['id'] = mover_refs[name]
+            mover['name'] = name
+        else:
             status = constants.STATUS_NOT_FOUND
         return status, mover
 
@@ -749,21 +790,11 @@ class XMLAPIHelper(object):
             'dns_domain': [],
         }
 
-        request = schema.build_query_package(
-            schema.MoverQueryParams(
-                mover=six.text_type(mover_id),
-                aspect_selection=schema.AspectSelectionMover(
-                    mover_deduplication_settings='true',
-                    mover_dns_domains='true',
-                    mover_interfaces="true",
-                    mover_network_devices="true",
-                    mover_nis_domains="true",
-                    mover_routes="true",
-                    movers="true",
-                    mover_statuses="true"
-                )
-            )
-        )
+        cached = self._cache.get('mover', mover_id)
+        if cached is not None:
+            return constants.STATUS_OK, cached
+
+        request = template.query_mover_by_id(mover_id)
 
         status, msg, result = self.send_request(request)
         if constants.STATUS_OK != status:
@@ -830,22 +861,17 @@ class XMLAPIHelper(object):
 
         if mover['id'] == '':
             status = constants.STATUS_ERROR
+        else:
+            self._cache.set('mover', mover, key=mover_id)
 
         return status, mover
 
     def extend_file_system(self, fs_id, pool_id, newsize):
 
-        request = schema.build_task_package(
-            schema.ExtendFileSystem(
-                filesystem=six.text_type(fs_id),
-                destination=schema.StoragePool(
-                    pool=six.text_type(pool_id),
-                    size=six.text_type(newsize)
-                )
-            )
-        )
+        request = template.extend_file_system(fs_id, pool_id, newsize)
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('pool')
 
         return status, msg
 
@@ -859,6 +885,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('vdm', 'pool')
 
         return status, msg
 
@@ -871,6 +898,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('vdm', 'pool', 'cifs_server')
 
         return status, msg
 
@@ -883,20 +911,30 @@ class XMLAPIHelper(object):
             'interfaces': [],
         }
 
-        request = schema.build_query_package(schema.VdmQueryParams())
-
-        status, msg, result = self.send_request(request)
-        if constants.STATUS_OK != status:
-            return status, msg
+        status = constants.STATUS_OK
+        vdms = self._cache.get('vdm')
+        if vdms is None:
+            request = schema.build_query_package(schema.VdmQueryParams())
 
-        for item in result:
-            if item[0] == 'Vdm' and item[1]['name'] == name:
-                vdm['name'] = item[1].get('name', '')
-                vdm['host_mover_id'] = item[1].get('mover', '')
-                vdm['interfaces'] = item[1].get('Interfaces', '')
-                vdm['state'] = item[1].get('state', '')
-                vdm['id'] = item[1].get('vdm', '')
-                break
+            status, msg, result = self.send_request(request)
+            if constants.STATUS_OK != status:
+                return status, msg
+
+            # The query returns every VDM; keep them all keyed by name.
+            vdms = {}
+            for item in result:
+                if item[0] == 'Vdm':
+                    vdms[item[1]['name']] = {
+                        'name': item[1].get('name', ''),
+                        'host_mover_id': item[1].get('mover', ''),
+                        'interfaces': item[1].get('Interfaces', ''),
+                        'state': item[1].get('state', ''),
+                        'id': item[1].get('vdm', ''),
+                    }
+            self._cache.set('vdm', vdms)
+
+        if name in vdms:
+            vdm.update(vdms[name])
 
         if vdm['id'] == '':
             status = constants.STATUS_NOT_FOUND
@@ -927,6 +965,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('mover')
 
         if constants.STATUS_OK != status:
             return status, msg
@@ -943,6 +982,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('mover')
 
         return status, msg
 
@@ -980,6 +1020,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('cifs_server')
 
         if constants.STATUS_OK == status:
             if (constants.MSG_JOIN_DOMAIN_FAILED
@@ -1023,6 +1064,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('cifs_server')
 
         return status, msg
 
@@ -1036,10 +1078,15 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('cifs_server')
 
         return status, msg
 
     def get_cifs_servers(self, mover_id, is_vdm=True):
+        cached = self._cache.get('cifs_server', (mover_id, is_vdm))
+        if cached is not None:
+            return constants.STATUS_OK, cached
+
         cifs_servers = []
 
         request = schema.build_query_package(
@@ -1087,6 +1134,9 @@ class XMLAPIHelper(object):
 
         if len(cifs_servers) == 0:
             status = constants.STATUS_NOT_FOUND
+        elif constants.STATUS_OK == status:
+            self._cache.set('cifs_server', cifs_servers,
+                            key=(mover_id, is_vdm))
 
         return status, cifs_servers
 
@@ -1102,6 +1152,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('mover')
 
         return status, msg
 
@@ -1115,6 +1166,7 @@ class XMLAPIHelper(object):
         )
 
         status, msg, result = self.send_request(request)
+        self._cache.invalidate('mover')
 
         return status, msg
 
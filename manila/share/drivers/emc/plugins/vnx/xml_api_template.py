@@ -0,0 +1,197 @@
+# Copyright (c) 2014 EMC Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Precompiled XML API requests.
+
+Building a request through the xml_api_schema DOM classes and serializing
+it with toxml() is expensive for the queries and tasks issued on every
+share operation and stats interval. The templates below render the exact
+same markup (attributes in sorted order, minidom escaping) but only
+substitute the escaped values at call time.
+"""
+import six
+
+from manila.share.drivers.emc.plugins.vnx import constants
+
+
+_NAMESPACE = 'http://www.emc.com/schemas/celerra/xml_api'
+
+_PACKET_PREFIX = (constants.XML_HEADER +
+                  '<RequestPacket xmlns="%s"><Request>' % _NAMESPACE)
+_PACKET_SUFFIX = '</Request></RequestPacket>'
+
+_QUERY_PREFIX = _PACKET_PREFIX + '<Query>'
+_QUERY_SUFFIX = '</Query>' + _PACKET_SUFFIX
+
+_TASK_PREFIX = _PACKET_PREFIX + '<StartTask timeout="300">'
+_TASK_SUFFIX = '</StartTask>' + _PACKET_SUFFIX
+
+
+def escape(value):
+    """Escape a value the same way minidom does for attributes and text."""
+    value = six.text_type(value)
+    if ('&' not in value and '<' not in value and
+            '"' not in value and '>' not in value):
+        return value
+    return (value.replace('&', '&amp;').replace('<', '&lt;').
+            replace('"', '&quot;').replace('>', '&gt;'))
+
+
+class RequestTemplate(object):
+    """A request packet rendered once and filled in per call."""
+
+    def __init__(self, body, task=False):
+        if task:
+            self._template = _TASK_PREFIX + body + _TASK_SUFFIX
+        else:
+            self._template = _QUERY_PREFIX + body + _QUERY_SUFFIX
+
+    def render(self, **kwargs):
+        if not kwargs:
+            return self._template
+        values = dict((k, escape(v)) for k, v in six.iteritems(kwargs))
+        return self._template % values
+
+
+def _bool(value):
+    return 'true' if value else 'false'
+
+
+_QUERY_FILE_SYSTEM_BY_NAME = RequestTemplate(
+    '<FileSystemQueryParams><AspectSelection '
+    'fileSystemCapabilities="false" '
+    'fileSystemCapacityInfos="%(need_capacity)s" '
+    'fileSystemCheckpointInfos="false" fileSystemDhsmInfos="false" '
+    'fileSystemRdeInfos="false" fileSystems="true"/>'
+    '<Alias name="%(name)s"/></FileSystemQueryParams>')
+
+_NEW_FILE_SYSTEM_ON_VDM = RequestTemplate(
+    '<NewFileSystem cwormState="off" name="%(name)s" type="uxfs">'
+    '<Vdm vdm="%(mover)s"/><StoragePool mayContainSlices="true" '
+    'pool="%(pool)s" size="%(size)s"/></NewFileSystem>', task=True)
+
+_NEW_FILE_SYSTEM_ON_MOVER = RequestTemplate(
+    '<NewFileSystem cwormState="off" name="%(name)s" type="uxfs">'
+    '<Mover mover="%(mover)s"/><StoragePool mayContainSlices="true" '
+    'pool="%(pool)s" size="%(size)s"/></NewFileSystem>', task=True)
+
+_DELETE_FILE_SYSTEM = RequestTemplate(
+    '<DeleteFileSystem fileSystem="%(fs_id)s"/>', task=True)
+
+_EXTEND_FILE_SYSTEM = RequestTemplate(
+    '<ExtendFileSystem fileSystem="%(fs_id)s"><StoragePool '
+    'pool="%(pool)s" size="%(size)s"/></ExtendFileSystem>', task=True)
+
+_QUERY_MOUNT_POINTS = RequestTemplate(
+    '<MountQueryParams><MoverOrVdm mover="%(mover)s"/></MountQueryParams>')
+
+_NEW_MOUNT = RequestTemplate(
+    '<NewMount fileSystem="%(fs_id)s" path="%(path)s">'
+    '<MoverOrVdm mover="%(mover)s"/></NewMount>', task=True)
+
+_DELETE_MOUNT = RequestTemplate(
+    '<DeleteMount mover="%(mover)s" moverIdIsVdm="%(is_vdm)s" '
+    'path="%(path)s"/>', task=True)
+
+_QUERY_CHECKPOINT_BY_NAME = RequestTemplate(
+    '<CheckpointQueryParams><Alias name="%(name)s"/>'
+    '</CheckpointQueryParams>')
+
+_NEW_CHECKPOINT = RequestTemplate(
+    '<NewCheckpoint checkpointOf="%(fs_id)s" name="%(name)s">'
+    '<SpaceAllocationMethod><StoragePool pool="%(pool)s"/>'
+    '</SpaceAllocationMethod></NewCheckpoint>', task=True)
+
+_NEW_CHECKPOINT_WITH_SIZE = RequestTemplate(
+    '<NewCheckpoint checkpointOf="%(fs_id)s" name="%(name)s">'
+    '<SpaceAllocationMethod><StoragePool pool="%(pool)s" size="%(size)s"/>'
+    '</SpaceAllocationMethod></NewCheckpoint>', task=True)
+
+_DELETE_CHECKPOINT = RequestTemplate(
+    '<DeleteCheckpoint checkpoint="%(ckpt_id)s" force="false"/>', task=True)
+
+_QUERY_STORAGE_POOLS = RequestTemplate('<StoragePoolQueryParams/>')
+
+_QUERY_MOVERS = RequestTemplate(
+    '<MoverQueryParams><AspectSelection moverDeduplicationSettings="false" '
+    'moverDnsDomains="false" moverInterfaces="false" '
+    'moverNetworkDevices="false" moverNisDomains="false" '
+    'moverRoutes="false" moverStatuses="false" movers="true"/>'
+    '</MoverQueryParams>')
+
+_QUERY_MOVER_BY_ID = RequestTemplate(
+    '<MoverQueryParams mover="%(mover)s"><AspectSelection '
+    'moverDeduplicationSettings="true" moverDnsDomains="true" '
+    'moverInterfaces="true" moverNetworkDevices="true" '
+    'moverNisDomains="true" moverRoutes="true" moverStatuses="true" '
+    'movers="true"/></MoverQueryParams>')
+
+
+def query_file_system_by_name(name, need_capacity=True):
+    return _QUERY_FILE_SYSTEM_BY_NAME.render(
+        name=name, need_capacity=_bool(need_capacity))
+
+
+def new_file_system(name, size, pool_id, mover_id, is_vdm=True):
+    template = (_NEW_FILE_SYSTEM_ON_VDM if is_vdm
+                else _NEW_FILE_SYSTEM_ON_MOVER)
+    return template.render(name=name, size=size, pool=pool_id,
+                           mover=mover_id)
+
+
+def delete_file_system(fs_id):
+    return _DELETE_FILE_SYSTEM.render(fs_id=fs_id)
+
+
+def extend_file_system(fs_id, pool_id, size):
+    return _EXTEND_FILE_SYSTEM.render(fs_id=fs_id, pool=pool_id, size=size)
+
+
+def query_mount_points(mover_id):
+    return _QUERY_MOUNT_POINTS.render(mover=mover_id)
+
+
+def new_mount(fs_id, path, mover_id):
+    return _NEW_MOUNT.render(fs_id=fs_id, path=path, mover=mover_id)
+
+
+def delete_mount(mover_id, path, is_vdm):
+    return _DELETE_MOUNT.render(mover=mover_id, path=path, is_vdm=is_vdm)
+
+
+def query_checkpoint_by_name(name):
+    return _QUERY_CHECKPOINT_BY_NAME.render(name=name)
+
+
+def new_checkpoint(fs_id, name, pool_id, size=None):
+    if size:
+        return _NEW_CHECKPOINT_WITH_SIZE.render(
+            fs_id=fs_id, name=name, pool=pool_id, size=size)
+    return _NEW_CHECKPOINT.render(fs_id=fs_id, name=name, pool=pool_id)
+
+
+def delete_checkpoint(ckpt_id):
+    return _DELETE_CHECKPOINT.render(ckpt_id=ckpt_id)
+
+
+def query_storage_pools():
+    return _QUERY_STORAGE_POOLS.render()
+
+
+def query_movers():
+    return _QUERY_MOVERS.render()
+
+
+def query_mover_by_id(mover_id):
+    return _QUERY_MOVER_BY_ID.render(mover=mover_id)
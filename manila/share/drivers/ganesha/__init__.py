@@ -88,7 +88,8 @@ class GaneshaNASHelper(NASHelperBase):
             ganesha_config_path=self.configuration.ganesha_config_path,
             ganesha_export_dir=self.configuration.ganesha_export_dir,
             ganesha_db_path=self.configuration.ganesha_db_path,
-            ganesha_service_name=self.configuration.ganesha_service_name)
+            ganesha_service_name=self.configuration.ganesha_service_name,
+            local=self.configuration.ganesha_local)
         system_export_template = self._load_conf_dir(
             self.configuration.ganesha_export_template_dir,
             must_exist=False)
@@ -13,10 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import glob
 import os
 import pipes
 import re
+import sqlite3
 import sys
+import tempfile
+import threading
 
 from oslo.serialization import jsonutils
 import six
@@ -173,12 +177,24 @@ def mkconf(confdict):
 
 
 class GaneshaManager(object):
-    """Ganesha instrumentation class."""
+    """Ganesha instrumentation class.
+
+    The set of exports is tracked in memory and mirrored to the INDEX.conf
+    file of the export directory.  With local=True (Ganesha runs on this
+    node) export files are written directly and the export id counter is
+    kept through the sqlite3 module instead of forking commands; execute
+    is then only used for dbus-send and the service restart.
+    """
 
     def __init__(self, execute, tag, **kwargs):
         self.confrx = re.compile('\.conf\Z')
         self.ganesha_config_path = kwargs['ganesha_config_path']
         self.tag = tag
+        self.local = kwargs.get('local', False)
+        self._exports = set()
+        self._index_lock = threading.Lock()
+        self._index_requested = 0
+        self._index_written = 0
 
         def _execute(*args, **kwargs):
             msg = kwargs.pop('message', args[0])
@@ -196,10 +212,25 @@ class GaneshaManager(object):
                     cmd=e.cmd)
         self.execute = _execute
         self.ganesha_export_dir = kwargs['ganesha_export_dir']
-        self.execute('mkdir', '-p', self.ganesha_export_dir)
         self.ganesha_db_path = kwargs['ganesha_db_path']
-        self.execute('mkdir', '-p', os.path.dirname(self.ganesha_db_path))
         self.ganesha_service = kwargs['ganesha_service_name']
+        if self.local:
+            for dirpath in (self.ganesha_export_dir,
+                            os.path.dirname(self.ganesha_db_path)):
+                if not os.path.isdir(dirpath):
+                    os.makedirs(dirpath)
+            self._db = sqlite3.connect(self.ganesha_db_path)
+            with self._db:
+                self._db.execute('create table if not exists ganesha('
+                                 'key varchar(20) primary key, value int)')
+                self._db.execute('insert or ignore into ganesha '
+                                 'values("exportid", 100)')
+            self.get_export_id(bump=False)
+            self.reset_exports()
+            self.restart_service()
+            return
+        self.execute('mkdir', '-p', self.ganesha_export_dir)
+        self.execute('mkdir', '-p', os.path.dirname(self.ganesha_db_path))
         # Here we are to make sure that an SQLite database of the
         # required scheme exists at self.ganesha_db_path.
         # The following command gets us there -- provided the file
@@ -225,6 +256,13 @@ class GaneshaManager(object):
         """Write data to path atomically."""
         dirpath, fname = (getattr(os.path, q + "name")(path) for q in
                           ("dir", "base"))
+        if self.local:
+            with tempfile.NamedTemporaryFile('w', dir=dirpath,
+                                             prefix=fname + '.',
+                                             delete=False) as f:
+                f.write(data)
+            os.rename(f.name, path)
+            return
         tmpf = self.execute('mktemp', '-p', dirpath, "-t",
                             fname + ".XXXXXX")[0][:-1]
         self.execute('sh', '-c', 'cat > ' + pipes.quote(tmpf),
@@ -238,20 +276,33 @@ class GaneshaManager(object):
         return path
 
     def _mkindex(self):
-        """Generate the index file for current exports."""
+        """Generate the index file for current exports.
+
+        Requests are batched: a caller that finds the index being written
+        waits and returns without writing again if the index written in the
+        meantime already covers its change.
+        """
+        self._index_requested += 1
+        requested = self._index_requested
+
         @utils.synchronized("ganesha-index-" + self.tag, external=True)
         def _mkindex():
-            files = filter(lambda f: self.confrx.search(f) and
-                           f != "INDEX.conf",
-                           self.execute('ls', self.ganesha_export_dir,
-                                        run_as_root=False)[0].split("\n"))
-            index = "".join(map(lambda f: "%include " + os.path.join(
-                    self.ganesha_export_dir, f) + "\n", files))
+            index = "".join("%include " + self._getpath(name) + "\n"
+                            for name in sorted(self._exports))
             self._write_conf_file("INDEX", index)
-        _mkindex()
+
+        with self._index_lock:
+            if self._index_written >= requested:
+                return
+            covered = self._index_requested
+            _mkindex()
+            self._index_written = covered
 
     def _read_export_file(self, name):
         """Return the dict of the export identified by name."""
+        if self.local:
+            with open(self._getpath(name)) as f:
+                return parseconf(f.read())
         return parseconf(self.execute("cat", self._getpath(name),
                                       message='reading export ' + name)[0])
 
@@ -268,6 +319,10 @@ class GaneshaManager(object):
 
     def _rm_export_file(self, name):
         """Remove export file of name."""
+        self._exports.discard(name)
+        if self.local:
+            os.remove(self._getpath(name))
+            return
         self.execute("rm", self._getpath(name))
 
     def _dbus_send_ganesha(self, method, *args, **kwargs):
@@ -289,6 +344,7 @@ class GaneshaManager(object):
         _mkindex_called = False
         try:
             path = self._write_export_file(name, confdict)
+            self._exports.add(name)
             undos.append(lambda: self._rm_export_file(name))
 
             self._dbus_send_ganesha("AddExport", "string:" + path,
@@ -317,6 +373,19 @@ class GaneshaManager(object):
         """Get a new export id."""
         # XXX overflowing the export id (16 bit unsigned integer)
         # is not handled
+        if self.local:
+            with self._db:
+                if bump:
+                    self._db.execute('update ganesha set value = value + 1 '
+                                     'where key = "exportid"')
+                row = self._db.execute('select value from ganesha where '
+                                       'key = "exportid"').fetchone()
+            if not row:
+                LOG.error(_LE("Invalid export database on "
+                          "Ganesha node %(tag)s: %(db)s."),
+                          {'tag': self.tag, 'db': self.ganesha_db_path})
+                raise exception.InvalidSqliteDB()
+            return int(row[0])
         if bump:
             bumpcode = 'update ganesha set value = value + 1;'
         else:
@@ -339,6 +408,12 @@ class GaneshaManager(object):
 
     def reset_exports(self):
         """Delete all export files."""
-        self.execute('sh', '-c',
-                     'rm %s/*.conf' % pipes.quote(self.ganesha_export_dir))
+        self._exports.clear()
+        if self.local:
+            for path in glob.glob(os.path.join(self.ganesha_export_dir,
+                                               '*.conf')):
+                os.remove(path)
+        else:
+            self.execute('sh', '-c',
+                         'rm %s/*.conf' % pipes.quote(self.ganesha_export_dir))
         self._mkindex()
@@ -29,6 +29,9 @@ import pipes
 import re
 import xml.etree.cElementTree as etree
 
+import eventlet
+from eventlet import event
+from eventlet import tpool
 from oslo.config import cfg
 import six
 
@@ -51,6 +54,11 @@ GlusterfsManilaShare_opts = [
                default='$state_path/mnt',
                help='Base directory containing mount points for Gluster '
                     'volumes.'),
+    cfg.FloatOpt('glusterfs_export_dir_batch_window',
+                 default=0.05,
+                 help='Seconds to wait for further access rule changes '
+                      'before setting the NFS exports of the Gluster volume '
+                      'with all of them at once.'),
 ]
 
 CONF = cfg.CONF
@@ -88,6 +96,73 @@ class GlusterAddress(object):
         return args, kw
 
 
+class ExportDirManager(object):
+    """Keeps the NFS exports of a Gluster volume and batches their changes.
+
+    The nfs.export-dir option of the volume is read once, and again after
+    setting it failed, rather than before every change.  The changes
+    requested while the batching window is open, or while the previous
+    batch is being set, are set together by a single gluster volume set.
+    Batches are set one at a time, and a failure fails all the changes of
+    its batch.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.export_dir = None
+        self._pending = []
+        self._flushing = False
+
+    def change(self, cbk, edir, host):
+        """Changes the exports with cbk, once they are set on the volume.
+
+        See GlusterfsShareDriver._manage_access for cbk.
+        """
+        done = event.Event()
+        self._pending.append((cbk, edir, host, done))
+        if not self._flushing:
+            self._flushing = True
+            eventlet.spawn_n(self._flush)
+        done.wait()
+
+    def _flush(self):
+        try:
+            config = self.driver.configuration
+            window = config.glusterfs_export_dir_batch_window
+            while self._pending:
+                eventlet.sleep(window)
+                batch, self._pending = self._pending, []
+                try:
+                    self._apply(batch)
+                except Exception as exc:
+                    for cbk, edir, host, done in batch:
+                        done.send_exception(exc)
+                else:
+                    for cbk, edir, host, done in batch:
+                        done.send()
+        finally:
+            self._flushing = False
+
+    def _apply(self, batch):
+        if self.export_dir is None:
+            self.export_dir = self.driver._get_export_dir_dict()
+        export_dir = dict((d, list(v))
+                          for d, v in six.iteritems(self.export_dir))
+        changed = False
+        for cbk, edir, host, done in batch:
+            if not cbk(export_dir, edir, host):
+                changed = True
+        if not changed:
+            return
+        try:
+            self.driver._set_export_dir(export_dir)
+        except Exception:
+            # The volume might not hold what we think, read it next time.
+            self.export_dir = None
+            raise
+        self.export_dir = export_dir
+
+
 class GlusterfsShareDriver(driver.ExecuteMixin, driver.ShareDriver):
     """Execute commands relating to Shares."""
 
@@ -99,6 +174,7 @@ class GlusterfsShareDriver(driver.ExecuteMixin, driver.ShareDriver):
         self.configuration.append_config_values(GlusterfsManilaShare_opts)
         self.backend_name = self.configuration.safe_get(
             'share_backend_name') or 'GlusterFS'
+        self._export_dirs = ExportDirManager(self)
 
     def do_setup(self, context):
         """Native mount the GlusterFS volume and tune it."""
@@ -255,12 +331,15 @@ class GlusterfsShareDriver(driver.ExecuteMixin, driver.ShareDriver):
 
         # sanity check for gluster ctl mount
         smpb = os.stat(self.configuration.glusterfs_mount_point_base)
-        smp = os.stat(self._get_mount_point_for_gluster_vol())
+        # The calls on the FUSE mount block the whole process while the
+        # volume does not answer, so they are made in a native thread.
+        smp = tpool.execute(os.stat, self._get_mount_point_for_gluster_vol())
         if smpb.st_dev == smp.st_dev:
             raise exception.GlusterfsException(
                 _("GlusterFS control mount is not available")
             )
-        smpv = os.statvfs(self._get_mount_point_for_gluster_vol())
+        smpv = tpool.execute(os.statvfs,
+                             self._get_mount_point_for_gluster_vol())
 
         LOG.debug("Updating share stats")
 
@@ -346,7 +425,8 @@ class GlusterfsShareDriver(driver.ExecuteMixin, driver.ShareDriver):
     def _manage_access(self, context, share, access, cbk):
         """Manage share access with cbk.
 
-        Adjust the exports of the Gluster-NFS server using cbk.
+        Adjust the exports of the Gluster-NFS server using cbk, along with
+        the concurrent adjustments, see ExportDirManager.
 
         :param share: share object
         :param access: access object
@@ -365,10 +445,10 @@ class GlusterfsShareDriver(driver.ExecuteMixin, driver.ShareDriver):
 
         if access['access_type'] != 'ip':
             raise exception.InvalidShareAccess('only ip access type allowed')
-        export_dir_dict = self._get_export_dir_dict()
-        if cbk(export_dir_dict, share['name'], access['access_to']):
-            return
+        self._export_dirs.change(cbk, share['name'], access['access_to'])
 
+    def _set_export_dir(self, export_dir_dict):
+        """Set the export entries of shares in the GlusterFS volume."""
         if export_dir_dict:
             export_dir_new = (",".join("/%s(%s)" % (d, "|".join(v))
                               for d, v in sorted(export_dir_dict.items())))
@@ -21,19 +21,26 @@ definitions and attributes.  A method republishing updated export definitions
 is also provided.  And there are methods for requesting the ganesha server
 to reload the export definitions.
 
+Alternatively exports can be kept in a file of their own each and be added,
+updated and removed one at a time through the Ganesha DBus interface, see
+update_ganesha_export().
+
 Consider moving this to common location for use by other manila drivers.
 """
 
 import copy
+import os
 import re
 import socket
+import tempfile
 import time
 
+from eventlet import greenpool
 import netaddr
 import six
 
 from manila import exception
-from manila.i18n import _, _LI
+from manila.i18n import _, _LI, _LW
 from manila.openstack.common import log as logging
 from manila import utils
 
@@ -65,6 +72,8 @@ DEFAULT_EXPORT_ATTRS = {
 
 STARTING_EXPORT_ID = 100
 
+INDEX_FILE = 'INDEX.conf'
+
 
 def valid_flags():
     return DEFAULT_EXPORT_ATTRS.keys()
@@ -233,6 +242,15 @@ def format_access_list(access_string, deny_access=None):
     return ','.join([str(ip) for ip in ipaddrlist])
 
 
+def format_export(export):
+    """Return the EXPORT block for the export."""
+    lines = ['EXPORT', '{']
+    for attr in export:
+        lines.append('%s = %s ;' % (attr, export[attr]))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
 def _publish_local_config(configpath, pre_lines, exports):
     tmp_path = '%s.tmp.%s' % (configpath, time.time())
     LOG.debug("tmp_path = %s", tmp_path)
@@ -260,11 +278,7 @@ def _publish_local_config(configpath, pre_lines, exports):
         for l in pre_lines:
             f.write('%s\n' % l)
         for e in exports:
-            f.write('EXPORT\n{\n')
-            for attr in exports[e]:
-                f.write('%s = %s ;\n' % (attr, exports[e][attr]))
-
-            f.write('}\n')
+            f.write(format_export(exports[e]))
     mvcmd = ['mv', tmp_path, configpath]
     try:
         utils.execute(*mvcmd, run_as_root=True)
@@ -339,3 +353,136 @@ def reload_ganesha_config(servers, sshlogin, service='ganesha.nfsd'):
                     'excmsg': six.text_type(e)})
             LOG.error(msg)
             raise exception.GPFSGaneshaException(msg)
+
+
+def read_export_file(export_path):
+    """Return the export defined in export_path or None if there is none."""
+    if not os.path.exists(export_path):
+        return None
+    __, exports = parse_ganesha_config(export_path)
+    for export in exports.values():
+        return export
+    return None
+
+
+def get_export_ids(export_dir):
+    """Return the export ids defined by the export files in export_dir."""
+    ids = []
+    for path in _list_export_files(export_dir):
+        export = read_export_file(path)
+        if export:
+            ids.append(export['export_id'])
+    return ids
+
+
+def _list_export_files(export_dir):
+    try:
+        names = os.listdir(export_dir)
+    except OSError:
+        return []
+    return [os.path.join(export_dir, name) for name in sorted(names)
+            if name.endswith('.conf') and name != INDEX_FILE]
+
+
+def _write_local_file(path, data):
+    fd, tmp_path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        utils.execute('mv', tmp_path, path, run_as_root=True)
+    except (IOError, OSError, exception.ProcessExecutionError) as e:
+        msg = (_('Failed while writing %(path)s locally. Error: %(excmsg)s.') %
+               {'path': path, 'excmsg': six.text_type(e)})
+        LOG.error(msg)
+        raise exception.GPFSGaneshaException(msg)
+
+
+def _write_local_index(export_dir):
+    index_path = os.path.join(export_dir, INDEX_FILE)
+    index = ''.join('%%include "%s"\n' % path
+                    for path in _list_export_files(export_dir))
+    _write_local_file(index_path, index)
+    return index_path
+
+
+def _run_on_server(server, local, sshlogin, cmd):
+    if local:
+        return utils.execute(*cmd, run_as_root=True)
+    return utils.execute('ssh', sshlogin + '@' + server, *cmd,
+                         run_as_root=False)
+
+
+def _dbus_export_cmd(method, export_path, export_id):
+    cmd = ['dbus-send', '--print-reply', '--system',
+           '--dest=org.ganesha.nfsd', '/org/ganesha/nfsd/ExportMgr',
+           'org.ganesha.nfsd.exportmgr.%s' % method]
+    if method == 'RemoveExport':
+        cmd.append('uint16:%d' % export_id)
+    else:
+        cmd.extend(['string:%s' % export_path,
+                    'string:EXPORT(Export_Id=%d)' % export_id])
+    return cmd
+
+
+def update_ganesha_export(servers, sshlogin, sshkey, service, method,
+                          export_path, export):
+    """Apply a change of a single export on all the servers.
+
+    The export file (and for AddExport and RemoveExport the INDEX.conf of
+    its directory) is updated locally and copied to the remote servers,
+    then the change is applied through the Ganesha DBus interface of each
+    server.  The servers are updated in parallel.  A server that rejects
+    the DBus request is restarted to reload its configuration instead.
+
+    :param method: one of 'AddExport', 'UpdateExport' or 'RemoveExport'.
+    """
+    export_dir = os.path.dirname(export_path)
+    export_id = int(export['export_id'])
+    paths = []
+    if method == 'RemoveExport':
+        utils.execute('rm', '-f', export_path, run_as_root=True)
+    else:
+        _write_local_file(export_path, format_export(export))
+        paths.append(export_path)
+    if method != 'UpdateExport':
+        paths.append(_write_local_index(export_dir))
+    dbus_cmd = _dbus_export_cmd(method, export_path, export_id)
+
+    def _update(server, local):
+        if not local:
+            if method == 'RemoveExport':
+                _run_on_server(server, local, sshlogin,
+                               ['rm', '-f', export_path])
+            for path in paths:
+                _publish_remote_config(server, sshlogin, sshkey, path)
+        try:
+            _run_on_server(server, local, sshlogin, dbus_cmd)
+        except exception.ProcessExecutionError as e:
+            LOG.warning(_LW('%(method)s of export %(id)s failed on '
+                            '%(server)s, falling back to a restart of '
+                            'the Ganesha service: %(excmsg)s'),
+                        {'method': method, 'id': export_id,
+                         'server': server, 'excmsg': six.text_type(e)})
+            reload_ganesha_config([server], sshlogin, service)
+
+    localserver_iplist = socket.gethostbyname_ex(socket.gethostname())[2]
+    pool = greenpool.GreenPool(max(len(servers), 1))
+    threads = [pool.spawn(_update, server, server in localserver_iplist)
+               for server in servers]
+    errors = []
+    for thread in threads:
+        try:
+            thread.wait()
+        except (exception.ProcessExecutionError,
+                exception.GPFSGaneshaException) as e:
+            errors.append(e)
+    if errors:
+        if isinstance(errors[0], exception.GPFSGaneshaException):
+            raise errors[0]
+        msg = (_('Failed to update Ganesha export %(id)s. '
+                 'Error: %(excmsg)s.') %
+               {'id': export_id, 'excmsg': six.text_type(errors[0])})
+        LOG.error(msg)
+        raise exception.GPFSGaneshaException(msg)
+    LOG.info(_LI('%(method)s of export %(id)s applied on %(servers)s.'),
+             {'method': method, 'id': export_id, 'servers': servers})
@@ -36,9 +36,11 @@ import pipes
 import re
 import socket
 
+from eventlet import greenpool
 from oslo.config import cfg
 from oslo.utils import excutils
 from oslo.utils import importutils
+from oslo.utils import timeutils
 from oslo.utils import units
 from oslo_concurrency import processutils
 import six
@@ -101,6 +103,18 @@ gpfs_share_opts = [
                      'NFS server. Note that these defaults can be overridden '
                      'when a share is created by passing metadata with key '
                      'name export_options.')),
+    cfg.BoolOpt('gpfs_ganesha_dynamic_exports',
+                default=False,
+                help=('Keep every Ganesha export in a file of its own under '
+                      'ganesha_export_dir and apply export changes through '
+                      'DBus instead of rewriting ganesha_config_path and '
+                      'restarting the service. ganesha_config_path must '
+                      'include the INDEX.conf file of that directory. '
+                      '(GNFS only.)')),
+    cfg.IntOpt('gpfs_state_cache_ttl',
+               default=60,
+               help='Number of seconds the GPFS device and cluster state '
+                    'lookups are cached for. Set to 0 to disable caching.'),
 ]
 
 
@@ -108,6 +122,55 @@ CONF = cfg.CONF
 CONF.register_opts(gpfs_share_opts)
 
 
+class GPFSCommandSession(object):
+    """Sequence of GPFS commands making up a single share operation.
+
+    Steps run in order and the session stops at the first failing step.
+    On a remote GPFS node the whole sequence is sent as one shell script
+    over a single SSH exec; the script exits with STEP_EXIT_BASE plus the
+    index of the failing step so that it can still be reported per step.
+    """
+
+    STEP_EXIT_BASE = 100
+
+    def __init__(self):
+        self.steps = []
+
+    def add(self, cmd, error_msg, **msg_args):
+        """Add a step.
+
+        :param cmd: command and its arguments.
+        :param error_msg: message raised when the step fails, formatted
+                          with msg_args and the error as 'excmsg'.
+        """
+        self.steps.append((tuple(cmd), error_msg, msg_args))
+
+    def script(self):
+        lines = []
+        for index, (cmd, __, __) in enumerate(self.steps):
+            command = ' '.join(pipes.quote(cmd_arg) for cmd_arg in cmd)
+            lines.append('%s || exit %d' % (command,
+                                            self.STEP_EXIT_BASE + index))
+        return '\n'.join(lines)
+
+    def failed_step(self, exit_code):
+        """Return the index of the step that caused exit_code, if any."""
+        try:
+            index = int(exit_code) - self.STEP_EXIT_BASE
+        except (TypeError, ValueError):
+            return None
+        if 0 <= index < len(self.steps):
+            return index
+        return None
+
+    def step_error(self, index, error):
+        __, error_msg, msg_args = self.steps[index]
+        msg_args = dict(msg_args, excmsg=six.text_type(error))
+        msg = error_msg % msg_args
+        LOG.error(msg)
+        return exception.GPFSException(msg)
+
+
 class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
                       driver.ShareDriver):
 
@@ -132,6 +195,8 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
         self.sshpool = None
         self.ssh_connections = {}
         self._gpfs_execute = None
+        self._gpfs_execute_session = self._gpfs_local_execute_session
+        self._state_cache = {}
 
     def do_setup(self, context):
         """Any initialization the share driver does while starting."""
@@ -140,8 +205,10 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
         localserver_iplist = socket.gethostbyname_ex(socket.gethostname())[2]
         if host in localserver_iplist:  # run locally
             self._gpfs_execute = self._gpfs_local_execute
+            self._gpfs_execute_session = self._gpfs_local_execute_session
         else:
             self._gpfs_execute = self._gpfs_remote_execute
+            self._gpfs_execute_session = self._gpfs_remote_execute_session
         self._setup_helpers()
 
     def _gpfs_local_execute(self, *cmd, **kwargs):
@@ -156,9 +223,33 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
 
         return self._run_ssh(host, cmd, check_exit_code)
 
-    def _run_ssh(self, host, cmd_list, check_exit_code=True):
-        command = ' '.join(pipes.quote(cmd_arg) for cmd_arg in cmd_list)
+    def _gpfs_local_execute_session(self, session):
+        for index, (cmd, __, __) in enumerate(session.steps):
+            try:
+                self._gpfs_execute(*cmd)
+            except exception.ProcessExecutionError as e:
+                raise session.step_error(index, e)
+
+    def _gpfs_remote_execute_session(self, session):
+        host = self.configuration.gpfs_share_export_ip
+        script = session.script()
+        try:
+            with self._get_sshpool(host).item() as ssh:
+                return processutils.ssh_execute(ssh, script,
+                                                check_exit_code=True)
+        except exception.ProcessExecutionError as e:
+            index = session.failed_step(e.exit_code)
+            if index is not None:
+                raise session.step_error(index, e)
+            error = e
+        except Exception as e:
+            error = e
+        msg = (_('Error running SSH command: %(cmd)s. Error: %(excmsg)s.') %
+               {'cmd': script, 'excmsg': six.text_type(error)})
+        LOG.error(msg)
+        raise exception.GPFSException(msg)
 
+    def _get_sshpool(self, host):
         if not self.sshpool:
             gpfs_ssh_login = self.configuration.gpfs_ssh_login
             password = self.configuration.gpfs_ssh_password
@@ -176,8 +267,13 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
                                          privatekey=privatekey,
                                          min_size=min_size,
                                          max_size=max_size)
+        return self.sshpool
+
+    def _run_ssh(self, host, cmd_list, check_exit_code=True):
+        command = ' '.join(pipes.quote(cmd_arg) for cmd_arg in cmd_list)
+
         try:
-            with self.sshpool.item() as ssh:
+            with self._get_sshpool(host).item() as ssh:
                 return processutils.ssh_execute(
                     ssh,
                     command,
@@ -191,7 +287,25 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
                 LOG.error(msg)
                 raise exception.GPFSException(msg)
 
+    def _get_cached_state(self, key):
+        ttl = self.configuration.gpfs_state_cache_ttl
+        entry = self._state_cache.get(key)
+        if not ttl or ttl <= 0 or entry is None:
+            return None
+        stored_at, value = entry
+        if timeutils.is_older_than(stored_at, ttl):
+            del self._state_cache[key]
+            return None
+        return value
+
+    def _set_cached_state(self, key, value):
+        ttl = self.configuration.gpfs_state_cache_ttl
+        if ttl and ttl > 0:
+            self._state_cache[key] = (timeutils.utcnow(), value)
+
     def _check_gpfs_state(self):
+        if self._get_cached_state('state') == 'active':
+            return True
         try:
             out, __ = self._gpfs_execute('mmgetstate', '-Y')
         except exception.ProcessExecutionError as e:
@@ -210,6 +324,7 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
             raise exception.GPFSException(msg)
         if gpfs_state != 'active':
             return False
+        self._set_cached_state('state', gpfs_state)
         return True
 
     def _is_dir(self, path):
@@ -251,6 +366,9 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
 
     def _get_gpfs_device(self):
         fspath = self.configuration.gpfs_mount_point_base
+        fs = self._get_cached_state(('device', fspath))
+        if fs:
+            return fs
         try:
             (out, _) = self._gpfs_execute('df', fspath)
         except exception.ProcessExecutionError as e:
@@ -262,6 +380,7 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
 
         lines = out.splitlines()
         fs = lines[1].split()[0]
+        self._set_cached_state(('device', fspath), fs)
         return fs
 
     def _create_share(self, shareobj):
@@ -276,45 +395,24 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
         fsdev = self._get_gpfs_device()
 
         # create fileset for the share, link it to root path and set max size
-        try:
-            self._gpfs_execute('mmcrfileset', fsdev, sharename,
-                               '--inode-space', 'new')
-        except exception.ProcessExecutionError as e:
-            msg = (_('Failed to create fileset on %(fsdev)s for '
-                     'the share %(sharename)s. Error: %(excmsg)s.'),
-                   {'fsdev': fsdev, 'sharename': sharename,
-                   'excmsg': six.text_type(e)})
-            LOG.error(msg)
-            raise exception.GPFSException(msg)
-
-        try:
-            self._gpfs_execute('mmlinkfileset', fsdev, sharename, '-J',
-                               sharepath)
-        except exception.ProcessExecutionError as e:
-            msg = (_('Failed to link fileset for the share %(sharename)s. '
-                     'Error: %(excmsg)s.'),
-                   {'sharename': sharename, 'excmsg': six.text_type(e)})
-            LOG.error(msg)
-            raise exception.GPFSException(msg)
-
-        try:
-            self._gpfs_execute('mmsetquota', '-j', sharename, '-h',
-                               sizestr, fsdev)
-        except exception.ProcessExecutionError as e:
-            msg = (_('Failed to set quota for the share %(sharename)s. '
-                     'Error: %(excmsg)s.'),
-                   {'sharename': sharename, 'excmsg': six.text_type(e)})
-            LOG.error(msg)
-            raise exception.GPFSException(msg)
-
-        try:
-            self._gpfs_execute('chmod', '777', sharepath)
-        except exception.ProcessExecutionError as e:
-            msg = (_('Failed to set permissions for share %(sharename)s. '
-                     'Error: %(excmsg).'),
-                   {'sharename': sharename, 'excmsg': six.text_type(e)})
-            LOG.error(msg)
-            raise exception.GPFSException(msg)
+        session = GPFSCommandSession()
+        session.add(('mmcrfileset', fsdev, sharename, '--inode-space', 'new'),
+                    _('Failed to create fileset on %(fsdev)s for '
+                      'the share %(sharename)s. Error: %(excmsg)s.'),
+                    fsdev=fsdev, sharename=sharename)
+        session.add(('mmlinkfileset', fsdev, sharename, '-J', sharepath),
+                    _('Failed to link fileset for the share %(sharename)s. '
+                      'Error: %(excmsg)s.'),
+                    sharename=sharename)
+        session.add(('mmsetquota', '-j', sharename, '-h', sizestr, fsdev),
+                    _('Failed to set quota for the share %(sharename)s. '
+                      'Error: %(excmsg)s.'),
+                    sharename=sharename)
+        session.add(('chmod', '777', sharepath),
+                    _('Failed to set permissions for share %(sharename)s. '
+                      'Error: %(excmsg)s.'),
+                    sharename=sharename)
+        self._gpfs_execute_session(session)
 
     def _delete_share(self, shareobj):
         """Remove container by removing GPFS fileset."""
@@ -322,23 +420,16 @@ class GPFSShareDriver(driver.ExecuteMixin, driver.GaneshaMixin,
         fsdev = self._get_gpfs_device()
 
         # unlink and delete the share's fileset
-        try:
-            self._gpfs_execute('mmunlinkfileset', fsdev, sharename, '-f')
-        except exception.ProcessExecutionError as e:
-            msg = (_('Failed unlink fileset for share %(sharename)s. '
-                     'Error: %(excmsg)s.'),
-                   {'sharename': sharename, 'excmsg': six.text_type(e)})
-            LOG.error(msg)
-            raise exception.GPFSException(msg)
-
-        try:
-            self._gpfs_execute('mmdelfileset', fsdev, sharename, '-f')
-        except exception.ProcessExecutionError as e:
-            msg = (_('Failed delete fileset for share %(sharename)s. '
-                     'Error: %(excmsg)s.'),
-                   {'sharename': sharename, 'excmsg': six.text_type(e)})
-            LOG.error(msg)
-            raise exception.GPFSException(msg)
+        session = GPFSCommandSession()
+        session.add(('mmunlinkfileset', fsdev, sharename, '-f'),
+                    _('Failed unlink fileset for share %(sharename)s. '
+                      'Error: %(excmsg)s.'),
+                    sharename=sharename)
+        session.add(('mmdelfileset', fsdev, sharename, '-f'),
+                    _('Failed delete fileset for share %(sharename)s. '
+                      'Error: %(excmsg)s.'),
+                    sharename=sharename)
+        self._gpfs_execute_session(session)
 
     def _get_available_capacity(self, path):
         """Calculate available space on path."""
@@ -589,21 +680,34 @@ class KNFSHelper(NASHelperBase):
             raise exception.GPFSException(msg)
 
     def _publish_access(self, *cmd):
-        for server in self.configuration.gpfs_nfs_server_list:
-            localserver_iplist = socket.gethostbyname_ex(
-                socket.gethostname())[2]
+        """Run cmd on all the NFS servers in parallel.
+
+        All the servers are waited for; the first failure is re-raised.
+        """
+        servers = self.configuration.gpfs_nfs_server_list
+        localserver_iplist = socket.gethostbyname_ex(
+            socket.gethostname())[2]
+        pool = greenpool.GreenPool(len(servers))
+        threads = []
+        for server in servers:
             run_local = True
+            server_cmd = list(cmd)
             if server not in localserver_iplist:
                 sshlogin = self.configuration.gpfs_ssh_login
                 remote_login = sshlogin + '@' + server
-                cmd = ['ssh', remote_login] + list(cmd)
+                server_cmd = ['ssh', remote_login] + server_cmd
                 run_local = False
+            threads.append(pool.spawn(utils.execute, *server_cmd,
+                                      run_as_root=run_local,
+                                      check_exit_code=True))
+        errors = []
+        for thread in threads:
             try:
-                utils.execute(*cmd,
-                              run_as_root=run_local,
-                              check_exit_code=True)
-            except exception.ProcessExecutionError:
-                raise
+                thread.wait()
+            except exception.ProcessExecutionError as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
 
     def _get_export_options(self, share):
         """Set various export attributes for share."""
@@ -686,6 +790,7 @@ class GNFSHelper(NASHelperBase):
             self.configuration.ganesha_nfs_export_options
         ):
             self.default_export_options[m.group('attr')] = m.group('val')
+        self._last_export_id = None
 
     def _get_export_options(self, share):
         """Set various export attributes for share."""
@@ -715,6 +820,9 @@ class GNFSHelper(NASHelperBase):
         gservers = self.configuration.gpfs_nfs_server_list
         sshlogin = self.configuration.gpfs_ssh_login
         sshkey = self.configuration.gpfs_ssh_private_key
+        if self.configuration.gpfs_ganesha_dynamic_exports:
+            return self._ganesha_update_export(req_type, local_path, share,
+                                               access)
         pre_lines, exports = ganesha_utils.parse_ganesha_config(cfgpath)
         reload_needed = True
 
@@ -794,6 +902,72 @@ class GNFSHelper(NASHelperBase):
                                                  cfgpath, pre_lines, exports)
             ganesha_utils.reload_ganesha_config(gservers, sshlogin, gservice)
 
+    def _get_next_export_id(self):
+        if self._last_export_id is None:
+            __, exports = ganesha_utils.parse_ganesha_config(
+                self.configuration.ganesha_config_path)
+            ids = list(exports) + ganesha_utils.get_export_ids(
+                self.configuration.ganesha_export_dir)
+            self._last_export_id = ganesha_utils.get_next_id(
+                dict.fromkeys(ids)) - 1
+        self._last_export_id += 1
+        return self._last_export_id
+
+    def _ganesha_update_export(self, req_type, local_path, share, access):
+        """Apply the request to the export file of the share only."""
+        export_path = os.path.join(self.configuration.ganesha_export_dir,
+                                   share['name'] + '.conf')
+        export = ganesha_utils.read_export_file(export_path)
+
+        if req_type == "allow_access":
+            if export is None:
+                new_id = self._get_next_export_id()
+                export = ganesha_utils.get_export_template()
+                export['fsal'] = '"GPFS"'
+                export['export_id'] = new_id
+                export['tag'] = '"fs%s"' % new_id
+                export['path'] = '"%s"' % local_path
+                export['pseudo'] = '"%s"' % local_path
+                export['rw_access'] = (
+                    '"%s"' % ganesha_utils.format_access_list(access)
+                )
+                export.update(self._get_export_options(share))
+                method = 'AddExport'
+            else:
+                initial_access = export['rw_access'].strip('"')
+                updated_access = ganesha_utils.format_access_list(
+                    ','.join([access, initial_access]))
+                if initial_access == updated_access:
+                    return
+                export['rw_access'] = '"%s"' % updated_access
+                method = 'UpdateExport'
+        elif req_type == "deny_access":
+            if export is None:
+                return
+            initial_access = export['rw_access'].strip('"')
+            updated_access = ganesha_utils.format_access_list(
+                initial_access, deny_access=access)
+            if initial_access == updated_access:
+                return
+            export['rw_access'] = '"%s"' % updated_access
+            method = 'UpdateExport'
+        elif req_type == "remove_export":
+            if export is None:
+                LOG.info(_LI('Export for %s is not defined in Ganesha '
+                             'config.'), share['name'])
+                return
+            method = 'RemoveExport'
+
+        LOG.info(_LI('%(method)s for %(share)s with access from %(access)s'),
+                 {'method': method, 'share': share['name'],
+                  'access': export['rw_access']})
+        ganesha_utils.update_ganesha_export(
+            self.configuration.gpfs_nfs_server_list,
+            self.configuration.gpfs_ssh_login,
+            self.configuration.gpfs_ssh_private_key,
+            self.configuration.ganesha_service_name,
+            method, export_path, export)
+
     def remove_export(self, local_path, share):
         """Remove export."""
         self._ganesha_process_request("remove_export", local_path, share)
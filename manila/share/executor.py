@@ -0,0 +1,176 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Runs the operations the share service receives over RPC.
+
+With the 'direct' executor, an operation runs in the greenthread of the
+RPC server which received it, as it always did.  With the 'pools'
+executor, the operations are queued by class to bounded pools of
+greenthreads, so that a flood of slow share creations cannot hold back
+access rule changes.  The RPC server only waits when the queue of the
+class is full, which leaves further messages with the broker.
+"""
+
+import functools
+import time
+
+import eventlet
+from eventlet import queue
+from oslo.config import cfg
+
+from manila.i18n import _LE
+from manila import instrumentation
+from manila.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+CREATE_DELETE = 'create_delete'
+ACCESS = 'access'
+SNAPSHOT = 'snapshot'
+SERVER = 'server'
+OPERATION_CLASSES = (CREATE_DELETE, ACCESS, SNAPSHOT, SERVER)
+
+share_executor_opts = [
+    cfg.StrOpt('share_executor',
+               default='direct',
+               choices=['direct', 'pools'],
+               help="How the share service runs the operations it receives "
+                    "over RPC: 'direct' runs them as they come, 'pools' "
+                    "queues them to a bounded pool per class of operation "
+                    "(share creation and deletion, access rules, "
+                    "snapshots and share servers)."),
+    cfg.IntOpt('share_create_delete_workers',
+               default=8,
+               help="Number of shares created or deleted at once by the "
+                    "'pools' executor."),
+    cfg.IntOpt('share_access_workers',
+               default=8,
+               help="Number of access rules changed at once by the 'pools' "
+                    "executor."),
+    cfg.IntOpt('share_snapshot_workers',
+               default=4,
+               help="Number of snapshots created or deleted at once by the "
+                    "'pools' executor."),
+    cfg.IntOpt('share_server_workers',
+               default=4,
+               help="Number of share servers deleted at once by the "
+                    "'pools' executor."),
+    cfg.IntOpt('share_executor_queue_size',
+               default=256,
+               help="Number of operations of a class the 'pools' executor "
+                    "queues. Further operations of the class hold an RPC "
+                    "server greenthread each until there is room, and the "
+                    "intake of messages stops once all of them "
+                    "(rpc_thread_pool_size) are held."),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(share_executor_opts)
+
+
+class OperationPool(object):
+    """A bounded queue of operations run by a fixed number of workers."""
+
+    def __init__(self, name, size, queue_size):
+        self.name = name
+        self.size = size
+        self.running = 0
+        self._queue = queue.LightQueue(queue_size)
+        self._workers = []
+
+    @property
+    def queued(self):
+        return self._queue.qsize()
+
+    def submit(self, func, context, *args, **kwargs):
+        """Queues func, waiting for room in the queue if it is full."""
+        if not self._workers:
+            self._workers = [eventlet.spawn(self._work)
+                             for i in range(self.size)]
+        self._queue.put((time.time(), func, context, args, kwargs))
+        self._report_depth()
+
+    def _work(self):
+        while True:
+            queued_at, func, context, args, kwargs = self._queue.get()
+            self.running += 1
+            self._report_depth()
+            if CONF.instrumentation_enabled:
+                instrumentation.emit('share.queue.%s.wait' % self.name,
+                                     time.time() - queued_at)
+            context.update_store()
+            try:
+                func(context, *args, **kwargs)
+            except Exception:
+                LOG.exception(_LE("Failed to run %(func)s queued to the "
+                                  "%(name)s pool."),
+                              {'func': func.__name__, 'name': self.name})
+            finally:
+                self.running -= 1
+
+    def _report_depth(self):
+        if CONF.instrumentation_enabled:
+            instrumentation.gauge('share.queue.%s.depth' % self.name,
+                                  self.queued)
+
+
+class ShareExecutor(object):
+    """Runs the operations of a share manager, as configured."""
+
+    def __init__(self, configuration):
+        self.pools = {}
+        if configuration.share_executor != 'pools':
+            return
+        for name in OPERATION_CLASSES:
+            self.pools[name] = OperationPool(
+                name, getattr(configuration, 'share_%s_workers' % name),
+                configuration.share_executor_queue_size)
+
+    def submit(self, operation, func, context, *args, **kwargs):
+        pool = self.pools.get(operation)
+        if pool is None:
+            return func(context, *args, **kwargs)
+        pool.submit(func, context, *args, **kwargs)
+
+    def capabilities(self):
+        """Returns the load of the pools, for the scheduler.
+
+        'queued_operations' counts the operations waiting for a worker in
+        all the pools, and 'operation_pools' details every pool.
+        """
+        if not self.pools:
+            return {}
+        pools = dict((name, {'workers': pool.size,
+                             'running': pool.running,
+                             'queued': pool.queued})
+                     for name, pool in self.pools.items())
+        return {'queued_operations': sum(pool['queued']
+                                         for pool in pools.values()),
+                'operation_pools': pools}
+
+
+def queued(operation):
+    """Decorator handing the calls of a manager method to its executor.
+
+    The method returns nothing to its caller when it is queued, so it is
+    only fit for the methods the share service receives as casts.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, context, *args, **kwargs):
+            method = functools.wraps(func)(functools.partial(func, self))
+            return self.executor.submit(operation, method, context,
+                                        *args, **kwargs)
+        return wrapper
+    return decorator
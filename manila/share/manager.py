@@ -31,10 +31,14 @@ from manila import exception
 from manila.i18n import _LE
 from manila.i18n import _LI
 from manila.i18n import _LW
+from manila import instrumentation
 from manila import manager
 from manila.openstack.common import log as logging
 from manila import quota
 import manila.share.configuration
+from manila.share import driver
+from manila.share import executor
+from manila.share import stats
 from manila import utils
 
 LOG = logging.getLogger(__name__)
@@ -47,10 +51,29 @@ share_manager_opts = [
                 default=False,
                 help='Whether share servers will '
                      'be deleted on deletion of the last share.'),
+    cfg.IntOpt('share_stats_timeout',
+               default=60,
+               help='Seconds to wait for the driver to refresh its stats '
+                    'before reporting the last stats it returned, marked '
+                    'as stale. The refresh goes on in the background.'),
+    cfg.IntOpt('share_stats_max_interval',
+               default=0,
+               help='Maximum seconds between two refreshes of the driver '
+                    'stats. The interval doubles from periodic_interval '
+                    'while the free capacity changes by less than '
+                    'share_stats_capacity_change_threshold, and is reset '
+                    'when it changes more or shares are created or '
+                    'deleted. 0 refreshes them on every periodic run.'),
+    cfg.FloatOpt('share_stats_capacity_change_threshold',
+                 default=1.0,
+                 help='Percentage of the total capacity the free capacity '
+                      'may change by between two refreshes of the driver '
+                      'stats for their interval to grow.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(share_manager_opts)
+CONF.import_opt('periodic_interval', 'manila.service')
 
 QUOTAS = quota.QUOTAS
 
@@ -63,6 +86,8 @@ class ShareManager(manager.SchedulerDependentManager):
         self.configuration = manila.share.configuration.Configuration(
             share_manager_opts,
             config_group=service_name)
+        self.configuration.append_config_values(
+            executor.share_executor_opts)
         super(ShareManager, self).__init__(service_name='share',
                                            *args, **kwargs)
 
@@ -70,6 +95,17 @@ class ShareManager(manager.SchedulerDependentManager):
             share_driver = self.configuration.share_driver
         self.driver = importutils.import_object(
             share_driver, self.db, configuration=self.configuration)
+        if CONF.instrumentation_enabled:
+            instrumentation.instrument_methods(self.driver, 'share.driver',
+                                               driver.ShareDriver)
+        self.stats_collector = stats.StatsCollector(
+            self.driver,
+            timeout=self.configuration.share_stats_timeout,
+            min_interval=CONF.periodic_interval,
+            max_interval=self.configuration.share_stats_max_interval,
+            change_threshold=(
+                self.configuration.share_stats_capacity_change_threshold))
+        self.executor = executor.ShareExecutor(self.configuration)
 
     def init_host(self):
         """Initialization for a standalone service."""
@@ -187,6 +223,8 @@ class ShareManager(manager.SchedulerDependentManager):
         else:
             return None
 
+    @executor.queued(executor.CREATE_DELETE)
+    @instrumentation.timed_method('share.manager')
     def create_share(self, context, share_id, request_spec=None,
                      filter_properties=None, snapshot_id=None):
         """Creates a share."""
@@ -216,8 +254,7 @@ class ShareManager(manager.SchedulerDependentManager):
                 with excutils.save_and_reraise_exception():
                     LOG.error(_LE("Share server %s does not exist."),
                               parent_share_server_id)
-                    self.db.share_update(context, share_id,
-                                         {'status': 'error'})
+                    self.db.share_status_update(context, share_id, 'error')
         elif share_network_id:
             try:
                 share_server, share_ref = self._provide_share_server_for_share(
@@ -226,8 +263,7 @@ class ShareManager(manager.SchedulerDependentManager):
                 with excutils.save_and_reraise_exception():
                     LOG.error(_LE("Failed to get share server"
                                   " for share creation."))
-                    self.db.share_update(context, share_id,
-                                         {'status': 'error'})
+                    self.db.share_status_update(context, share_id, 'error')
         else:
             share_server = None
 
@@ -239,29 +275,39 @@ class ShareManager(manager.SchedulerDependentManager):
             else:
                 export_location = self.driver.create_share(
                     context, share_ref, share_server=share_server)
-            self.db.share_update(context, share_id,
-                                 {'export_location': export_location})
         except Exception as e:
             with excutils.save_and_reraise_exception():
                 LOG.error(_LE("Share %s failed on creation."), share_id)
                 detail_data = getattr(e, 'detail_data', {})
+                values = None
                 if (isinstance(detail_data, dict) and
                         detail_data.get('export_location')):
-                    self.db.share_update(
-                        context, share_id,
-                        {'export_location': detail_data['export_location']})
+                    values = {
+                        'export_location': detail_data['export_location']}
                 else:
                     LOG.warning(_LW('Share information in exception '
                                     'can not be written to db because it '
                                     'contains %s and it is not a dictionary.'),
                                 detail_data)
-                self.db.share_update(context, share_id, {'status': 'error'})
+                self.db.share_status_update(context, share_id, 'error',
+                                            values=values)
         else:
             LOG.info(_LI("Share created successfully."))
-            self.db.share_update(context, share_id,
-                                 {'status': 'available',
-                                  'launched_at': timeutils.utcnow()})
+            if not self.db.share_status_update(
+                    context, share_id, 'available',
+                    expected_status='creating',
+                    values={'export_location': export_location,
+                            'launched_at': timeutils.utcnow()}):
+                # Still record where the share is, for its deletion.
+                LOG.warning(_LW("Share %s changed status while being "
+                                "created, it is not made available."),
+                            share_id)
+                self.db.share_update(context, share_id,
+                                     {'export_location': export_location})
+            self.stats_collector.expire()
 
+    @executor.queued(executor.CREATE_DELETE)
+    @instrumentation.timed_method('share.manager')
     def delete_share(self, context, share_id):
         """Delete a share."""
         context = context.elevated()
@@ -280,8 +326,8 @@ class ShareManager(manager.SchedulerDependentManager):
                                      share_server=share_server)
         except Exception:
             with excutils.save_and_reraise_exception():
-                self.db.share_update(context, share_id,
-                                     {'status': 'error_deleting'})
+                self.db.share_status_update(context, share_id,
+                                            'error_deleting')
         try:
             reservations = QUOTAS.reserve(context,
                                           project_id=project_id,
@@ -293,6 +339,7 @@ class ShareManager(manager.SchedulerDependentManager):
 
         self.db.share_delete(context, share_id)
         LOG.info(_LI("Share %s: deleted successfully."), share_ref['name'])
+        self.stats_collector.expire()
 
         if reservations:
             QUOTAS.commit(context, reservations, project_id=project_id)
@@ -305,6 +352,8 @@ class ShareManager(manager.SchedulerDependentManager):
                           "deletion of last share.", share_server['id'])
                 self.delete_share_server(context, share_server)
 
+    @executor.queued(executor.SNAPSHOT)
+    @instrumentation.timed_method('share.manager')
     def create_snapshot(self, context, share_id, snapshot_id):
         """Create snapshot for share."""
         snapshot_ref = self.db.share_snapshot_get(context, snapshot_id)
@@ -321,16 +370,19 @@ class ShareManager(manager.SchedulerDependentManager):
 
         except Exception:
             with excutils.save_and_reraise_exception():
-                self.db.share_snapshot_update(context,
-                                              snapshot_ref['id'],
-                                              {'status': 'error'})
-
-        self.db.share_snapshot_update(context,
-                                      snapshot_ref['id'],
-                                      {'status': 'available',
-                                       'progress': '100%'})
+                self.db.share_snapshot_status_update(
+                    context, snapshot_ref['id'], 'error')
+
+        if not self.db.share_snapshot_status_update(
+                context, snapshot_ref['id'], 'available',
+                expected_status='creating', values={'progress': '100%'}):
+            LOG.warning(_LW("Snapshot %s changed status while being "
+                            "created, it is not made available."),
+                        snapshot_id)
         return snapshot_id
 
+    @executor.queued(executor.SNAPSHOT)
+    @instrumentation.timed_method('share.manager')
     def delete_snapshot(self, context, snapshot_id):
         """Delete share snapshot."""
         context = context.elevated()
@@ -348,12 +400,13 @@ class ShareManager(manager.SchedulerDependentManager):
             self.driver.delete_snapshot(context, snapshot_ref,
                                         share_server=share_server)
         except exception.ShareSnapshotIsBusy:
-            self.db.share_snapshot_update(context, snapshot_ref['id'],
-                                          {'status': 'available'})
+            self.db.share_snapshot_status_update(
+                context, snapshot_ref['id'], 'available',
+                expected_status='deleting')
         except Exception:
             with excutils.save_and_reraise_exception():
-                self.db.share_snapshot_update(context, snapshot_ref['id'],
-                                              {'status': 'error_deleting'})
+                self.db.share_snapshot_status_update(
+                    context, snapshot_ref['id'], 'error_deleting')
         else:
             self.db.share_snapshot_destroy(context, snapshot_id)
             try:
@@ -368,6 +421,8 @@ class ShareManager(manager.SchedulerDependentManager):
             if reservations:
                 QUOTAS.commit(context, reservations, project_id=project_id)
 
+    @executor.queued(executor.ACCESS)
+    @instrumentation.timed_method('share.manager')
     def allow_access(self, context, access_id):
         """Allow access to some share."""
         try:
@@ -378,13 +433,16 @@ class ShareManager(manager.SchedulerDependentManager):
             if access_ref['state'] == access_ref.STATE_NEW:
                 self.driver.allow_access(context, share_ref, access_ref,
                                          share_server=share_server)
-                self.db.share_access_update(
-                    context, access_id, {'state': access_ref.STATE_ACTIVE})
+                self.db.share_access_state_update(
+                    context, access_id, access_ref.STATE_ACTIVE,
+                    expected_state=access_ref.STATE_NEW)
         except Exception:
             with excutils.save_and_reraise_exception():
-                self.db.share_access_update(
-                    context, access_id, {'state': access_ref.STATE_ERROR})
+                self.db.share_access_state_update(
+                    context, access_id, access_ref.STATE_ERROR)
 
+    @executor.queued(executor.ACCESS)
+    @instrumentation.timed_method('share.manager')
     def deny_access(self, context, access_id):
         """Deny access to some share."""
         access_ref = self.db.share_access_get(context, access_id)
@@ -400,21 +458,23 @@ class ShareManager(manager.SchedulerDependentManager):
                                     share_server=share_server)
         except Exception:
             with excutils.save_and_reraise_exception():
-                self.db.share_access_update(
-                    context, access_id, {'state': access_ref.STATE_ERROR})
+                self.db.share_access_state_update(
+                    context, access_id, access_ref.STATE_ERROR)
         self.db.share_access_delete(context, access_id)
 
     @manager.periodic_task
     def _report_driver_status(self, context):
         LOG.info(_LI('Updating share status'))
-        share_stats = self.driver.get_share_stats(refresh=True)
+        share_stats = self.stats_collector.get_stats()
         if share_stats:
+            share_stats.update(self.executor.capabilities())
             self.update_service_capabilities(share_stats)
 
+    @instrumentation.timed_method('share.manager')
     def publish_service_capabilities(self, context):
         """Collect driver status and then publish it."""
         self._report_driver_status(context)
-        self._publish_service_capabilities(context)
+        self._publish_service_capabilities(context, full=True)
 
     def _form_server_setup_info(self, context, share_server, share_network):
         # Network info is used by driver for setting up share server
@@ -475,6 +535,8 @@ class ShareManager(manager.SchedulerDependentManager):
                                             {'status': constants.STATUS_ERROR})
                 self.driver.deallocate_network(context, share_server['id'])
 
+    @executor.queued(executor.SERVER)
+    @instrumentation.timed_method('share.manager')
     def delete_share_server(self, context, share_server):
 
         @utils.synchronized(
@@ -84,6 +84,9 @@ class ShareAPI(object):
         cctxt = self.client.prepare(server=share['host'], version='1.0')
         cctxt.cast(ctxt, 'deny_access', access_id=access['id'])
 
-    def publish_service_capabilities(self, ctxt):
-        cctxt = self.client.prepare(fanout=True, version='1.0')
+    def publish_service_capabilities(self, ctxt, host=None):
+        if host:
+            cctxt = self.client.prepare(server=host, version='1.0')
+        else:
+            cctxt = self.client.prepare(fanout=True, version='1.0')
         cctxt.cast(ctxt, 'publish_service_capabilities')
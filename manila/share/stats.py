@@ -0,0 +1,140 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Collects the stats of a share driver without stalling the service.
+
+Refreshing the stats of a backend can take a while, or hang when the
+backend does not answer.  The collector refreshes them in a green thread
+of its own and waits for it no longer than a deadline, serving the last
+stats the driver returned, marked as stale, when the refresh is late or
+fails.  A late refresh is not abandoned: its stats are kept once it
+completes, and no other refresh is started in the meantime.
+"""
+
+import eventlet
+from oslo.utils import timeutils
+
+from manila.i18n import _LE
+from manila.i18n import _LW
+from manila.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class StatsCollector(object):
+    """Refreshes and serves the stats of one share driver.
+
+    While the free capacity of the backend changes by less than
+    change_threshold percent of its total capacity between refreshes,
+    the interval between them doubles from min_interval up to
+    max_interval.  A max_interval of 0 refreshes on every call.
+    """
+
+    def __init__(self, driver, timeout, min_interval=0, max_interval=0,
+                 change_threshold=0):
+        self.driver = driver
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.change_threshold = change_threshold
+        self.interval = 0
+        self.stats = None
+        self.updated_at = None
+        self.stale = False
+        self._started_at = None
+        self._worker = None
+
+    def expire(self):
+        """Refreshes the stats on the next call, whatever the interval."""
+        self.interval = 0
+
+    def get_stats(self):
+        """Returns the last stats of the driver, refreshing them when due.
+
+        The stats are completed with 'stats_updated_at', the time of the
+        last successful refresh, and 'stats_stale', which tells whether
+        the last refresh failed or did not complete in time.
+
+        :returns: None until the driver returned stats once.
+        """
+        if self._worker is None and self._is_due():
+            self._started_at = timeutils.utcnow()
+            self._worker = eventlet.spawn(self._refresh)
+        if self._worker is not None:
+            remaining = self.timeout - timeutils.delta_seconds(
+                self._started_at, timeutils.utcnow())
+            with eventlet.Timeout(max(remaining, 0), False):
+                self._worker.wait()
+            if self._worker is not None:
+                LOG.warning(_LW("Share driver stats refresh started at "
+                                "%(started)s has not completed after "
+                                "%(timeout)s seconds, reporting the last "
+                                "known stats."),
+                            {'started': timeutils.isotime(self._started_at),
+                             'timeout': self.timeout})
+                self.stale = True
+        if not self.stats:
+            return None
+        stats = dict(self.stats)
+        stats['stats_updated_at'] = timeutils.isotime(self.updated_at)
+        stats['stats_stale'] = self.stale
+        return stats
+
+    def _is_due(self):
+        if self._started_at is None or not self.interval:
+            return True
+        # Allow for the periodic tasks not running exactly on time.
+        return timeutils.is_older_than(self._started_at, self.interval - 1)
+
+    def _refresh(self):
+        try:
+            stats = self.driver.get_share_stats(refresh=True)
+        except Exception:
+            LOG.exception(_LE("Failed to refresh the share driver stats."))
+            self.stale = True
+            self.interval = 0
+        else:
+            if stats:
+                self._adapt_interval(self.stats, stats)
+                self.stats = dict(stats)
+                self.updated_at = timeutils.utcnow()
+                self.stale = False
+        finally:
+            self._worker = None
+
+    def _adapt_interval(self, old, new):
+        if not self.max_interval:
+            return
+        change = _capacity_change(old, new) if old else None
+        if change is None or change > self.change_threshold:
+            self.interval = 0
+        else:
+            self.interval = min(max(self.interval * 2, self.min_interval),
+                                self.max_interval)
+
+
+def _capacity_change(old, new):
+    """Percentage of the total capacity the free capacity changed by.
+
+    :returns: None when the capacities are not numbers and changed.
+    """
+    keys = ('total_capacity_gb', 'free_capacity_gb')
+    if all(old.get(key) == new.get(key) for key in keys):
+        return 0
+    try:
+        change = abs(float(new['free_capacity_gb']) -
+                     float(old['free_capacity_gb']))
+        return 100.0 * change / float(new['total_capacity_gb'])
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
@@ -32,6 +32,7 @@ from oslo.config import cfg
 from oslo.messaging import conffixture as messaging_conffixture
 from oslo.utils import timeutils
 import six
+from sqlalchemy import event
 import testtools
 
 from manila.db import migration
@@ -103,6 +104,36 @@ class Database(fixtures.Fixture):
         db_migrate.stamp('head')
 
 
+class QueryCounter(fixtures.Fixture):
+    """Counts the SQL statements sent to the database while in use.
+
+    Used to check that list calls issue a constant number of queries
+    whatever the number of rows they return::
+
+        with test.QueryCounter() as counter:
+            db.share_server_view_get_all(ctxt)
+        self.assertEqual(1, counter.count)
+    """
+
+    def setUp(self):
+        super(QueryCounter, self).setUp()
+        self.count = 0
+        self.statements = []
+        engine = db_api.get_engine()
+        event.listen(engine, 'before_cursor_execute',
+                     self._before_cursor_execute)
+        self.addCleanup(event.remove, engine, 'before_cursor_execute',
+                        self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany):
+        # NOTE: oslo.db pings every connection it checks out of the pool.
+        if statement == 'SELECT 1':
+            return
+        self.count += 1
+        self.statements.append(statement)
+
+
 class StubOutForTesting(object):
     def __init__(self, parent):
         self.parent = parent
@@ -0,0 +1,115 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import webob
+import webob.dec
+
+from manila.api.middleware import instrumentation as middleware
+from manila import context
+from manila import instrumentation
+from manila import test
+
+
+@webob.dec.wsgify
+def fake_app(req):
+    with instrumentation.timed('db'):
+        pass
+    return webob.Response(body='fake body')
+
+
+@webob.dec.wsgify
+def fake_streaming_app(req):
+    def body():
+        with instrumentation.timed('db'):
+            yield 'fake '
+        yield 'body'
+    return webob.Response(app_iter=body())
+
+
+class InstrumentationMiddlewareTest(test.TestCase):
+
+    def setUp(self):
+        super(InstrumentationMiddlewareTest, self).setUp()
+        self.flags(instrumentation_enabled=True)
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+
+    def test_disabled(self):
+        self.flags(instrumentation_enabled=False)
+        req = webob.Request.blank('/')
+
+        response = req.get_response(middleware.Instrumentation(fake_app))
+
+        self.assertEqual('fake body', response.body)
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual({}, instrumentation._METRICS)
+
+    def test_server_timing(self):
+        req = webob.Request.blank('/')
+
+        response = req.get_response(middleware.Instrumentation(fake_app))
+
+        self.assertEqual('fake body', response.body)
+        self.assertIn(';desc="1"', response.headers['Server-Timing'])
+        self.assertIsNone(instrumentation.current())
+        self.assertEqual(['api', 'api.db'],
+                         sorted(instrumentation._METRICS))
+
+    def test_streamed_response(self):
+        req = webob.Request.blank('/')
+
+        response = req.get_response(
+            middleware.Instrumentation(fake_streaming_app))
+
+        self.assertEqual('fake body', response.body)
+        self.assertIsNone(instrumentation.current())
+        self.assertEqual(['api', 'api.db', 'api.stream'],
+                         sorted(instrumentation._METRICS))
+
+    def test_metrics(self):
+        instrumentation.emit('db.query', 0.5)
+        req = webob.Request.blank('/metrics')
+        req.environ['manila.context'] = context.get_admin_context()
+
+        response = req.get_response(middleware.Metrics())
+
+        self.assertEqual(200, response.status_int)
+        self.assertIn('manila_timing_seconds_count{name="db.query"} 1',
+                      response.body)
+
+    def test_metrics_disabled(self):
+        self.flags(instrumentation_enabled=False)
+        req = webob.Request.blank('/metrics')
+        req.environ['manila.context'] = context.get_admin_context()
+
+        response = req.get_response(middleware.Metrics())
+
+        self.assertEqual(404, response.status_int)
+
+    def test_metrics_not_admin(self):
+        req = webob.Request.blank('/metrics')
+        req.environ['manila.context'] = context.RequestContext(
+            'fake_user', 'fake_project', is_admin=False)
+
+        response = req.get_response(middleware.Metrics())
+
+        self.assertEqual(403, response.status_int)
+
+    def test_metrics_no_context(self):
+        req = webob.Request.blank('/metrics')
+
+        response = req.get_response(middleware.Metrics())
+
+        self.assertEqual(403, response.status_int)
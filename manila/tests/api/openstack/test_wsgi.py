@@ -1,8 +1,12 @@
 import inspect
+
+import mock
+from oslo.serialization import jsonutils
 import webob
 
 from manila.api.openstack import wsgi
 from manila import exception
+from manila import instrumentation
 from manila import test
 from manila.tests.api import fakes
 
@@ -118,6 +122,38 @@ class JSONDictSerializerTest(test.TestCase):
         result = result.replace('\n', '').replace(' ', '')
         self.assertEqual(result, expected_json)
 
+    def test_serialize_iter(self):
+        serializer = wsgi.JSONDictSerializer()
+        items = [dict(id=i, name='share%d' % i) for i in range(5000)]
+        data = dict(shares=wsgi.LazyList(dict, items),
+                    shares_links=[dict(rel='next')])
+        chunks = list(serializer.serialize_iter(data))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(jsonutils.loads(serializer.serialize(
+            dict(shares=items, shares_links=[dict(rel='next')]))),
+            jsonutils.loads(''.join(chunks)))
+
+    def test_serialize_iter_empty(self):
+        serializer = wsgi.JSONDictSerializer()
+        result = ''.join(serializer.serialize_iter(
+            dict(shares=wsgi.LazyList(dict, []))))
+        self.assertEqual({'shares': []}, jsonutils.loads(result))
+        self.assertEqual({}, jsonutils.loads(
+            ''.join(serializer.serialize_iter({}))))
+
+
+class LazyListTest(test.TestCase):
+    def test_lazy_list(self):
+        func = mock.Mock(side_effect=lambda item: item * 2)
+        lazy = wsgi.LazyList(func, [1, 2, 3])
+        self.assertFalse(func.called)
+        self.assertEqual(3, len(lazy))
+        self.assertEqual(4, lazy[1])
+        self.assertEqual([2, 4], lazy[:2])
+        self.assertEqual([2, 4, 6], lazy)
+        self.assertEqual(wsgi.LazyList(func, [1, 2, 3]), [2, 4, 6])
+        self.assertNotEqual([2, 4], lazy)
+
 
 class TextDeserializerTest(test.TestCase):
     def test_dispatch_default(self):
@@ -191,6 +227,19 @@ class ResourceTest(test.TestCase):
         self.assertEqual(response.body, 'off')
         self.assertEqual(response.status_int, 200)
 
+    def test_resource_call_names_timings(self):
+        class Controller(object):
+            def index(self, req):
+                return {'fake': 'body'}
+
+        req = webob.Request.blank('/tests')
+        app = fakes.TestRouter(Controller())
+        timings = instrumentation.begin('api')
+        self.addCleanup(instrumentation.finish, timings)
+        req.get_response(app)
+        self.assertEqual('api.Controller.index', timings.name)
+        self.assertEqual(1, timings.counts['serialize'])
+
     def test_resource_not_authorized(self):
         class Controller(object):
             def index(self, req):
@@ -826,6 +875,27 @@ class ResponseObjectTest(test.TestCase):
             self.assertEqual(response.status_int, 202)
             self.assertEqual(response.body, mtype)
 
+    def test_serialize_lazy_list(self):
+        robj = wsgi.ResponseObject(
+            dict(shares=wsgi.LazyList(dict, [dict(id='1')])))
+        request = wsgi.Request.blank('/tests/123')
+
+        response = robj.serialize(
+            request, 'application/json',
+            default_serializers=dict(json=wsgi.JSONDictSerializer))
+        self.assertNotIsInstance(response.app_iter, list)
+        self.assertEqual({'shares': [{'id': '1'}]},
+                         jsonutils.loads(response.body))
+
+        serializer = mock.Mock(spec=['serialize'])
+        serializer.serialize.return_value = 'xml'
+        response = robj.serialize(
+            request, 'application/xml',
+            default_serializers=dict(xml=mock.Mock(return_value=serializer)))
+        serializer.serialize.assert_called_once_with(
+            {'shares': [{'id': '1'}]})
+        self.assertEqual('xml', response.body)
+
 
 class ValidBodyTest(test.TestCase):
 
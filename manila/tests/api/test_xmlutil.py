@@ -17,6 +17,7 @@ from xml.dom import minidom
 
 from lxml import etree
 
+from manila.api.openstack import wsgi
 from manila.api import xmlutil
 from manila import test
 
@@ -628,6 +629,71 @@ class TemplateTest(test.TestCase):
         self.assertEqual(result[idx].text, obj['test']['image']['name'])
 
 
+class RenderPlanTest(test.TestCase):
+    obj = {'test': {'name': 'foobar',
+                    'values': [1, 2, 3, 4],
+                    'attrs': {'a': 1, 'b': 2, 'c': 3, 'd': 4, },
+                    'image': {'name': 'image_foobar', 'id': 42, }, }, }
+
+    def _make_master(self, nsmap=None):
+        root = xmlutil.TemplateElement('test', selector='test',
+                                       name='name')
+        value = xmlutil.SubTemplateElement(root, 'value', selector='values')
+        value.text = xmlutil.Selector()
+        attrs = xmlutil.SubTemplateElement(root, 'attrs', selector='attrs')
+        xmlutil.SubTemplateElement(attrs, 'attr', selector=xmlutil.get_items,
+                                   key=0, value=1)
+        return xmlutil.MasterTemplate(root, 1, nsmap=nsmap)
+
+    def _make_slave(self):
+        root_slave = xmlutil.TemplateElement('test', selector='test')
+        image = xmlutil.SubTemplateElement(root_slave, 'image',
+                                           selector='image', id='id')
+        image.text = xmlutil.Selector('name')
+        return xmlutil.SlaveTemplate(root_slave, 1)
+
+    def test_make_tree_matches_serialize(self):
+        master = self._make_master(nsmap=dict(f='foo'))
+        master.attach(self._make_slave())
+        expected = master._serialize(None, self.obj, master._siblings(),
+                                     master._nsmap())
+        self.assertEqual(etree.tostring(expected),
+                         etree.tostring(master.make_tree(self.obj)))
+
+    def test_render_plan_cached(self):
+        master = self._make_master()
+        plan = master.render_plan()
+        self.assertIs(plan, master.copy().render_plan())
+        slave = self._make_slave()
+        master.attach(slave)
+        slave_plan = master.render_plan()
+        self.assertIsNot(plan, slave_plan)
+        self.assertEqual(['value', 'attrs', 'image'],
+                         [child.tag for child in slave_plan.children])
+
+    def test_serialize_iter(self):
+        root = xmlutil.TemplateElement('tests')
+        elem = xmlutil.SubTemplateElement(root, 'test', selector='tests',
+                                          id='id')
+        xmlutil.SubTemplateElement(elem, 'value', selector='values').text = (
+            xmlutil.Selector())
+        tmpl = xmlutil.MasterTemplate(root, 1)
+        items = [dict(id=i, values=['a&b', i]) for i in range(5000)]
+        for obj in (dict(tests=items),
+                    dict(tests=wsgi.LazyList(dict, items)),
+                    dict(tests=[]),
+                    dict()):
+            chunks = list(tmpl.serialize_iter(obj))
+            self.assertEqual(tmpl.serialize(obj), b''.join(chunks))
+        self.assertEqual(1, len(chunks))
+        self.assertTrue(len(list(tmpl.serialize_iter(dict(tests=items)))) > 1)
+
+    def test_serialize_iter_with_nsmap(self):
+        master = self._make_master(nsmap=dict(f='foo'))
+        self.assertEqual([master.serialize(self.obj)],
+                         list(master.serialize_iter(self.obj)))
+
+
 class MasterTemplateBuilder(xmlutil.TemplateBuilder):
     def construct(self):
         elem = xmlutil.TemplateElement('test')
@@ -17,7 +17,11 @@
 Tests dealing with HTTP rate-limiting.
 """
 
+import copy
 import httplib
+import os
+import shutil
+import tempfile
 from xml.dom import minidom
 
 from lxml import etree
@@ -310,6 +314,16 @@ class LimitTest(BaseLimitTestSuite):
         self.assertEqual(0, limit.next_request)
         self.assertEqual(0, limit.last_request)
 
+    def test_deepcopy(self):
+        """Test copies share the compiled regex but not the state."""
+        limit = limits.Limit("GET", "*", ".*", 1, 1)
+        limit("GET", "/anything")
+        limit_copy = copy.deepcopy(limit)
+        self.assertIs(limit.compiled_regex, limit_copy.compiled_regex)
+        limit_copy("GET", "/anything")
+        self.assertEqual(0, limit.next_request)
+        self.assertEqual(1, limit_copy.next_request)
+
     def test_GET_delay(self):
         """Test two calls to 1 GET per second limit."""
         limit = limits.Limit("GET", "*", ".*", 1, 1)
@@ -545,6 +559,82 @@ class LimiterTest(BaseLimitTestSuite):
         results = list(self._check(5, "PUT", "/anything", "user2"))
         self.assertEqual(expected, results)
 
+    def test_max_users(self):
+        """Test only the levels of the most recent users are kept."""
+        self.limiter = limits.Limiter(TEST_LIMITS, max_users=2,
+                                      **{'user:user3': ''})
+        self.assertEqual([None] * 10 + [6.0],
+                         list(self._check(11, "PUT", "/anything", "user1")))
+        self.assertEqual([6.0],
+                         list(self._check(1, "PUT", "/anything", "user1")))
+        list(self._check(1, "PUT", "/anything", "user2"))
+        list(self._check(1, "PUT", "/anything", "user3"))
+        self.assertEqual(['user2', 'user3'], list(self.limiter.levels))
+        self.assertEqual([], self.limiter.levels['user3'])
+        self.assertEqual([None],
+                         list(self._check(1, "PUT", "/anything", "user1")))
+
+
+class SharedLimiterTest(LimiterTest):
+    """Tests for `limits.SharedLimiter` with the in-memory backend."""
+
+    def setUp(self):
+        super(SharedLimiterTest, self).setUp()
+        self.limiter = self._make_limiter()
+
+    def _make_limiter(self, **kwargs):
+        return limits.SharedLimiter(TEST_LIMITS, **dict(kwargs, **{
+            'user:user3': ''}))
+
+    def test_user_limit(self):
+        """Test user-specific limits."""
+        self.assertEqual([], self.limiter.get_limits('user3'))
+
+    def test_max_users(self):
+        """Test the backend only keeps the most recent states."""
+        self.limiter = self._make_limiter(backend_max_keys=2)
+        list(self._check(3, "PUT", "/volumes", "user1"))
+        list(self._check(1, "PUT", "/anything", "user2"))
+        self.assertEqual(2, len(self.limiter.backend._states))
+
+    def test_get_limits(self):
+        list(self._check(3, "PUT", "/volumes", "user1"))
+        result = self.limiter.get_limits('user1')
+        self.assertEqual([limit.regex for limit in TEST_LIMITS],
+                         [limit['regex'] for limit in result])
+        self.assertEqual([1, 7, 3, 7, 2],
+                         [limit['remaining'] for limit in result])
+
+
+class SharedMemoryLimiterTest(SharedLimiterTest):
+    """Tests for `limits.SharedLimiter` with the shared memory backend."""
+
+    def _make_limiter(self, **kwargs):
+        kwargs.setdefault('backend_slots', '64')
+        return super(SharedMemoryLimiterTest, self)._make_limiter(
+            backend='manila.api.v1.limits.SharedMemoryLimitBackend',
+            backend_path=self.path, **kwargs)
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = os.path.join(tmpdir, 'ratelimit')
+        super(SharedMemoryLimiterTest, self).setUp()
+
+    def test_max_users(self):
+        """Test states of other keys are reused once the table is full."""
+        self.limiter = self._make_limiter(backend_slots='1')
+        list(self._check(3, "PUT", "/volumes", "user1"))
+        self.assertEqual([None] * 5,
+                         list(self._check(5, "PUT", "/volumes", "user2")))
+
+    def test_shared_between_limiters(self):
+        """Test limiters sharing a file enforce limits together."""
+        other = self._make_limiter()
+        list(self._check(5, "PUT", "/volumes"))
+        self.assertEqual(12.0,
+                         other.check_for_delay("PUT", "/volumes")[0])
+
 
 class WsgiLimiterTest(BaseLimitTestSuite):
     """Tests for `limits.WsgiLimiter` class."""
@@ -249,6 +249,26 @@ class ShareApiTest(test.TestCase):
         res_dict = self.controller.index(req)
         self.assertEqual(self.security_service_list_expected_resp, res_dict)
 
+    @mock.patch.object(db, 'security_service_get_all_by_project', mock.Mock())
+    @mock.patch.object(db, 'share_network_ids_get_by_security_services',
+                       mock.Mock())
+    def test_security_service_detail_list(self):
+        db.security_service_get_all_by_project.return_value = [
+            self.ss_active_directory,
+            self.ss_ldap,
+        ]
+        db.share_network_ids_get_by_security_services.return_value = {
+            1: ['fake_sn_id1', 'fake_sn_id2'],
+            2: [],
+        }
+        req = fakes.HTTPRequest.blank('/security-services/detail')
+        res_dict = self.controller.detail(req)
+        self.assertEqual(
+            [['fake_sn_id1', 'fake_sn_id2'], []],
+            [ss['share_networks'] for ss in res_dict['security_services']])
+        db.share_network_ids_get_by_security_services.\
+            assert_called_once_with(req.environ['manila.context'], [1, 2])
+
     @mock.patch.object(db, 'share_network_get', mock.Mock())
     def test_security_service_list_filter_by_sn(self):
         sn = {
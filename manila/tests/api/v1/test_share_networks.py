@@ -207,14 +207,14 @@ class ShareNetworkAPITest(test.TestCase):
     def test_index_no_filters(self):
         networks = [fake_share_network]
         with mock.patch.object(db_api,
-                               'share_network_get_all_by_project',
+                               'share_network_view_get_all',
                                mock.Mock(return_value=networks)):
 
             result = self.controller.index(self.req)
 
-            db_api.share_network_get_all_by_project.assert_called_once_with(
+            db_api.share_network_view_get_all.assert_called_once_with(
                 self.context,
-                self.context.project_id)
+                project_id=self.context.project_id)
 
             self.assertEqual(len(result[share_networks.RESOURCES_NAME]), 1)
             self._check_share_network_view_shortened(
@@ -224,69 +224,69 @@ class ShareNetworkAPITest(test.TestCase):
     def test_index_detailed(self):
         networks = [fake_share_network]
         with mock.patch.object(db_api,
-                               'share_network_get_all_by_project',
+                               'share_network_view_get_all',
                                mock.Mock(return_value=networks)):
 
             result = self.controller.detail(self.req)
 
-            db_api.share_network_get_all_by_project.assert_called_once_with(
+            db_api.share_network_view_get_all.assert_called_once_with(
                 self.context,
-                self.context.project_id)
+                project_id=self.context.project_id)
 
             self.assertEqual(len(result[share_networks.RESOURCES_NAME]), 1)
             self._check_share_network_view(
                 result[share_networks.RESOURCES_NAME][0],
                 fake_share_network)
 
-    @mock.patch.object(db_api, 'share_network_get_all_by_security_service',
+    @mock.patch.object(db_api, 'share_network_view_get_all',
                        mock.Mock())
     def test_index_filter_by_security_service(self):
-        db_api.share_network_get_all_by_security_service.return_value = [
+        db_api.share_network_view_get_all.return_value = [
             fake_share_network_with_ss]
         req = fakes.HTTPRequest.blank(
             '/share_networks?security_service_id=fake-ss-id')
         result = self.controller.index(req)
-        db_api.share_network_get_all_by_security_service.\
+        db_api.share_network_view_get_all.\
             assert_called_once_with(req.environ['manila.context'],
-                                    'fake-ss-id')
+                                    security_service_id='fake-ss-id')
         self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
         self._check_share_network_view_shortened(
             result[share_networks.RESOURCES_NAME][0],
             fake_sn_with_ss_shortened)
 
-    @mock.patch.object(db_api, 'share_network_get_all', mock.Mock())
+    @mock.patch.object(db_api, 'share_network_view_get_all', mock.Mock())
     def test_index_all_tenants_non_admin_context(self):
         req = fakes.HTTPRequest.blank(
             '/share_networks?all_tenants=1')
         self.assertRaises(exception.PolicyNotAuthorized, self.controller.index,
                           req)
-        self.assertFalse(db_api.share_network_get_all.called)
+        self.assertFalse(db_api.share_network_view_get_all.called)
 
-    @mock.patch.object(db_api, 'share_network_get_all', mock.Mock())
+    @mock.patch.object(db_api, 'share_network_view_get_all', mock.Mock())
     def test_index_all_tenants_admin_context(self):
-        db_api.share_network_get_all.return_value = [fake_share_network]
+        db_api.share_network_view_get_all.return_value = [fake_share_network]
         req = fakes.HTTPRequest.blank(
             '/share_networks?all_tenants=1',
             use_admin_context=True)
         result = self.controller.index(req)
-        db_api.share_network_get_all.assert_called_once_with(
+        db_api.share_network_view_get_all.assert_called_once_with(
             req.environ['manila.context'])
         self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
         self._check_share_network_view_shortened(
             result[share_networks.RESOURCES_NAME][0],
             fake_share_network_shortened)
 
-    @mock.patch.object(db_api, 'share_network_get_all_by_project', mock.Mock())
+    @mock.patch.object(db_api, 'share_network_view_get_all', mock.Mock())
     def test_index_filter_by_project_id_non_admin_context(self):
         req = fakes.HTTPRequest.blank(
             '/share_networks?project_id=fake project')
         self.assertRaises(exception.PolicyNotAuthorized, self.controller.index,
                           req)
-        self.assertFalse(db_api.share_network_get_all_by_project.called)
+        self.assertFalse(db_api.share_network_view_get_all.called)
 
-    @mock.patch.object(db_api, 'share_network_get_all_by_project', mock.Mock())
+    @mock.patch.object(db_api, 'share_network_view_get_all', mock.Mock())
     def test_index_filter_by_project_id_admin_context(self):
-        db_api.share_network_get_all_by_project.return_value = [
+        db_api.share_network_view_get_all.return_value = [
             fake_share_network,
             fake_share_network_with_ss,
         ]
@@ -294,17 +294,17 @@ class ShareNetworkAPITest(test.TestCase):
             '/share_networks?project_id=fake',
             use_admin_context=True)
         result = self.controller.index(req)
-        db_api.share_network_get_all_by_project.assert_called_once_with(
-            req.environ['manila.context'], 'fake')
+        db_api.share_network_view_get_all.assert_called_once_with(
+            req.environ['manila.context'], project_id='fake')
         self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
         self._check_share_network_view_shortened(
             result[share_networks.RESOURCES_NAME][0],
             fake_sn_with_ss_shortened)
 
-    @mock.patch.object(db_api, 'share_network_get_all_by_security_service',
+    @mock.patch.object(db_api, 'share_network_view_get_all',
                        mock.Mock())
     def test_index_filter_by_ss_and_project_id_admin_context(self):
-        db_api.share_network_get_all_by_security_service.return_value = [
+        db_api.share_network_view_get_all.return_value = [
             fake_share_network,
             fake_share_network_with_ss,
         ]
@@ -312,15 +312,15 @@ class ShareNetworkAPITest(test.TestCase):
             '/share_networks?security_service_id=fake-ss-id&project_id=fake',
             use_admin_context=True)
         result = self.controller.index(req)
-        db_api.share_network_get_all_by_security_service.\
+        db_api.share_network_view_get_all.\
             assert_called_once_with(req.environ['manila.context'],
-                                    'fake-ss-id')
+                                    security_service_id='fake-ss-id')
         self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
         self._check_share_network_view_shortened(
             result[share_networks.RESOURCES_NAME][0],
             fake_sn_with_ss_shortened)
 
-    @mock.patch.object(db_api, 'share_network_get_all_by_project',
+    @mock.patch.object(db_api, 'share_network_view_get_all',
                        mock.Mock())
     def test_index_all_filter_opts(self):
         valid_filter_opts = {
@@ -334,7 +334,7 @@ class ShareNetworkAPITest(test.TestCase):
             'ip_version': 6,
             'name': 'test-sn'
         }
-        db_api.share_network_get_all_by_project.return_value = [
+        db_api.share_network_view_get_all.return_value = [
             fake_share_network,
             fake_share_network_with_ss]
 
@@ -344,9 +344,9 @@ class ShareNetworkAPITest(test.TestCase):
             req = fakes.HTTPRequest.blank(query_string,
                                           use_admin_context=use_admin_context)
             result = self.controller.index(req)
-            db_api.share_network_get_all_by_project.assert_called_with(
+            db_api.share_network_view_get_all.assert_called_with(
                 req.environ['manila.context'],
-                'fake')
+                project_id='fake')
             self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
             self._check_share_network_view_shortened(
                 result[share_networks.RESOURCES_NAME][0],
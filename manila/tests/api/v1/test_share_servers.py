@@ -95,6 +95,7 @@ class FakeShareServer(object):
                                            self.share_network['id'])
         self.status = kwargs.get('status', constants.STATUS_ACTIVE)
         self.project_id = self.share_network['project_id']
+        self.share_network_name = self.share_network['name']
         self.backend_details = share_server_backend_details
 
     def __getitem__(self, item):
@@ -156,6 +157,14 @@ class FakeRequestWithFakeFilter(FakeRequestAdmin):
     GET = {'fake_key': 'fake_value'}
 
 
+class FakeRequestWithPagination(FakeRequestAdmin):
+    GET = {'host': 'fake_host_2', 'limit': '1', 'marker': 'fake_server_id'}
+
+
+class FakeRequestWithBigLimit(FakeRequestAdmin):
+    GET = {'limit': '1000'}
+
+
 class ShareServerAPITest(test.TestCase):
 
     def setUp(self):
@@ -163,62 +172,70 @@ class ShareServerAPITest(test.TestCase):
         self.controller = share_servers.ShareServerController()
         self.stubs.Set(policy, 'check_policy',
                        mock.Mock(return_value=True))
-        self.stubs.Set(db_api, 'share_server_get_all',
+        self.stubs.Set(db_api, 'share_server_view_get_all',
                        mock.Mock(return_value=fake_share_server_get_all()))
 
+    def _index_filtered(self, req, indexes):
+        servers = fake_share_server_get_all()
+        db_api.share_server_view_get_all.return_value = [
+            servers[i] for i in indexes]
+        result = self.controller.index(req)
+        policy.check_policy.assert_called_once_with(
+            CONTEXT, share_servers.RESOURCE_NAME, 'index')
+        db_api.share_server_view_get_all.assert_called_once_with(
+            CONTEXT, filters=req.GET)
+        self.assertEqual(
+            [fake_share_server_list['share_servers'][i] for i in indexes],
+            result['share_servers'])
+
     def test_index_no_filters(self):
         result = self.controller.index(FakeRequestAdmin)
         policy.check_policy.assert_called_once_with(
             CONTEXT, share_servers.RESOURCE_NAME, 'index')
-        db_api.share_server_get_all.assert_called_once_with(CONTEXT)
+        db_api.share_server_view_get_all.assert_called_once_with(
+            CONTEXT, filters={})
         self.assertEqual(result, fake_share_server_list)
 
     def test_index_host_filter(self):
-        result = self.controller.index(FakeRequestWithHost)
-        policy.check_policy.assert_called_once_with(
-            CONTEXT, share_servers.RESOURCE_NAME, 'index')
-        db_api.share_server_get_all.assert_called_once_with(CONTEXT)
-        self.assertEqual(result['share_servers'],
-                         [fake_share_server_list['share_servers'][0]])
+        self._index_filtered(FakeRequestWithHost, [0])
 
     def test_index_status_filter(self):
-        result = self.controller.index(FakeRequestWithStatus)
-        policy.check_policy.assert_called_once_with(
-            CONTEXT, share_servers.RESOURCE_NAME, 'index')
-        db_api.share_server_get_all.assert_called_once_with(CONTEXT)
-        self.assertEqual(result['share_servers'],
-                         [fake_share_server_list['share_servers'][1]])
+        self._index_filtered(FakeRequestWithStatus, [1])
 
     def test_index_project_id_filter(self):
-        result = self.controller.index(FakeRequestWithProjectId)
-        policy.check_policy.assert_called_once_with(
-            CONTEXT, share_servers.RESOURCE_NAME, 'index')
-        db_api.share_server_get_all.assert_called_once_with(CONTEXT)
-        self.assertEqual(result['share_servers'],
-                         [fake_share_server_list['share_servers'][0]])
+        self._index_filtered(FakeRequestWithProjectId, [0])
 
     def test_index_share_network_filter_by_name(self):
-        result = self.controller.index(FakeRequestWithShareNetworkName)
-        policy.check_policy.assert_called_once_with(
-            CONTEXT, share_servers.RESOURCE_NAME, 'index')
-        db_api.share_server_get_all.assert_called_once_with(CONTEXT)
-        self.assertEqual(result['share_servers'],
-                         [fake_share_server_list['share_servers'][0]])
+        self._index_filtered(FakeRequestWithShareNetworkName, [0])
 
     def test_index_share_network_filter_by_id(self):
-        result = self.controller.index(FakeRequestWithShareNetworkId)
-        policy.check_policy.assert_called_once_with(
-            CONTEXT, share_servers.RESOURCE_NAME, 'index')
-        db_api.share_server_get_all.assert_called_once_with(CONTEXT)
-        self.assertEqual(result['share_servers'],
-                         [fake_share_server_list['share_servers'][0]])
+        self._index_filtered(FakeRequestWithShareNetworkId, [0])
 
     def test_index_fake_filter(self):
-        result = self.controller.index(FakeRequestWithFakeFilter)
-        policy.check_policy.assert_called_once_with(
-            CONTEXT, share_servers.RESOURCE_NAME, 'index')
-        db_api.share_server_get_all.assert_called_once_with(CONTEXT)
-        self.assertEqual(len(result['share_servers']), 0)
+        self._index_filtered(FakeRequestWithFakeFilter, [])
+
+    def test_index_paginated(self):
+        req = FakeRequestWithPagination
+        db_api.share_server_view_get_all.return_value = (
+            fake_share_server_get_all()[1:])
+        result = self.controller.index(req)
+        db_api.share_server_view_get_all.assert_called_once_with(
+            CONTEXT, filters={'host': 'fake_host_2'}, limit=1,
+            marker='fake_server_id')
+        self.assertEqual(fake_share_server_list['share_servers'][1:],
+                         result['share_servers'])
+
+    def test_index_limit_capped(self):
+        self.flags(osapi_max_limit=5)
+        self.controller.index(FakeRequestWithBigLimit)
+        db_api.share_server_view_get_all.assert_called_once_with(
+            CONTEXT, filters={}, limit=5)
+
+    def test_index_marker_not_found(self):
+        db_api.share_server_view_get_all.side_effect = (
+            exception.ShareServerNotFound(share_server_id='fake_server_id'))
+        self.assertRaises(exc.HTTPBadRequest, self.controller.index,
+                          FakeRequestWithPagination)
 
     def test_show(self):
         self.stubs.Set(db_api, 'share_server_get',
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
 import uuid
 
 from oslo.config import cfg
@@ -196,3 +197,71 @@ class API(object):
         network['tenant_id'] = tenant_id
         network['name'] = name
         return network
+
+
+class FakeNeutronClient(object):
+    """In-memory stand-in for the neutron client.
+
+    Keeps the ports it creates and counts the requests made to it, so
+    that the number of round trips of the network plugins can be
+    checked.  A latency can be set to make each request take that many
+    seconds, like a remote neutron server would.
+    """
+
+    def __init__(self, latency=0, extensions=None, networks=None,
+                 subnets=None):
+        self.latency = latency
+        self.requests = 0
+        self.ports = {}
+        self.extensions = [{'name': name} for name in (extensions or [])]
+        self.networks = networks or {}
+        self.subnets = subnets or {}
+        self._next_ip = 10
+
+    def _request(self):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _new_port(self, body):
+        port = dict(body, id=str(uuid.uuid4()),
+                    mac_address='fa:16:3e:00:00:%02x' % (self._next_ip % 256))
+        port['fixed_ips'] = [
+            dict(fixed_ip, ip_address='10.0.0.%d' % self._next_ip)
+            for fixed_ip in body.get('fixed_ips', [{}])]
+        self._next_ip += 1
+        self.ports[port['id']] = port
+        return port
+
+    def create_port(self, body):
+        self._request()
+        if 'ports' in body:
+            return {'ports': [self._new_port(port)
+                              for port in body['ports']]}
+        return {'port': self._new_port(body['port'])}
+
+    def delete_port(self, port_id):
+        self._request()
+        self.ports.pop(port_id, None)
+
+    def show_port(self, port_id):
+        self._request()
+        return {'port': self.ports[port_id]}
+
+    def list_ports(self, **search_opts):
+        self._request()
+        return {'ports': [port for port in self.ports.values()
+                          if all(port.get(key) == value
+                                 for key, value in search_opts.items())]}
+
+    def show_network(self, network_uuid):
+        self._request()
+        return {'network': self.networks.get(network_uuid, {})}
+
+    def show_subnet(self, subnet_uuid):
+        self._request()
+        return {'subnet': self.subnets.get(subnet_uuid, {})}
+
+    def list_extensions(self):
+        self._request()
+        return {'extensions': self.extensions}
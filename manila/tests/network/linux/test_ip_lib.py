@@ -15,6 +15,7 @@
 
 import mock
 
+from manila import exception
 from manila.network.linux import ip_lib
 from manila import test
 
@@ -97,6 +98,35 @@ SUBNET_SAMPLE1 = ("10.0.0.0/24 dev qr-23380d11-d2  scope link  src 10.0.0.1\n"
 SUBNET_SAMPLE2 = ("10.0.0.0/24 dev tap1d7888a7-10  scope link  src 10.0.0.2\n"
                   "10.0.0.0/24 dev qr-23380d11-d2  scope link  src 10.0.0.1")
 
+NETLINK_LINKS = [
+    {'index': 1, 'name': 'lo', 'flags': 0x49,
+     'attributes': {'link/loopback': '00:00:00:00:00:00', 'mtu': 16436,
+                    'qdisc': 'noqueue', 'state': 'UNKNOWN'}},
+    {'index': 2, 'name': 'eth0', 'flags': 0x1043,
+     'attributes': {'link/ether': 'cc:dd:ee:ff:ab:cd', 'mtu': 1500,
+                    'qdisc': 'mq', 'qlen': 1000, 'state': 'UP',
+                    'brd': 'ff:ff:ff:ff:ff:ff', 'alias': 'openvswitch'}},
+    {'index': 3, 'name': 'qr-23380d11-d2', 'flags': 0x1043,
+     'attributes': {}},
+    {'index': 4, 'name': 'tap1d7888a7-10', 'flags': 0x1043,
+     'attributes': {}}]
+
+NETLINK_ADDRESSES = [
+    dict(index=2, ip_version=4, scope='global',
+         dynamic=False, cidr='172.16.77.240/24',
+         broadcast='172.16.77.255'),
+    dict(index=2, ip_version=6, scope='global',
+         dynamic=True, cidr='2001:470:9:1224:dfcc:aaff:feb9:76ce/64',
+         broadcast='::'),
+    dict(index=2, ip_version=6, scope='link',
+         dynamic=False, cidr='fe80::dfcc:aaff:feb9:76ce/64',
+         broadcast='::')]
+
+
+def _netlink_route(dst, oif, src=None, protocol=2):
+    return {'dst': dst, 'table': 254, 'protocol': protocol, 'oif': oif,
+            'gateway': None, 'metric': None, 'src': src}
+
 
 class TestSubProcessBase(test.TestCase):
     def setUp(self):
@@ -169,6 +199,25 @@ class TestIpWrapper(test.TestCase):
 
         self.execute.assert_called_once_with('o', 'link', ('list',), None)
 
+    @mock.patch.object(ip_lib.netlink, 'get_links',
+                       mock.Mock(return_value=NETLINK_LINKS))
+    def test_get_devices_netlink(self):
+        self.flags(ip_lib_backend='netlink')
+        retval = ip_lib.IPWrapper().get_devices(exclude_loopback=True)
+        self.assertEqual(retval,
+                         [ip_lib.IPDevice('eth0'),
+                          ip_lib.IPDevice('qr-23380d11-d2'),
+                          ip_lib.IPDevice('tap1d7888a7-10')])
+        self.assertFalse(self.execute.called)
+
+    def test_get_devices_netlink_namespace(self):
+        self.flags(ip_lib_backend='netlink')
+        self.execute.return_value = '\n'.join(LINK_SAMPLE)
+        with mock.patch.object(ip_lib.netlink, 'get_links') as get_links:
+            ip_lib.IPWrapper('ns').get_devices()
+            self.assertFalse(get_links.called)
+        self.execute.assert_called_once_with('o', 'link', ('list',), 'ns')
+
     def test_get_devices_malformed_line(self):
         self.execute.return_value = '\n'.join(LINK_SAMPLE + ['gibberish'])
         retval = ip_lib.IPWrapper().get_devices()
@@ -465,6 +514,25 @@ class TestIpLinkCommand(TestIPCmdBase):
         self.parent._execute = mock.Mock(return_value=LINK_SAMPLE[1])
         self.assertEqual(self.link_cmd.state, 'UP')
 
+    @mock.patch.object(ip_lib.netlink, 'get_link',
+                       mock.Mock(return_value=NETLINK_LINKS[1]))
+    def test_attributes_netlink(self):
+        self.flags(ip_lib_backend='netlink')
+        self.parent.namespace = None
+        self.assertEqual(self.link_cmd.address, 'cc:dd:ee:ff:ab:cd')
+        self.assertEqual(self.link_cmd.mtu, 1500)
+        self.assertEqual(self.link_cmd.alias, 'openvswitch')
+        ip_lib.netlink.get_link.assert_called_with('eth0')
+        self.assertFalse(self.parent._run.called)
+
+    @mock.patch.object(ip_lib.netlink, 'get_link',
+                       mock.Mock(return_value=None))
+    def test_attributes_netlink_no_device(self):
+        self.flags(ip_lib_backend='netlink')
+        self.parent.namespace = None
+        self.assertRaises(exception.NetworkException,
+                          getattr, self.link_cmd, 'attributes')
+
     def test_settings_property(self):
         expected = {'mtu': 1500,
                     'qlen': 1000,
@@ -551,6 +619,45 @@ class TestIpAddrCommand(TestIPCmdBase):
             self._assert_call([], ('show', 'tap0', 'permanent', 'scope',
                               'global'))
 
+    def _list_netlink(self, *args, **kwargs):
+        self.flags(ip_lib_backend='netlink')
+        self.parent.namespace = None
+        self.parent.name = 'eth0'
+        with mock.patch.object(ip_lib.netlink, 'get_link',
+                               return_value=NETLINK_LINKS[1]):
+            with mock.patch.object(
+                    ip_lib.netlink, 'get_addresses',
+                    side_effect=lambda index: [dict(address) for address in
+                                               NETLINK_ADDRESSES]) as addrs:
+                retval = self.addr_cmd.list(*args, **kwargs)
+                addrs.assert_called_once_with(2)
+        self.assertFalse(self.parent._run.called)
+        return retval
+
+    def test_list_netlink(self):
+        expected = [dict(address) for address in NETLINK_ADDRESSES]
+        for address in expected:
+            del address['index']
+        self.assertEqual(self._list_netlink(), expected)
+
+    def test_list_netlink_filtered(self):
+        expected = [
+            dict(ip_version=4, scope='global',
+                 dynamic=False, cidr='172.16.77.240/24',
+                 broadcast='172.16.77.255')]
+        self.assertEqual(self._list_netlink('global', filters=['permanent']),
+                         expected)
+        self.assertEqual(self._list_netlink(to='172.16.0.0/16'), expected)
+
+    def test_list_netlink_other_filters(self):
+        self.flags(ip_lib_backend='netlink')
+        self.parent.namespace = None
+        self.parent._run.return_value = ADDR_SAMPLE
+        with mock.patch.object(ip_lib.netlink, 'get_addresses') as addrs:
+            self.addr_cmd.list(filters=['dynamic'])
+            self.assertFalse(addrs.called)
+        self._assert_call([], ('show', 'tap0', 'dynamic'))
+
 
 class TestIpRouteCommand(TestIPCmdBase):
     def setUp(self):
@@ -619,6 +726,43 @@ class TestIpRouteCommand(TestIPCmdBase):
         # Check two calls - device get and subnet get
         self.assertEqual(len(self.parent._run.mock_calls), 2)
 
+    def _pullup_route_netlink(self, routes):
+        self.flags(ip_lib_backend='netlink')
+        self.parent.namespace = None
+        with mock.patch.multiple(
+                ip_lib.netlink,
+                get_link=mock.Mock(return_value=NETLINK_LINKS[3]),
+                get_links=mock.Mock(return_value=NETLINK_LINKS),
+                get_routes=mock.Mock(return_value=routes)):
+            self.route_cmd.pullup_route('tap1d7888a7-10')
+        self.assertFalse(self.parent._run.called)
+
+    def test_pullup_route_netlink(self):
+        self._pullup_route_netlink([
+            _netlink_route('default', 2, protocol=3),
+            _netlink_route('10.0.0.0/8', 2, '10.1.0.1'),
+            _netlink_route('10.0.0.0/24', 3, '10.0.0.1'),
+            _netlink_route('10.0.0.0/24', 4, '10.0.0.2'),
+            _netlink_route('10.0.0.0/24', 2)])
+        self.parent._as_root.assert_has_calls([
+            mock.call([], 'route', ('del', '10.0.0.0/24', 'dev', 'eth0'),
+                      False),
+            mock.call([], 'route', ('append', '10.0.0.0/24', 'proto',
+                                    'kernel', 'src', '10.1.0.1', 'dev',
+                                    'eth0'), False),
+            mock.call([], 'route', ('del', '10.0.0.0/24', 'dev',
+                                    'qr-23380d11-d2'), False),
+            mock.call([], 'route', ('append', '10.0.0.0/24', 'proto',
+                                    'kernel', 'src', '10.0.0.1', 'dev',
+                                    'qr-23380d11-d2'), False)])
+        self.assertEqual(len(self.parent._as_root.mock_calls), 4)
+
+    def test_pullup_route_netlink_first(self):
+        self._pullup_route_netlink([
+            _netlink_route('10.0.0.0/24', 4, '10.0.0.2'),
+            _netlink_route('10.0.0.0/24', 3, '10.0.0.1')])
+        self.assertFalse(self.parent._as_root.called)
+
 
 class TestIpNetnsCommand(TestIPCmdBase):
     def setUp(self):
@@ -682,3 +826,11 @@ class TestDeviceExists(test.TestCase):
             _execute.return_value = ''
             _execute.side_effect = RuntimeError('Device does not exist.')
             self.assertFalse(ip_lib.device_exists('eth0'))
+
+    def test_device_exists_netlink(self):
+        self.flags(ip_lib_backend='netlink')
+        with mock.patch.object(ip_lib.netlink, 'get_link') as get_link:
+            get_link.return_value = NETLINK_LINKS[1]
+            self.assertTrue(ip_lib.device_exists('eth0'))
+            get_link.return_value = None
+            self.assertFalse(ip_lib.device_exists('eth1'))
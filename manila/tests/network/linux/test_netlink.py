@@ -0,0 +1,215 @@
+# Copyright 2014 Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import errno
+import socket
+import struct
+
+import mock
+
+from manila.network.linux import netlink
+from manila import test
+
+
+def _message(kind, body):
+    return (netlink.NLMSG_HEADER.pack(netlink.NLMSG_HEADER.size + len(body),
+                                      kind, 0, 1, 0) +
+            body + '\0' * (netlink._align(len(body)) - len(body)))
+
+
+def _error(error):
+    return _message(netlink.NLMSG_ERROR, struct.pack('=i', -error) +
+                    '\0' * netlink.NLMSG_HEADER.size)
+
+
+def _done():
+    return _message(netlink.NLMSG_DONE, struct.pack('=i', 0))
+
+
+def _link(index, name, link_type=netlink.ARPHRD_ETHER):
+    return (netlink.IFINFOMSG.pack(socket.AF_UNSPEC, link_type, index,
+                                   0x1043, 0) +
+            netlink._attribute(netlink.IFLA_IFNAME, name + '\0') +
+            netlink._attribute(netlink.IFLA_ADDRESS,
+                               '\xcc\xdd\xee\xff\xab\xcd') +
+            netlink._attribute(netlink.IFLA_BROADCAST, '\xff' * 6) +
+            netlink._attribute(netlink.IFLA_MTU, struct.pack('=I', 1500)) +
+            netlink._attribute(netlink.IFLA_QDISC, 'mq\0') +
+            netlink._attribute(netlink.IFLA_TXQLEN, struct.pack('=I', 1000)) +
+            netlink._attribute(netlink.IFLA_OPERSTATE, '\x06') +
+            netlink._attribute(netlink.IFLA_LINKMODE, '\x00') +
+            netlink._attribute(netlink.IFLA_GROUP, struct.pack('=I', 0)))
+
+
+def _address(index, family, address, prefixlen, scope=0, flags=0x80,
+             broadcast=None):
+    body = (netlink.IFADDRMSG.pack(family, prefixlen, flags, scope, index) +
+            netlink._attribute(netlink.IFA_ADDRESS,
+                               socket.inet_pton(family, address)))
+    if family == socket.AF_INET:
+        body += netlink._attribute(netlink.IFA_LOCAL,
+                                   socket.inet_pton(family, address))
+    if broadcast:
+        body += netlink._attribute(netlink.IFA_BROADCAST,
+                                   socket.inet_pton(family, broadcast))
+    return body
+
+
+def _route(dst, dst_len, oif, table=netlink.RT_TABLE_MAIN,
+           protocol=netlink.RTPROT_KERNEL, src=None, gateway=None):
+    body = (netlink.RTMSG.pack(socket.AF_INET, dst_len, 0, 0, table,
+                               protocol, 0, 1, 0) +
+            netlink._attribute(netlink.RTA_TABLE, struct.pack('=I', table)) +
+            netlink._attribute(netlink.RTA_OIF, struct.pack('=I', oif)))
+    if dst:
+        body += netlink._attribute(netlink.RTA_DST, socket.inet_aton(dst))
+    if src:
+        body += netlink._attribute(netlink.RTA_PREFSRC,
+                                   socket.inet_aton(src))
+    if gateway:
+        body += netlink._attribute(netlink.RTA_GATEWAY,
+                                   socket.inet_aton(gateway))
+    return body
+
+
+class NetlinkRequestTestCase(test.TestCase):
+
+    def setUp(self):
+        super(NetlinkRequestTestCase, self).setUp()
+        self.sock = mock.Mock()
+        self.mock_socket = mock.patch.object(
+            netlink.socket, 'socket', return_value=self.sock).start()
+
+    def test_request_dump(self):
+        link1 = _link(1, 'lo')
+        link2 = _link(2, 'eth0')
+        self.sock.recv.side_effect = [
+            _message(netlink.RTM_NEWLINK, link1),
+            _message(netlink.RTM_NEWLINK, link2) + _done()]
+
+        messages = netlink._request(netlink.RTM_GETLINK, 'payload')
+
+        self.assertEqual([(netlink.RTM_NEWLINK, link1),
+                          (netlink.RTM_NEWLINK, link2)], messages)
+        self.mock_socket.assert_called_once_with(
+            socket.AF_NETLINK, socket.SOCK_RAW, netlink.NETLINK_ROUTE)
+        sent = self.sock.sendall.call_args[0][0]
+        self.assertEqual(
+            (len(sent), netlink.RTM_GETLINK,
+             netlink.NLM_F_REQUEST | netlink.NLM_F_DUMP, 1, 0),
+            netlink.NLMSG_HEADER.unpack_from(sent))
+        self.assertEqual('payload', sent[netlink.NLMSG_HEADER.size:])
+        self.sock.close.assert_called_once_with()
+
+    def test_request_single(self):
+        link = _link(2, 'eth0')
+        self.sock.recv.return_value = _message(netlink.RTM_NEWLINK, link)
+
+        messages = netlink._request(netlink.RTM_GETLINK, '', dump=False)
+
+        self.assertEqual([(netlink.RTM_NEWLINK, link)], messages)
+        self.assertEqual(1, self.sock.recv.call_count)
+
+    def test_request_error(self):
+        self.sock.recv.return_value = _error(errno.EPERM)
+
+        e = self.assertRaises(OSError, netlink._request,
+                              netlink.RTM_GETLINK, '')
+
+        self.assertEqual(errno.EPERM, e.errno)
+        self.sock.close.assert_called_once_with()
+
+
+class NetlinkTestCase(test.TestCase):
+
+    def test_get_links(self):
+        with mock.patch.object(netlink, '_request', return_value=[
+                (netlink.RTM_NEWLINK,
+                 _link(1, 'lo', netlink.ARPHRD_LOOPBACK)),
+                (netlink.RTM_NEWLINK, _link(2, 'eth0'))]):
+            links = netlink.get_links()
+
+        self.assertEqual(['lo', 'eth0'], [link['name'] for link in links])
+        self.assertEqual('cc:dd:ee:ff:ab:cd',
+                         links[0]['attributes']['link/loopback'])
+        self.assertEqual({'link/ether': 'cc:dd:ee:ff:ab:cd',
+                          'brd': 'ff:ff:ff:ff:ff:ff',
+                          'mtu': 1500,
+                          'qdisc': 'mq',
+                          'qlen': 1000,
+                          'state': 'UP',
+                          'mode': 'DEFAULT',
+                          'group': 'default'},
+                         links[1]['attributes'])
+        self.assertEqual(2, links[1]['index'])
+
+    def test_get_link(self):
+        with mock.patch.object(netlink, '_request', return_value=[
+                (netlink.RTM_NEWLINK, _link(2, 'eth0'))]) as request:
+            link = netlink.get_link('eth0')
+
+        self.assertEqual('eth0', link['name'])
+        payload = request.call_args[0][1]
+        self.assertIn(netlink._attribute(netlink.IFLA_IFNAME, 'eth0\0'),
+                      payload)
+        self.assertEqual({'dump': False}, request.call_args[1])
+
+    def test_get_link_no_device(self):
+        with mock.patch.object(netlink, '_request',
+                               side_effect=OSError(errno.ENODEV, 'No device')):
+            self.assertIsNone(netlink.get_link('eth9'))
+
+    def test_get_link_error(self):
+        with mock.patch.object(netlink, '_request',
+                               side_effect=OSError(errno.EPERM, 'Denied')):
+            self.assertRaises(OSError, netlink.get_link, 'eth0')
+
+    def test_get_addresses(self):
+        with mock.patch.object(netlink, '_request', return_value=[
+                (netlink.RTM_NEWADDR,
+                 _address(1, socket.AF_INET, '127.0.0.1', 8, scope=254)),
+                (netlink.RTM_NEWADDR,
+                 _address(2, socket.AF_INET, '172.16.77.240', 24,
+                          broadcast='172.16.77.255')),
+                (netlink.RTM_NEWADDR,
+                 _address(2, socket.AF_INET, '10.0.0.2', 24)),
+                (netlink.RTM_NEWADDR,
+                 _address(2, socket.AF_INET6, 'fe80::1', 64, scope=253,
+                          flags=0))]):
+            addresses = netlink.get_addresses(2)
+
+        self.assertEqual([
+            dict(index=2, ip_version=4, scope='global', dynamic=False,
+                 cidr='172.16.77.240/24', broadcast='172.16.77.255'),
+            dict(index=2, ip_version=4, scope='global', dynamic=False,
+                 cidr='10.0.0.2/24', broadcast='10.0.0.255'),
+            dict(index=2, ip_version=6, scope='link', dynamic=True,
+                 cidr='fe80::1/64', broadcast='::')], addresses)
+
+    def test_get_routes(self):
+        with mock.patch.object(netlink, '_request', return_value=[
+                (netlink.RTM_NEWROUTE,
+                 _route(None, 0, 2, protocol=3, gateway='10.0.0.254')),
+                (netlink.RTM_NEWROUTE,
+                 _route('10.0.0.0', 24, 2, src='10.0.0.2')),
+                (netlink.RTM_NEWROUTE,
+                 _route('127.0.0.0', 8, 1, table=255))]):
+            routes = netlink.get_routes()
+
+        self.assertEqual([
+            {'dst': 'default', 'table': 254, 'protocol': 3, 'oif': 2,
+             'gateway': '10.0.0.254', 'metric': None, 'src': None},
+            {'dst': '10.0.0.0/24', 'table': 254, 'protocol': 2, 'oif': 2,
+             'gateway': None, 'metric': None, 'src': '10.0.0.2'}], routes)
@@ -208,6 +208,48 @@ class NeutronApiTest(test.TestCase):
         self.assertTrue(clientv20.Client.called)
         self.assertTrue(self.neutron_api.client.create_port.called)
 
+    def test_create_ports(self):
+        # Set up test data
+        self.stubs.Set(self.neutron_api, '_has_port_binding_extension',
+                       mock.Mock(return_value=False))
+        self.stubs.Set(self.neutron_api.client, 'create_port',
+                       mock.Mock(side_effect=lambda body: body))
+
+        # Execute method 'create_ports'
+        ports = self.neutron_api.create_ports(
+            'test tenant', 'test net', 3, subnet_id='test subnet',
+            device_owner='test owner')
+
+        # Verify results
+        self.assertEqual(3, len(ports))
+        self.neutron_api.client.create_port.assert_called_once_with(
+            {'ports': ports})
+        for port in ports:
+            self.assertEqual('test tenant', port['tenant_id'])
+            self.assertEqual('test net', port['network_id'])
+            self.assertEqual('test owner', port['device_owner'])
+            self.assertEqual([{'subnet_id': 'test subnet'}],
+                             port['fixed_ips'])
+
+    @mock.patch.object(neutron_api.LOG, 'exception', mock.Mock())
+    def test_create_ports_exception_status_409(self):
+        # Set up test data
+        self.stubs.Set(
+            self.neutron_api, '_has_port_binding_extension',
+            mock.Mock(return_value=True))
+        self.stubs.Set(
+            self.neutron_api.client, 'create_port',
+            mock.Mock(side_effect=neutron_client_exc.NeutronClientException(
+                status_code=409)))
+
+        # Execute method 'create_ports'
+        self.assertRaises(exception.PortLimitExceeded,
+                          self.neutron_api.create_ports,
+                          'test tenant', 'test net', 2)
+
+        # Verify results
+        self.assertTrue(neutron_api.LOG.exception.called)
+
     def test_delete_port(self):
         # Set up test data
         self.stubs.Set(self.neutron_api.client, 'delete_port', mock.Mock())
@@ -324,6 +366,37 @@ class NeutronApiTest(test.TestCase):
         self.assertEqual(
             extensions[1], result[neutron_constants.PROVIDER_NW_EXT])
 
+    def test_has_extension_cached(self):
+        # Set up test data
+        self.stubs.Set(
+            self.neutron_api.client, 'list_extensions',
+            mock.Mock(return_value={'extensions': [
+                {'name': neutron_constants.PROVIDER_NW_EXT}]}))
+
+        # Execute method 'has_extension'
+        self.assertTrue(self.neutron_api.has_extension(
+            neutron_constants.PROVIDER_NW_EXT))
+        self.assertFalse(self.neutron_api.has_extension(
+            neutron_constants.PORTBINDING_EXT))
+
+        # Verify results
+        self.neutron_api.client.list_extensions.assert_called_once_with()
+
+    def test_has_extension_refreshed(self):
+        # Set up test data
+        self.stubs.Set(
+            self.neutron_api.client, 'list_extensions',
+            mock.Mock(return_value={'extensions': []}))
+        self.neutron_api.has_extension(neutron_constants.PROVIDER_NW_EXT)
+        self.neutron_api.last_neutron_extension_sync -= (
+            self.neutron_api.configuration.neutron_extension_sync_interval)
+
+        # Execute method 'has_extension'
+        self.neutron_api.has_extension(neutron_constants.PROVIDER_NW_EXT)
+
+        # Verify results
+        self.assertEqual(2, self.neutron_api.client.list_extensions.call_count)
+
     def test_create_network(self):
         # Set up test data
         net_args = {'tenant_id': 'test tenant', 'name': 'test name'}
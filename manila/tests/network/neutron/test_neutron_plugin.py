@@ -22,6 +22,7 @@ from manila import exception
 from manila.network.neutron import constants as neutron_constants
 from manila.network.neutron import neutron_network_plugin as plugin
 from manila import test
+from manila.tests import fake_network
 
 fake_neutron_port = {
     "status": "test_port_status",
@@ -75,8 +76,8 @@ class NeutronNetworkPluginTest(test.TestCase):
                                                    project_id='fake project',
                                                    is_admin=False)
 
-    @mock.patch.object(db_api, 'network_allocation_create',
-                       mock.Mock(return_values=fake_network_allocation))
+    @mock.patch.object(db_api, 'network_allocations_create',
+                       mock.Mock(return_values=[fake_network_allocation]))
     @mock.patch.object(db_api, 'share_network_get',
                        mock.Mock(return_value=fake_share_network))
     @mock.patch.object(db_api, 'share_server_get',
@@ -91,8 +92,8 @@ class NeutronNetworkPluginTest(test.TestCase):
             self.plugin,
             '_save_neutron_subnet_data').start()
 
-        with mock.patch.object(self.plugin.neutron_api, 'create_port',
-                               mock.Mock(return_value=fake_neutron_port)):
+        with mock.patch.object(self.plugin.neutron_api, 'create_ports',
+                               mock.Mock(return_value=[fake_neutron_port])):
             self.plugin.allocate_network(
                 self.fake_context,
                 fake_share_server,
@@ -104,21 +105,22 @@ class NeutronNetworkPluginTest(test.TestCase):
                                                  fake_share_network)
             save_subnet_data.assert_called_once_with(self.fake_context,
                                                      fake_share_network)
-            self.plugin.neutron_api.create_port.assert_called_once_with(
+            self.plugin.neutron_api.create_ports.assert_called_once_with(
                 fake_share_network['project_id'],
-                network_id=fake_share_network['neutron_net_id'],
+                fake_share_network['neutron_net_id'],
+                1,
                 subnet_id=fake_share_network['neutron_subnet_id'],
                 device_owner='manila:share')
-            db_api.network_allocation_create.assert_called_once_with(
+            db_api.network_allocations_create.assert_called_once_with(
                 self.fake_context,
-                fake_network_allocation)
+                [fake_network_allocation])
 
             has_provider_nw_ext.stop()
             save_nw_data.stop()
             save_subnet_data.stop()
 
-    @mock.patch.object(db_api, 'network_allocation_create',
-                       mock.Mock(return_values=fake_network_allocation))
+    @mock.patch.object(db_api, 'network_allocations_create',
+                       mock.Mock(return_values=[fake_network_allocation] * 2))
     @mock.patch.object(db_api, 'share_network_get',
                        mock.Mock(return_value=fake_share_network))
     @mock.patch.object(db_api, 'share_server_get',
@@ -133,31 +135,24 @@ class NeutronNetworkPluginTest(test.TestCase):
             self.plugin,
             '_save_neutron_subnet_data').start()
 
-        with mock.patch.object(self.plugin.neutron_api, 'create_port',
-                               mock.Mock(return_value=fake_neutron_port)):
+        with mock.patch.object(
+                self.plugin.neutron_api, 'create_ports',
+                mock.Mock(return_value=[fake_neutron_port] * 2)):
             self.plugin.allocate_network(
                 self.fake_context,
                 fake_share_server,
                 fake_share_network,
                 count=2)
 
-            neutron_api_calls = [
-                mock.call(fake_share_network['project_id'],
-                          network_id=fake_share_network['neutron_net_id'],
-                          subnet_id=fake_share_network['neutron_subnet_id'],
-                          device_owner='manila:share'),
-                mock.call(fake_share_network['project_id'],
-                          network_id=fake_share_network['neutron_net_id'],
-                          subnet_id=fake_share_network['neutron_subnet_id'],
-                          device_owner='manila:share'),
-            ]
-            db_api_calls = [
-                mock.call(self.fake_context, fake_network_allocation),
-                mock.call(self.fake_context, fake_network_allocation)
-            ]
-            self.plugin.neutron_api.create_port.assert_has_calls(
-                neutron_api_calls)
-            db_api.network_allocation_create.assert_has_calls(db_api_calls)
+            self.plugin.neutron_api.create_ports.assert_called_once_with(
+                fake_share_network['project_id'],
+                fake_share_network['neutron_net_id'],
+                2,
+                subnet_id=fake_share_network['neutron_subnet_id'],
+                device_owner='manila:share')
+            db_api.network_allocations_create.assert_called_once_with(
+                self.fake_context,
+                [fake_network_allocation, fake_network_allocation])
 
             has_provider_nw_ext.stop()
             save_nw_data.stop()
@@ -174,7 +169,7 @@ class NeutronNetworkPluginTest(test.TestCase):
             self.plugin,
             '_save_neutron_subnet_data').start()
         create_port = mock.patch.object(self.plugin.neutron_api,
-                                        'create_port').start()
+                                        'create_ports').start()
         create_port.side_effect = exception.NetworkException
 
         self.assertRaises(exception.NetworkException,
@@ -188,7 +183,7 @@ class NeutronNetworkPluginTest(test.TestCase):
         save_subnet_data.stop()
         create_port.stop()
 
-    @mock.patch.object(db_api, 'network_allocation_delete', mock.Mock())
+    @mock.patch.object(db_api, 'network_allocations_delete', mock.Mock())
     @mock.patch.object(db_api, 'share_network_update', mock.Mock())
     @mock.patch.object(db_api, 'network_allocations_get_for_share_server',
                        mock.Mock(return_value=[fake_network_allocation]))
@@ -201,13 +196,14 @@ class NeutronNetworkPluginTest(test.TestCase):
             self.plugin.deallocate_network(self.fake_context, share_srv)
             self.plugin.neutron_api.delete_port.assert_called_once_with(
                 fake_network_allocation['id'])
-            db_api.network_allocation_delete.assert_called_once_with(
+            db_api.network_allocations_delete.assert_called_once_with(
                 self.fake_context,
-                fake_network_allocation['id'])
+                [fake_network_allocation['id']])
 
     @mock.patch.object(db_api, 'share_network_update',
                        mock.Mock(return_value=fake_share_network))
     @mock.patch.object(db_api, 'network_allocation_update', mock.Mock())
+    @mock.patch.object(db_api, 'network_allocations_delete', mock.Mock())
     @mock.patch.object(db_api, 'network_allocations_get_for_share_server',
                        mock.Mock(return_value=[fake_network_allocation]))
     def test_deallocate_network_neutron_api_exception(self):
@@ -226,6 +222,8 @@ class NeutronNetworkPluginTest(test.TestCase):
             self.fake_context,
             fake_network_allocation['id'],
             {'status': constants.STATUS_ERROR})
+        db_api.network_allocations_delete.assert_called_once_with(
+            self.fake_context, [])
         delete_port.stop()
 
     @mock.patch.object(db_api, 'share_network_update', mock.Mock())
@@ -248,6 +246,25 @@ class NeutronNetworkPluginTest(test.TestCase):
                 fake_share_network['id'],
                 share_nw_update_dict)
 
+    @mock.patch.object(db_api, 'share_network_update', mock.Mock())
+    def test_save_neutron_network_data_cached(self):
+        neutron_nw_info = {'provider:network_type': 'vlan',
+                           'provider:segmentation_id': 1000}
+        share_network = dict(fake_share_network, network_type='vlan',
+                             segmentation_id=1000)
+
+        with mock.patch.object(self.plugin.neutron_api,
+                               'get_network',
+                               mock.Mock(return_value=neutron_nw_info)):
+            self.plugin._save_neutron_network_data(self.fake_context,
+                                                   share_network)
+            self.plugin._save_neutron_network_data(self.fake_context,
+                                                   share_network)
+
+            self.plugin.neutron_api.get_network.assert_called_once_with(
+                fake_share_network['neutron_net_id'])
+            self.assertFalse(self.plugin.db.share_network_update.called)
+
     @mock.patch.object(db_api, 'share_network_update', mock.Mock())
     def test_save_neutron_subnet_data(self):
         neutron_subnet_info = {'cidr': '10.0.0.0/24',
@@ -266,6 +283,24 @@ class NeutronNetworkPluginTest(test.TestCase):
                 fake_share_network['id'],
                 neutron_subnet_info)
 
+    @mock.patch.object(db_api, 'share_network_update', mock.Mock())
+    def test_save_neutron_subnet_data_cached(self):
+        neutron_subnet_info = {'cidr': '10.0.0.0/24',
+                               'ip_version': 4}
+
+        with mock.patch.object(self.plugin.neutron_api,
+                               'get_subnet',
+                               mock.Mock(return_value=neutron_subnet_info)):
+            self.plugin._save_neutron_subnet_data(self.fake_context,
+                                                  fake_share_network)
+            self.plugin._save_neutron_subnet_data(self.fake_context,
+                                                  fake_share_network)
+
+            self.plugin.neutron_api.get_subnet.assert_called_once_with(
+                fake_share_network['neutron_subnet_id'])
+            self.assertEqual(
+                2, self.plugin.db.share_network_update.call_count)
+
     def test_has_network_provider_extension_true(self):
         extensions = {neutron_constants.PROVIDER_NW_EXT: {}}
         with mock.patch.object(self.plugin.neutron_api,
@@ -284,3 +319,64 @@ class NeutronNetworkPluginTest(test.TestCase):
 
             self.plugin.neutron_api.list_extensions.assert_any_call()
             self.assertFalse(result)
+
+
+class NeutronNetworkPluginFakeNeutronTest(test.TestCase):
+
+    def setUp(self):
+        super(NeutronNetworkPluginFakeNeutronTest, self).setUp()
+        self.client = fake_network.FakeNeutronClient(
+            extensions=[neutron_constants.PROVIDER_NW_EXT],
+            networks={'net': {'provider:network_type': 'vlan',
+                              'provider:segmentation_id': 1000}},
+            subnets={'subnet': {'cidr': '10.0.0.0/24', 'ip_version': 4}})
+        self.plugin = plugin.NeutronNetworkPlugin()
+        self.plugin.neutron_api.client = self.client
+        self.context = context.get_admin_context()
+        self.share_network = db_api.share_network_create(
+            self.context, {'id': 'share-net',
+                           'user_id': 'fake user',
+                           'project_id': 'fake project',
+                           'neutron_net_id': 'net',
+                           'neutron_subnet_id': 'subnet'})
+
+    def _share_server(self):
+        return db_api.share_server_create(
+            self.context, {'share_network_id': self.share_network['id'],
+                           'host': 'fake@host',
+                           'status': constants.STATUS_ACTIVE})
+
+    def test_allocate_and_deallocate_network(self):
+        server = self._share_server()
+
+        allocations = self.plugin.allocate_network(
+            self.context, server, self.share_network, count=4)
+
+        # Extensions, network, subnet and one bulk port creation.
+        self.assertEqual(4, self.client.requests)
+        self.assertEqual(4, len(self.client.ports))
+        self.assertEqual(sorted(self.client.ports),
+                         sorted(allocation['id']
+                                for allocation in allocations))
+        share_network = db_api.share_network_get(self.context,
+                                                 self.share_network['id'])
+        self.assertEqual('vlan', share_network['network_type'])
+        self.assertEqual('10.0.0.0/24', share_network['cidr'])
+
+        self.plugin.deallocate_network(self.context, server['id'])
+
+        self.assertEqual({}, self.client.ports)
+        self.assertEqual([], db_api.network_allocations_get_for_share_server(
+            self.context, server['id']))
+
+    def test_allocate_network_second_server(self):
+        self.plugin.allocate_network(self.context, self._share_server(),
+                                     self.share_network, count=2)
+        self.client.requests = 0
+        share_network = db_api.share_network_get(self.context,
+                                                 self.share_network['id'])
+
+        self.plugin.allocate_network(self.context, self._share_server(),
+                                     share_network, count=2)
+
+        self.assertEqual(1, self.client.requests)
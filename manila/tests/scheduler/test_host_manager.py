@@ -15,6 +15,8 @@
 """
 Tests For HostManager
 """
+import datetime
+
 import mock
 from oslo.config import cfg
 from oslo.utils import timeutils
@@ -134,6 +136,45 @@ class HostManagerTestCase(test.TestCase):
         }
         self.assertDictMatch(service_states, expected)
 
+    def test_apply_service_capabilities_update(self):
+        capabilities = dict(free_capacity_gb=4321, total_capacity_gb=5000,
+                            reserved_percentage=0, vendor_name='fake')
+        self.assertTrue(self.host_manager.apply_service_capabilities_update(
+            'share', 'host1', 5, capabilities))
+        state = self.host_manager.service_states['host1']
+        host_state = self.host_manager.host_state_cls(
+            'host1', capabilities=state)
+        self.host_manager.host_state_map['host1'] = host_state
+
+        with mock.patch.object(timeutils, 'utcnow',
+                               mock.Mock(return_value=31337)):
+            self.assertTrue(
+                self.host_manager.apply_service_capabilities_update(
+                    'share', 'host1', 6, {'free_capacity_gb': 1234},
+                    base_version=5, removed=['vendor_name']))
+
+        self.assertIs(state, self.host_manager.service_states['host1'])
+        self.assertEqual(dict(free_capacity_gb=1234, total_capacity_gb=5000,
+                              reserved_percentage=0, timestamp=31337), state)
+        self.assertEqual(1234, host_state.capabilities['free_capacity_gb'])
+        self.assertEqual(1234, host_state.free_capacity_gb)
+        self.assertEqual(6, self.host_manager.capability_versions['host1'])
+
+    def test_apply_service_capabilities_update_stale(self):
+        self.assertFalse(self.host_manager.apply_service_capabilities_update(
+            'share', 'host1', 6, {'free_capacity_gb': 1234}, base_version=5))
+        self.host_manager.apply_service_capabilities_update(
+            'share', 'host1', 5, {'free_capacity_gb': 4321})
+        self.assertFalse(self.host_manager.apply_service_capabilities_update(
+            'share', 'host1', 8, {'free_capacity_gb': 1234}, base_version=7))
+        self.host_manager.update_service_capabilities(
+            'share', 'host1', {'free_capacity_gb': 4321})
+        self.assertFalse(self.host_manager.apply_service_capabilities_update(
+            'share', 'host1', 6, {'free_capacity_gb': 1234}, base_version=5))
+
+        state = self.host_manager.service_states['host1']
+        self.assertEqual(4321, state['free_capacity_gb'])
+
     def test_get_all_host_states_share(self):
         context = 'fake_context'
         topic = CONF.share_topic
@@ -152,6 +193,25 @@ class HostManagerTestCase(test.TestCase):
                 self.assertEqual(host_state_map[host].service, share_node)
             db.service_get_all_by_topic.assert_called_once_with(context, topic)
 
+    def test_get_all_host_states_share_liveness_from_capabilities(self):
+        self.flags(scheduler_liveness_from_capabilities=True,
+                   service_down_time=60)
+        now = timeutils.utcnow()
+        self.host_manager.service_states = {
+            'host1': dict(free_capacity_gb=1024, total_capacity_gb=1024,
+                          reserved_percentage=0, timestamp=now),
+            'host2': dict(free_capacity_gb=1024, total_capacity_gb=1024,
+                          reserved_percentage=0,
+                          timestamp=now - datetime.timedelta(seconds=61)),
+        }
+        services = [dict(service, updated_at=None)
+                    for service in fakes.SHARE_SERVICES]
+        with mock.patch.object(db, 'service_get_all_by_topic',
+                               mock.Mock(return_value=services)):
+            self.host_manager.get_all_host_states_share('fake_context')
+
+        self.assertEqual(['host1'], list(self.host_manager.host_state_map))
+
 
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class."""
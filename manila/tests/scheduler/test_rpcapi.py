@@ -78,7 +78,15 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  service_name='fake_name',
                                  host='fake_host',
                                  capabilities='fake_capabilities',
-                                 fanout=True)
+                                 fanout=True,
+                                 version='1.0')
+
+    def test_update_service_capabilities_batch(self):
+        self._test_scheduler_api('update_service_capabilities_batch',
+                                 rpc_method='cast',
+                                 updates=['fake_update'],
+                                 fanout=True,
+                                 version='1.1')
 
     def test_create_share(self):
         self._test_scheduler_api('create_share',
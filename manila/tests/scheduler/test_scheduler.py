@@ -73,6 +73,25 @@ class SchedulerManagerTestCase(test.TestCase):
             self.manager.driver.update_service_capabilities.\
                 assert_called_once_with(service_name, host, capabilities)
 
+    @mock.patch.object(share_rpcapi.ShareAPI, 'publish_service_capabilities',
+                       mock.Mock())
+    def test_update_service_capabilities_batch(self):
+        updates = [{'service_name': 'share', 'host': 'host1', 'version': 2,
+                    'capabilities': {}, 'base_version': 2, 'removed': []},
+                   {'service_name': 'share', 'host': 'host2', 'version': 3,
+                    'capabilities': {'fake': 1}}]
+        with mock.patch.object(self.manager.driver,
+                               'apply_service_capabilities_update',
+                               mock.Mock(side_effect=[False, True])):
+            self.manager.update_service_capabilities_batch(self.context,
+                                                           updates)
+
+            self.manager.driver.apply_service_capabilities_update.\
+                assert_has_calls([mock.call(**updates[0]),
+                                  mock.call(**updates[1])])
+        share_rpcapi.ShareAPI.publish_service_capabilities.\
+            assert_called_once_with(self.context, host='host1')
+
     @mock.patch.object(db, 'share_update', mock.Mock())
     def test_create_share_exception_puts_share_in_error_state(self):
         """Test that a NoValideHost exception for create_share.
@@ -1215,14 +1215,14 @@ class EMCShareDriverVNXTestCase(test.TestCase):
         if_ip1 = if_data1['ip_address']
         if_name2 = 'if-' + if_data2['id'][-12:]
         if_ip2 = if_data2['ip_address']
-        hook.append(TD.resp_get_mover_ref())
+        # The mover references were cached by do_setup, and creating the
+        # VDM drops the cached VDM list so it is queried again.
         hook.append(TD.resp_get_vdm_not_exist())
         hook.append(TD.resp_task_succeed())
         hook.append(TD.resp_get_created_vdm())
         hook.append(TD.resp_get_mover_by_id())
         hook.append(TD.resp_task_succeed())
         hook.append(TD.resp_task_succeed())
-        hook.append(TD.resp_get_mover_ref())
         hook.append(TD.resp_task_succeed())
         hook.append(TD.resp_task_succeed())
         ssh_hook.append('', '')
@@ -1230,19 +1230,19 @@ class EMCShareDriverVNXTestCase(test.TestCase):
         helper.SSHConnector.run_ssh = mock.Mock(side_effect=ssh_hook)
         self.driver.setup_server(network_info, None)
         expected_calls = [
-            mock.call(TD.req_get_mover_ref()),
             mock.call(TD.req_get_vdm_by_name()),
             mock.call(TD.req_create_vdm()),
             mock.call(TD.req_get_vdm_by_name()),
             mock.call(TD.req_get_mover_by_id()),
             mock.call(TD.req_create_mover_interface(if_name1, if_ip1)),
             mock.call(TD.req_create_mover_interface(if_name2, if_ip2)),
-            mock.call(TD.req_get_mover_ref()),
             mock.call(TD.req_create_dns_domain()),
             mock.call(TD.req_create_cifs_server(if_ip1)),
         ]
         ssh_calls = [mock.call(TD.req_enable_nfs_service(if_name2))]
         helper.XMLAPIConnector.request.assert_has_calls(expected_calls)
+        self.assertEqual(len(expected_calls),
+                         helper.XMLAPIConnector.request.call_count)
         helper.SSHConnector.run_ssh.assert_has_calls(ssh_calls)
 
     def test_teardown_server(self):
@@ -1647,6 +1647,78 @@ class EMCShareDriverVNXTestCase(test.TestCase):
         helper.XMLAPIConnector.request.assert_has_calls(expected_calls)
         helper.SSHConnector.run_ssh.assert_has_calls(ssh_calls)
 
+    def test_update_share_stats_uses_cached_pools(self):
+        helper.XMLAPIConnector.request = mock.Mock()
+        stats = {}
+
+        self.driver.plugin.update_share_stats(stats)
+
+        self.assertFalse(helper.XMLAPIConnector.request.called)
+        self.assertEqual('0', stats['total_capacity_gb'])
+
+    def test_pool_cache_invalidated_by_file_system_creation(self):
+        hook = RequestSideEffect()
+        hook.append(TD.resp_task_succeed())
+        hook.append(TD.resp_get_storage_pools())
+        helper.XMLAPIConnector.request = mock.Mock(side_effect=hook)
+
+        self.driver.plugin.allocate_container('fakename', 1024,
+                                              TD.default_vdm_id)
+        self.driver.plugin.update_share_stats({})
+
+        expected_calls = [
+            mock.call(TD.req_create_file_system('fakename', 1)),
+            mock.call(TD.req_get_storage_pools()),
+        ]
+        helper.XMLAPIConnector.request.assert_has_calls(expected_calls)
+
+    def test_get_vdm_by_name_cached(self):
+        hook = RequestSideEffect()
+        hook.append(TD.resp_get_vdm_by_name())
+        helper.XMLAPIConnector.request = mock.Mock(side_effect=hook)
+
+        vdm = self.driver.plugin.get_vdm_by_name(TD.default_vdm_name)
+        other = self.driver.plugin.get_vdm_by_name(
+            'vdm-87e12630-c8f8-446c-abe7-364ba256b2cf')
+
+        helper.XMLAPIConnector.request.assert_called_once_with(
+            TD.req_get_vdm_by_name())
+        self.assertEqual(TD.default_vdm_id, vdm['id'])
+        self.assertEqual('55', other['id'])
+
+    def test_query_cache_disabled(self):
+        self.driver.plugin._XMLAPI_helper._cache.ttl = 0
+        hook = RequestSideEffect()
+        hook.append(TD.resp_get_mover_ref())
+        helper.XMLAPIConnector.request = mock.Mock(side_effect=hook)
+
+        mover = self.driver.plugin.get_mover_ref_by_name(
+            TD.default_mover_name)
+
+        helper.XMLAPIConnector.request.assert_called_once_with(
+            TD.req_get_mover_ref())
+        self.assertEqual(TD.default_mover_id, mover['id'])
+
+    def test_task_tracker(self):
+        tracker = helper.TaskTracker()
+        tracker.submit(lambda x: x * 2, 1)
+        tracker.submit(lambda x: x * 2, 2)
+
+        self.assertEqual([2, 4], tracker.wait())
+
+    def test_task_tracker_reraises_after_all_tasks(self):
+        done = []
+
+        def fail():
+            raise exception.EMCVnxXMLAPIError(err='fake')
+
+        tracker = helper.TaskTracker()
+        tracker.submit(fail)
+        tracker.submit(done.append, 'second')
+
+        self.assertRaises(exception.EMCVnxXMLAPIError, tracker.wait)
+        self.assertEqual(['second'], done)
+
     def _fake_safe_get(self, value):
         if value == "emc_share_backend":
             return "vnx"
@@ -0,0 +1,156 @@
+# Copyright (c) 2014 EMC Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from manila.share import configuration as conf
+from manila.share.drivers.emc.plugins.vnx import constants
+from manila.share.drivers.emc.plugins.vnx import helper
+from manila.share.drivers.emc.plugins.vnx import xml_api_schema as schema
+from manila.share.drivers.emc.plugins.vnx import xml_api_template as template
+from manila import test
+
+
+class XMLAPITemplateTestCase(test.TestCase):
+    """Templates must render exactly what the schema classes serialize."""
+
+    def _query(self, body):
+        return constants.XML_HEADER + schema.build_query_package(body).toxml()
+
+    def _task(self, body):
+        return constants.XML_HEADER + schema.build_task_package(body).toxml()
+
+    def test_escape(self):
+        self.assertEqual('a&lt;b&gt;&amp;&quot;c',
+                         template.escape('a<b>&"c'))
+        self.assertEqual('48', template.escape(48))
+
+    def test_query_file_system_by_name(self):
+        expected = self._query(schema.FileSystemQueryParams(
+            aspect_selection=schema.AspectSelectionFileSystem(
+                file_systems='true', file_system_capacity_info='true'),
+            sub_element=schema.FileSystemAlias(name=u'fs&1')))
+        self.assertEqual(expected,
+                         template.query_file_system_by_name('fs&1'))
+
+    def test_new_file_system(self):
+        for is_vdm, ref in ((True, schema.VdmRef(vdm=u'2')),
+                            (False, schema.MoverRef(mover=u'2'))):
+            expected = self._task(schema.NewFileSystem(
+                name=u'fs', mover=ref,
+                destination=schema.StoragePool(
+                    pool=u'48', size=u'1024', may_contain_slices='true')))
+            self.assertEqual(
+                expected,
+                template.new_file_system('fs', 1024, 48, 2, is_vdm=is_vdm))
+
+    def test_delete_file_system(self):
+        expected = self._task(schema.DeleteFileSystem(filesystem=u'86'))
+        self.assertEqual(expected, template.delete_file_system(86))
+
+    def test_extend_file_system(self):
+        expected = self._task(schema.ExtendFileSystem(
+            filesystem=u'86',
+            destination=schema.StoragePool(pool=u'48', size=u'2048')))
+        self.assertEqual(expected, template.extend_file_system(86, 48, 2048))
+
+    def test_mount_points(self):
+        self.assertEqual(
+            self._query(schema.MountQueryParams(
+                mover_or_vdm=schema.MoverOrVdmRef(mover=u'1'))),
+            template.query_mount_points(1))
+        self.assertEqual(
+            self._task(schema.NewMount(
+                sub_element=schema.MoverOrVdmRef(mover=u'1'),
+                file_system=u'86', path=u'/fs')),
+            template.new_mount(86, '/fs', 1))
+        self.assertEqual(
+            self._task(schema.DeleteMount(mover=u'1', path=u'/fs',
+                                          is_vdm=u'True')),
+            template.delete_mount(1, '/fs', True))
+
+    def test_checkpoints(self):
+        self.assertEqual(
+            self._query(schema.CheckpointQueryParams(
+                sub_element=schema.FileSystemAlias(name=u'snap'))),
+            template.query_checkpoint_by_name('snap'))
+        self.assertEqual(
+            self._task(schema.NewCheckpoint(
+                sub_element=schema.SpaceAllocationMethod(
+                    schema.StoragePool(pool=u'48')),
+                checkpoint_of=u'86', name=u'snap')),
+            template.new_checkpoint(86, 'snap', 48))
+        self.assertEqual(
+            self._task(schema.NewCheckpoint(
+                sub_element=schema.SpaceAllocationMethod(
+                    schema.StoragePool(pool=u'48', size=u'10')),
+                checkpoint_of=u'86', name=u'snap')),
+            template.new_checkpoint(86, 'snap', 48, size=10))
+        self.assertEqual(
+            self._task(schema.DeleteCheckpoint(checkpoint=u'1')),
+            template.delete_checkpoint(1))
+
+    def test_pools_and_movers(self):
+        self.assertEqual(self._query(schema.StoragePoolQueryParams()),
+                         template.query_storage_pools())
+        self.assertEqual(
+            self._query(schema.MoverQueryParams(
+                aspect_selection=schema.AspectSelectionMover())),
+            template.query_movers())
+        self.assertEqual(
+            self._query(schema.MoverQueryParams(
+                mover=u'1',
+                aspect_selection=schema.AspectSelectionMover(
+                    mover_deduplication_settings='true',
+                    mover_dns_domains='true',
+                    mover_interfaces='true',
+                    mover_network_devices='true',
+                    mover_nis_domains='true',
+                    mover_routes='true',
+                    movers='true',
+                    mover_statuses='true'))),
+            template.query_mover_by_id(1))
+
+
+class XMLAPIConnectorLoggingTestCase(test.TestCase):
+    def setUp(self):
+        super(XMLAPIConnectorLoggingTestCase, self).setUp()
+        self.configuration = conf.Configuration(None)
+        self.configuration.emc_nas_server = '192.1.1.1'
+        self.configuration.emc_nas_login = 'fakename'
+        self.configuration.emc_nas_password = 'fakepwd'
+        self.configuration.emc_nas_xml_api_log_sample_rate = 1.0
+        self.configuration.emc_nas_xml_api_log_max_body = 8
+        self.stubs.Set(helper.XMLAPIConnector, 'do_setup', mock.Mock())
+        self.connector = helper.XMLAPIConnector(self.configuration)
+
+    def test_truncate_body(self):
+        self.assertEqual('short', self.connector._truncate_body('short'))
+        self.assertEqual('12345678... (2 more characters)',
+                         self.connector._truncate_body('1234567890'))
+
+    def test_should_log_requires_debug(self):
+        self.flags(debug=False)
+        self.assertFalse(self.connector._should_log())
+        self.flags(debug=True)
+        self.assertTrue(self.connector._should_log())
+
+    def test_should_log_sampled(self):
+        self.flags(debug=True)
+        self.connector.log_sample_rate = 0.25
+        with mock.patch('random.random', mock.Mock(return_value=0.5)):
+            self.assertFalse(self.connector._should_log())
+        with mock.patch('random.random', mock.Mock(return_value=0.1)):
+            self.assertTrue(self.connector._should_log())
@@ -14,7 +14,10 @@
 #    under the License.
 
 import contextlib
+import os
 import re
+import shutil
+import tempfile
 
 import mock
 from oslo.serialization import jsonutils
@@ -263,18 +266,35 @@ class GaneshaManagerTestCase(test.TestCase):
             test_path, test_data)
 
     def test_mkindex(self):
-        test_ls_output = 'INDEX.conf\nfakefile.conf\nfakefile.txt'
-        test_index = '%include /fakedir0/export.d/fakefile.conf\n'
-        self.stubs.Set(self._manager, 'execute',
-                       mock.Mock(return_value=(test_ls_output, '')))
+        test_index = ('%include /fakedir0/export.d/fakefile.conf\n'
+                      '%include /fakedir0/export.d/fakefile2.conf\n')
+        self._manager._exports = set(['fakefile2', 'fakefile'])
+        self.stubs.Set(self._manager, 'execute', mock.Mock())
         self.stubs.Set(self._manager, '_write_conf_file', mock.Mock())
         ret = self._manager._mkindex()
-        self._manager.execute.assert_called_once_with(
-            'ls', '/fakedir0/export.d', run_as_root=False)
+        self.assertFalse(self._manager.execute.called)
         self._manager._write_conf_file.assert_called_once_with(
             'INDEX', test_index)
+        self.assertEqual(self._manager._index_requested,
+                         self._manager._index_written)
         self.assertEqual(None, ret)
 
+    def test_mkindex_already_covered(self):
+        # another request wrote the index while this one was waiting
+        self._manager._index_requested = 4
+        self._manager._index_written = 5
+        self.stubs.Set(self._manager, '_write_conf_file', mock.Mock())
+        self._manager._mkindex()
+        self.assertFalse(self._manager._write_conf_file.called)
+
+    def test_mkindex_error(self):
+        self.stubs.Set(self._manager, '_write_conf_file', mock.Mock(
+            side_effect=exception.GaneshaCommandFailure))
+        written = self._manager._index_written
+        self.assertRaises(exception.GaneshaCommandFailure,
+                          self._manager._mkindex)
+        self.assertEqual(written, self._manager._index_written)
+
     def test_read_export_file(self):
         test_args = ('cat', test_path)
         test_kwargs = {'message': 'reading export fakefile'}
@@ -321,11 +341,13 @@ class GaneshaManagerTestCase(test.TestCase):
         self.assertFalse(self._manager._write_conf_file.called)
 
     def test_rm_export_file(self):
+        self._manager._exports.add(test_name)
         self.stubs.Set(self._manager, 'execute',
                        mock.Mock(return_value=('', '')))
         self.stubs.Set(self._manager, '_getpath',
                        mock.Mock(return_value=test_path))
         ret = self._manager._rm_export_file(test_name)
+        self.assertNotIn(test_name, self._manager._exports)
         self._manager._getpath.assert_called_once_with(test_name)
         self._manager.execute.assert_called_once_with('rm', test_path)
         self.assertEqual(None, ret)
@@ -365,6 +387,7 @@ class GaneshaManagerTestCase(test.TestCase):
             'AddExport', 'string:' + test_path,
             'string:EXPORT(Export_Id=101)')
         self._manager._mkindex.assert_called_once_with()
+        self.assertIn(test_name, self._manager._exports)
         self.assertEqual(None, ret)
 
     def test_add_export_error_during_mkindex(self):
@@ -516,3 +539,60 @@ class GaneshaManagerTestCase(test.TestCase):
             'sh', '-c', 'rm /fakedir0/export.d/*.conf')
         self._manager._mkindex.assert_called_once_with()
         self.assertEqual(None, ret)
+
+
+class GaneshaManagerLocalTestCase(test.TestCase):
+    """Tests GaneshaManager running on the Ganesha node."""
+
+    def setUp(self):
+        super(GaneshaManagerLocalTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.export_dir = os.path.join(self.tmpdir, 'export.d')
+        self._execute = mock.Mock(return_value=('', ''))
+        self.stubs.Set(utils, 'synchronized',
+                       mock.Mock(return_value=lambda f: f))
+        self._manager = manager.GaneshaManager(
+            self._execute, 'faketag', local=True,
+            ganesha_config_path=os.path.join(self.tmpdir, 'ganesha.conf'),
+            ganesha_db_path=os.path.join(self.tmpdir, 'db', 'ganesha.db'),
+            ganesha_export_dir=self.export_dir,
+            ganesha_service_name='ganesha.fakeservice')
+        self.stubs.Set(self._manager, '_dbus_send_ganesha', mock.Mock())
+
+    def _read(self, name):
+        with open(os.path.join(self.export_dir, name)) as f:
+            return f.read()
+
+    def test_init(self):
+        self.assertTrue(os.path.isdir(self.export_dir))
+        self.assertEqual('', self._read('INDEX.conf'))
+        self._execute.assert_called_once_with(
+            'service', 'ganesha.fakeservice', 'restart')
+
+    def test_get_export_id(self):
+        self.assertEqual(100, self._manager.get_export_id(bump=False))
+        self.assertEqual(101, self._manager.get_export_id())
+        self.assertEqual(102, self._manager.get_export_id())
+
+    def test_add_and_remove_export(self):
+        self._manager.add_export(test_name, test_dict_str)
+        self._manager._dbus_send_ganesha.assert_called_once_with(
+            'AddExport', 'string:' + self._manager._getpath(test_name),
+            'string:EXPORT(Export_Id=101)')
+        self.assertEqual(test_dict_unicode,
+                         manager.parseconf(self._read('fakefile.conf')))
+        self.assertEqual(
+            '%include ' + self._manager._getpath(test_name) + '\n',
+            self._read('INDEX.conf'))
+
+        self._manager.remove_export(test_name)
+        self.assertEqual(['INDEX.conf'], os.listdir(self.export_dir))
+        self.assertEqual('', self._read('INDEX.conf'))
+        self.assertEqual(1, self._execute.call_count)
+
+    def test_reset_exports(self):
+        self._manager.add_export(test_name, test_dict_str)
+        self._manager.reset_exports()
+        self.assertEqual(['INDEX.conf'], os.listdir(self.export_dir))
+        self.assertEqual('', self._read('INDEX.conf'))
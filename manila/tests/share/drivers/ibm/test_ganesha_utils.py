@@ -14,7 +14,10 @@
 
 """Unit tests for the Ganesha Utils module."""
 
+import os
+import shutil
 import socket
+import tempfile
 import time
 
 import mock
@@ -265,3 +268,121 @@ class GaneshaUtilsTestCase(test.TestCase):
                           ganesha_utils._publish_remote_config, server,
                           self.sshlogin, self.sshkey, self.fake_configpath)
         utils.execute.assert_called_once_with(*scpcmd, run_as_root=False)
+
+    def test_format_export(self):
+        export = {'export_id': '100', 'path': '"/fs0/share-1234"'}
+        result = ganesha_utils.format_export(export)
+        self.assertTrue(result.startswith('EXPORT\n{\n'))
+        self.assertTrue(result.endswith('}\n'))
+        self.assertIn('export_id = 100 ;\n', result)
+        self.assertIn('path = "/fs0/share-1234" ;\n', result)
+
+    def test_read_export_file_and_get_export_ids(self):
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        for export in self.fake_exports.values():
+            path = os.path.join(export_dir,
+                                'share-%s.conf' % export['export_id'])
+            with open(path, 'w') as f:
+                f.write(ganesha_utils.format_export(export))
+        with open(os.path.join(export_dir, 'INDEX.conf'), 'w') as f:
+            f.write('%include "/fake"\n')
+
+        export = ganesha_utils.read_export_file(
+            os.path.join(export_dir, 'share-101.conf'))
+        self.assertEqual(self.fake_exports['101'], export)
+        self.assertIsNone(ganesha_utils.read_export_file(
+            os.path.join(export_dir, 'share-102.conf')))
+        self.assertEqual(['100', '101'],
+                         ganesha_utils.get_export_ids(export_dir))
+
+    def _stub_update_export(self):
+        self.stubs.Set(utils, 'execute', mock.Mock(return_value=('', '')))
+        self.stubs.Set(ganesha_utils, '_write_local_file', mock.Mock())
+        self.stubs.Set(ganesha_utils, '_write_local_index', mock.Mock(
+            return_value='/etc/ganesha/export.d/INDEX.conf'))
+        self.stubs.Set(ganesha_utils, '_publish_remote_config', mock.Mock())
+        self.stubs.Set(ganesha_utils, 'reload_ganesha_config', mock.Mock())
+
+    def test_update_ganesha_export_add(self):
+        self._stub_update_export()
+        export_path = '/etc/ganesha/export.d/share-1234.conf'
+        export = self.fake_exports['100']
+        ganesha_utils.update_ganesha_export(
+            self.servers, self.sshlogin, self.sshkey, 'ganesha.nfsd',
+            'AddExport', export_path, export)
+
+        ganesha_utils._write_local_file.assert_called_once_with(
+            export_path, ganesha_utils.format_export(export))
+        ganesha_utils._write_local_index.assert_called_once_with(
+            '/etc/ganesha/export.d')
+        dbus_cmd = ['dbus-send', '--print-reply', '--system',
+                    '--dest=org.ganesha.nfsd', '/org/ganesha/nfsd/ExportMgr',
+                    'org.ganesha.nfsd.exportmgr.AddExport',
+                    'string:' + export_path, 'string:EXPORT(Export_Id=100)']
+        utils.execute.assert_any_call(*dbus_cmd, run_as_root=True)
+        for remote_ip in self.remote_ips:
+            remote_login = self.sshlogin + '@' + remote_ip
+            utils.execute.assert_any_call('ssh', remote_login, *dbus_cmd,
+                                          run_as_root=False)
+            ganesha_utils._publish_remote_config.assert_any_call(
+                remote_ip, self.sshlogin, self.sshkey, export_path)
+            ganesha_utils._publish_remote_config.assert_any_call(
+                remote_ip, self.sshlogin, self.sshkey,
+                '/etc/ganesha/export.d/INDEX.conf')
+        self.assertEqual(3, utils.execute.call_count)
+        self.assertFalse(ganesha_utils.reload_ganesha_config.called)
+
+    def test_update_ganesha_export_update_keeps_index(self):
+        self._stub_update_export()
+        export_path = '/etc/ganesha/export.d/share-1234.conf'
+        ganesha_utils.update_ganesha_export(
+            self.local_ip, self.sshlogin, self.sshkey, 'ganesha.nfsd',
+            'UpdateExport', export_path, self.fake_exports['100'])
+        self.assertFalse(ganesha_utils._write_local_index.called)
+        self.assertFalse(ganesha_utils._publish_remote_config.called)
+        utils.execute.assert_called_once_with(
+            'dbus-send', '--print-reply', '--system',
+            '--dest=org.ganesha.nfsd', '/org/ganesha/nfsd/ExportMgr',
+            'org.ganesha.nfsd.exportmgr.UpdateExport',
+            'string:' + export_path, 'string:EXPORT(Export_Id=100)',
+            run_as_root=True)
+
+    def test_update_ganesha_export_remove(self):
+        self._stub_update_export()
+        export_path = '/etc/ganesha/export.d/share-1234.conf'
+        ganesha_utils.update_ganesha_export(
+            self.local_ip, self.sshlogin, self.sshkey, 'ganesha.nfsd',
+            'RemoveExport', export_path, self.fake_exports['100'])
+        self.assertFalse(ganesha_utils._write_local_file.called)
+        utils.execute.assert_any_call('rm', '-f', export_path,
+                                      run_as_root=True)
+        utils.execute.assert_any_call(
+            'dbus-send', '--print-reply', '--system',
+            '--dest=org.ganesha.nfsd', '/org/ganesha/nfsd/ExportMgr',
+            'org.ganesha.nfsd.exportmgr.RemoveExport', 'uint16:100',
+            run_as_root=True)
+
+    def test_update_ganesha_export_dbus_failure_restarts(self):
+        self._stub_update_export()
+        utils.execute.side_effect = exception.ProcessExecutionError
+        export_path = '/etc/ganesha/export.d/share-1234.conf'
+        ganesha_utils.update_ganesha_export(
+            self.servers, self.sshlogin, self.sshkey, 'ganesha.nfsd',
+            'UpdateExport', export_path, self.fake_exports['100'])
+        for server in self.servers:
+            ganesha_utils.reload_ganesha_config.assert_any_call(
+                [server], self.sshlogin, 'ganesha.nfsd')
+
+    def test_update_ganesha_export_restart_failure(self):
+        self._stub_update_export()
+        utils.execute.side_effect = exception.ProcessExecutionError
+        ganesha_utils.reload_ganesha_config.side_effect = (
+            exception.GPFSGaneshaException)
+        self.assertRaises(exception.GPFSGaneshaException,
+                          ganesha_utils.update_ganesha_export,
+                          self.servers, self.sshlogin, self.sshkey,
+                          'ganesha.nfsd', 'UpdateExport',
+                          '/etc/ganesha/export.d/share-1234.conf',
+                          self.fake_exports['100'])
+        self.assertEqual(3, ganesha_utils.reload_ganesha_config.call_count)
@@ -19,6 +19,7 @@ import socket
 
 import mock
 from oslo.config import cfg
+import six
 
 from manila import context
 from manila import exception
@@ -468,6 +469,89 @@ class GPFSShareDriverTestCase(test.TestCase):
         )
         self._driver.configuration.gpfs_share_export_ip = orig_value
 
+    def _fake_session(self):
+        session = gpfs.GPFSCommandSession()
+        session.add(('mmcrfileset', self.fakedev, 'fakename'),
+                    'Failed to create %(sharename)s: %(excmsg)s',
+                    sharename='fakename')
+        session.add(('chmod', '777', self.fakesharepath),
+                    'Failed to chmod %(sharename)s: %(excmsg)s',
+                    sharename='fakename')
+        return session
+
+    def test_command_session_script(self):
+        session = self._fake_session()
+        self.assertEqual(
+            'mmcrfileset /dev/gpfs0 fakename || exit 100\n'
+            'chmod 777 /gpfs0/share-fakeid || exit 101',
+            session.script())
+        self.assertEqual(1, session.failed_step(101))
+        self.assertIsNone(session.failed_step(1))
+        self.assertIsNone(session.failed_step(102))
+        self.assertIsNone(session.failed_step(None))
+
+    def test__gpfs_local_execute_session_stops_at_failed_step(self):
+        self._driver._gpfs_execute = mock.Mock(
+            side_effect=exception.ProcessExecutionError)
+        self.assertRaises(exception.GPFSException,
+                          self._driver._gpfs_local_execute_session,
+                          self._fake_session())
+        self._driver._gpfs_execute.assert_called_once_with(
+            'mmcrfileset', self.fakedev, 'fakename')
+
+    def test__gpfs_remote_execute_session(self):
+        session = self._fake_session()
+        ssh = mock.Mock()
+        self._driver.sshpool = mock.Mock()
+        self._driver.sshpool.item.return_value.__enter__ = mock.Mock(
+            return_value=ssh)
+        self._driver.sshpool.item.return_value.__exit__ = mock.Mock(
+            return_value=False)
+        self.stubs.Set(gpfs.processutils, 'ssh_execute',
+                       mock.Mock(return_value=('', '')))
+        self._driver._gpfs_remote_execute_session(session)
+        gpfs.processutils.ssh_execute.assert_called_once_with(
+            ssh, session.script(), check_exit_code=True)
+
+    def test__gpfs_remote_execute_session_step_failure(self):
+        session = self._fake_session()
+        self._driver.sshpool = mock.MagicMock()
+        self.stubs.Set(gpfs.processutils, 'ssh_execute', mock.Mock(
+            side_effect=exception.ProcessExecutionError(exit_code=101)))
+        exc = self.assertRaises(exception.GPFSException,
+                                self._driver._gpfs_remote_execute_session,
+                                session)
+        self.assertIn('Failed to chmod fakename', six.text_type(exc))
+
+    def test__get_gpfs_device_cached(self):
+        fakeout = "Filesystem\n" + self.fakedev
+        self._driver._gpfs_execute = mock.Mock(return_value=(fakeout, ''))
+        self.assertEqual(self.fakedev, self._driver._get_gpfs_device())
+        self.assertEqual(self.fakedev, self._driver._get_gpfs_device())
+        self.assertEqual(1, self._driver._gpfs_execute.call_count)
+
+    def test__get_gpfs_device_cache_disabled(self):
+        self.flags(gpfs_state_cache_ttl=0)
+        fakeout = "Filesystem\n" + self.fakedev
+        self._driver._gpfs_execute = mock.Mock(return_value=(fakeout, ''))
+        self._driver._get_gpfs_device()
+        self._driver._get_gpfs_device()
+        self.assertEqual(2, self._driver._gpfs_execute.call_count)
+
+    def test__check_gpfs_state_down_not_cached(self):
+        fakeout = "mmgetstate::state:\nmmgetstate::down:"
+        self._driver._gpfs_execute = mock.Mock(return_value=(fakeout, ''))
+        self.assertFalse(self._driver._check_gpfs_state())
+        self.assertFalse(self._driver._check_gpfs_state())
+        self.assertEqual(2, self._driver._gpfs_execute.call_count)
+
+    def test__check_gpfs_state_active_cached(self):
+        fakeout = "mmgetstate::state:\nmmgetstate::active:"
+        self._driver._gpfs_execute = mock.Mock(return_value=(fakeout, ''))
+        self.assertTrue(self._driver._check_gpfs_state())
+        self.assertTrue(self._driver._check_gpfs_state())
+        self._driver._gpfs_execute.assert_called_once_with('mmgetstate', '-Y')
+
     def test_knfs_allow_access(self):
         self._knfs_helper._execute = mock.Mock(
             return_value=['/fs0 <world>', 0]
@@ -573,8 +657,13 @@ class GPFSShareDriverTestCase(test.TestCase):
                           self._knfs_helper._publish_access, *cmd)
         self.assertTrue(socket.gethostbyname_ex.called)
         self.assertTrue(socket.gethostname.called)
-        utils.execute.assert_called_once_with(*cmd, run_as_root=True,
-                                              check_exit_code=True)
+        utils.execute.assert_any_call(*cmd, run_as_root=True,
+                                      check_exit_code=True)
+        remote_login = self.sshlogin + '@' + self.remote_ip
+        utils.execute.assert_any_call('ssh', remote_login, *cmd,
+                                      run_as_root=False,
+                                      check_exit_code=True)
+        self.assertEqual(2, utils.execute.call_count)
 
     def test_gnfs_allow_access(self):
         self._gnfs_helper._ganesha_process_request = mock.Mock()
@@ -715,3 +804,75 @@ class GPFSShareDriverTestCase(test.TestCase):
                                                                  local_path)
         self.assertFalse(ganesha_utils.publish_ganesha_config.called)
         self.assertFalse(ganesha_utils.reload_ganesha_config.called)
+
+    def _stub_dynamic_exports(self, export=None):
+        self.flags(gpfs_ganesha_dynamic_exports=True,
+                   ganesha_export_dir='/fake/export.d')
+        self.stubs.Set(ganesha_utils, 'read_export_file',
+                       mock.Mock(return_value=export))
+        self.stubs.Set(ganesha_utils, 'update_ganesha_export', mock.Mock())
+        self.stubs.Set(ganesha_utils, 'parse_ganesha_config', mock.Mock())
+        self.stubs.Set(ganesha_utils, 'publish_ganesha_config', mock.Mock())
+        self.stubs.Set(ganesha_utils, 'reload_ganesha_config', mock.Mock())
+
+    def _assert_export_updated(self, method, export):
+        ganesha_utils.update_ganesha_export.assert_called_once_with(
+            self._gnfs_helper.configuration.gpfs_nfs_server_list,
+            self.sshlogin, self.sshkey, self.gservice, method,
+            '/fake/export.d/fakename.conf', export)
+        self.assertFalse(ganesha_utils.parse_ganesha_config.called)
+        self.assertFalse(ganesha_utils.publish_ganesha_config.called)
+        self.assertFalse(ganesha_utils.reload_ganesha_config.called)
+
+    def test_gnfs__ganesha_process_request_dynamic_new_export(self):
+        self._stub_dynamic_exports()
+        self._gnfs_helper._get_export_options = mock.Mock(return_value={})
+        self._gnfs_helper._get_next_export_id = mock.Mock(return_value=105)
+        self._gnfs_helper._ganesha_process_request(
+            "allow_access", self.fakesharepath, self.share, 'ip', '10.0.0.1')
+        export = ganesha_utils.update_ganesha_export.call_args[0][6]
+        self.assertEqual(105, export['export_id'])
+        self.assertEqual('"10.0.0.1"', export['rw_access'])
+        self.assertEqual('"%s"' % self.fakesharepath, export['path'])
+        self._assert_export_updated('AddExport', export)
+
+    def test_gnfs__ganesha_process_request_dynamic_allow_access(self):
+        export = {'export_id': '100', 'rw_access': '"10.0.0.1"'}
+        self._stub_dynamic_exports(export)
+        self._gnfs_helper._ganesha_process_request(
+            "allow_access", self.fakesharepath, self.share, 'ip', '10.0.0.2')
+        self.assertEqual('"10.0.0.1,10.0.0.2"', export['rw_access'])
+        self._assert_export_updated('UpdateExport', export)
+
+    def test_gnfs__ganesha_process_request_dynamic_access_unchanged(self):
+        export = {'export_id': '100', 'rw_access': '"10.0.0.1"'}
+        self._stub_dynamic_exports(export)
+        self._gnfs_helper._ganesha_process_request(
+            "allow_access", self.fakesharepath, self.share, 'ip', '10.0.0.1')
+        self._gnfs_helper._ganesha_process_request(
+            "deny_access", self.fakesharepath, self.share, 'ip', '10.0.0.2')
+        self.assertFalse(ganesha_utils.update_ganesha_export.called)
+
+    def test_gnfs__ganesha_process_request_dynamic_deny_access(self):
+        export = {'export_id': '100', 'rw_access': '"10.0.0.1,10.0.0.2"'}
+        self._stub_dynamic_exports(export)
+        self._gnfs_helper._ganesha_process_request(
+            "deny_access", self.fakesharepath, self.share, 'ip', '10.0.0.2')
+        self.assertEqual('"10.0.0.1"', export['rw_access'])
+        self._assert_export_updated('UpdateExport', export)
+
+    def test_gnfs__ganesha_process_request_dynamic_remove_export(self):
+        export = {'export_id': '100', 'rw_access': '"10.0.0.1"'}
+        self._stub_dynamic_exports(export)
+        self._gnfs_helper._ganesha_process_request(
+            "remove_export", self.fakesharepath, self.share)
+        self._assert_export_updated('RemoveExport', export)
+
+    def test_gnfs__get_next_export_id(self):
+        self.stubs.Set(ganesha_utils, 'parse_ganesha_config', mock.Mock(
+            return_value=([], {'100': {}})))
+        self.stubs.Set(ganesha_utils, 'get_export_ids',
+                       mock.Mock(return_value=['103']))
+        self.assertEqual(104, self._gnfs_helper._get_next_export_id())
+        self.assertEqual(105, self._gnfs_helper._get_next_export_id())
+        self.assertEqual(1, ganesha_utils.get_export_ids.call_count)
@@ -189,7 +189,8 @@ class GaneshaNASHelperTestCase(test.TestCase):
             ganesha_config_path='/fakedir0/fakeconfig',
             ganesha_export_dir='/fakedir0/export.d',
             ganesha_db_path='/fakedir1/fake.db',
-            ganesha_service_name='ganesha.fakeservice')
+            ganesha_service_name='ganesha.fakeservice',
+            local=False)
         self._helper._load_conf_dir.assert_called_once_with(
             '/fakedir2/faketempl.d', must_exist=False)
         self.assertFalse(self._helper._default_config_hook.called)
@@ -212,7 +213,8 @@ class GaneshaNASHelperTestCase(test.TestCase):
             ganesha_config_path='/fakedir0/fakeconfig',
             ganesha_export_dir='/fakedir0/export.d',
             ganesha_db_path='/fakedir1/fake.db',
-            ganesha_service_name='ganesha.fakeservice')
+            ganesha_service_name='ganesha.fakeservice',
+            local=False)
         self._helper._load_conf_dir.assert_called_once_with(
             '/fakedir2/faketempl.d', must_exist=False)
         self._helper._default_config_hook.assert_called_once_with()
@@ -220,6 +222,18 @@ class GaneshaNASHelperTestCase(test.TestCase):
         self.assertEqual(mock_template, self._helper.export_template)
         self.assertEqual(None, ret)
 
+    def test_init_helper_local(self):
+        self.flags(ganesha_local=True)
+        self.stubs.Set(ganesha.ganesha_manager, 'GaneshaManager',
+                       mock.Mock())
+        self.stubs.Set(self._helper, '_load_conf_dir',
+                       mock.Mock(return_value={'key': 'value'}))
+
+        self._helper.init_helper()
+
+        self.assertTrue(ganesha.ganesha_manager.GaneshaManager.call_args[1][
+            'local'])
+
     def test_default_config_hook(self):
         fake_template = {'key': 'value'}
         self.stubs.Set(ganesha.ganesha_utils, 'path_from',
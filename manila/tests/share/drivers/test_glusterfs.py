@@ -17,6 +17,7 @@ import errno
 import os
 import subprocess
 
+import eventlet
 import mock
 from oslo.config import cfg
 
@@ -468,6 +469,24 @@ class GlusterfsShareDriverTestCase(test.TestCase):
                 self._driver._update_share_stats()
                 self.assertEqual(self._driver._stats, test_data)
 
+    def test_update_share_stats_in_native_thread(self):
+        self._driver._get_mount_point_for_gluster_vol = \
+            mock.Mock(return_value='/mnt/nfs/testvol')
+        test_statvfs = mock.Mock(f_frsize=4096, f_blocks=524288,
+                                 f_bavail=524288)
+        stat = mock.Mock(side_effect=[mock.Mock(st_dev=42),
+                                      mock.Mock(st_dev=43)])
+        statvfs = mock.Mock(return_value=test_statvfs)
+        with mock.patch.object(os, 'stat', stat):
+            with mock.patch.object(os, 'statvfs', statvfs):
+                with mock.patch.object(glusterfs.tpool, 'execute',
+                                       side_effect=lambda f, *a: f(*a)) as tp:
+                    self._driver._update_share_stats()
+
+        tp.assert_has_calls([mock.call(stat, '/mnt/nfs/testvol'),
+                             mock.call(statvfs, '/mnt/nfs/testvol')])
+        self.assertEqual(2, self._driver._stats['total_capacity_gb'])
+
     def test_update_share_stats_gluster_mnt_unavailable(self):
         self._driver._get_mount_point_for_gluster_vol = \
             mock.Mock(return_value='/mnt/nfs/testvol')
@@ -608,7 +627,7 @@ class GlusterfsShareDriverTestCase(test.TestCase):
     def test_manage_access_noop(self):
         cbk = mock.Mock(return_value=True)
         access = {'access_type': 'ip', 'access_to': '10.0.0.1'}
-        self._driver._get_export_dir_dict = mock.Mock()
+        self._driver._get_export_dir_dict = mock.Mock(return_value={})
         self._driver.gluster_address = mock.Mock(
             make_gluster_args=mock.Mock(return_value=(('true',), {})))
         expected_exec = []
@@ -702,6 +721,51 @@ class GlusterfsShareDriverTestCase(test.TestCase):
         self._driver.allow_access(self._context, self.share, access)
         self.assertFalse(self._driver.gluster_address.make_gluster_args.called)
 
+    def test_allow_access_concurrent_calls_coalesced(self):
+        self._driver._get_export_dir_dict = mock.Mock(
+            return_value={'example.com': ['10.0.0.1']})
+        self._driver.gluster_address = mock.Mock(
+            make_gluster_args=mock.Mock(return_value=(('true',), {})))
+        shares = [fake_share(name='fakename%d' % i) for i in range(3)]
+        access = {'access_type': 'ip', 'access_to': '10.0.0.2'}
+
+        threads = [eventlet.spawn(self._driver.allow_access, self._context,
+                                  share, access) for share in shares]
+        for thread in threads:
+            thread.wait()
+
+        self.assertEqual(['true'], fake_utils.fake_execute_get_log())
+        self.assertEqual(
+            '/example.com(10.0.0.1),/fakename0(10.0.0.2),'
+            '/fakename1(10.0.0.2),/fakename2(10.0.0.2)',
+            self._driver.gluster_address.make_gluster_args.call_args[0][-1])
+
+        self._driver.deny_access(self._context, shares[0], access)
+
+        self.assertEqual(1, self._driver._get_export_dir_dict.call_count)
+        self.assertEqual(
+            '/example.com(10.0.0.1),/fakename1(10.0.0.2),'
+            '/fakename2(10.0.0.2)',
+            self._driver.gluster_address.make_gluster_args.call_args[0][-1])
+
+    def test_allow_access_failure_refreshes_export_dir(self):
+        self._driver._get_export_dir_dict = mock.Mock(return_value={})
+        self._driver.gluster_address = mock.Mock(
+            make_gluster_args=mock.Mock(return_value=(('true',), {})))
+        access = {'access_type': 'ip', 'access_to': '10.0.0.1'}
+
+        def exec_runner(*ignore_args, **ignore_kw):
+            raise exception.ProcessExecutionError
+        fake_utils.fake_execute_set_repliers([('true', exec_runner)])
+        self.assertRaises(exception.ProcessExecutionError,
+                          self._driver.allow_access, self._context,
+                          self.share, access)
+        fake_utils.fake_execute_set_repliers([])
+        self._driver.allow_access(self._context, self.share, access)
+
+        self.assertEqual(2, self._driver._get_export_dir_dict.call_count)
+        self.assertEqual(['true', 'true'], fake_utils.fake_execute_get_log())
+
     def test_allow_access_can_be_called_with_extra_arg_share_server(self):
         access = None
         share_server = None
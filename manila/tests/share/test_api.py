@@ -179,13 +179,13 @@ class ShareAPITestCase(test.TestCase):
         self.addCleanup(self.policy_patcher.stop)
 
     def test_get_all_admin_no_filters(self):
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=True)
         shares = self.api.get_all(ctx)
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all')
-        db_driver.share_get_all_by_project.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
             project_id='fake_pid_1', filters={},
         )
@@ -193,12 +193,12 @@ class ShareAPITestCase(test.TestCase):
 
     def test_get_all_admin_filter_by_all_tenants(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=True)
-        self.stubs.Set(db_driver, 'share_get_all',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES))
         shares = self.api.get_all(ctx, {'all_tenants': 1})
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all')
-        db_driver.share_get_all.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at', filters={})
         self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES)
 
@@ -226,33 +226,29 @@ class ShareAPITestCase(test.TestCase):
         # NOTE(vponomaryov): if share_server_id provided, 'all_tenants' opt
         #                    should not make any influence.
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=True)
-        self.stubs.Set(db_driver, 'share_get_all_by_share_server',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[2:]))
-        self.stubs.Set(db_driver, 'share_get_all', mock.Mock())
-        self.stubs.Set(db_driver, 'share_get_all_by_project', mock.Mock())
         shares = self.api.get_all(
             ctx, {'share_server_id': 'fake_server_3', 'all_tenants': 1})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
             mock.call(ctx, 'share', 'list_by_share_server_id'),
         ])
-        db_driver.share_get_all_by_share_server.assert_called_once_with(
-            ctx, 'fake_server_3', sort_dir='desc', sort_key='created_at',
-            filters={},
+        db_driver.share_view_get_all.assert_called_once_with(
+            ctx, share_server_id='fake_server_3', sort_dir='desc',
+            sort_key='created_at', filters={},
         )
-        db_driver.share_get_all_by_project.assert_has_calls([])
-        db_driver.share_get_all.assert_has_calls([])
         self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[2:])
 
     def test_get_all_admin_filter_by_name(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:]))
         shares = self.api.get_all(ctx, {'name': 'bar'})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
-        db_driver.share_get_all_by_project.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
             project_id='fake_pid_2', filters={},
         )
@@ -260,25 +256,25 @@ class ShareAPITestCase(test.TestCase):
 
     def test_get_all_admin_filter_by_name_and_all_tenants(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
-        self.stubs.Set(db_driver, 'share_get_all',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES))
         shares = self.api.get_all(ctx, {'name': 'foo', 'all_tenants': 1})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
-        db_driver.share_get_all.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at', filters={})
         self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[::2])
 
     def test_get_all_admin_filter_by_status(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:]))
         shares = self.api.get_all(ctx, {'status': 'active'})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
-        db_driver.share_get_all_by_project.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
             project_id='fake_pid_2', filters={}
         )
@@ -286,26 +282,26 @@ class ShareAPITestCase(test.TestCase):
 
     def test_get_all_admin_filter_by_status_and_all_tenants(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
-        self.stubs.Set(db_driver, 'share_get_all',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES))
         shares = self.api.get_all(ctx, {'status': 'error', 'all_tenants': 1})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
-        db_driver.share_get_all.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at', filters={})
         self.assertEqual(shares, _FAKE_LIST_OF_ALL_SHARES[1::2])
 
     def test_get_all_non_admin_filter_by_all_tenants(self):
         # Expected share list only by project of non-admin user
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=False)
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:]))
         shares = self.api.get_all(ctx, {'all_tenants': 1})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
-        db_driver.share_get_all_by_project.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
             project_id='fake_pid_2', filters={},
         )
@@ -313,13 +309,13 @@ class ShareAPITestCase(test.TestCase):
 
     def test_get_all_non_admin_with_name_and_status_filters(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=False)
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:]))
         shares = self.api.get_all(ctx, {'name': 'bar', 'status': 'error'})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
-        db_driver.share_get_all_by_project.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
             project_id='fake_pid_2', filters={},
         )
@@ -334,7 +330,7 @@ class ShareAPITestCase(test.TestCase):
             mock.call(ctx, 'share', 'get_all'),
             mock.call(ctx, 'share', 'get_all'),
         ])
-        db_driver.share_get_all_by_project.assert_has_calls([
+        db_driver.share_view_get_all.assert_has_calls([
             mock.call(ctx, sort_dir='desc', sort_key='created_at',
                       project_id='fake_pid_2', filters={}),
             mock.call(ctx, sort_dir='desc', sort_key='created_at',
@@ -342,20 +338,20 @@ class ShareAPITestCase(test.TestCase):
         ])
 
     def test_get_all_with_sorting_valid(self):
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         shares = self.api.get_all(ctx, sort_key='status', sort_dir='asc')
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all')
-        db_driver.share_get_all_by_project.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='asc', sort_key='status',
             project_id='fake_pid_1', filters={},
         )
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[0], shares)
 
     def test_get_all_sort_key_invalid(self):
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         self.assertRaises(
@@ -368,7 +364,7 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share', 'get_all')
 
     def test_get_all_sort_dir_invalid(self):
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         self.assertRaises(
@@ -381,14 +377,14 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share', 'get_all')
 
     def _get_all_filter_metadata_or_extra_specs_valid(self, key):
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         search_opts = {key: {'foo1': 'bar1', 'foo2': 'bar2'}}
         shares = self.api.get_all(ctx, search_opts=search_opts.copy())
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all')
-        db_driver.share_get_all_by_project.assert_called_once_with(
+        db_driver.share_view_get_all.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
             project_id='fake_pid_1', filters=search_opts)
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[0], shares)
@@ -400,7 +396,7 @@ class ShareAPITestCase(test.TestCase):
         self._get_all_filter_metadata_or_extra_specs_valid(key='extra_specs')
 
     def _get_all_filter_metadata_or_extra_specs_invalid(self, key):
-        self.stubs.Set(db_driver, 'share_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         search_opts = {key: "{'foo': 'bar'}"}
@@ -838,40 +834,42 @@ class ShareAPITestCase(test.TestCase):
             db_driver.share_get.assert_called_once_with(
                 self.context, 'fakeid')
 
-    @mock.patch.object(db_driver, 'share_snapshot_get_all_by_project',
+    @mock.patch.object(db_driver, 'share_snapshot_view_get_all',
                        mock.Mock())
     def test_get_all_snapshots_admin_not_all_tenants(self):
         ctx = context.RequestContext('fakeuid', 'fakepid', is_admin=True)
         self.api.get_all_snapshots(ctx)
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all_snapshots')
-        db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={})
+        db_driver.share_snapshot_view_get_all.assert_called_once_with(
+            ctx, project_id='fakepid', sort_dir='desc', sort_key='share_id',
+            filters={})
 
-    @mock.patch.object(db_driver, 'share_snapshot_get_all', mock.Mock())
+    @mock.patch.object(db_driver, 'share_snapshot_view_get_all', mock.Mock())
     def test_get_all_snapshots_admin_all_tenants(self):
         self.api.get_all_snapshots(self.context,
                                    search_opts={'all_tenants': 1})
         share_api.policy.check_policy.assert_called_once_with(
             self.context, 'share', 'get_all_snapshots')
-        db_driver.share_snapshot_get_all.assert_called_once_with(
+        db_driver.share_snapshot_view_get_all.assert_called_once_with(
             self.context, sort_dir='desc', sort_key='share_id', filters={})
 
-    @mock.patch.object(db_driver, 'share_snapshot_get_all_by_project',
+    @mock.patch.object(db_driver, 'share_snapshot_view_get_all',
                        mock.Mock())
     def test_get_all_snapshots_not_admin(self):
         ctx = context.RequestContext('fakeuid', 'fakepid', is_admin=False)
         self.api.get_all_snapshots(ctx)
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all_snapshots')
-        db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={})
+        db_driver.share_snapshot_view_get_all.assert_called_once_with(
+            ctx, project_id='fakepid', sort_dir='desc', sort_key='share_id',
+            filters={})
 
     def test_get_all_snapshots_not_admin_search_opts(self):
         search_opts = {'size': 'fakesize'}
         fake_objs = [{'name': 'fakename1'}, search_opts]
         ctx = context.RequestContext('fakeuid', 'fakepid', is_admin=False)
-        self.stubs.Set(db_driver, 'share_snapshot_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_snapshot_view_get_all',
                        mock.Mock(return_value=fake_objs))
 
         result = self.api.get_all_snapshots(ctx, search_opts)
@@ -879,24 +877,25 @@ class ShareAPITestCase(test.TestCase):
         self.assertEqual([search_opts], result)
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all_snapshots')
-        db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
+        db_driver.share_snapshot_view_get_all.assert_called_once_with(
+            ctx, project_id='fakepid', sort_dir='desc', sort_key='share_id',
             filters=search_opts)
 
     def test_get_all_snapshots_with_sorting_valid(self):
-        self.stubs.Set(db_driver, 'share_snapshot_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_snapshot_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SNAPSHOTS[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         snapshots = self.api.get_all_snapshots(
             ctx, sort_key='status', sort_dir='asc')
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share', 'get_all_snapshots')
-        db_driver.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fake_pid_1', sort_dir='asc', sort_key='status', filters={})
+        db_driver.share_snapshot_view_get_all.assert_called_once_with(
+            ctx, project_id='fake_pid_1', sort_dir='asc', sort_key='status',
+            filters={})
         self.assertEqual(_FAKE_LIST_OF_ALL_SNAPSHOTS[0], snapshots)
 
     def test_get_all_snapshots_sort_key_invalid(self):
-        self.stubs.Set(db_driver, 'share_snapshot_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_snapshot_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SNAPSHOTS[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         self.assertRaises(
@@ -909,7 +908,7 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share', 'get_all_snapshots')
 
     def test_get_all_snapshots_sort_dir_invalid(self):
-        self.stubs.Set(db_driver, 'share_snapshot_get_all_by_project',
+        self.stubs.Set(db_driver, 'share_snapshot_view_get_all',
                        mock.Mock(return_value=_FAKE_LIST_OF_ALL_SNAPSHOTS[0]))
         ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=False)
         self.assertRaises(
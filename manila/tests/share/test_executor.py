@@ -0,0 +1,159 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the share service executor."""
+
+import eventlet
+from eventlet import event
+import mock
+
+from manila import context
+from manila import instrumentation
+from manila.share import executor
+from manila import test
+
+
+class FakeManager(object):
+
+    def __init__(self, configuration):
+        self.executor = executor.ShareExecutor(configuration)
+        self.calls = []
+
+    @executor.queued(executor.ACCESS)
+    def allow_access(self, context, access_id):
+        self.calls.append(('allow_access', access_id))
+        return access_id
+
+
+class OperationPoolTestCase(test.TestCase):
+
+    def setUp(self):
+        super(OperationPoolTestCase, self).setUp()
+        self.context = context.get_admin_context()
+
+    def test_submit(self):
+        pool = executor.OperationPool('access', 2, 10)
+        func = mock.Mock(__name__='func')
+
+        pool.submit(func, self.context, 'fake_id', key='value')
+        self.assertEqual(1, pool.queued)
+        eventlet.sleep(0)
+
+        func.assert_called_once_with(self.context, 'fake_id', key='value')
+        self.assertEqual(0, pool.queued)
+        self.assertEqual(0, pool.running)
+
+    def test_bounded_concurrency(self):
+        release = event.Event()
+        running = []
+
+        def slow(context, i):
+            running.append(i)
+            release.wait()
+
+        pool = executor.OperationPool('create_delete', 2, 10)
+        for i in range(5):
+            pool.submit(slow, self.context, i)
+        eventlet.sleep(0)
+
+        self.assertEqual([0, 1], running)
+        self.assertEqual(2, pool.running)
+        self.assertEqual(3, pool.queued)
+
+        release.send()
+        for i in range(5):
+            eventlet.sleep(0)
+        self.assertEqual([0, 1, 2, 3, 4], running)
+        self.assertEqual(0, pool.running)
+
+    def test_submit_waits_when_full(self):
+        release = event.Event()
+
+        def slow(context):
+            release.wait()
+
+        pool = executor.OperationPool('access', 1, 1)
+        pool.submit(slow, self.context)
+        eventlet.sleep(0)
+        pool.submit(slow, self.context)
+
+        submitter = eventlet.spawn(pool.submit, slow, self.context)
+        eventlet.sleep(0)
+        self.assertFalse(submitter.dead)
+
+        release.send()
+        submitter.wait()
+
+    def test_failure_is_logged(self):
+        func = mock.Mock(__name__='func', side_effect=[Exception, None])
+        pool = executor.OperationPool('access', 1, 10)
+
+        with mock.patch.object(executor.LOG, 'exception') as log:
+            pool.submit(func, self.context, 'fake_id_1')
+            pool.submit(func, self.context, 'fake_id_2')
+            eventlet.sleep(0)
+            eventlet.sleep(0)
+
+        self.assertEqual(1, log.call_count)
+        self.assertEqual(2, func.call_count)
+
+    def test_metrics(self):
+        self.flags(instrumentation_enabled=True)
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        pool = executor.OperationPool('access', 1, 10)
+
+        with mock.patch.object(instrumentation, 'gauge') as gauge:
+            with mock.patch.object(instrumentation, 'emit') as emit:
+                pool.submit(mock.Mock(__name__='func'), self.context)
+                eventlet.sleep(0)
+
+        gauge.assert_has_calls([mock.call('share.queue.access.depth', 1),
+                                mock.call('share.queue.access.depth', 0)])
+        self.assertEqual('share.queue.access.wait', emit.call_args[0][0])
+
+
+class ShareExecutorTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ShareExecutorTestCase, self).setUp()
+        self.context = context.get_admin_context()
+
+    def test_direct(self):
+        manager = FakeManager(executor.CONF)
+
+        self.assertEqual('fake_id', manager.allow_access(self.context,
+                                                         'fake_id'))
+        self.assertEqual([('allow_access', 'fake_id')], manager.calls)
+        self.assertEqual({}, manager.executor.capabilities())
+
+    def test_pools(self):
+        self.flags(share_executor='pools', share_access_workers=3,
+                   share_executor_queue_size=5)
+        manager = FakeManager(executor.CONF)
+
+        self.assertIsNone(manager.allow_access(self.context, 'fake_id'))
+        self.assertEqual([], manager.calls)
+        self.assertEqual(1, manager.executor.capabilities()[
+            'queued_operations'])
+        eventlet.sleep(0)
+
+        self.assertEqual([('allow_access', 'fake_id')], manager.calls)
+        capabilities = manager.executor.capabilities()
+        self.assertEqual(0, capabilities['queued_operations'])
+        self.assertEqual(sorted(executor.OPERATION_CLASSES),
+                         sorted(capabilities['operation_pools']))
+        self.assertEqual({'workers': 3, 'running': 0, 'queued': 0},
+                         capabilities['operation_pools']['access'])
@@ -15,6 +15,7 @@
 
 """Test of Share Manager for Manila."""
 
+import eventlet
 import mock
 from oslo.utils import importutils
 
@@ -374,6 +375,24 @@ class ShareManagerTestCase(test.TestCase):
         shr = db.share_get(self.context, share_id)
         self.assertEqual(shr['status'], 'available')
 
+    def test_create_share_status_changed(self):
+        """Test a share deleted while created is not made available."""
+        share = self._create_share()
+
+        def fake_create_share(context, share_ref, share_server=None):
+            db.share_update(self.context, share['id'],
+                            {'status': 'deleting'})
+            return 'fake_location'
+
+        self.stubs.Set(self.share_manager.driver, 'create_share',
+                       fake_create_share)
+
+        self.share_manager.create_share(self.context, share['id'])
+
+        shr = db.share_get(self.context, share['id'])
+        self.assertEqual('deleting', shr['status'])
+        self.assertEqual('fake_location', shr['export_location'])
+
     def test_create_delete_share_snapshot(self):
         """Test share's snapshot can be created and deleted."""
 
@@ -449,7 +468,8 @@ class ShareManagerTestCase(test.TestCase):
         self.stubs.Set(self.share_manager.driver, "delete_snapshot",
                        mock.Mock(side_effect=_raise_share_snapshot_is_busy))
         share = self._create_share(status='ACTIVE')
-        snapshot = self._create_snapshot(share_id=share['id'])
+        snapshot = self._create_snapshot(status='deleting',
+                                         share_id=share['id'])
         snapshot_id = snapshot['id']
 
         self.share_manager.delete_snapshot(self.context, snapshot_id)
@@ -488,6 +508,7 @@ class ShareManagerTestCase(test.TestCase):
                        mock.Mock(return_value=fake_server))
         self.stubs.Set(db, 'share_update',
                        mock.Mock(return_value=fake_share))
+        self.stubs.Set(db, 'share_status_update', mock.Mock())
         self.stubs.Set(db, 'share_get',
                        mock.Mock(return_value=fake_share))
 
@@ -517,18 +538,16 @@ class ShareManagerTestCase(test.TestCase):
             )
         db.share_server_create.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext), mock.ANY)
-        db.share_update.assert_has_calls([
-            mock.call(
-                utils.IsAMatcher(context.RequestContext),
-                fake_share['id'],
-                {'share_server_id': fake_server['id']},
-            ),
-            mock.call(
-                utils.IsAMatcher(context.RequestContext),
-                fake_share['id'],
-                {'status': 'error'},
-            )
-        ])
+        db.share_update.assert_called_once_with(
+            utils.IsAMatcher(context.RequestContext),
+            fake_share['id'],
+            {'share_server_id': fake_server['id']},
+        )
+        db.share_status_update.assert_called_once_with(
+            utils.IsAMatcher(context.RequestContext),
+            fake_share['id'],
+            'error',
+        )
         self.share_manager._setup_server.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext), fake_server)
 
@@ -944,3 +963,80 @@ class ShareManagerTestCase(test.TestCase):
 
     def test_setup_server_exception_in_driver(self):
         self.setup_server_raise_exception(detail_data_proper=True)
+
+    def test_report_driver_status(self):
+        share_stats = {'share_backend_name': 'fake',
+                       'stats_stale': False}
+        self.stubs.Set(self.share_manager.stats_collector, 'get_stats',
+                       mock.Mock(return_value=share_stats))
+        self.stubs.Set(self.share_manager, 'update_service_capabilities',
+                       mock.Mock())
+
+        self.share_manager._report_driver_status(self.context)
+
+        self.share_manager.update_service_capabilities.\
+            assert_called_once_with(share_stats)
+
+    def test_report_driver_status_no_stats(self):
+        self.stubs.Set(self.share_manager.stats_collector, 'get_stats',
+                       mock.Mock(return_value=None))
+        self.stubs.Set(self.share_manager, 'update_service_capabilities',
+                       mock.Mock())
+
+        self.share_manager._report_driver_status(self.context)
+
+        self.assertFalse(
+            self.share_manager.update_service_capabilities.called)
+
+    def test_stats_collector_config(self):
+        self.flags(share_stats_timeout=5, share_stats_max_interval=600,
+                   share_stats_capacity_change_threshold=2.5,
+                   periodic_interval=30)
+
+        share_manager = manager.ShareManager()
+
+        collector = share_manager.stats_collector
+        self.assertEqual(share_manager.driver, collector.driver)
+        self.assertEqual((5, 30, 600, 2.5),
+                         (collector.timeout, collector.min_interval,
+                          collector.max_interval, collector.change_threshold))
+
+    def test_create_delete_share_expire_stats(self):
+        share = self._create_share()
+        self.stubs.Set(self.share_manager.stats_collector, 'expire',
+                       mock.Mock())
+
+        self.share_manager.create_share(self.context, share['id'])
+        self.share_manager.delete_share(self.context, share['id'])
+
+        self.assertEqual(2, self.share_manager.stats_collector.expire.
+                         call_count)
+
+    def test_report_driver_status_operation_pools(self):
+        self.flags(share_executor='pools')
+        share_manager = manager.ShareManager()
+        self.stubs.Set(share_manager.stats_collector, 'get_stats',
+                       mock.Mock(return_value={'share_backend_name': 'fake'}))
+        self.stubs.Set(share_manager, 'update_service_capabilities',
+                       mock.Mock())
+
+        share_manager._report_driver_status(self.context)
+
+        share_stats = share_manager.update_service_capabilities.call_args[0][0]
+        self.assertEqual(0, share_stats['queued_operations'])
+        self.assertIn('access', share_stats['operation_pools'])
+
+    def test_create_share_queued(self):
+        self.flags(share_executor='pools')
+        share_manager = manager.ShareManager()
+        share = self._create_share()
+
+        share_manager.create_share(self.context, share['id'])
+
+        self.assertEqual('creating', db.share_get(self.context,
+                                                  share['id'])['status'])
+        pool = share_manager.executor.pools['create_delete']
+        while pool.queued or pool.running:
+            eventlet.sleep(0)
+        self.assertEqual('available', db.share_get(self.context,
+                                                   share['id'])['status'])
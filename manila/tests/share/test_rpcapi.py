@@ -128,6 +128,11 @@ class ShareRpcAPITestCase(test.TestCase):
                              filter_properties=None,
                              request_spec=None)
 
+    def test_publish_service_capabilities_to_host(self):
+        self._test_share_api('publish_service_capabilities',
+                             rpc_method='cast',
+                             host='fake_host1')
+
     def test_delete_share(self):
         self._test_share_api('delete_share',
                              rpc_method='cast',
@@ -0,0 +1,178 @@
+# Copyright (c) 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the share driver stats collector."""
+
+import datetime
+
+from eventlet import event
+import mock
+from oslo.utils import timeutils
+
+from manila.share import stats
+from manila import test
+
+
+def _stats(free, total=100):
+    return {'share_backend_name': 'fake',
+            'total_capacity_gb': total,
+            'free_capacity_gb': free}
+
+
+class StatsCollectorTestCase(test.TestCase):
+
+    def setUp(self):
+        super(StatsCollectorTestCase, self).setUp()
+        self.driver = mock.Mock()
+        self.driver.get_share_stats.return_value = _stats(50)
+        self.now = datetime.datetime(2014, 12, 1, 10, 0, 0)
+        timeutils.set_time_override(self.now)
+        self.addCleanup(timeutils.clear_time_override)
+
+    def _advance(self, seconds):
+        timeutils.advance_time_seconds(seconds)
+
+    def test_get_stats(self):
+        collector = stats.StatsCollector(self.driver, timeout=10)
+
+        result = collector.get_stats()
+
+        expected = _stats(50)
+        expected.update({'stats_updated_at': '2014-12-01T10:00:00Z',
+                         'stats_stale': False})
+        self.assertEqual(expected, result)
+        self.driver.get_share_stats.assert_called_once_with(refresh=True)
+
+    def test_get_stats_refreshes_every_call(self):
+        collector = stats.StatsCollector(self.driver, timeout=10)
+
+        collector.get_stats()
+        self._advance(60)
+        collector.get_stats()
+
+        self.assertEqual(2, self.driver.get_share_stats.call_count)
+
+    def test_get_stats_no_stats(self):
+        self.driver.get_share_stats.return_value = {}
+        collector = stats.StatsCollector(self.driver, timeout=10)
+
+        self.assertIsNone(collector.get_stats())
+
+    def test_get_stats_failure_serves_last_stats(self):
+        collector = stats.StatsCollector(self.driver, timeout=10)
+        collector.get_stats()
+        self.driver.get_share_stats.side_effect = Exception('backend down')
+        self._advance(60)
+
+        result = collector.get_stats()
+
+        self.assertEqual(50, result['free_capacity_gb'])
+        self.assertEqual('2014-12-01T10:00:00Z', result['stats_updated_at'])
+        self.assertTrue(result['stats_stale'])
+
+    def test_get_stats_timeout(self):
+        release = event.Event()
+
+        def slow_stats(refresh):
+            release.wait()
+            return _stats(40)
+
+        collector = stats.StatsCollector(self.driver, timeout=10)
+        collector.get_stats()
+        self.driver.get_share_stats.side_effect = slow_stats
+        collector.timeout = 0
+        self._advance(60)
+
+        result = collector.get_stats()
+
+        self.assertEqual(50, result['free_capacity_gb'])
+        self.assertTrue(result['stats_stale'])
+
+        # No other refresh is started while the late one goes on.
+        self._advance(60)
+        collector.get_stats()
+        self.assertEqual(2, self.driver.get_share_stats.call_count)
+
+        release.send()
+        collector.timeout = 10
+        result = collector.get_stats()
+        self.assertEqual(40, result['free_capacity_gb'])
+        self.assertEqual('2014-12-01T10:02:00Z', result['stats_updated_at'])
+        self.assertFalse(result['stats_stale'])
+
+    def test_adaptive_interval(self):
+        collector = stats.StatsCollector(self.driver, timeout=10,
+                                         min_interval=60, max_interval=300,
+                                         change_threshold=1.0)
+        intervals = []
+        for i in range(6):
+            collector.get_stats()
+            intervals.append(collector.interval)
+            self._advance(collector.interval or 60)
+
+        self.assertEqual([0, 60, 120, 240, 300, 300], intervals)
+        self.assertEqual(6, self.driver.get_share_stats.call_count)
+
+    def test_adaptive_interval_skips_refreshes(self):
+        collector = stats.StatsCollector(self.driver, timeout=10,
+                                         min_interval=60, max_interval=300)
+        collector.get_stats()
+        collector.get_stats()
+        self._advance(60)
+        collector.get_stats()
+        self._advance(60)
+
+        result = collector.get_stats()
+
+        self.assertEqual(3, self.driver.get_share_stats.call_count)
+        self.assertFalse(result['stats_stale'])
+
+    def test_adaptive_interval_reset_on_change(self):
+        collector = stats.StatsCollector(self.driver, timeout=10,
+                                         min_interval=60, max_interval=300,
+                                         change_threshold=1.0)
+        collector.get_stats()
+        collector.get_stats()
+        collector.interval = 240
+        self.driver.get_share_stats.return_value = _stats(45)
+        self._advance(240)
+
+        collector.get_stats()
+
+        self.assertEqual(0, collector.interval)
+
+    def test_expire(self):
+        collector = stats.StatsCollector(self.driver, timeout=10,
+                                         min_interval=60, max_interval=300)
+        collector.get_stats()
+        collector.get_stats()
+        self.assertEqual(60, collector.interval)
+
+        collector.expire()
+        collector.get_stats()
+
+        self.assertEqual(3, self.driver.get_share_stats.call_count)
+
+    def test_capacity_change(self):
+        self.assertEqual(0, stats._capacity_change(
+            _stats('infinite', 'infinite'), _stats('infinite', 'infinite')))
+        self.assertEqual(5.0, stats._capacity_change(_stats(50),
+                                                     _stats(45)))
+        self.assertEqual(10.0, stats._capacity_change(_stats(50),
+                                                      _stats(60)))
+        self.assertIsNone(stats._capacity_change(
+            _stats(50), _stats('unknown')))
+        self.assertIsNone(stats._capacity_change(_stats(50),
+                                                 _stats(40, 0)))
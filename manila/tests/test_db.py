@@ -13,10 +13,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-"""Tests for the ShareServer and ShareServerBackendDetails tables."""
+"""Tests for the share server tables and the read models of the DB API."""
 
+import datetime
+import re
+
+from oslo.utils import timeutils
+import sqlalchemy
+
+from manila.common import constants
 from manila import context
 from manila import db
+from manila.db.sqlalchemy import api as db_api
 from manila import exception
 from manila.openstack.common import uuidutils
 from manila import test
@@ -177,6 +185,22 @@ class ShareServerTableTestCase(test.TestCase):
             db.share_server_backend_details_get(self.ctxt, server['id'])
         )
 
+    def test_share_server_backend_details_set_update(self):
+        server = self._create_share_server()
+        db.share_server_backend_details_set(self.ctxt, server['id'],
+                                            {'value1': '1', 'value2': '2'})
+
+        db.share_server_backend_details_set(self.ctxt, server['id'],
+                                            {'value2': '3'})
+
+        self.assertDictMatch(
+            {'value1': '1', 'value2': '3'},
+            db.share_server_backend_details_get(self.ctxt, server['id']))
+        rows = db_api.model_query(
+            self.ctxt, db_api.models.ShareServerBackendDetails).\
+            filter_by(share_server_id=server['id']).all()
+        self.assertEqual(2, len(rows))
+
     def test_share_server_backend_details_set_not_found(self):
         fake_id = 'FAKE_UUID'
         self.assertRaises(exception.ShareServerNotFound,
@@ -215,3 +239,579 @@ class ShareServerTableTestCase(test.TestCase):
                          num_records - 1)
         self.assertFalse(
             db.share_server_backend_details_get(self.ctxt, server['id']))
+
+
+class ReadModelTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ReadModelTestCase, self).setUp()
+        self.ctxt = context.RequestContext(user_id='user_id',
+                                           project_id='project_id',
+                                           is_admin=True)
+        self.user_ctxt = context.RequestContext(user_id='user_id',
+                                                project_id='project_id')
+
+    def _create_share(self, **values):
+        share = {'project_id': 'project_id', 'user_id': 'user_id',
+                 'size': 1, 'status': 'available', 'share_proto': 'NFS'}
+        share.update(values)
+        return db.share_create(self.ctxt, share)
+
+    def test_share_view_get_all(self):
+        volume_type = db.volume_type_create(self.ctxt, {'name': 'gold'})
+        share = self._create_share(metadata={'k1': 'v1', 'k2': 'v2'},
+                                   volume_type_id=volume_type['id'])
+        self._create_share(project_id='other')
+
+        shares = db.share_view_get_all(self.user_ctxt,
+                                       project_id='project_id')
+
+        self.assertEqual(1, len(shares))
+        record = shares[0]
+        orm_share = db.share_get(self.ctxt, share['id'])
+        for key, value in orm_share.iteritems():
+            if key not in ('share_metadata', 'volume_type') and \
+                    key in record:
+                self.assertEqual(value, record[key])
+        self.assertEqual(share['id'], record.id)
+        self.assertEqual({'k1': 'v1', 'k2': 'v2'},
+                         dict((item['key'], item['value'])
+                              for item in record.get('share_metadata')))
+        self.assertEqual('gold', record['volume_type']['name'])
+
+    def test_share_view_get_all_filters_and_sorting(self):
+        self._create_share(display_name='b', metadata={'k': 'v'})
+        self._create_share(display_name='a', metadata={'k': 'v'})
+        self._create_share(display_name='c')
+        deleted = self._create_share(display_name='d', metadata={'k': 'v'})
+        db.share_delete(self.ctxt, deleted['id'])
+
+        shares = db.share_view_get_all(
+            self.ctxt, filters={'metadata': {'k': 'v'}},
+            sort_key='display_name', sort_dir='asc')
+
+        self.assertEqual(['a', 'b'], [s['display_name'] for s in shares])
+        shares = dict((s['display_name'], s)
+                      for s in db.share_view_get_all(self.ctxt))
+        self.assertEqual(['a', 'b', 'c'], sorted(shares))
+        self.assertEqual([], shares['c'].share_metadata)
+
+    def test_share_view_get_all_by_share_server(self):
+        self._create_share(share_server_id='fake_server')
+        self._create_share()
+
+        shares = db.share_view_get_all(self.user_ctxt,
+                                       share_server_id='fake_server')
+
+        self.assertEqual(['fake_server'],
+                         [s['share_server_id'] for s in shares])
+
+    def test_share_view_get_all_projects_requires_admin(self):
+        self.assertRaises(exception.AdminRequired,
+                          db.share_view_get_all, self.user_ctxt)
+
+    def test_share_snapshot_view_get_all(self):
+        share = self._create_share()
+        db.share_snapshot_create(self.ctxt, {
+            'share_id': share['id'], 'project_id': 'project_id',
+            'user_id': 'user_id', 'status': 'available', 'size': 1,
+            'display_name': 'snap'})
+        db.share_snapshot_create(self.ctxt, {
+            'share_id': share['id'], 'project_id': 'other',
+            'user_id': 'user_id', 'status': 'available', 'size': 1})
+
+        snapshots = db.share_snapshot_view_get_all(
+            self.user_ctxt, project_id='project_id')
+
+        self.assertEqual(['snap'], [s['display_name'] for s in snapshots])
+        self.assertEqual(share['id'], snapshots[0].share_id)
+        self.assertEqual(2, len(db.share_snapshot_view_get_all(self.ctxt)))
+        self.assertRaises(exception.AdminRequired,
+                          db.share_snapshot_view_get_all, self.user_ctxt)
+
+    def test_share_network_view_get_all(self):
+        values = {'project_id': 'project_id', 'user_id': 'user_id'}
+        network = db.share_network_create(self.ctxt,
+                                          dict(values, name='net1'))
+        db.share_network_create(self.ctxt, dict(values, name='net2',
+                                                project_id='other'))
+        security_service = db.security_service_create(
+            self.ctxt, {'project_id': 'project_id', 'type': 'ldap'})
+        db.share_network_add_security_service(self.ctxt, network['id'],
+                                              security_service['id'])
+
+        self.assertEqual(2, len(db.share_network_view_get_all(self.ctxt)))
+        networks = db.share_network_view_get_all(self.ctxt,
+                                                 project_id='project_id')
+        self.assertEqual(['net1'], [n['name'] for n in networks])
+        networks = db.share_network_view_get_all(
+            self.ctxt, security_service_id=security_service['id'])
+        self.assertEqual([network['id']], [n.id for n in networks])
+
+    def test_share_server_view_get_all(self):
+        network = db.share_network_create(
+            self.ctxt, {'project_id': 'project_id', 'user_id': 'user_id',
+                        'name': 'net1'})
+        server = db.share_server_create(
+            self.ctxt, {'share_network_id': network['id'], 'host': 'host1',
+                        'status': 'ACTIVE'})
+        db.share_server_create(
+            self.ctxt, {'share_network_id': 'missing', 'host': 'host2',
+                        'status': 'ACTIVE'})
+
+        servers = dict((s.id, s)
+                       for s in db.share_server_view_get_all(self.ctxt))
+
+        self.assertEqual(2, len(servers))
+        record = servers.pop(server['id'])
+        self.assertEqual('host1', record['host'])
+        self.assertEqual('project_id', record.project_id)
+        self.assertEqual('net1', record.share_network_name)
+        record = servers.popitem()[1]
+        self.assertIsNone(record.project_id)
+        self.assertIsNone(record.share_network_name)
+
+    def _create_server(self, network, **values):
+        server = {'share_network_id': network['id'], 'host': 'host',
+                  'status': 'ACTIVE'}
+        server.update(values)
+        return db.share_server_create(self.ctxt, server)
+
+    def test_share_server_view_get_all_filters(self):
+        values = {'project_id': 'project_id', 'user_id': 'user_id'}
+        net1 = db.share_network_create(self.ctxt, dict(values, name='net1'))
+        net2 = db.share_network_create(self.ctxt, dict(values, name='net2',
+                                                       project_id='other'))
+        server1 = self._create_server(net1, host='host1')
+        server2 = self._create_server(net2, host='host2', status='ERROR')
+
+        def ids(filters):
+            return [s.id for s in db.share_server_view_get_all(
+                self.ctxt, filters=filters)]
+
+        self.assertEqual([server1['id']], ids({'host': 'host1'}))
+        self.assertEqual([server2['id']], ids({'status': 'ERROR'}))
+        self.assertEqual([server2['id']], ids({'project_id': 'other'}))
+        self.assertEqual([server1['id']],
+                         ids({'share_network_name': 'net1'}))
+        self.assertEqual([server1['id']], ids({'share_network': 'net1'}))
+        self.assertEqual([server2['id']],
+                         ids({'share_network': net2['id']}))
+        self.assertEqual([], ids({'share_network': 'net1',
+                                  'host': 'host2'}))
+        self.assertEqual([], ids({'fake_key': 'fake_value'}))
+
+    def test_share_server_view_get_all_paginated(self):
+        network = db.share_network_create(
+            self.ctxt, {'project_id': 'project_id', 'user_id': 'user_id'})
+        servers = [self._create_server(network) for _i in range(5)]
+        expected = [s['id'] for s in sorted(
+            servers, key=lambda s: (s['created_at'], s['id']))]
+
+        page = db.share_server_view_get_all(self.ctxt, limit=2)
+        self.assertEqual(expected[:2], [s.id for s in page])
+        page = db.share_server_view_get_all(self.ctxt, limit=2,
+                                            marker=page[-1].id)
+        self.assertEqual(expected[2:4], [s.id for s in page])
+        self.assertRaises(exception.ShareServerNotFound,
+                          db.share_server_view_get_all, self.ctxt,
+                          marker='missing')
+
+    def test_share_server_view_get_all_query_count(self):
+        network = db.share_network_create(
+            self.ctxt, {'project_id': 'project_id', 'user_id': 'user_id',
+                        'name': 'net'})
+        counts = []
+        for _i in range(2):
+            for _j in range(5):
+                self._create_server(network)
+            with test.QueryCounter() as counter:
+                db.share_server_view_get_all(
+                    self.ctxt, filters={'share_network': 'net'})
+            counts.append(counter.count)
+
+        self.assertEqual([1, 1], counts)
+
+    def test_share_network_ids_get_by_security_services(self):
+        values = {'project_id': 'project_id', 'user_id': 'user_id'}
+        net1 = db.share_network_create(self.ctxt, dict(values))
+        net2 = db.share_network_create(self.ctxt, dict(values))
+        ss_ids = []
+        counts = []
+        for networks in ([net1, net2], [net2], []):
+            ss = db.security_service_create(
+                self.ctxt, {'project_id': 'project_id', 'type': 'ldap'})
+            ss_ids.append(ss['id'])
+            for network in networks:
+                db.share_network_add_security_service(
+                    self.ctxt, network['id'], ss['id'])
+            with test.QueryCounter() as counter:
+                result = db.share_network_ids_get_by_security_services(
+                    self.ctxt, ss_ids)
+            counts.append(counter.count)
+
+        self.assertEqual([1, 1, 1], counts)
+        self.assertEqual(sorted([net1['id'], net2['id']]),
+                         sorted(result[ss_ids[0]]))
+        self.assertEqual([net2['id']], result[ss_ids[1]])
+        self.assertEqual([], result[ss_ids[2]])
+        self.assertEqual({}, db.share_network_ids_get_by_security_services(
+            self.ctxt, []))
+
+    def test_read_record(self):
+        record = db_api.ShareRecord()
+        record['id'] = 'fake_id'
+        record.update({'size': 2})
+
+        self.assertEqual('fake_id', record.id)
+        self.assertEqual(2, record['size'])
+        self.assertIsNone(record.get('status'))
+        self.assertEqual('default', record.get('missing', 'default'))
+        self.assertIn('size', record)
+        self.assertNotIn('missing', record)
+        self.assertEqual(record.to_dict(), dict(record))
+        self.assertRaises(AttributeError, setattr, record, 'missing', 1)
+
+
+class ServiceHeartbeatTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ServiceHeartbeatTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+
+    def _service(self, host):
+        return db.service_create(self.ctxt, {'host': host,
+                                             'binary': 'manila-share',
+                                             'topic': 'share',
+                                             'report_count': 0,
+                                             'availability_zone': 'nova'})
+
+    def test_service_heartbeat(self):
+        first = self._service('host1')
+        second = self._service('host2')
+
+        with test.QueryCounter() as counter:
+            missing = db.service_heartbeat(
+                self.ctxt, [first['id'], second['id']], 'zone')
+        db.service_heartbeat(self.ctxt, [first['id']])
+
+        self.assertEqual([], missing)
+        statements = [statement for statement in counter.statements
+                      if statement != 'BEGIN']
+        self.assertEqual(1, len(statements))
+        self.assertTrue(statements[0].startswith('UPDATE services'))
+        first = db.service_get(self.ctxt, first['id'])
+        second = db.service_get(self.ctxt, second['id'])
+        self.assertEqual(2, first['report_count'])
+        self.assertEqual(1, second['report_count'])
+        self.assertEqual('zone', first['availability_zone'])
+        self.assertIsNotNone(second['updated_at'])
+
+    def test_service_heartbeat_missing_services(self):
+        first = self._service('host1')
+        second = self._service('host2')
+        db.service_destroy(self.ctxt, second['id'])
+
+        missing = db.service_heartbeat(
+            self.ctxt, [first['id'], second['id'], 12345])
+
+        self.assertEqual([second['id'], 12345], missing)
+        self.assertEqual(
+            1, db.service_get(self.ctxt, first['id'])['report_count'])
+
+
+class NetworkAllocationsTestCase(test.TestCase):
+
+    def setUp(self):
+        super(NetworkAllocationsTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.server = db.share_server_create(
+            self.ctxt, {'share_network_id': 'fake-share-net-id',
+                        'host': 'host1',
+                        'status': 'ACTIVE'})
+
+    def _values(self, count):
+        return [{'id': uuidutils.generate_uuid(),
+                 'share_server_id': self.server['id'],
+                 'ip_address': '10.0.0.%d' % i,
+                 'mac_address': 'fa:16:3e:00:00:%02x' % i,
+                 'status': constants.STATUS_ACTIVE} for i in range(count)]
+
+    def test_network_allocations_create(self):
+        values = self._values(3)
+
+        with test.QueryCounter() as counter:
+            allocations = db.network_allocations_create(self.ctxt, values)
+
+        self.assertEqual([value['id'] for value in values],
+                         [allocation['id'] for allocation in allocations])
+        inserts = [statement for statement in counter.statements
+                   if statement.startswith('INSERT')]
+        self.assertEqual(1, len(inserts))
+        stored = db.network_allocations_get_for_share_server(
+            self.ctxt, self.server['id'])
+        self.assertEqual(sorted(value['ip_address'] for value in values),
+                         sorted(allocation['ip_address']
+                                for allocation in stored))
+
+    def test_network_allocations_delete(self):
+        values = self._values(3)
+        db.network_allocations_create(self.ctxt, values)
+
+        with test.QueryCounter() as counter:
+            db.network_allocations_delete(
+                self.ctxt, [values[0]['id'], values[2]['id']])
+        db.network_allocations_delete(self.ctxt, [])
+
+        statements = [statement for statement in counter.statements
+                      if statement != 'BEGIN']
+        self.assertEqual(1, len(statements))
+        stored = db.network_allocations_get_for_share_server(
+            self.ctxt, self.server['id'])
+        self.assertEqual([values[1]['id']],
+                         [allocation['id'] for allocation in stored])
+        deleted = db_api.model_query(
+            self.ctxt, db_api.models.NetworkAllocation,
+            read_deleted='only').all()
+        self.assertEqual(sorted([values[0]['id'], values[2]['id']]),
+                         sorted(allocation['deleted']
+                                for allocation in deleted))
+
+
+class KeyValuesSetTestCase(test.TestCase):
+
+    def setUp(self):
+        super(KeyValuesSetTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+
+    def _statements(self, counter, table):
+        # The statements on the table itself, not those joining it.
+        return [statement.split()[0] for statement in counter.statements
+                if re.search(r'(FROM|INTO|UPDATE) %s\b' % table, statement)]
+
+    def test_share_metadata_update(self):
+        share = db.share_create(
+            self.ctxt, {'size': 1, 'status': 'available',
+                        'share_proto': 'NFS',
+                        'metadata': {'kept': 'v', 'changed': 'v',
+                                     'removed': 'v'}})
+        metadata = dict(('new%d' % i, 'v') for i in range(100))
+        metadata.update({'kept': 'v', 'changed': 'w'})
+
+        with test.QueryCounter() as counter:
+            db.share_metadata_update(self.ctxt, share['id'], metadata, True)
+
+        self.assertEqual(metadata,
+                         db.share_metadata_get(self.ctxt, share['id']))
+        self.assertEqual(['SELECT', 'INSERT', 'UPDATE', 'UPDATE'],
+                         self._statements(counter, 'share_metadata'))
+
+    def test_share_metadata_update_without_delete(self):
+        share = db.share_create(
+            self.ctxt, {'size': 1, 'status': 'available',
+                        'share_proto': 'NFS', 'metadata': {'k1': 'v1'}})
+
+        db.share_metadata_update(self.ctxt, share['id'], {'k2': 'v2'},
+                                 False)
+
+        self.assertEqual({'k1': 'v1', 'k2': 'v2'},
+                         db.share_metadata_get(self.ctxt, share['id']))
+
+    def test_share_metadata_update_unchanged(self):
+        share = db.share_create(
+            self.ctxt, {'size': 1, 'status': 'available',
+                        'share_proto': 'NFS', 'metadata': {'k1': 'v1'}})
+
+        with test.QueryCounter() as counter:
+            db.share_metadata_update(self.ctxt, share['id'], {'k1': 'v1'},
+                                     True)
+
+        self.assertEqual(['SELECT'],
+                         self._statements(counter, 'share_metadata'))
+
+    def test_volume_type_extra_specs_update_or_create(self):
+        volume_type = db.volume_type_create(
+            self.ctxt, {'name': 'gold', 'extra_specs': {'k1': 'v1',
+                                                        'k2': 'v2'}})
+        db.volume_type_extra_specs_delete(self.ctxt, volume_type['id'], 'k2')
+
+        db.volume_type_extra_specs_update_or_create(
+            self.ctxt, volume_type['id'], {'k1': 'w1', 'k2': 'w2'})
+
+        self.assertEqual({'k1': 'w1', 'k2': 'w2'},
+                         db.volume_type_extra_specs_get(self.ctxt,
+                                                        volume_type['id']))
+
+
+class CompareAndSetTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CompareAndSetTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.share = db.share_create(
+            self.ctxt, {'size': 1, 'status': 'creating',
+                        'share_proto': 'NFS'})
+
+    def test_share_status_update(self):
+        with test.QueryCounter() as counter:
+            updated = db.share_status_update(
+                self.ctxt, self.share['id'], 'available',
+                expected_status='creating',
+                values={'export_location': 'fake_location'})
+
+        self.assertTrue(updated)
+        self.assertEqual(['UPDATE'], [statement.split()[0] for statement
+                                      in counter.statements
+                                      if statement != 'BEGIN'])
+        share = db.share_get(self.ctxt, self.share['id'])
+        self.assertEqual('available', share['status'])
+        self.assertEqual('fake_location', share['export_location'])
+
+    def test_share_status_update_unexpected_status(self):
+        updated = db.share_status_update(
+            self.ctxt, self.share['id'], 'available',
+            expected_status=['deleting', 'error'])
+
+        self.assertFalse(updated)
+        self.assertEqual('creating',
+                         db.share_get(self.ctxt, self.share['id'])['status'])
+
+    def test_share_status_update_unconditional(self):
+        self.assertTrue(db.share_status_update(self.ctxt, self.share['id'],
+                                               'error'))
+        self.assertFalse(db.share_status_update(self.ctxt, 'fake_id',
+                                                'error'))
+
+    def test_share_snapshot_status_update(self):
+        snapshot = db.share_snapshot_create(
+            self.ctxt, {'share_id': self.share['id'], 'size': 1,
+                        'status': 'creating'})
+
+        self.assertTrue(db.share_snapshot_status_update(
+            self.ctxt, snapshot['id'], 'available',
+            expected_status='creating', values={'progress': '100%'}))
+        self.assertFalse(db.share_snapshot_status_update(
+            self.ctxt, snapshot['id'], 'available',
+            expected_status='creating'))
+
+        snapshot = db.share_snapshot_get(self.ctxt, snapshot['id'])
+        self.assertEqual('available', snapshot['status'])
+        self.assertEqual('100%', snapshot['progress'])
+
+    def test_share_access_state_update(self):
+        access = db.share_access_create(
+            self.ctxt, {'share_id': self.share['id'], 'access_type': 'ip',
+                        'access_to': '10.0.0.1'})
+
+        self.assertTrue(db.share_access_state_update(
+            self.ctxt, access['id'], 'active', expected_state='new'))
+        self.assertEqual('active',
+                         db.share_access_get(self.ctxt, access['id'])['state'])
+
+        db.share_access_delete(self.ctxt, access['id'])
+        self.assertFalse(db.share_access_state_update(
+            self.ctxt, access['id'], 'error'))
+
+
+class PurgeDeletedRowsTestCase(test.TestCase):
+
+    def setUp(self):
+        super(PurgeDeletedRowsTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.before = datetime.datetime(2014, 12, 1)
+        self.addCleanup(timeutils.clear_time_override)
+
+    def _create_share(self, deleted_at=None, **values):
+        share = {'project_id': 'project_id', 'user_id': 'user_id',
+                 'size': 1, 'status': 'available', 'share_proto': 'NFS',
+                 'metadata': {'k': 'v'}}
+        share.update(values)
+        share = db.share_create(self.ctxt, share)
+        if deleted_at:
+            timeutils.set_time_override(deleted_at)
+            db.share_delete(self.ctxt, share['id'])
+            timeutils.clear_time_override()
+        return share
+
+    def _share_ids(self):
+        return sorted(share['id'] for share in db_api.model_query(
+            self.ctxt, db_api.models.Share, read_deleted='yes').all())
+
+    def test_purge(self):
+        old = self._create_share(deleted_at=datetime.datetime(2014, 11, 1))
+        recent = self._create_share(deleted_at=datetime.datetime(2014, 12, 2))
+        live = self._create_share()
+
+        counts = db.purge_deleted_rows(self.ctxt, self.before)
+
+        self.assertEqual(1, counts['shares'])
+        self.assertEqual(1, counts['share_metadata'])
+        self.assertLess(list(counts).index('share_metadata'),
+                        list(counts).index('shares'))
+        self.assertNotIn(old['id'], self._share_ids())
+        self.assertEqual(sorted([recent['id'], live['id']]),
+                         self._share_ids())
+
+    def test_purge_keeps_referenced_rows(self):
+        server = db.share_server_create(
+            self.ctxt, {'share_network_id': 'fake_net_id', 'host': 'host',
+                        'status': 'ACTIVE'})
+        timeutils.set_time_override(datetime.datetime(2014, 11, 1))
+        db.share_server_delete(self.ctxt, server['id'])
+        timeutils.clear_time_override()
+        self._create_share(share_server_id=server['id'])
+
+        counts = db.purge_deleted_rows(self.ctxt, self.before)
+
+        self.assertEqual(0, counts['share_servers'])
+        self.assertEqual(1, len(db_api.model_query(
+            self.ctxt, db_api.models.ShareServer, read_deleted='yes').all()))
+
+    def test_purge_dry_run(self):
+        self._create_share(deleted_at=datetime.datetime(2014, 11, 1))
+
+        counts = db.purge_deleted_rows(self.ctxt, self.before, dry_run=True)
+
+        self.assertEqual(1, counts['shares'])
+        self.assertEqual(1, counts['share_metadata'])
+        self.assertEqual(1, len(self._share_ids()))
+
+    def test_purge_batches(self):
+        for i in range(5):
+            self._create_share(deleted_at=datetime.datetime(2014, 11, 1))
+        progress = []
+
+        counts = db.purge_deleted_rows(
+            self.ctxt, self.before, batch_size=2,
+            progress=lambda table, count: progress.append((table, count)))
+
+        self.assertEqual(5, counts['shares'])
+        self.assertEqual([('shares', 2), ('shares', 4), ('shares', 5)],
+                         [call for call in progress if call[0] == 'shares'])
+        self.assertEqual([], self._share_ids())
+
+    def test_purge_archive(self):
+        share = self._create_share(deleted_at=datetime.datetime(2014, 11, 1))
+
+        db.purge_deleted_rows(self.ctxt, self.before, archive=True)
+        self._create_share(deleted_at=datetime.datetime(2014, 11, 1))
+        db.purge_deleted_rows(self.ctxt, self.before, archive=True)
+
+        shadow = sqlalchemy.Table('shadow_shares', sqlalchemy.MetaData(),
+                                  autoload=True,
+                                  autoload_with=db_api.get_engine())
+        rows = db_api.get_engine().execute(shadow.select()).fetchall()
+        self.assertEqual(2, len(rows))
+        self.assertIn(share['id'], [row['id'] for row in rows])
+        self.assertEqual([], self._share_ids())
+
+    def test_purge_archive_shadow_table_mismatch(self):
+        self._create_share(deleted_at=datetime.datetime(2014, 11, 1))
+        sqlalchemy.Table(
+            'shadow_shares', sqlalchemy.MetaData(bind=db_api.get_engine()),
+            sqlalchemy.Column('id', sqlalchemy.String(36))).create()
+
+        self.assertRaises(exception.ShadowTableMismatch,
+                          db.purge_deleted_rows, self.ctxt, self.before,
+                          archive=True)
+        self.assertEqual(1, len(self._share_ids()))
@@ -0,0 +1,211 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+
+import mock
+import sqlalchemy
+
+from manila import instrumentation
+from manila import test
+
+
+class FakeDriver(object):
+
+    def create_share(self, share):
+        return 'created %s' % share
+
+    def _private(self):
+        pass
+
+
+class FakeManager(object):
+
+    def __init__(self):
+        self.driver = FakeDriver()
+
+    @instrumentation.timed_method('share.manager')
+    def create_share(self, share):
+        return self.driver.create_share(share)
+
+
+class InstrumentationTestCase(test.TestCase):
+
+    def setUp(self):
+        super(InstrumentationTestCase, self).setUp()
+        self.flags(instrumentation_enabled=True)
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+
+    def _metrics(self):
+        return dict((name, metric[0])
+                    for name, metric in instrumentation._METRICS.items())
+
+    def test_timed(self):
+        timings = instrumentation.begin('api')
+        with instrumentation.timed('db'):
+            pass
+        with instrumentation.timed('db'):
+            pass
+        instrumentation.finish(timings)
+
+        self.assertIsNone(instrumentation.current())
+        self.assertEqual(2, timings.counts['db'])
+        self.assertIn('db=', timings.summary())
+        self.assertTrue(timings.server_timing(0.5).startswith(
+            'total;dur=500.0, db;dur='))
+        self.assertEqual({'api': 1, 'api.db': 1}, self._metrics())
+
+    def test_timed_without_timings(self):
+        with instrumentation.timed('db'):
+            pass
+
+        self.assertEqual({}, self._metrics())
+
+    @mock.patch.object(instrumentation.LOG, 'warn')
+    def test_finish_logs_slow_calls(self, mock_warn):
+        self.flags(instrumentation_slow_threshold=0)
+
+        instrumentation.finish(instrumentation.begin('api'))
+
+        self.assertEqual(1, mock_warn.call_count)
+
+    def test_timed_method(self):
+        manager = FakeManager()
+        instrumentation.instrument_methods(manager.driver, 'share.driver',
+                                           FakeDriver)
+
+        self.assertEqual('created fake', manager.create_share('fake'))
+        self.assertEqual({'share.manager.create_share': 1,
+                          'share.manager.create_share.share.driver': 1,
+                          'share.driver.create_share': 1},
+                         self._metrics())
+        self.assertIsNone(instrumentation.current())
+
+    def test_timed_method_disabled(self):
+        self.flags(instrumentation_enabled=False)
+
+        self.assertEqual('created fake', FakeManager().create_share('fake'))
+        self.assertEqual({}, self._metrics())
+
+    def test_instrument_engine(self):
+        engine = sqlalchemy.create_engine('sqlite://')
+        instrumentation.instrument_engine(engine)
+        timings = instrumentation.begin('api')
+
+        engine.execute('SELECT 1')
+        engine.execute('SELECT 2')
+        instrumentation.finish(timings)
+
+        self.assertEqual(2, timings.counts['db'])
+        self.assertEqual(2, self._metrics()['db.query'])
+
+    def test_instrument_rpc_client(self):
+        client = mock.Mock()
+        timed_client = instrumentation.instrument_rpc_client(client)
+        timings = instrumentation.begin('api')
+
+        timed_client.prepare(server='host').cast('ctxt', 'method', arg=1)
+        instrumentation.finish(timings)
+
+        client.prepare.assert_called_once_with(server='host')
+        client.prepare.return_value.cast.assert_called_once_with(
+            'ctxt', 'method', arg=1)
+        self.assertEqual(1, timings.counts['rpc'])
+
+    def test_instrument_rpc_client_disabled(self):
+        self.flags(instrumentation_enabled=False)
+        client = mock.Mock()
+
+        self.assertIs(client, instrumentation.instrument_rpc_client(client))
+
+    def test_render_metrics(self):
+        instrumentation.emit('api.ShareController.index', 0.25)
+        instrumentation.emit('api.ShareController.index', 0.5)
+
+        self.assertEqual(
+            '# TYPE manila_timing_seconds summary\n'
+            'manila_timing_seconds_count{name="api.ShareController.index"} '
+            '2\n'
+            'manila_timing_seconds_sum{name="api.ShareController.index"} '
+            '0.750000\n',
+            instrumentation.render_metrics())
+
+    def test_render_metrics_gauges(self):
+        instrumentation.emit('db.query', 0.5)
+        instrumentation.gauge('share.queue.access.depth', 3)
+        instrumentation.gauge('share.queue.access.depth', 2)
+
+        self.assertEqual(
+            '# TYPE manila_timing_seconds summary\n'
+            'manila_timing_seconds_count{name="db.query"} 1\n'
+            'manila_timing_seconds_sum{name="db.query"} 0.500000\n'
+            '# TYPE manila_gauge gauge\n'
+            'manila_gauge{name="share.queue.access.depth"} 2\n',
+            instrumentation.render_metrics())
+
+    def test_render_metrics_histograms(self):
+        instrumentation.observe('lock.fake.wait', 0.005)
+        instrumentation.observe('lock.fake.wait', 0.5)
+        instrumentation.observe('lock.fake.wait', 20)
+
+        self.assertEqual(
+            '# TYPE manila_timing_seconds summary\n'
+            '# TYPE manila_histogram_seconds histogram\n'
+            'manila_histogram_seconds_bucket{name="lock.fake.wait",'
+            'le="0.001"} 0\n'
+            'manila_histogram_seconds_bucket{name="lock.fake.wait",'
+            'le="0.01"} 1\n'
+            'manila_histogram_seconds_bucket{name="lock.fake.wait",'
+            'le="0.1"} 1\n'
+            'manila_histogram_seconds_bucket{name="lock.fake.wait",'
+            'le="1.0"} 2\n'
+            'manila_histogram_seconds_bucket{name="lock.fake.wait",'
+            'le="10.0"} 2\n'
+            'manila_histogram_seconds_bucket{name="lock.fake.wait",'
+            'le="+Inf"} 3\n'
+            'manila_histogram_seconds_count{name="lock.fake.wait"} 3\n'
+            'manila_histogram_seconds_sum{name="lock.fake.wait"} '
+            '20.505000\n',
+            instrumentation.render_metrics())
+
+    @mock.patch('socket.socket')
+    def test_gauge_to_statsd(self, mock_socket):
+        self.flags(instrumentation_statsd_host='127.0.0.1')
+
+        instrumentation.gauge('share.queue.access.depth', 4)
+
+        mock_socket.return_value.sendto.assert_called_once_with(
+            'manila.share.queue.access.depth:4|g', ('127.0.0.1', 8125))
+
+    @mock.patch('socket.socket')
+    def test_emit_to_statsd(self, mock_socket):
+        self.flags(instrumentation_statsd_host='127.0.0.1')
+
+        instrumentation.emit('db.query', 0.0125)
+
+        mock_socket.assert_called_once_with(socket.AF_INET,
+                                            socket.SOCK_DGRAM)
+        mock_socket.return_value.sendto.assert_called_once_with(
+            'manila.db.query:12.500|ms', ('127.0.0.1', 8125))
+
+    @mock.patch('socket.socket')
+    def test_emit_to_statsd_ignores_errors(self, mock_socket):
+        self.flags(instrumentation_statsd_host='127.0.0.1')
+        mock_socket.return_value.sendto.side_effect = socket.error
+
+        instrumentation.emit('db.query', 0.0125)
+
+        self.assertEqual({'db.query': 1}, self._metrics())
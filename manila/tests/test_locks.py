@@ -0,0 +1,195 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the named locks."""
+
+import os
+import subprocess
+import sys
+
+import eventlet
+import mock
+
+from manila import instrumentation
+from manila import locks
+from manila import test
+
+
+class LockManagerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(LockManagerTestCase, self).setUp()
+        self.manager = locks.LockManager()
+        self.lock_path = locks.CONF.lock_path
+
+    def _names(self):
+        return set(name for mutex, names in self.manager._stripes
+                   for name in names)
+
+    def test_lock_serializes(self):
+        events = []
+
+        def work(i):
+            with self.manager.lock('fake_lock'):
+                events.append(('start', i))
+                eventlet.sleep(0)
+                events.append(('end', i))
+
+        threads = [eventlet.spawn(work, i) for i in range(3)]
+        for thread in threads:
+            thread.wait()
+
+        self.assertEqual([('start', 0), ('end', 0), ('start', 1),
+                          ('end', 1), ('start', 2), ('end', 2)], events)
+
+    def test_lock_names_are_independent(self):
+        with self.manager.lock('fake_lock_1'):
+            thread = eventlet.spawn(self._lock_once, 'fake_lock_2')
+            self.assertTrue(thread.wait())
+
+    def _lock_once(self, name):
+        with self.manager.lock(name):
+            return True
+
+    def test_nested_locks_of_one_stripe(self):
+        manager = locks.LockManager(stripes=1)
+
+        with manager.lock('fake_lock_1'):
+            with manager.lock('fake_lock_2'):
+                pass
+
+    def test_names_dropped_when_unused(self):
+        with self.manager.lock('fake_lock'):
+            self.assertEqual(set(['fake_lock']), self._names())
+            thread = eventlet.spawn(self._lock_once, 'fake_lock')
+            eventlet.sleep(0)
+        self.assertTrue(thread.wait())
+
+        self.assertEqual(set(), self._names())
+
+    def test_names_dropped_on_error(self):
+        def fail():
+            with self.manager.lock('fake_lock'):
+                raise ValueError()
+
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(set(), self._names())
+
+    def _try_lock(self, path):
+        """Tries to lock the file from another process."""
+        return subprocess.call(
+            [sys.executable, '-c',
+             'import fcntl, sys\n'
+             'fcntl.lockf(open(sys.argv[1], "a"), '
+             'fcntl.LOCK_EX | fcntl.LOCK_NB)', path],
+            stderr=subprocess.PIPE) == 0
+
+    def test_external_lock(self):
+        path = os.path.join(self.lock_path, 'manila-fake_lock')
+
+        with self.manager.lock('fake_lock', 'manila-', external=True):
+            lock_file = self.manager._files[path]
+            self.assertFalse(self._try_lock(path))
+
+        self.assertTrue(self._try_lock(path))
+        self.assertFalse(lock_file.in_use)
+        with self.manager.lock('fake_lock', 'manila-', external=True):
+            self.assertIs(lock_file, self.manager._files[path])
+
+    def test_external_lock_disabled(self):
+        self.flags(disable_process_locking=True)
+
+        with self.manager.lock('fake_lock', external=True):
+            pass
+
+        self.assertEqual({}, dict(self.manager._files))
+
+    def test_external_lock_waits(self):
+        path = os.path.join(self.lock_path, 'fake_lock')
+        other = subprocess.Popen(
+            [sys.executable, '-c',
+             'import fcntl, sys\n'
+             'f = open(sys.argv[1], "a")\n'
+             'fcntl.lockf(f, fcntl.LOCK_EX)\n'
+             'print("locked")\n'
+             'sys.stdout.flush()\n'
+             'sys.stdin.read()', path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.assertEqual('locked', other.stdout.readline().strip())
+        thread = eventlet.spawn(self._lock_once_external, 'fake_lock')
+        eventlet.sleep(0.05)
+        self.assertFalse(thread.dead)
+
+        other.communicate('')
+        self.assertTrue(thread.wait())
+
+    def _lock_once_external(self, name):
+        with self.manager.lock(name, external=True):
+            return True
+
+    def test_lock_file_pool_is_bounded(self):
+        self.flags(lock_file_pool_size=2)
+
+        for i in range(4):
+            with self.manager.lock('fake_lock_%d' % i, external=True):
+                pass
+
+        self.assertEqual([os.path.join(self.lock_path, 'fake_lock_%d' % i)
+                          for i in (2, 3)], list(self.manager._files))
+
+    def test_lock_file_in_use_not_closed(self):
+        self.flags(lock_file_pool_size=1)
+
+        with self.manager.lock('fake_lock_1', external=True):
+            with self.manager.lock('fake_lock_2', external=True):
+                pass
+            path = os.path.join(self.lock_path, 'fake_lock_1')
+            self.assertIsNotNone(self.manager._files[path].file)
+
+    def test_lock_timing(self):
+        self.flags(instrumentation_enabled=True,
+                   instrumentation_lock_timing=True)
+
+        with mock.patch.object(instrumentation, 'observe') as observe:
+            with self.manager.lock(
+                    'share_manager_0c4e2a3a-4b4f-4e3f-9f3e-2c1d5c4b3a2f'):
+                pass
+
+        self.assertEqual(['lock.share_manager_<id>.wait',
+                          'lock.share_manager_<id>.hold'],
+                         [call[0][0] for call in observe.call_args_list])
+
+    def test_lock_timing_disabled(self):
+        self.flags(instrumentation_enabled=True)
+
+        with mock.patch.object(instrumentation, 'observe') as observe:
+            with self.manager.lock('fake_lock'):
+                pass
+
+        self.assertFalse(observe.called)
+
+
+class SynchronizedTestCase(test.TestCase):
+
+    def test_synchronized(self):
+        @locks.synchronized('fake_lock', 'manila-', external=True)
+        def f(arg):
+            return arg
+
+        with mock.patch.object(locks, 'lock',
+                               wraps=locks.lock) as lock:
+            self.assertEqual('fake_arg', f('fake_arg'))
+
+        lock.assert_called_once_with('fake_lock', 'manila-', True, None)
@@ -68,3 +68,58 @@ class SchedulerDependentManagerTestCase(test.TestCase):
         self.assertEqual(fake_sched_manager.host, host)
         self.assertEqual(fake_sched_manager.service_name, service_name)
         importutils.import_module.assert_called_once_with(db_driver)
+
+    @mock.patch.object(importutils, 'import_module', mock.Mock())
+    def test_capabilities_update(self):
+        fake_sched_manager = manager.SchedulerDependentManager(
+            'fake_host', 'fake_driver', 'share')
+        self.assertIsNone(fake_sched_manager.capabilities_update())
+        capabilities = {'free_capacity_gb': 10, 'pools': {'a': 1},
+                        'vendor_name': 'fake'}
+
+        fake_sched_manager.update_service_capabilities(capabilities)
+        full = fake_sched_manager.capabilities_update()
+        unchanged = fake_sched_manager.capabilities_update()
+        capabilities['free_capacity_gb'] = 5
+        capabilities['pools']['a'] = 2
+        del capabilities['vendor_name']
+        delta = fake_sched_manager.capabilities_update()
+
+        self.assertEqual({'service_name': 'share', 'host': 'fake_host',
+                          'version': full['version'],
+                          'capabilities': {'free_capacity_gb': 10,
+                                           'pools': {'a': 1},
+                                           'vendor_name': 'fake'}}, full)
+        self.assertEqual({'service_name': 'share', 'host': 'fake_host',
+                          'version': full['version'],
+                          'base_version': full['version'],
+                          'capabilities': {}, 'removed': []}, unchanged)
+        self.assertEqual({'service_name': 'share', 'host': 'fake_host',
+                          'version': full['version'] + 1,
+                          'base_version': full['version'],
+                          'capabilities': {'free_capacity_gb': 5,
+                                           'pools': {'a': 2}},
+                          'removed': ['vendor_name']}, delta)
+        self.assertNotIn('base_version',
+                         fake_sched_manager.capabilities_update(full=True))
+
+    @mock.patch.object(importutils, 'import_module', mock.Mock())
+    def test_publish_service_capabilities_deltas(self):
+        self.flags(publish_capability_deltas=True)
+        fake_sched_manager = manager.SchedulerDependentManager(
+            'fake_host', 'fake_driver', 'share')
+        fake_sched_manager.update_service_capabilities({'fake': 1})
+        rpcapi = fake_sched_manager.scheduler_rpcapi
+
+        with mock.patch.object(rpcapi, 'update_service_capabilities_batch'):
+            with mock.patch.object(rpcapi, 'update_service_capabilities'):
+                fake_sched_manager._publish_service_capabilities('context')
+                self.assertFalse(
+                    rpcapi.update_service_capabilities_batch.called)
+                fake_sched_manager._publish_service_capabilities('context',
+                                                                 full=True)
+                self.assertFalse(rpcapi.update_service_capabilities.called)
+
+            update = rpcapi.update_service_capabilities_batch.call_args[0][1]
+            self.assertEqual([{'fake': 1}],
+                             [u['capabilities'] for u in update])
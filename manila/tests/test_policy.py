@@ -16,6 +16,7 @@
 """Test of Policy Engine For Manila."""
 
 import os.path
+import time
 
 import mock
 from oslo.config import cfg
@@ -63,6 +64,24 @@ class PolicyFileTestCase(test.TestCase):
                 self.target,
             )
 
+    def test_policy_reload_interval(self):
+        with utils.tempdir() as tmpdir:
+            tmpfilename = os.path.join(tmpdir, 'policy')
+            self.flags(policy_file=tmpfilename, policy_reload_interval=60)
+            with open(tmpfilename, "w") as policyfile:
+                policyfile.write("""{"example:test": []}""")
+            policy.init(tmpfilename)
+            with mock.patch.object(common_policy.fileutils,
+                                   'read_cached_file') as read_cached_file:
+                policy.enforce(self.context, "example:test", self.target)
+                policy.init()
+                self.assertFalse(read_cached_file.called)
+                with mock.patch('time.time',
+                                mock.Mock(return_value=time.time() + 61)):
+                    read_cached_file.return_value = (False, None)
+                    policy.init()
+                self.assertTrue(read_cached_file.called)
+
 
 class PolicyTestCase(test.TestCase):
     def setUp(self):
@@ -159,6 +178,57 @@ class PolicyTestCase(test.TestCase):
         policy.enforce(admin_context, lowercase_action, self.target)
         policy.enforce(admin_context, uppercase_action, self.target)
 
+    def test_enforce_memoizes_decision(self):
+        action = "example:my_file"
+        target = {'project_id': 'fake'}
+        with mock.patch.object(policy._ENFORCER, 'decide',
+                               mock.Mock(return_value=True)) as decide:
+            policy.enforce(self.context, action, target)
+            policy.enforce(self.context, action, dict(target, foo='bar'))
+            self.assertEqual(1, decide.call_count)
+            policy.enforce(self.context, action, {'project_id': 'another'})
+            self.assertEqual(2, decide.call_count)
+
+    def test_enforce_memo_tracks_credentials(self):
+        action = "example:lowercase_admin"
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, action, self.target)
+        self.context.roles = ['member', 'admin']
+        self.assertTrue(policy.enforce(self.context, action, self.target))
+
+    def test_enforce_memo_reset_by_set_rules(self):
+        action = "example:allowed"
+        policy.enforce(self.context, action, self.target)
+        self.rules[action] = [["false:false"]]
+        self._set_rules()
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, action, self.target)
+
+    def test_enforce_http_not_memoized(self):
+        action = "example:get_http"
+        self.assertIsNone(
+            policy._ENFORCER.decision_key(action, {}, self.context))
+
+    def test_compiled_rules_match_checks(self):
+        self.rules.update({
+            "example:not": "not role:member",
+            "example:literal": "'fake':%(user_id)s",
+            "example:missing_key": "user_id:%(missing)s",
+            "example:undefined_rule": "rule:example:noexist",
+        })
+        self._set_rules()
+        creds = self.context.to_dict()
+        targets = ({}, {'project_id': 'fake', 'user_id': 'fake'},
+                   {'project_id': 'another', 'user_id': 'other'})
+        for rule, check in policy._ENFORCER.rules.items():
+            if rule == "example:get_http":
+                continue
+            for target in targets:
+                self.assertEqual(
+                    check(target, creds, policy._ENFORCER),
+                    policy._ENFORCER.decide(rule, target, creds),
+                    "%s %s" % (rule, target))
+
 
 class DefaultPolicyTestCase(test.TestCase):
 
@@ -21,6 +21,9 @@
 Unit Tests for remote procedure calls using queue
 """
 
+import os
+import signal
+
 import mock
 from oslo.config import cfg
 
@@ -57,6 +60,13 @@ class FakeManager(manager.Manager):
         return 'manager'
 
 
+class FakeSchedulerDependentManager(manager.SchedulerDependentManager):
+    """Fake manager publishing capabilities for tests."""
+    def __init__(self, host=None, db_driver=None, service_name=None):
+        super(FakeSchedulerDependentManager, self).__init__(
+            host=host, db_driver=db_driver, service_name='share')
+
+
 class ExtendedService(service.Service):
     def test_method(self):
         return 'service'
@@ -141,7 +151,7 @@ class ServiceTestCase(test.TestCase):
                        mock.Mock(side_effect=fake_service_get_by_args))
     @mock.patch.object(service.db, 'service_create',
                        mock.Mock(return_value=service_ref))
-    @mock.patch.object(service.db, 'service_get',
+    @mock.patch.object(service.db, 'service_heartbeat',
                        mock.Mock(side_effect=fake_service_get))
     def test_report_state_newly_disconnected(self):
         serv = service.Service(host, binary, topic, CONF.fake_manager)
@@ -152,17 +162,15 @@ class ServiceTestCase(test.TestCase):
             mock.ANY, host, binary)
         service.db.service_create.assert_called_once_with(
             mock.ANY, service_create)
-        service.db.service_get.assert_called_once_with(mock.ANY, mock.ANY)
+        service.db.service_heartbeat.assert_called_once_with(
+            mock.ANY, [service_ref['id']], 'nova')
 
     @mock.patch.object(service.db, 'service_get_by_args',
                        mock.Mock(side_effect=fake_service_get_by_args))
     @mock.patch.object(service.db, 'service_create',
                        mock.Mock(return_value=service_ref))
-    @mock.patch.object(service.db, 'service_get',
-                       mock.Mock(return_value=service_ref))
-    @mock.patch.object(service.db, 'service_update',
-                       mock.Mock(return_value=service_ref.
-                                 update({'report_count': 1})))
+    @mock.patch.object(service.db, 'service_heartbeat',
+                       mock.Mock(return_value=[]))
     def test_report_state_newly_connected(self):
         serv = service.Service(host, binary, topic, CONF.fake_manager)
         serv.start()
@@ -173,10 +181,129 @@ class ServiceTestCase(test.TestCase):
             mock.ANY, host, binary)
         service.db.service_create.assert_called_once_with(
             mock.ANY, service_create)
-        service.db.service_get.assert_called_once_with(
-            mock.ANY, service_ref['id'])
-        service.db.service_update.assert_called_once_with(
-            mock.ANY, service_ref['id'], mock.ANY)
+        service.db.service_heartbeat.assert_called_once_with(
+            mock.ANY, [service_ref['id']], 'nova')
+
+    @mock.patch.object(service.db, 'service_get_by_args',
+                       mock.Mock(side_effect=fake_service_get_by_args))
+    @mock.patch.object(service.db, 'service_create',
+                       mock.Mock(return_value=service_ref))
+    @mock.patch.object(service.db, 'service_heartbeat',
+                       mock.Mock(return_value=[service_ref['id']]))
+    def test_report_state_recreates_missing_service(self):
+        serv = service.Service(host, binary, topic, CONF.fake_manager)
+        serv.start()
+        serv.report_state()
+        self.assertEqual(2, service.db.service_create.call_count)
+
+    def test_report_state_counts_reports(self):
+        serv = service.Service(host, binary, topic, CONF.fake_manager)
+        serv.start()
+        self.addCleanup(db.service_destroy, context.get_admin_context(),
+                        serv.service_id)
+
+        serv.report_state()
+        serv.report_state()
+
+        ref = db.service_get(context.get_admin_context(), serv.service_id)
+        self.assertEqual(2, ref['report_count'])
+        self.assertIsNotNone(ref['updated_at'])
+
+
+class StateReporterTestCase(test.TestCase):
+
+    def setUp(self):
+        super(StateReporterTestCase, self).setUp()
+        self.flags(batch_report_state=True)
+        self.mock_looping_call = mock.Mock()
+        self.stubs.Set(service.loopingcall, 'FixedIntervalLoopingCall',
+                       self.mock_looping_call)
+        self.mock_heartbeat = mock.Mock(return_value=[])
+        self.stubs.Set(service.db, 'service_heartbeat', self.mock_heartbeat)
+
+    def _service(self, host):
+        serv = service.Service(host, binary, topic, CONF.fake_manager,
+                               report_interval=10)
+        serv.start()
+        self.addCleanup(db.service_destroy, context.get_admin_context(),
+                        serv.service_id)
+        self.addCleanup(serv.stop)
+        return serv
+
+    def test_one_update_for_all_services(self):
+        first = self._service('host1')
+        second = self._service('host2')
+
+        service._STATE_REPORTER.report_state()
+
+        self.mock_looping_call.assert_called_once_with(
+            service._STATE_REPORTER.report_state)
+        self.mock_heartbeat.assert_called_once_with(
+            mock.ANY, [first.service_id, second.service_id], 'nova')
+
+    def test_stop(self):
+        first = self._service('host1')
+        second = self._service('host2')
+
+        first.stop()
+        service._STATE_REPORTER.report_state()
+        second.stop()
+
+        self.mock_heartbeat.assert_called_once_with(
+            mock.ANY, [second.service_id], 'nova')
+        self.mock_looping_call.return_value.stop.assert_called_once_with()
+        self.assertIsNone(service._STATE_REPORTER.timer)
+
+
+class CapabilityPublisherTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CapabilityPublisherTestCase, self).setUp()
+        self.flags(publish_capability_deltas=True)
+        self.mock_looping_call = mock.Mock()
+        self.stubs.Set(service.loopingcall, 'FixedIntervalLoopingCall',
+                       self.mock_looping_call)
+
+    def _service(self, host):
+        serv = service.Service(
+            host, binary, topic,
+            'manila.tests.test_service.FakeSchedulerDependentManager',
+            report_interval=0, periodic_interval=60)
+        serv.start()
+        self.addCleanup(db.service_destroy, context.get_admin_context(),
+                        serv.service_id)
+        self.addCleanup(serv.stop)
+        return serv
+
+    def test_one_update_for_all_services(self):
+        first = self._service('host1')
+        second = self._service('host2')
+        self._service('host3')
+        first.manager.update_service_capabilities({'fake': 1})
+        second.manager.update_service_capabilities({'fake': 2})
+        rpcapi = first.manager.scheduler_rpcapi
+
+        with mock.patch.object(rpcapi, 'update_service_capabilities_batch'):
+            service._CAPABILITY_PUBLISHER.publish()
+
+            self.assertEqual(
+                1, rpcapi.update_service_capabilities_batch.call_count)
+            updates = rpcapi.update_service_capabilities_batch.call_args[0][1]
+        self.assertEqual([('host1', {'fake': 1}), ('host2', {'fake': 2})],
+                         [(update['host'], update['capabilities'])
+                          for update in updates])
+        self.mock_looping_call.assert_any_call(
+            service._CAPABILITY_PUBLISHER.publish)
+
+    def test_stop(self):
+        first = self._service('host1')
+        second = self._service('host2')
+
+        first.stop()
+        self.assertEqual([second], service._CAPABILITY_PUBLISHER.services)
+        second.stop()
+
+        self.assertIsNone(service._CAPABILITY_PUBLISHER.timer)
 
 
 class TestWSGIService(test.TestCase):
@@ -190,6 +317,38 @@ class TestWSGIService(test.TestCase):
         test_service.stop()
         wsgi.Loader.load_app.assert_called_once_with("test_service")
 
+    @mock.patch.object(wsgi.Loader, 'load_app', mock.Mock())
+    def test_service_workers(self):
+        self.flags(osapi_share_workers=4, osapi_share_listen='127.0.0.1',
+                   osapi_share_listen_port=0)
+        test_service = service.WSGIService("osapi_share")
+        self.assertEqual(4, test_service.workers)
+        self.assertFalse(test_service.reuse_port)
+        test_service.listen()
+        port = test_service.port
+        self.assertNotEqual(0, port)
+        test_service.start()
+        self.assertEqual(port, test_service.port)
+        test_service.stop()
+
+    @mock.patch.object(wsgi.Loader, 'load_app', mock.Mock())
+    def test_service_listen_with_reuse_port(self):
+        self.flags(osapi_share_reuse_port=True,
+                   osapi_share_listen='127.0.0.1',
+                   osapi_share_listen_port=0)
+        test_service = service.WSGIService("osapi_share")
+        test_service.listen()
+        self.assertEqual(0, test_service.port)
+
+    @mock.patch.object(wsgi.Loader, 'load_app', mock.Mock())
+    def test_service_reset(self):
+        test_service = service.WSGIService("test_service")
+        new_app = mock.Mock()
+        wsgi.Loader.load_app.return_value = new_app
+        test_service.reset()
+        self.assertEqual(new_app, test_service.app)
+        self.assertEqual(new_app, test_service.server.app)
+
 
 class TestLauncher(test.TestCase):
 
@@ -202,3 +361,71 @@ class TestLauncher(test.TestCase):
         self.assertEqual(0, self.service.port)
         launcher.stop()
         wsgi.Loader.load_app.assert_called_once_with("test_service")
+
+
+class ProcessLauncherTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ProcessLauncherTestCase, self).setUp()
+        with mock.patch('signal.signal'):
+            self.launcher = service.ProcessLauncher()
+        self.addCleanup(self.launcher.readpipe.close)
+        self.addCleanup(os.close, self.launcher.writepipe)
+
+    def _fake_start_child(self):
+        pids = iter(range(100, 200))
+
+        def _start_child(wrap):
+            pid = next(pids)
+            wrap.children.add(pid)
+            self.launcher.children[pid] = wrap
+            return pid
+
+        self.stubs.Set(self.launcher, '_start_child',
+                       mock.Mock(side_effect=_start_child))
+
+    def test_launch_server_listens_before_forking(self):
+        self._fake_start_child()
+        server = mock.Mock()
+        self.launcher.launch_server(server, workers=3)
+        server.listen.assert_called_once_with()
+        self.assertEqual(3, self.launcher._start_child.call_count)
+        self.assertEqual(3, len(self.launcher.children))
+
+    @mock.patch('os.fork', mock.Mock(return_value=1234))
+    @mock.patch.object(db, 'dispose_engine', mock.Mock())
+    def test_start_child_disposes_engine(self):
+        wrap = service.ServerWrapper(mock.Mock(), 1)
+        self.assertEqual(1234, self.launcher._start_child(wrap))
+        db.dispose_engine.assert_called_once_with()
+        self.assertEqual(set([1234]), wrap.children)
+
+    @mock.patch('os.kill')
+    @mock.patch.object(service.CONF, 'reload_config_files', mock.Mock())
+    def test_reload(self, mock_kill):
+        self._fake_start_child()
+        server = mock.Mock()
+        wrap = service.ServerWrapper(server, 2)
+        wrap.children = set([1, 2])
+        self.launcher.children = {1: wrap, 2: wrap}
+        self.launcher.reload()
+        service.CONF.reload_config_files.assert_called_once_with()
+        server.reset.assert_called_once_with()
+        self.assertEqual(2, self.launcher._start_child.call_count)
+        mock_kill.assert_has_calls([mock.call(1, signal.SIGHUP),
+                                    mock.call(2, signal.SIGHUP)],
+                                   any_order=True)
+        self.assertEqual(4, len(wrap.children))
+
+    def test_wait_reloads_on_sighup(self):
+        signals = [signal.SIGHUP, signal.SIGTERM]
+
+        def _respawn_children():
+            self.launcher.sigcaught = signals.pop(0)
+
+        self.stubs.Set(self.launcher, '_respawn_children',
+                       mock.Mock(side_effect=_respawn_children))
+        self.stubs.Set(self.launcher, 'reload', mock.Mock())
+        self.launcher.wait()
+        self.launcher.reload.assert_called_once_with()
+        self.assertEqual(2, self.launcher._respawn_children.call_count)
@@ -409,6 +409,27 @@ class GenericUtilsTestCase(test.TestCase):
             fake_dns.getaddrinfo.assert_called_once_with('::1', 80)
 
 
+class LazyImportTestCase(test.TestCase):
+
+    @mock.patch('oslo.utils.importutils.import_module')
+    def test_imported_on_first_use(self, mock_import):
+        lazy_module = utils.LazyImport('fake.module')
+
+        self.assertFalse(mock_import.called)
+        self.assertEqual(mock_import.return_value.attr, lazy_module.attr)
+        self.assertEqual(mock_import.return_value.func(),
+                         lazy_module.func())
+        mock_import.assert_called_once_with('fake.module')
+
+    def test_patching_the_module(self):
+        lazy_module = utils.LazyImport('os.path')
+
+        with mock.patch.object(os.path, 'exists',
+                               mock.Mock(return_value='fake')):
+            self.assertEqual('fake', lazy_module.exists('/fake'))
+        self.assertIs(os.path.exists, lazy_module.exists)
+
+
 class MonkeyPatchTestCase(test.TestCase):
     """Unit test for utils.monkey_patch()."""
     def setUp(self):
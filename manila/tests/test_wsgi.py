@@ -97,6 +97,47 @@ class TestWSGIServer(test.TestCase):
         server.stop()
         server.wait()
 
+    def test_listen_before_start(self):
+        server = manila.wsgi.Server("test_listen", None, host="127.0.0.1")
+        server.listen()
+        port = server.port
+        self.assertNotEqual(0, port)
+        sock = server._socket
+        server.listen()
+        server.start()
+        self.assertEqual(port, server.port)
+        self.assertIs(sock, server._socket)
+        server.stop()
+        server.wait()
+
+    def test_listen_invalid_backlog(self):
+        server = manila.wsgi.Server("test_listen", None, host="127.0.0.1")
+        self.assertRaises(exception.InvalidInput, server.listen, backlog=0)
+
+    @testtools.skipIf(manila.wsgi.SO_REUSEPORT is None,
+                      "Test requires SO_REUSEPORT")
+    def test_start_with_reuse_port(self):
+        greetings = 'Hello, World!!!'
+
+        def hello_world(env, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [greetings]
+
+        first = manila.wsgi.Server("test_reuse_port", hello_world,
+                                   host="127.0.0.1", reuse_port=True)
+        first.start()
+        second = manila.wsgi.Server("test_reuse_port", hello_world,
+                                    host="127.0.0.1", port=first.port,
+                                    reuse_port=True)
+        second.start()
+        self.assertEqual(first.port, second.port)
+
+        response = urllib2.urlopen('http://127.0.0.1:%d/' % first.port)
+        self.assertEqual(greetings, response.read())
+
+        first.stop()
+        second.stop()
+
     @testtools.skipIf(not utils.is_ipv6_configured(),
                       "Test requires an IPV6 configured interface")
     @testtools.skipIf(utils.is_eventlet_bug105(),
@@ -20,6 +20,7 @@
 import contextlib
 import datetime
 import errno
+import functools
 import hashlib
 import inspect
 import os
@@ -43,12 +44,11 @@ from oslo.utils import excutils
 from oslo.utils import importutils
 from oslo.utils import timeutils
 from oslo_concurrency import processutils
-import paramiko
 import six
 
 from manila import exception
 from manila.i18n import _
-from manila.openstack.common import lockutils
+from manila import locks
 from manila.openstack.common import log as logging
 
 
@@ -57,7 +57,32 @@ LOG = logging.getLogger(__name__)
 ISO_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
 PERFECT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
 
-synchronized = lockutils.synchronized_with_prefix('manila-')
+synchronized = functools.partial(locks.synchronized,
+                                 lock_file_prefix='manila-')
+
+
+class LazyImport(object):
+    """A module imported on first attribute access.
+
+    Heavy modules only used by some code paths, like SSH and the clients
+    of other services, are imported this way so that they do not slow
+    down the startup of every process which imports their users.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+
+    def __get_module(self):
+        if self.__module is None:
+            self.__module = importutils.import_module(self.__name)
+        return self.__module
+
+    def __getattr__(self, key):
+        return getattr(self.__get_module(), key)
+
+
+paramiko = LazyImport('paramiko')
 
 
 def find_config(config_path):
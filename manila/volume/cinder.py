@@ -20,15 +20,17 @@ Handles all requests relating to volumes + cinder.
 import copy
 import sys
 
-from cinderclient import exceptions as cinder_exception
-from cinderclient import service_catalog
-from cinderclient.v1 import client as cinder_client
 from oslo.config import cfg
 
 from manila.db import base
 from manila import exception
 from manila.i18n import _
 from manila.openstack.common import log as logging
+from manila import utils
+
+cinder_exception = utils.LazyImport('cinderclient.exceptions')
+service_catalog = utils.LazyImport('cinderclient.service_catalog')
+cinder_client = utils.LazyImport('cinderclient.v1.client')
 
 
 cinder_opts = [
@@ -27,6 +27,7 @@ import sys
 import time
 
 import eventlet
+import eventlet.green.socket
 import eventlet.wsgi
 import greenlet
 from oslo.config import cfg
@@ -91,6 +92,15 @@ CONF.register_opts(eventlet_opts)
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
+# NOTE: the python 2 socket module does not export SO_REUSEPORT, fall back
+# to the Linux value where it is missing.
+if hasattr(socket, 'SO_REUSEPORT'):
+    SO_REUSEPORT = socket.SO_REUSEPORT
+elif sys.platform.startswith('linux'):
+    SO_REUSEPORT = 15
+else:
+    SO_REUSEPORT = None
+
 
 class Server(object):
     """Server class to manage a WSGI server, serving a WSGI application."""
@@ -98,7 +108,7 @@ class Server(object):
     default_pool_size = 1000
 
     def __init__(self, name, app, host=None, port=None, pool_size=None,
-                 protocol=eventlet.wsgi.HttpProtocol):
+                 protocol=eventlet.wsgi.HttpProtocol, reuse_port=False):
         """Initialize, but do not start, a WSGI server.
 
         :param name: Pretty name for logging.
@@ -106,6 +116,8 @@ class Server(object):
         :param host: IP address to serve the application.
         :param port: Port number to server the application.
         :param pool_size: Maximum number of eventlets to spawn concurrently.
+        :param reuse_port: Bind with SO_REUSEPORT, so that several processes
+                           can each own a listening socket on the same port.
         :returns: None
 
         """
@@ -117,10 +129,24 @@ class Server(object):
         self._server = None
         self._socket = None
         self._protocol = protocol
+        self._reuse_port = reuse_port
         self._pool = eventlet.GreenPool(pool_size or self.default_pool_size)
         self._logger = logging.getLogger("eventlet.wsgi.server")
         self._wsgi_logger = logging.WritableLogger(self._logger)
 
+    def _listen(self, bind_addr, backlog, family):
+        if not self._reuse_port:
+            return eventlet.listen(bind_addr, backlog=backlog, family=family)
+        if SO_REUSEPORT is None:
+            raise RuntimeError(_("SO_REUSEPORT is not supported on this "
+                                 "platform"))
+        sock = eventlet.green.socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, 1)
+        sock.bind(bind_addr)
+        sock.listen(backlog)
+        return sock
+
     def _get_socket(self, host, port, backlog):
         bind_addr = (host, port)
         # TODO(dims): eventlet's green dns/socket module does not actually
@@ -173,9 +199,7 @@ class Server(object):
         retry_until = time.time() + 30
         while not sock and time.time() < retry_until:
             try:
-                sock = eventlet.listen(bind_addr,
-                                       backlog=backlog,
-                                       family=family)
+                sock = self._listen(bind_addr, backlog, family)
                 if use_ssl:
                     sock = wrap_ssl(sock)
 
@@ -210,14 +234,20 @@ class Server(object):
                              custom_pool=self._pool,
                              log=self._wsgi_logger)
 
-    def start(self, backlog=128):
-        """Start serving a WSGI application.
+    def listen(self, backlog=128):
+        """Bind the listening socket without serving on it yet.
+
+        A server which is forked into several workers is bound once in the
+        parent, so all of the workers accept connections from the same
+        socket. Calling it again once bound does nothing.
 
         :param backlog: Maximum number of queued connections.
         :returns: None
         :raises: manila.exception.InvalidInput
 
         """
+        if self._socket is not None:
+            return
         if backlog < 1:
             raise exception.InvalidInput(
                 reason='The backlog must be more than 1')
@@ -225,8 +255,18 @@ class Server(object):
         self._socket = self._get_socket(self._host,
                                         self._port,
                                         backlog=backlog)
-        self._server = eventlet.spawn(self._start)
         (self._host, self._port) = self._socket.getsockname()[0:2]
+
+    def start(self, backlog=128):
+        """Start serving a WSGI application.
+
+        :param backlog: Maximum number of queued connections.
+        :returns: None
+        :raises: manila.exception.InvalidInput
+
+        """
+        self.listen(backlog=backlog)
+        self._server = eventlet.spawn(self._start)
         LOG.info(_LI("Started %(name)s on %(_host)s:%(_port)s"),
                  {'name': self.name, '_host': self._host, '_port': self._port})
 
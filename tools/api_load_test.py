@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the request rate the share API sustains.
+
+Run it against manila-api started with osapi_share_workers set to 1, 2, ...
+up to the number of cores to see how the API scales with its workers:
+
+    tools/api_load_test.py --token $TOKEN \\
+        http://127.0.0.1:8786/v1/$TENANT_ID/shares/detail
+
+The client load is spread over several processes, so the client itself
+does not become the bottleneck on a single core.
+"""
+
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import threading
+import time
+import urllib2
+
+
+def _client(url, headers, deadline, results):
+    requests = errors = 0
+    latency = 0.0
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            urllib2.urlopen(urllib2.Request(url, headers=headers)).read()
+            requests += 1
+            latency += time.time() - start
+        except Exception:
+            errors += 1
+    results.append((requests, errors, latency))
+
+
+def _process(url, headers, threads, deadline, queue):
+    results = []
+    clients = [threading.Thread(target=_client,
+                                args=(url, headers, deadline, results))
+               for _i in range(threads)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    queue.put([sum(column) for column in zip(*results)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('url', help='URL requested with GET.')
+    parser.add_argument('--token', help='Keystone token to send.')
+    parser.add_argument('--processes', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Client processes (default: number of cores).')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='Concurrent connections per client process.')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='Seconds to run for.')
+    args = parser.parse_args()
+
+    headers = {'Accept': 'application/json'}
+    if args.token:
+        headers['X-Auth-Token'] = args.token
+
+    deadline = time.time() + args.duration
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_process,
+                                         args=(args.url, headers,
+                                               args.threads, deadline,
+                                               queue))
+                 for _i in range(args.processes)]
+    for process in processes:
+        process.start()
+    totals = [sum(column)
+              for column in zip(*[queue.get() for _p in processes])]
+    for process in processes:
+        process.join()
+
+    requests, errors, latency = totals
+    print('requests: %d, errors: %d' % (requests, errors))
+    print('requests/sec: %.1f' % (requests / args.duration))
+    if requests:
+        print('mean latency: %.1f ms' % (latency / requests * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Report where the time goes while importing modules.
+
+Python 2.7 has no '-X importtime', so this tool times the imports by
+wrapping __import__ instead.  It imports a module or runs a script, then
+prints the imports that took longest, with the time spent in the module
+itself and the time including the modules it imported in turn:
+
+    tools/import_time.py manila.api.v1.router
+    tools/import_time.py --limit 20 bin/manila-manage version list
+
+The arguments following a script are passed to it.  Only imports which
+load new modules are reported, so a module shows up under whichever
+importer happened to load it first.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+import traceback
+
+from six.moves import builtins
+
+
+class ImportTimer(object):
+
+    def __init__(self):
+        self.rows = []
+        self._stack = []
+        self._import = builtins.__import__
+
+    def __enter__(self):
+        builtins.__import__ = self._timed_import
+        return self
+
+    def __exit__(self, *exc_info):
+        builtins.__import__ = self._import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=None,
+                      level=-1):
+        loaded = len(sys.modules)
+        start = time.time()
+        self._stack.append(0.0)
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.time() - start
+            children = self._stack.pop()
+            if len(sys.modules) > loaded:
+                if fromlist:
+                    name = '%s (%s)' % (name, ', '.join(fromlist))
+                self.rows.append((elapsed - children, elapsed,
+                                  len(self._stack), name))
+            if self._stack:
+                self._stack[-1] += elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report the slowest imports of a module or script.')
+    parser.add_argument('--limit', type=int, default=40,
+                        help='Number of imports to report.')
+    parser.add_argument('--sort', choices=('cumulative', 'self'),
+                        default='cumulative',
+                        help='Whether to rank imports by the time including '
+                             'or excluding the modules they imported.')
+    parser.add_argument('target',
+                        help='Module to import or script to run.')
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help='Arguments of the script.')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.join(
+        os.path.dirname(__file__), os.pardir)))
+    start = time.time()
+    with ImportTimer() as timer:
+        try:
+            if os.path.isfile(args.target):
+                sys.argv = [args.target] + args.args
+                sys.path[0] = os.path.dirname(os.path.abspath(args.target))
+                with open(args.target) as script:
+                    code = compile(script.read(), args.target, 'exec')
+                exec(code, {'__name__': '__main__',
+                            '__file__': args.target})
+            else:
+                __import__(args.target)
+        except SystemExit:
+            pass
+        except Exception:
+            # Report the imports made until the failure all the same.
+            traceback.print_exc()
+    total = time.time() - start
+
+    column = 0 if args.sort == 'self' else 1
+    rows = sorted(timer.rows, key=lambda row: row[column], reverse=True)
+    print('%.1f ms total, %d modules loaded' % (total * 1000,
+                                                len(sys.modules)),
+          file=sys.stderr)
+    print('%9s %9s  %s' % ('self ms', 'cumul ms', 'import'), file=sys.stderr)
+    for own, cumulative, depth, name in rows[:args.limit]:
+        print('%9.1f %9.1f  %s%s' % (own * 1000, cumulative * 1000,
+                                     '  ' * depth, name),
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the ip_lib backends on the network devices of this host.
+
+Runs the lookups the interface drivers make -- device_exists, the link
+attributes and the global permanent addresses of every device, and the
+routes of pullup_route -- with each value of ip_lib_backend, and reports
+the commands forked through utils.execute and the time taken:
+
+    tools/ip_lib_forks.py
+    tools/ip_lib_forks.py --iterations 10 --route-device eth0
+
+Only reads are made, in the namespace of the tool, so no root is needed.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+
+def _workload(ip_lib, route_device, route_lookups):
+    for device in ip_lib.IPWrapper().get_devices(exclude_loopback=True):
+        ip_lib.device_exists(device.name)
+        device.link.attributes
+        device.addr.list(scope='global', filters=['permanent'])
+    if route_device:
+        route = ip_lib.IPDevice(route_device).route
+        for _i in range(route_lookups):
+            route.get_subnet_devices(route_device)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Count the commands forked by each ip_lib backend.')
+    parser.add_argument('--iterations', type=int, default=1,
+                        help='Number of times to run the lookups.')
+    parser.add_argument('--route-device',
+                        help='Device whose routes pullup_route would look '
+                             'up. Routes are not looked up by default.')
+    parser.add_argument('--route-lookups', type=int, default=10,
+                        help='Number of route lookups per iteration.')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.join(
+        os.path.dirname(__file__), os.pardir)))
+    from oslo.config import cfg
+
+    from manila.common import config  # noqa
+    from manila.network.linux import ip_lib
+    from manila import utils
+
+    cfg.CONF([], project='manila', default_config_files=[])
+
+    forks = [0]
+    execute = utils.execute
+
+    def counting_execute(*cmd, **kwargs):
+        forks[0] += 1
+        return execute(*cmd, **kwargs)
+
+    utils.execute = counting_execute
+    print('%-12s %8s %10s' % ('backend', 'forks', 'ms'))
+    for backend in ('subprocess', 'netlink'):
+        cfg.CONF.set_override('ip_lib_backend', backend)
+        forks[0] = 0
+        start = time.time()
+        for _i in range(args.iterations):
+            _workload(ip_lib, args.route_device, args.route_lookups)
+        print('%-12s %8d %10.1f' % (backend, forks[0],
+                                    (time.time() - start) * 1000))
+
+
+if __name__ == '__main__':
+    main()